@@ -14,6 +14,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from src.core.database import Base
 from src.project.models import * # Import all models here
 from src.crew.models import * 
+from src.core.models import *
 # --- Load .env file ---
 # This ensures the DATABASE_URL is available for Alembic
 load_dotenv()
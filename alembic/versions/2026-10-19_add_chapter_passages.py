@@ -0,0 +1,41 @@
+"""Add chapter_passages
+
+Revision ID: 3f6a0c8e91d2
+Revises: e2a8b57d04c1
+Create Date: 2026-10-19 16:48:52.120447
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6a0c8e91d2'
+down_revision = 'e2a8b57d04c1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing chapters are indexed lazily, the first time their project's
+    # passages are retrieved (see src/project/retrieval.py).
+    op.create_table('chapter_passages',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('project_id', sa.UUID(), nullable=False),
+    sa.Column('chapter_id', sa.UUID(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('text', sa.TEXT(), nullable=False),
+    sa.Column('term_counts', sa.JSON(), nullable=False),
+    sa.Column('length', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['chapter_id'], ['chapters.id'], name=op.f('chapter_passages_chapter_id_fkey'), ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], name=op.f('chapter_passages_project_id_fkey'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id', name=op.f('chapter_passages_pkey'))
+    )
+    op.create_index(op.f('chapter_passages_chapter_id_idx'), 'chapter_passages', ['chapter_id'], unique=False)
+    op.create_index(op.f('chapter_passages_project_id_idx'), 'chapter_passages', ['project_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('chapter_passages_project_id_idx'), table_name='chapter_passages')
+    op.drop_index(op.f('chapter_passages_chapter_id_idx'), table_name='chapter_passages')
+    op.drop_table('chapter_passages')
@@ -0,0 +1,27 @@
+"""Add finalization to parts
+
+Revision ID: c5e8a1f3b7d2
+Revises: 9a3f6d2b8c14
+Create Date: 2026-10-20 09:14:05.402318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e8a1f3b7d2'
+down_revision = '9a3f6d2b8c14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('parts', sa.Column('finalization', sa.String(), nullable=True))
+    # Introductions are part 0; conclusions only have their title to go by.
+    op.execute("UPDATE parts SET finalization = 'introduction' WHERE part_number = 0")
+    op.execute("UPDATE parts SET finalization = 'conclusion' WHERE title = 'The Book''s Conclusion'")
+
+
+def downgrade() -> None:
+    op.drop_column('parts', 'finalization')
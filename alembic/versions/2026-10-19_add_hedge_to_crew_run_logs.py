@@ -0,0 +1,24 @@
+"""Add hedge to crew_run_logs
+
+Revision ID: 4e7b1c9a2d65
+Revises: 7c2e9a4d1f38
+Create Date: 2026-10-19 23:48:31.507192
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e7b1c9a2d65'
+down_revision = '7c2e9a4d1f38'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('crew_run_logs', sa.Column('hedge', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('crew_run_logs', 'hedge')
@@ -0,0 +1,38 @@
+"""Add job_checkpoints
+
+Revision ID: 9c41d6e3b2f7
+Revises: 5b7e2f0c1a93
+Create Date: 2026-10-19 11:03:18.554902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c41d6e3b2f7'
+down_revision = '5b7e2f0c1a93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('job_checkpoints',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('job_key', sa.String(), nullable=False),
+    sa.Column('step', sa.String(), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('job_id', sa.String(), nullable=True),
+    sa.Column('function_name', sa.String(), nullable=True),
+    sa.Column('job_args', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id', name=op.f('job_checkpoints_pkey')),
+    sa.UniqueConstraint('job_key', name=op.f('job_checkpoints_job_key_key'))
+    )
+    op.create_index(op.f('job_checkpoints_updated_at_idx'), 'job_checkpoints', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('job_checkpoints_updated_at_idx'), table_name='job_checkpoints')
+    op.drop_table('job_checkpoints')
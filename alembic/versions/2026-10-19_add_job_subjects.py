@@ -0,0 +1,34 @@
+"""Add job_subjects to cancel queued jobs by entity
+
+Revision ID: 7c2e9a4d1f38
+Revises: 1b8d4f6e2a07
+Create Date: 2026-10-19 23:05:12.184406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e9a4d1f38'
+down_revision = '1b8d4f6e2a07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('job_subjects',
+    sa.Column('job_id', sa.String(), nullable=False),
+    sa.Column('function_name', sa.String(), nullable=False),
+    sa.Column('project_id', sa.UUID(), nullable=False),
+    sa.Column('subject_id', sa.UUID(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], name=op.f('job_subjects_project_id_fkey'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('job_id', name=op.f('job_subjects_pkey'))
+    )
+    op.create_index(op.f('ix_job_subjects_subject_id'), 'job_subjects', ['subject_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_job_subjects_subject_id'), table_name='job_subjects')
+    op.drop_table('job_subjects')
@@ -0,0 +1,45 @@
+"""Add full-text search vectors to chapters and chapter_versions
+
+Revision ID: 5e0f93b7a2c4
+Revises: c3b97e1a4d58
+Create Date: 2026-10-19 20:47:12.018455
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '5e0f93b7a2c4'
+down_revision = 'c3b97e1a4d58'
+branch_labels = None
+depends_on = None
+
+
+# The text search configuration must match SEARCH_CONFIG in src/project/search.py.
+CHAPTER_SEARCH_VECTOR = (
+    "setweight(to_tsvector('english'::regconfig, coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english'::regconfig, coalesce(content, '')), 'B')"
+)
+VERSION_SEARCH_VECTOR = "to_tsvector('english'::regconfig, coalesce(content, ''))"
+
+
+def upgrade() -> None:
+    # Stored generated columns: PostgreSQL keeps them in sync with every write
+    # and computes them for existing rows here (this rewrites both tables).
+    op.add_column('chapters', sa.Column('search_vector', postgresql.TSVECTOR(),
+                  sa.Computed(CHAPTER_SEARCH_VECTOR, persisted=True), nullable=True))
+    op.add_column('chapter_versions', sa.Column('search_vector', postgresql.TSVECTOR(),
+                  sa.Computed(VERSION_SEARCH_VECTOR, persisted=True), nullable=True))
+    op.create_index(op.f('chapters_search_vector_idx'), 'chapters', ['search_vector'], unique=False,
+                    postgresql_using='gin')
+    op.create_index(op.f('chapter_versions_search_vector_idx'), 'chapter_versions', ['search_vector'], unique=False,
+                    postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('chapter_versions_search_vector_idx'), table_name='chapter_versions', postgresql_using='gin')
+    op.drop_index(op.f('chapters_search_vector_idx'), table_name='chapters', postgresql_using='gin')
+    op.drop_column('chapter_versions', 'search_vector')
+    op.drop_column('chapters', 'search_vector')
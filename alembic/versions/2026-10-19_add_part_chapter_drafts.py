@@ -0,0 +1,83 @@
+"""Move draft chapter outlines to part_chapter_drafts
+
+Revision ID: a84e2d7f5c16
+Revises: 7d15c4a2b9e0
+Create Date: 2026-10-19 19:21:08.336190
+
+"""
+import uuid
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a84e2d7f5c16'
+down_revision = '7d15c4a2b9e0'
+branch_labels = None
+depends_on = None
+
+
+projects = sa.table(
+    'projects',
+    sa.column('id', sa.UUID()),
+    sa.column('draft_chapters_outline', sa.JSON()),
+)
+parts = sa.table(
+    'parts',
+    sa.column('id', sa.UUID()),
+    sa.column('project_id', sa.UUID()),
+)
+
+
+def upgrade() -> None:
+    drafts = op.create_table('part_chapter_drafts',
+    sa.Column('part_id', sa.UUID(), nullable=False),
+    sa.Column('project_id', sa.UUID(), nullable=False),
+    sa.Column('outline', sa.JSON(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['part_id'], ['parts.id'], name=op.f('part_chapter_drafts_part_id_fkey'), ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], name=op.f('part_chapter_drafts_project_id_fkey'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('part_id', name=op.f('part_chapter_drafts_pkey'))
+    )
+    op.create_index(op.f('part_chapter_drafts_project_id_idx'), 'part_chapter_drafts', ['project_id'], unique=False)
+
+    # Copy the drafts of the {part_id: outline} maps, skipping parts that no longer exist.
+    bind = op.get_bind()
+    part_ids = set(bind.execute(sa.select(parts.c.id)).scalars())
+    now = datetime.utcnow()
+    rows = []
+    for project_id, outline_map in bind.execute(
+        sa.select(projects.c.id, projects.c.draft_chapters_outline)
+        .where(projects.c.draft_chapters_outline.is_not(None))
+    ):
+        for part_id, outline in (outline_map or {}).items():
+            if outline and uuid.UUID(part_id) in part_ids:
+                rows.append({'part_id': uuid.UUID(part_id), 'project_id': project_id, 'outline': outline, 'updated_at': now})
+    if rows:
+        op.bulk_insert(drafts, rows)
+
+    op.drop_column('projects', 'draft_chapters_outline')
+
+
+def downgrade() -> None:
+    op.add_column('projects', sa.Column('draft_chapters_outline', sa.JSON(), nullable=True))
+
+    drafts = sa.table(
+        'part_chapter_drafts',
+        sa.column('part_id', sa.UUID()),
+        sa.column('project_id', sa.UUID()),
+        sa.column('outline', sa.JSON()),
+    )
+    bind = op.get_bind()
+    outline_maps: dict = {}
+    for part_id, project_id, outline in bind.execute(sa.select(drafts.c.part_id, drafts.c.project_id, drafts.c.outline)):
+        outline_maps.setdefault(project_id, {})[str(part_id)] = outline
+    for project_id, outline_map in outline_maps.items():
+        bind.execute(
+            projects.update().where(projects.c.id == project_id).values(draft_chapters_outline=outline_map)
+        )
+
+    op.drop_index(op.f('part_chapter_drafts_project_id_idx'), table_name='part_chapter_drafts')
+    op.drop_table('part_chapter_drafts')
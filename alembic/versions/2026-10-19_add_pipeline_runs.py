@@ -0,0 +1,35 @@
+"""Add pipeline_runs
+
+Revision ID: 5b7e2f0c1a93
+Revises: 0196dad3d456
+Create Date: 2026-10-19 09:12:41.208311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7e2f0c1a93'
+down_revision = '0196dad3d456'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('pipeline_runs',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('project_id', sa.UUID(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('config', sa.JSON(), nullable=False),
+    sa.Column('node_states', sa.JSON(), nullable=False),
+    sa.Column('job_id', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], name=op.f('pipeline_runs_project_id_fkey'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id', name=op.f('pipeline_runs_pkey'))
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('pipeline_runs')
@@ -0,0 +1,41 @@
+"""Add queue_jobs for the Postgres queue backend
+
+Revision ID: 1b8d4f6e2a07
+Revises: 5e0f93b7a2c4
+Create Date: 2026-10-19 21:32:40.527913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1b8d4f6e2a07'
+down_revision = '5e0f93b7a2c4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('queue_jobs',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('function_name', sa.String(), nullable=False),
+    sa.Column('args', sa.JSON(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('scheduled_at', sa.DateTime(), nullable=False),
+    sa.Column('locked_until', sa.DateTime(), nullable=True),
+    sa.Column('worker_id', sa.String(), nullable=True),
+    sa.Column('success', sa.Boolean(), nullable=True),
+    sa.Column('result', sa.JSON(), nullable=True),
+    sa.Column('enqueued_at', sa.DateTime(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id', name=op.f('queue_jobs_pkey'))
+    )
+    op.create_index('queue_jobs_status_scheduled_at_idx', 'queue_jobs', ['status', 'scheduled_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('queue_jobs_status_scheduled_at_idx', table_name='queue_jobs')
+    op.drop_table('queue_jobs')
@@ -0,0 +1,24 @@
+"""Add repair to crew_run_logs
+
+Revision ID: 9a3f6d2b8c14
+Revises: 4e7b1c9a2d65
+Create Date: 2026-10-20 00:21:47.836105
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a3f6d2b8c14'
+down_revision = '4e7b1c9a2d65'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('crew_run_logs', sa.Column('repair', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('crew_run_logs', 'repair')
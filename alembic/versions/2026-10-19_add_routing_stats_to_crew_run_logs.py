@@ -0,0 +1,32 @@
+"""Add routing stats to crew_run_logs
+
+Revision ID: e2a8b57d04c1
+Revises: 9c41d6e3b2f7
+Create Date: 2026-10-19 14:27:05.913377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a8b57d04c1'
+down_revision = '9c41d6e3b2f7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('crew_run_logs', sa.Column('agent_name', sa.String(), nullable=True))
+    op.add_column('crew_run_logs', sa.Column('phase', sa.String(), nullable=True))
+    op.add_column('crew_run_logs', sa.Column('latency_ms', sa.Integer(), nullable=True))
+    op.add_column('crew_run_logs', sa.Column('succeeded', sa.Boolean(), server_default=sa.true(), nullable=False))
+    op.create_index('crew_run_logs_phase_created_at_idx', 'crew_run_logs', ['phase', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('crew_run_logs_phase_created_at_idx', table_name='crew_run_logs')
+    op.drop_column('crew_run_logs', 'succeeded')
+    op.drop_column('crew_run_logs', 'latency_ms')
+    op.drop_column('crew_run_logs', 'phase')
+    op.drop_column('crew_run_logs', 'agent_name')
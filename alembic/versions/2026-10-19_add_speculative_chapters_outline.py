@@ -0,0 +1,24 @@
+"""Add projects.speculative_chapters_outline
+
+Revision ID: 7d15c4a2b9e0
+Revises: 3f6a0c8e91d2
+Create Date: 2026-10-19 18:02:37.514208
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d15c4a2b9e0'
+down_revision = '3f6a0c8e91d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('projects', sa.Column('speculative_chapters_outline', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('projects', 'speculative_chapters_outline')
@@ -0,0 +1,50 @@
+"""Store briefs and draft outlines as JSONB with GIN indexes
+
+Revision ID: c3b97e1a4d58
+Revises: a84e2d7f5c16
+Create Date: 2026-10-19 20:05:44.901273
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3b97e1a4d58'
+down_revision = 'a84e2d7f5c16'
+branch_labels = None
+depends_on = None
+
+
+# (table, column, nullable)
+JSON_DOCUMENT_COLUMNS = (
+    ('chapters', 'brief', True),
+    ('part_chapter_drafts', 'outline', False),
+    ('projects', 'draft_parts_outline', True),
+    ('projects', 'speculative_chapters_outline', True),
+)
+
+
+def upgrade() -> None:
+    for table, column, nullable in JSON_DOCUMENT_COLUMNS:
+        op.alter_column(table, column,
+               existing_type=sa.JSON(),
+               type_=postgresql.JSONB(astext_type=sa.Text()),
+               existing_nullable=nullable,
+               postgresql_using=f'{column}::jsonb')
+    op.create_index(op.f('chapters_brief_idx'), 'chapters', ['brief'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'brief': 'jsonb_path_ops'})
+    op.create_index(op.f('part_chapter_drafts_outline_idx'), 'part_chapter_drafts', ['outline'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'outline': 'jsonb_path_ops'})
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('part_chapter_drafts_outline_idx'), table_name='part_chapter_drafts', postgresql_using='gin')
+    op.drop_index(op.f('chapters_brief_idx'), table_name='chapters', postgresql_using='gin')
+    for table, column, nullable in JSON_DOCUMENT_COLUMNS:
+        op.alter_column(table, column,
+               existing_type=postgresql.JSONB(astext_type=sa.Text()),
+               type_=sa.JSON(),
+               existing_nullable=nullable,
+               postgresql_using=f'{column}::json')
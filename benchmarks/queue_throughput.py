@@ -0,0 +1,153 @@
+# benchmarks/queue_throughput.py
+"""
+Throughput of the arq (Redis) and Postgres queue backends on the same job
+functions.
+
+Each run enqueues --jobs jobs, then drains them with a single burst worker of
+each backend (--max-jobs concurrent jobs), so the numbers compare the queue
+overhead: enqueue, claim, running the function and storing its result. Run it
+from the project root with the usual environment (.env or exported
+variables); Redis and a migrated Postgres database must be reachable:
+
+    python benchmarks/queue_throughput.py --jobs 1000 --runs 3
+
+Benchmark jobs use their own arq queue and "bench-" job ids in queue_jobs,
+which are deleted afterwards. Do not run it while a Postgres queue worker is
+serving the same database: it would claim the benchmark jobs.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+ARQ_QUEUE_NAME = "benchmark:queue"
+JOB_ID_PREFIX = "bench-"
+
+
+async def noop_job(ctx, item_id: uuid.UUID) -> dict:
+    """Pure queue overhead."""
+    return {"status": "success", "item_id": str(item_id)}
+
+
+async def io_job(ctx, item_id: uuid.UUID, delay_ms: int) -> dict:
+    """Stands in for a job waiting on I/O, as the crew jobs wait on the LLM API."""
+    await asyncio.sleep(delay_ms / 1000)
+    return {"status": "success", "item_id": str(item_id)}
+
+
+FUNCTIONS = [noop_job, io_job]
+
+
+def job_args(function_name: str, delay_ms: int) -> tuple:
+    return (uuid.uuid4(), delay_ms) if function_name == "io_job" else (uuid.uuid4(),)
+
+
+async def bench_arq(function_name: str, jobs: int, max_jobs: int, delay_ms: int) -> tuple[float, float]:
+    from arq import create_pool
+    from arq.worker import Worker
+    from src.core.config import settings
+    from src.core.task_queue import TaskQueue
+
+    TaskQueue.configure(settings.REDIS_URL)
+    pool = await create_pool(TaskQueue.redis_settings)
+    try:
+        t0 = time.perf_counter()
+        for _ in range(jobs):
+            await pool.enqueue_job(function_name, *job_args(function_name, delay_ms), _queue_name=ARQ_QUEUE_NAME)
+        enqueue_s = time.perf_counter() - t0
+
+        worker = Worker(
+            FUNCTIONS, redis_pool=pool, queue_name=ARQ_QUEUE_NAME, burst=True,
+            max_jobs=max_jobs, poll_delay=0.05, handle_signals=False, keep_result=60,
+        )
+        t0 = time.perf_counter()
+        await worker.async_run()
+        drain_s = time.perf_counter() - t0
+        if worker.jobs_complete != jobs:
+            raise RuntimeError(f"arq completed {worker.jobs_complete} of {jobs} jobs")
+        await worker.close()
+    finally:
+        await pool.close()
+    return enqueue_s, drain_s
+
+
+async def bench_postgres(function_name: str, jobs: int, max_jobs: int, delay_ms: int) -> tuple[float, float]:
+    from sqlalchemy import delete
+    from src.core.database import AsyncSessionFactory, engine
+    from src.core.models import QueueJob
+    from src.core.pg_queue import PostgresQueueBackend, PostgresWorker
+
+    backend = PostgresQueueBackend()
+    try:
+        t0 = time.perf_counter()
+        for _ in range(jobs):
+            await backend.enqueue(
+                function_name, *job_args(function_name, delay_ms), _job_id=f"{JOB_ID_PREFIX}{uuid.uuid4().hex}"
+            )
+        enqueue_s = time.perf_counter() - t0
+
+        worker = PostgresWorker(FUNCTIONS, max_jobs=max_jobs)
+        t0 = time.perf_counter()
+        await worker.run(burst=True)
+        drain_s = time.perf_counter() - t0
+        if worker.jobs_complete != jobs:
+            raise RuntimeError(f"postgres completed {worker.jobs_complete} of {jobs} jobs")
+    finally:
+        async with AsyncSessionFactory() as session:
+            await session.execute(delete(QueueJob).where(QueueJob.id.startswith(JOB_ID_PREFIX)))
+            await session.commit()
+        await engine.dispose()
+    return enqueue_s, drain_s
+
+
+BACKENDS = {"arq": bench_arq, "postgres": bench_postgres}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=500, help="Jobs enqueued and drained per run.")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per backend and job function.")
+    parser.add_argument("--max-jobs", type=int, default=10, help="Concurrent jobs per worker.")
+    parser.add_argument("--delay-ms", type=int, default=20, help="Simulated I/O wait of io_job.")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), action="append", help="Only these backends.")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args()
+
+    results = {}
+    for backend in args.backend or list(BACKENDS):
+        for function in FUNCTIONS:
+            runs = [
+                asyncio.run(BACKENDS[backend](function.__name__, args.jobs, args.max_jobs, args.delay_ms))
+                for _ in range(args.runs)
+            ]
+            enqueue_rates = [args.jobs / enqueue_s for enqueue_s, _ in runs]
+            drain_rates = [args.jobs / drain_s for _, drain_s in runs]
+            results[f"{backend}/{function.__name__}"] = {
+                "jobs": args.jobs,
+                "runs": args.runs,
+                "enqueue_per_s": round(statistics.median(enqueue_rates), 1),
+                "drain_per_s": round(statistics.median(drain_rates), 1),
+                "drain_min_per_s": round(min(drain_rates), 1),
+                "drain_max_per_s": round(max(drain_rates), 1),
+            }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'backend/function':<24}{'enqueue':>12}{'drain':>12}{'min':>12}{'max':>12}")
+    for name, r in results.items():
+        print(
+            f"{name:<24}{r['enqueue_per_s']:>10.1f}/s{r['drain_per_s']:>10.1f}/s"
+            f"{r['drain_min_per_s']:>10.1f}/s{r['drain_max_per_s']:>10.1f}/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# benchmarks/startup.py
+"""
+Import-time and cold-start benchmark for the API and the arq worker.
+
+Every measurement runs in a fresh interpreter so module caches are cold, the
+same way a newly scheduled pod starts. Run it from the project root with the
+usual environment (.env or exported variables):
+
+    python benchmarks/startup.py --runs 5
+
+"Cold start" measures what a process pays before it can do useful work:
+  - api:    import src.main and build the OpenAPI schema (route compilation).
+  - worker: import src.crew.worker and build every registered agent, i.e. the
+            work that is now deferred until the first job runs.
+  - embedded_cold_start: import src.main and run its startup hooks in
+            embedded mode on a new SQLite database (no services needed),
+            until the app serves requests (the in-process job runners keep
+            starting in the background).
+Add --with-services to also run the API startup hooks (Postgres + Redis must
+be reachable).
+
+Scenarios with a target in TARGETS_MS fail the run (exit status 1) when their
+median is over it, so that a regression does not go unnoticed.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+# Median start-up time each scenario must stay under, in ms
+TARGETS_MS = {
+    "embedded_cold_start": 1000,
+}
+
+SCENARIOS = {
+    "api_import": """
+import time
+t0 = time.perf_counter()
+import src.main
+print(time.perf_counter() - t0)
+""",
+    "api_cold_start": """
+import time
+t0 = time.perf_counter()
+from src.main import app
+app.openapi()
+print(time.perf_counter() - t0)
+""",
+    "api_cold_start_with_services": """
+import asyncio, time
+t0 = time.perf_counter()
+from src.main import app, startup_event, shutdown_event
+app.openapi()
+asyncio.run(startup_event())
+print(time.perf_counter() - t0)
+asyncio.run(shutdown_event())
+""",
+    "embedded_cold_start": """
+import asyncio, os, tempfile, time
+os.environ["EMBEDDED_MODE"] = "1"
+os.environ["DATABASE_URL"] = "sqlite+aiosqlite:///" + os.path.join(tempfile.mkdtemp(), "embedded.db")
+t0 = time.perf_counter()
+from src.main import app, startup_event, shutdown_event
+async def start():
+    await startup_event()
+    print(time.perf_counter() - t0)
+    await shutdown_event()
+asyncio.run(start())
+""",
+    "worker_import": """
+import time
+t0 = time.perf_counter()
+import src.crew.worker
+print(time.perf_counter() - t0)
+""",
+    "worker_cold_start": """
+import time
+t0 = time.perf_counter()
+from src.crew.worker import WorkerSettings
+from src.crew.agents import AGENT_BUILDERS, get_agent
+for name in AGENT_BUILDERS:
+    get_agent(name)
+print(time.perf_counter() - t0)
+""",
+}
+
+
+def run_scenario(code: str) -> float:
+    """Runs one scenario in a fresh interpreter and returns its elapsed seconds."""
+    completed = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr else "scenario failed")
+    # Application logging goes to stderr; the timing is the last stdout line.
+    return float(completed.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per scenario.")
+    parser.add_argument("--with-services", action="store_true", help="Also run the API startup hooks.")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args()
+
+    scenarios = dict(SCENARIOS)
+    if not args.with_services:
+        scenarios.pop("api_cold_start_with_services")
+
+    results = {}
+    for name, code in scenarios.items():
+        timings = [run_scenario(code) for _ in range(args.runs)]
+        results[name] = {
+            "runs": args.runs,
+            "median_ms": round(statistics.median(timings) * 1000, 1),
+            "min_ms": round(min(timings) * 1000, 1),
+            "max_ms": round(max(timings) * 1000, 1),
+        }
+
+    over_target = {
+        name: target for name, target in TARGETS_MS.items()
+        if name in results and results[name]["median_ms"] > target
+    }
+    for name, target in TARGETS_MS.items():
+        if name in results:
+            results[name]["target_ms"] = target
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'scenario':<32}{'median':>10}{'min':>10}{'max':>10}{'target':>10}")
+        for name, r in results.items():
+            target = f"{r['target_ms']:>8}ms" if "target_ms" in r else ""
+            print(f"{name:<32}{r['median_ms']:>8.1f}ms{r['min_ms']:>8.1f}ms{r['max_ms']:>8.1f}ms{target}")
+
+    if over_target:
+        for name, target in over_target.items():
+            print(f"{name}: median {results[name]['median_ms']:.1f}ms is over its {target}ms target", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# src/core/admission.py
+"""
+Admission control for the enqueue endpoints.
+
+Before a job is queued, the backlog of its lane (the job function) and the
+estimated time until a new job of that lane is done are computed from the
+queue's lane statistics. The request is refused when the lane already holds
+QUEUE_MAX_DEPTH jobs (429: this kind of work is saturated, slow down) or
+when the estimate exceeds QUEUE_MAX_ETA_SECONDS (503: the workers are
+overloaded), with a Retry-After of the time the backlog needs to drain back
+under the threshold. Accepted requests report the depth and estimate.
+Jobs enqueued together by one request (`admit_jobs`) are admitted or
+refused together.
+"""
+import math
+from dataclasses import dataclass, replace
+
+from fastapi import HTTPException, status
+
+from src.core.config import settings
+from src.core.task_queue import LaneStats, task_queue
+
+
+@dataclass(frozen=True)
+class QueueLoad:
+    lane: str
+    # Jobs of the lane already deferred, queued or running
+    depth: int
+    # Estimated seconds until a job enqueued now is done
+    eta_seconds: float
+
+
+def _worker_concurrency() -> int:
+    # In embedded mode the API process runs QUEUE_MAX_JOBS jobs at once
+    return settings.QUEUE_MAX_JOBS if settings.EMBEDDED_MODE else settings.QUEUE_WORKER_CONCURRENCY
+
+
+def estimate_load(lane: str, stats: dict[str, LaneStats]) -> QueueLoad:
+    """
+    Workers take jobs in enqueue order whatever their lane, so a new job
+    waits for the whole backlog (each lane's depth times its mean run time,
+    spread over the workers' concurrency) and then runs for its own lane's
+    mean run time.
+    """
+    def run_time(name: str) -> float:
+        lane_stats = stats.get(name)
+        if lane_stats is None or lane_stats.avg_duration_s is None:
+            return settings.QUEUE_DEFAULT_JOB_SECONDS
+        return lane_stats.avg_duration_s
+
+    backlog_s = sum(lane_stats.depth * run_time(name) for name, lane_stats in stats.items())
+    depth = stats[lane].depth if lane in stats else 0
+    return QueueLoad(
+        lane=lane,
+        depth=depth,
+        eta_seconds=round(backlog_s / _worker_concurrency() + run_time(lane), 1),
+    )
+
+
+class QueueAdmission:
+    """Dependency admitting a job of `function_name` into the queue; returns its QueueLoad."""
+
+    def __init__(self, function_name: str):
+        self.function_name = function_name
+
+    async def __call__(self) -> QueueLoad:
+        return (await admit_jobs(self.function_name))[0]
+
+
+async def admit_jobs(function_name: str, jobs: int = 1) -> list[QueueLoad]:
+    """
+    Admits `jobs` jobs of `function_name` enqueued together, or refuses them
+    all. Returns the QueueLoad of each, in enqueue order: each job waits for
+    the ones enqueued before it.
+    """
+    stats = await task_queue.lane_stats()
+    load = estimate_load(function_name, stats)
+    lane_stats = stats.get(function_name)
+    avg_run_s = (lane_stats.avg_duration_s if lane_stats else None) or settings.QUEUE_DEFAULT_JOB_SECONDS
+    loads = [
+        replace(load, depth=load.depth + i, eta_seconds=round(load.eta_seconds + i * avg_run_s / _worker_concurrency(), 1))
+        for i in range(jobs)
+    ]
+
+    max_depth = settings.QUEUE_MAX_DEPTH.get(function_name, settings.QUEUE_MAX_DEPTH_DEFAULT)
+    if load.depth + jobs > max_depth:
+        # Until enough jobs of the lane finished for these to fit under the limit
+        retry_after = (load.depth + jobs - max_depth) * avg_run_s / _worker_concurrency()
+        _refuse(status.HTTP_429_TOO_MANY_REQUESTS, f"{load.depth} {function_name} jobs are already queued.", retry_after, load)
+    if loads[-1].eta_seconds > settings.QUEUE_MAX_ETA_SECONDS:
+        retry_after = loads[-1].eta_seconds - settings.QUEUE_MAX_ETA_SECONDS
+        _refuse(status.HTTP_503_SERVICE_UNAVAILABLE, "The job queue is overloaded.", retry_after, loads[-1])
+    return loads
+
+
+def _refuse(status_code: int, reason: str, retry_after: float, load: QueueLoad) -> None:
+    raise HTTPException(
+        status_code=status_code,
+        detail={
+            "message": f"{reason} Retry later.",
+            "queue_depth": load.depth,
+            "eta_seconds": load.eta_seconds,
+        },
+        headers={"Retry-After": str(max(math.ceil(retry_after), 1))},
+    )
@@ -0,0 +1,157 @@
+# src/core/arq_queue.py
+"""
+Redis queue backend, served by arq workers (`arq src.crew.worker.WorkerSettings`).
+
+Besides arq's own keys, each job is recorded in the lane of its function
+(see lane_stats), maintained by the enqueue side and by the workers' job
+hooks.
+"""
+import time
+
+from arq.connections import ArqRedis
+from arq.constants import abort_jobs_ss, in_progress_key_prefix, result_key_prefix
+from arq.jobs import deserialize_result
+from arq.utils import timestamp_ms
+
+from src.core.redis_manager import redis_manager
+from src.core.task_queue import (
+    JOB_COMPLETE, JOB_DEFERRED, JOB_IN_PROGRESS, JOB_NOT_FOUND, JOB_QUEUED, LIVE_JOB_STATUSES,
+    JobInfo, LaneStats, QueueBackend,
+)
+
+# Redis keys of the arq lanes: a sorted set of the live job ids of each lane
+# (scored by enqueue time), the set of lane names, the lane of each live job
+# and the run times of each lane's last LANE_DURATION_SAMPLES jobs.
+LANE_JOBS_KEY = "queue:lane:{}"
+LANES_KEY = "queue:lanes"
+JOB_LANES_KEY = "queue:job-lanes"
+LANE_DURATIONS_KEY = "queue:durations:{}"
+LANE_DURATION_SAMPLES = 50
+# Jobs still counted after this long were lost (arq expires jobs after a day)
+LANE_MAX_AGE_MS = 24 * 60 * 60 * 1000
+# Set when a job is aborted, so that its result reads as cancelled
+CANCELLED_JOB_KEY = "queue:cancelled:{}"
+CANCELLED_JOB_TTL = 24 * 60 * 60
+
+
+class ArqQueueBackend(QueueBackend):
+    """
+    Redis queue served by arq workers, on the shared redis_manager pool.
+    `_session` is ignored: jobs are queued immediately.
+    """
+
+    def __init__(self, redis_url: str):
+        self.redis_url = redis_url
+        self.pool: ArqRedis | None = None
+        # Whether connect() opened redis_manager (and close() must close it)
+        self._owns_manager = False
+
+    async def connect(self) -> None:
+        if not redis_manager.connected:
+            redis_manager.configure(self.redis_url)
+            await redis_manager.connect()
+            self._owns_manager = True
+        self.pool = redis_manager.client
+
+    async def close(self) -> None:
+        if self._owns_manager:
+            await redis_manager.close()
+            self._owns_manager = False
+        self.pool = None
+
+    async def enqueue(self, function_name, *args, _job_id=None, _defer_by=None, _session=None):
+        if not self.pool:
+            raise ConnectionError("TaskQueue is not connected. Call .connect() first.")
+        job = await self.pool.enqueue_job(function_name, *args, _job_id=_job_id, _defer_by=_defer_by)
+        if job is not None:
+            async with self.pool.pipeline(transaction=False) as pipe:
+                pipe.sadd(LANES_KEY, function_name)
+                pipe.zadd(LANE_JOBS_KEY.format(function_name), {job.job_id: timestamp_ms()})
+                pipe.hset(JOB_LANES_KEY, job.job_id, function_name)
+                await pipe.execute()
+        return job
+
+    async def job_info(self, job_id: str) -> JobInfo:
+        if not self.pool:
+            raise ConnectionError("TaskQueue is not connected. Call .connect() first.")
+        # arq's Job.status() then Job.result_info() cost two round trips; the
+        # same keys are read here in one pipeline.
+        async with self.pool.pipeline(transaction=True) as pipe:
+            pipe.get(result_key_prefix + job_id)
+            pipe.exists(in_progress_key_prefix + job_id)
+            pipe.zscore(self.pool.default_queue_name, job_id)
+            pipe.exists(CANCELLED_JOB_KEY.format(job_id))
+            raw_result, in_progress, score, cancelled = await pipe.execute()
+
+        if raw_result:
+            result_info = deserialize_result(raw_result, deserializer=self.pool.job_deserializer)
+            return JobInfo(
+                job_id=job_id, status=JOB_COMPLETE, success=result_info.success, result=result_info.result,
+                cancelled=bool(cancelled),
+            )
+        if in_progress:
+            return JobInfo(job_id=job_id, status=JOB_IN_PROGRESS)
+        if score:
+            return JobInfo(job_id=job_id, status=JOB_DEFERRED if score > timestamp_ms() else JOB_QUEUED)
+        return JobInfo(job_id=job_id, status=JOB_NOT_FOUND)
+
+    async def lane_stats(self) -> dict[str, LaneStats]:
+        if not self.pool:
+            raise ConnectionError("TaskQueue is not connected. Call .connect() first.")
+        lanes = sorted(lane.decode() for lane in await self.pool.smembers(LANES_KEY))
+        async with self.pool.pipeline(transaction=False) as pipe:
+            for lane in lanes:
+                pipe.zremrangebyscore(LANE_JOBS_KEY.format(lane), 0, timestamp_ms() - LANE_MAX_AGE_MS)
+                pipe.zcard(LANE_JOBS_KEY.format(lane))
+                pipe.lrange(LANE_DURATIONS_KEY.format(lane), 0, -1)
+            replies = await pipe.execute()
+        stats = {}
+        for i, lane in enumerate(lanes):
+            depth, durations = replies[3 * i + 1], [float(d) for d in replies[3 * i + 2]]
+            stats[lane] = LaneStats(depth=depth, avg_duration_s=sum(durations) / len(durations) if durations else None)
+        return stats
+
+    async def abort(self, job_id: str) -> bool:
+        """
+        Uses arq's abort support (workers need `allow_abort_jobs`): the worker
+        cancels the job if it is running, or drops it when it comes up. A
+        deferred job is brought forward so that it is dropped now.
+        """
+        info = await self.job_info(job_id)
+        if info.status not in LIVE_JOB_STATUSES:
+            return False
+        async with self.pool.pipeline(transaction=True) as pipe:
+            if info.status == JOB_DEFERRED:
+                pipe.zadd(self.pool.default_queue_name, {job_id: 1})
+            pipe.zadd(abort_jobs_ss, {job_id: timestamp_ms()})
+            pipe.set(CANCELLED_JOB_KEY.format(job_id), 1, ex=CANCELLED_JOB_TTL)
+            await pipe.execute()
+        if info.status != JOB_IN_PROGRESS:
+            # The job hooks do not run for a job aborted before it started
+            lane = await self.pool.hget(JOB_LANES_KEY, job_id)
+            if lane is not None:
+                async with self.pool.pipeline(transaction=False) as pipe:
+                    pipe.zrem(LANE_JOBS_KEY.format(lane.decode()), job_id)
+                    pipe.hdel(JOB_LANES_KEY, job_id)
+                    await pipe.execute()
+        return True
+
+    async def job_started(self, ctx: dict) -> None:
+        ctx["lane_started_at"] = time.monotonic()
+
+    async def job_ended(self, ctx: dict) -> None:
+        job_id = ctx["job_id"]
+        lane = await self.pool.hget(JOB_LANES_KEY, job_id)
+        if lane is None:
+            return
+        lane = lane.decode()
+        # A retried job is back in arq's queue and stays in its lane
+        finished = await self.pool.zscore(self.pool.default_queue_name, job_id) is None
+        async with self.pool.pipeline(transaction=False) as pipe:
+            if finished:
+                pipe.zrem(LANE_JOBS_KEY.format(lane), job_id)
+                pipe.hdel(JOB_LANES_KEY, job_id)
+            if "lane_started_at" in ctx:
+                pipe.lpush(LANE_DURATIONS_KEY.format(lane), round(time.monotonic() - ctx["lane_started_at"], 3))
+                pipe.ltrim(LANE_DURATIONS_KEY.format(lane), 0, LANE_DURATION_SAMPLES - 1)
+            await pipe.execute()
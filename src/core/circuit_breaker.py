@@ -0,0 +1,351 @@
+# src/core/circuit_breaker.py
+"""
+Circuit breakers shared by every process of the deployment.
+
+An in-process breaker per API pod and worker lets each of them hammer a
+failing upstream until it trips on its own, and then probe it all at once
+when the recovery timeout ends. Here the state of each circuit lives in
+Redis (a hash per circuit, changed by Lua scripts so that every transition is
+atomic), so the first failures seen anywhere open the circuit everywhere:
+
+  - closed: calls go through; CIRCUIT_BREAKER_FAILURE_THRESHOLD consecutive
+    failures open the circuit.
+  - open: calls are refused with CircuitOpenError until the recovery timeout
+    (CIRCUIT_BREAKER_RECOVERY_SECONDS) ends.
+  - half-open: the first caller after the timeout becomes the probe; every
+    other caller is refused until the probe's outcome closes or reopens the
+    circuit. A probe that never reports back (its process died) is replaced
+    after CIRCUIT_BREAKER_PROBE_TIMEOUT_SECONDS.
+
+A call can go through several circuits at once (e.g. its model's and its
+agent's); it is refused if any of them is open, and its outcome is recorded
+on all of them. `track_refusals()` lets a job find out that it was refused
+(to re-queue itself rather than fail).
+
+Processes without Redis (embedded mode, Postgres queue workers) keep the same
+state in process memory. If Redis fails, calls are let through rather than
+refused.
+"""
+import logging
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable
+
+from src.core.config import settings
+from src.core.redis_manager import redis_manager
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_KEY_PREFIX = "circuit:"
+# Set of the circuit keys ever used, for states()
+CIRCUITS_KEY = "circuits"
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+# Outcomes of a call, as recorded by RECORD_SCRIPT. A call that neither
+# succeeded nor failed upstream (e.g. it was cancelled) releases its probe.
+OUTCOME_SUCCESS = "success"
+OUTCOME_FAILURE = "failure"
+OUTCOME_RELEASE = "release"
+
+# KEYS: circuit keys. ARGV: call token, probe timeout (ms), recovery timeout (ms).
+# Returns 0 if the call may go through (taking the probe of circuits whose
+# recovery timeout ended), else the milliseconds to wait before trying again.
+ACQUIRE_SCRIPT = """
+local time = redis.call('TIME')
+local now = time[1] * 1000 + math.floor(time[2] / 1000)
+local wait = 0
+local probes = {}
+for _, key in ipairs(KEYS) do
+    local circuit = redis.call('HMGET', key, 'state', 'open_until', 'probe_until')
+    local state = circuit[1] or 'closed'
+    if state == 'open' then
+        local open_until = tonumber(circuit[2]) or 0
+        if now < open_until then
+            wait = math.max(wait, open_until - now)
+        else
+            table.insert(probes, key)
+        end
+    elseif state == 'half_open' then
+        local probe_until = tonumber(circuit[3]) or 0
+        if now < probe_until then
+            wait = math.max(wait, math.min(probe_until - now, tonumber(ARGV[3])))
+        else
+            table.insert(probes, key)
+        end
+    end
+end
+if wait > 0 then
+    return wait
+end
+for _, key in ipairs(probes) do
+    redis.call('HSET', key, 'state', 'half_open', 'probe', ARGV[1], 'probe_until', now + tonumber(ARGV[2]))
+end
+return 0
+"""
+
+# KEYS: circuit keys. ARGV: call token, outcome, failure threshold, recovery
+# timeout (ms), key of the circuit registry. Returns the transition of each
+# circuit: 'opened', 'closed' or ''.
+RECORD_SCRIPT = """
+local time = redis.call('TIME')
+local now = time[1] * 1000 + math.floor(time[2] / 1000)
+local outcome = ARGV[2]
+local changes = {}
+for i, key in ipairs(KEYS) do
+    redis.call('SADD', ARGV[5], key)
+    local circuit = redis.call('HMGET', key, 'state', 'probe', 'failures')
+    local state = circuit[1] or 'closed'
+    local change = ''
+    if state == 'half_open' and circuit[2] == ARGV[1] then
+        if outcome == 'success' then
+            redis.call('HSET', key, 'state', 'closed', 'failures', 0)
+            redis.call('HDEL', key, 'probe', 'probe_until', 'open_until')
+            change = 'closed'
+        elseif outcome == 'failure' then
+            redis.call('HSET', key, 'state', 'open', 'open_until', now + tonumber(ARGV[4]))
+            redis.call('HDEL', key, 'probe', 'probe_until')
+            redis.call('HINCRBY', key, 'times_opened', 1)
+            change = 'opened'
+        else
+            redis.call('HSET', key, 'state', 'open', 'open_until', now)
+            redis.call('HDEL', key, 'probe', 'probe_until')
+        end
+    elseif state == 'closed' then
+        if outcome == 'success' then
+            if (tonumber(circuit[3]) or 0) > 0 then
+                redis.call('HSET', key, 'failures', 0)
+            end
+        elseif outcome == 'failure' then
+            local failures = redis.call('HINCRBY', key, 'failures', 1)
+            if failures >= tonumber(ARGV[3]) then
+                redis.call('HSET', key, 'state', 'open', 'open_until', now + tonumber(ARGV[4]), 'failures', 0)
+                redis.call('HINCRBY', key, 'times_opened', 1)
+                change = 'opened'
+            end
+        end
+    end
+    changes[i] = change
+end
+return changes
+"""
+
+
+# Circuits that refused calls in the current job -> seconds until they half-open
+_refusals: ContextVar[dict[str, float] | None] = ContextVar("circuit_refusals", default=None)
+
+
+def track_refusals() -> dict[str, float]:
+    """
+    Starts recording the circuits that refuse calls in the current task and
+    the tasks it spawns (they share the returned dict), e.g. for one job.
+    """
+    refusals: dict[str, float] = {}
+    _refusals.set(refusals)
+    return refusals
+
+
+def calls_refused() -> bool:
+    """Whether a circuit has refused a call of the current job (see track_refusals)."""
+    return bool(_refusals.get())
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of making a call while one of its circuits is open."""
+
+    def __init__(self, circuit: str, retry_after: float):
+        self.circuit = circuit
+        # Seconds until the circuit lets a probe call through
+        self.retry_after = retry_after
+        super().__init__(f"Circuit '{circuit}' is open, retry in {retry_after:.1f}s.")
+
+
+def _now_ms() -> int:
+    return int(time.monotonic() * 1000)
+
+
+class _LocalCircuits:
+    """The scripts' state machine on an in-process dict, for processes without Redis."""
+
+    def __init__(self):
+        self.circuits: dict[str, dict[str, Any]] = {}
+
+    def acquire(self, keys: list[str], token: str, probe_timeout_ms: int, recovery_ms: int) -> int:
+        now = _now_ms()
+        wait = 0
+        probes = []
+        for key in keys:
+            circuit = self.circuits.get(key, {})
+            state = circuit.get("state", CIRCUIT_CLOSED)
+            if state == CIRCUIT_OPEN:
+                if now < circuit["open_until"]:
+                    wait = max(wait, circuit["open_until"] - now)
+                else:
+                    probes.append(key)
+            elif state == CIRCUIT_HALF_OPEN:
+                if now < circuit["probe_until"]:
+                    wait = max(wait, min(circuit["probe_until"] - now, recovery_ms))
+                else:
+                    probes.append(key)
+        if wait > 0:
+            return wait
+        for key in probes:
+            self.circuits[key].update(state=CIRCUIT_HALF_OPEN, probe=token, probe_until=now + probe_timeout_ms)
+        return 0
+
+    def record(self, keys: list[str], token: str, outcome: str, threshold: int, recovery_ms: int) -> list[str]:
+        now = _now_ms()
+        changes = []
+        for key in keys:
+            circuit = self.circuits.setdefault(key, {"state": CIRCUIT_CLOSED, "failures": 0, "times_opened": 0})
+            change = ""
+            if circuit["state"] == CIRCUIT_HALF_OPEN and circuit.get("probe") == token:
+                circuit.pop("probe", None)
+                circuit.pop("probe_until", None)
+                if outcome == OUTCOME_SUCCESS:
+                    circuit.update(state=CIRCUIT_CLOSED, failures=0)
+                    circuit.pop("open_until", None)
+                    change = "closed"
+                elif outcome == OUTCOME_FAILURE:
+                    circuit.update(state=CIRCUIT_OPEN, open_until=now + recovery_ms)
+                    circuit["times_opened"] += 1
+                    change = "opened"
+                else:
+                    circuit.update(state=CIRCUIT_OPEN, open_until=now)
+            elif circuit["state"] == CIRCUIT_CLOSED:
+                if outcome == OUTCOME_SUCCESS:
+                    circuit["failures"] = 0
+                elif outcome == OUTCOME_FAILURE:
+                    circuit["failures"] += 1
+                    if circuit["failures"] >= threshold:
+                        circuit.update(state=CIRCUIT_OPEN, open_until=now + recovery_ms, failures=0)
+                        circuit["times_opened"] += 1
+                        change = "opened"
+            changes.append(change)
+        return changes
+
+    def snapshot(self) -> tuple[int, dict[str, dict[str, Any]]]:
+        return _now_ms(), {key: dict(circuit) for key, circuit in self.circuits.items()}
+
+
+class DistributedCircuitBreaker:
+    """
+    Runs calls through named circuits. Exceptions of `expected_exception` are
+    upstream failures; any other outcome (including other exceptions, i.e. the
+    upstream answered) counts as a success.
+    `expected_exception` may be a callable returning the tuple, resolved on the
+    first call, so that the client library defining them is not imported at
+    start-up.
+    """
+
+    def __init__(
+        self,
+        expected_exception: tuple[type[BaseException], ...] | Callable[[], tuple[type[BaseException], ...]],
+    ):
+        self._expected_exception = expected_exception
+        self._local = _LocalCircuits()
+
+    @property
+    def expected_exception(self) -> tuple[type[BaseException], ...]:
+        if callable(self._expected_exception):
+            self._expected_exception = self._expected_exception()
+        return self._expected_exception
+
+    @staticmethod
+    def _keys(circuits: tuple[str, ...] | list[str]) -> list[str]:
+        return [CIRCUIT_KEY_PREFIX + circuit for circuit in circuits]
+
+    async def call(self, circuits: tuple[str, ...] | list[str], func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Awaits `func(*args, **kwargs)` unless one of `circuits` is open (raises CircuitOpenError)."""
+        keys = self._keys(circuits)
+        token = uuid.uuid4().hex
+        await self._acquire(keys, token)
+        try:
+            result = await func(*args, **kwargs)
+        except self.expected_exception:
+            await self._record(keys, token, OUTCOME_FAILURE)
+            raise
+        except Exception:
+            await self._record(keys, token, OUTCOME_SUCCESS)
+            raise
+        except BaseException:
+            await self._record(keys, token, OUTCOME_RELEASE)
+            raise
+        await self._record(keys, token, OUTCOME_SUCCESS)
+        return result
+
+    async def _acquire(self, keys: list[str], token: str) -> None:
+        probe_timeout_ms = settings.CIRCUIT_BREAKER_PROBE_TIMEOUT_SECONDS * 1000
+        recovery_ms = settings.CIRCUIT_BREAKER_RECOVERY_SECONDS * 1000
+        if redis_manager.connected:
+            from redis.exceptions import RedisError
+            try:
+                script = redis_manager.client.register_script(ACQUIRE_SCRIPT)
+                wait_ms = await script(keys=keys, args=[token, probe_timeout_ms, recovery_ms])
+            except RedisError as e:
+                logger.warning(f"⚠️ Circuit state unavailable, letting the call through: {e}")
+                return
+        else:
+            wait_ms = self._local.acquire(keys, token, probe_timeout_ms, recovery_ms)
+        if wait_ms:
+            error = CircuitOpenError(", ".join(key.removeprefix(CIRCUIT_KEY_PREFIX) for key in keys), wait_ms / 1000)
+            refusals = _refusals.get()
+            if refusals is not None:
+                refusals[error.circuit] = max(refusals.get(error.circuit, 0.0), error.retry_after)
+            raise error
+
+    async def _record(self, keys: list[str], token: str, outcome: str) -> None:
+        threshold = settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD
+        recovery_ms = settings.CIRCUIT_BREAKER_RECOVERY_SECONDS * 1000
+        if redis_manager.connected:
+            from redis.exceptions import RedisError
+            try:
+                script = redis_manager.client.register_script(RECORD_SCRIPT)
+                changes = await script(keys=keys, args=[token, outcome, threshold, recovery_ms, CIRCUITS_KEY])
+            except RedisError as e:
+                logger.warning(f"⚠️ Could not record a call outcome on its circuits: {e}")
+                return
+            changes = [change.decode() if isinstance(change, bytes) else change for change in changes]
+        else:
+            changes = self._local.record(keys, token, outcome, threshold, recovery_ms)
+        for key, change in zip(keys, changes):
+            circuit = key.removeprefix(CIRCUIT_KEY_PREFIX)
+            if change == "opened":
+                logger.error(f"🔴 Circuit '{circuit}' opened for {settings.CIRCUIT_BREAKER_RECOVERY_SECONDS}s.")
+            elif change == "closed":
+                logger.info(f"🟢 Circuit '{circuit}' closed: the probe call succeeded.")
+
+    async def states(self) -> dict[str, dict[str, Any]]:
+        """State of every circuit used so far, for the metrics endpoint."""
+        if redis_manager.connected:
+            keys = sorted(key.decode() for key in await redis_manager.client.smembers(CIRCUITS_KEY))
+            async with redis_manager.pipeline() as pipe:
+                pipe.time()
+                for key in keys:
+                    pipe.hgetall(key)
+                replies = await pipe.execute()
+            seconds, microseconds = replies[0]
+            now = seconds * 1000 + microseconds // 1000
+            circuits = {
+                key: {field.decode(): value.decode() for field, value in circuit.items()}
+                for key, circuit in zip(keys, replies[1:])
+            }
+        else:
+            now, circuits = self._local.snapshot()
+
+        states = {}
+        for key, circuit in circuits.items():
+            state = circuit.get("state", CIRCUIT_CLOSED)
+            open_until = int(circuit.get("open_until", 0))
+            states[key.removeprefix(CIRCUIT_KEY_PREFIX)] = {
+                "state": state,
+                "failures": int(circuit.get("failures", 0)),
+                "times_opened": int(circuit.get("times_opened", 0)),
+                # Seconds until the next probe may be sent
+                "retry_after_s": round(max(open_until - now, 0) / 1000, 1) if state == CIRCUIT_OPEN else 0.0,
+                "probing": state == CIRCUIT_HALF_OPEN and int(circuit.get("probe_until", 0)) > now,
+            }
+        return states
@@ -1,7 +1,7 @@
 # src/core/config.py
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from decimal import Decimal
-from typing import Dict, Any # Make sure Any is imported
+from typing import Dict, Any, List # Make sure Any is imported
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
@@ -9,16 +9,171 @@ class Settings(BaseSettings):
     # --- Core Application Settings ---
     DATABASE_URL: str
     REDIS_URL: str = "redis://localhost:6379"
+    # The process's one Redis pool (src/core/redis_manager.py), shared by the
+    # queue, the rate limiter, job status lookups and caches. At most
+    # REDIS_MAX_CONNECTIONS connections; callers wait up to REDIS_POOL_TIMEOUT
+    # seconds for a free one. Idle connections are PINGed after
+    # REDIS_HEALTH_CHECK_INTERVAL seconds, failed commands are retried
+    # REDIS_RETRY_ATTEMPTS times with exponential backoff (REDIS_BACKOFF_BASE
+    # to REDIS_BACKOFF_CAP seconds), and startup tries REDIS_CONNECT_ATTEMPTS times.
+    REDIS_MAX_CONNECTIONS: int = 20
+    REDIS_POOL_TIMEOUT: float = 5.0
+    REDIS_SOCKET_TIMEOUT: float = 5.0
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
+    REDIS_RETRY_ATTEMPTS: int = 3
+    REDIS_BACKOFF_BASE: float = 0.1
+    REDIS_BACKOFF_CAP: float = 2.0
+    REDIS_CONNECT_ATTEMPTS: int = 5
     APP_VERSION: str = "0.1.0"
     ENVIRONMENT: str = "development"
     APP_NAME: str = "Scriptorium-Engine" # Added in general spec
     APP_DESCRIPTION: str = "Automates book writing using AI." # Added in general spec
     CORS_ORIGINS: str = "http://localhost:5173,http://localhost:3000" # NEW: Add this line
+    # How the API reacts at startup when the database is not at the Alembic head
+    # revision: "strict" refuses to start, "warn" only logs, "off" skips the check.
+    # The schema itself is managed with `alembic upgrade head`, never at boot.
+    SCHEMA_REVISION_CHECK: str = "warn"
+    # Embedded single-process mode, for single-author installs and integration
+    # tests: no Redis, the API process runs the workers of
+    # EMBEDDED_WORKER_SETTINGS on an in-process queue, rate limits are counted
+    # in memory and the schema is created from the models at startup. Use it
+    # with a SQLite DATABASE_URL, e.g. sqlite+aiosqlite:///./scriptorium.db.
+    EMBEDDED_MODE: bool = False
+    EMBEDDED_WORKER_SETTINGS: str = "src.crew.worker.WorkerSettings"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    # Job queue backend: "arq" (Redis) or "postgres" (the queue_jobs table,
+    # workers run with `python -m src.core.pg_queue src.crew.worker.WorkerSettings`).
+    # With "postgres", Redis is only used if REDIS_URL is set (see uses_redis()).
+    # Embedded mode always uses the in-process "memory" backend.
+    QUEUE_BACKEND: str = "arq"
+    # Postgres backend: idle workers poll this often (seconds) besides LISTEN,
+    # a job's lease lasts QUEUE_VISIBILITY_TIMEOUT seconds and is renewed while
+    # it runs. Postgres and memory backends: concurrent jobs per worker, and
+    # results are kept for QUEUE_RESULT_TTL seconds.
+    QUEUE_POLL_INTERVAL: float = 5.0
+    QUEUE_VISIBILITY_TIMEOUT: int = 300
+    QUEUE_MAX_JOBS: int = 10
+    QUEUE_RESULT_TTL: int = 3600
+    # Admission control on the enqueue endpoints (src/core/admission.py): a
+    # job is refused with 429 when its lane (job function) already has
+    # QUEUE_MAX_DEPTH[function] (or QUEUE_MAX_DEPTH_DEFAULT) live jobs, and
+    # with 503 when it would be done in more than QUEUE_MAX_ETA_SECONDS. The
+    # estimate assumes QUEUE_WORKER_CONCURRENCY jobs run at once across all
+    # workers and QUEUE_DEFAULT_JOB_SECONDS per job of a lane without history.
+    QUEUE_MAX_DEPTH_DEFAULT: int = 200
+    QUEUE_MAX_DEPTH: Dict[str, int] = {"autopilot_worker": 20, "finalization_worker": 20}
+    QUEUE_MAX_ETA_SECONDS: int = 4 * 60 * 60
+    QUEUE_WORKER_CONCURRENCY: int = 10
+    QUEUE_DEFAULT_JOB_SECONDS: float = 60.0
+    # Directory where the export worker writes finished manuscripts
+    EXPORT_DIR: str = "exports"
 
     # --- LLM Settings ---
     OPENAI_API_KEY: str
     # This will be the DEFAULT model if not specified per agent
     DEFAULT_OPENAI_MODEL_NAME: str #= "gpt-4o-mini" # Renamed from OPENAI_MODEL_NAME
+    # Maximum number of concurrent Continuity Editor calls in a batch transition job
+    TRANSITION_BATCH_CONCURRENCY: int = 5
+    # Maximum number of pipeline steps (LLM jobs) running at once across all
+    # autopilot runs of a worker process, and the arq timeout of one run
+    AUTOPILOT_MAX_CONCURRENCY: int = 4
+    AUTOPILOT_JOB_TIMEOUT: int = 6 * 60 * 60
+    # Job checkpoints older than this are discarded instead of resumed
+    CHECKPOINT_TTL_HOURS: int = 24
+
+    # Speculative chapter detailing: once parts are drafted, their chapter
+    # outlines are generated in the background and attached when the parts are
+    # validated unchanged.
+    SPECULATIVE_CHAPTER_DETAILING: bool = False
+    CHAPTER_PREFETCH_CONCURRENCY: int = 4
+    # Section-parallel chapter drafting: the brief is split into up to
+    # CHAPTER_SECTION_MAX sections written concurrently, then stitched with
+    # bridging sentences. Default mode for chapter generation jobs that do not
+    # choose one explicitly.
+    CHAPTER_SECTION_PARALLEL: bool = False
+    CHAPTER_SECTION_MAX: int = 4
+    CHAPTER_SECTION_CONCURRENCY: int = 4
+    # Passages from earlier chapters retrieved (BM25) into each chapter-writing
+    # prompt, and the maximum characters kept per passage. 0 disables retrieval.
+    RETRIEVAL_TOP_K: int = 4
+    RETRIEVAL_PASSAGE_MAX_CHARS: int = 700
+
+    # --- Model Routing ---
+    # Model overrides per agent name (e.g. {"Continuity Editor AI": "gpt-4o-mini"})
+    # and per pipeline phase (part_generation, chapter_detailing,
+    # chapter_generation, transition_analysis, finalization). A phase route
+    # wins over an agent route; anything unrouted uses DEFAULT_OPENAI_MODEL_NAME.
+    AGENT_MODEL_ROUTES: Dict[str, str] = {}
+    PHASE_MODEL_ROUTES: Dict[str, str] = {}
+    # "static" uses the routes above. "adaptive" picks among the candidates
+    # listed for a phase (or agent) using rolling cost, latency and failure
+    # statistics from crew_run_logs, falling back to the static route.
+    MODEL_ROUTING_POLICY: str = "static"
+    MODEL_ROUTING_CANDIDATES: Dict[str, List[str]] = {}
+    MODEL_ROUTING_WEIGHTS: Dict[str, float] = {"cost": 0.5, "latency": 0.3, "failure": 0.2}
+    MODEL_ROUTING_WINDOW_HOURS: int = 24
+    MODEL_ROUTING_MIN_SAMPLES: int = 5
+    MODEL_ROUTING_STATS_TTL: int = 60 # seconds
+
+    # --- Model Fallbacks ---
+    # Models tried in order, per agent name, when the routed model's circuit is
+    # open or its call times out (e.g. {"Historian AI": ["gpt-4o-mini",
+    # "llama-3.1-70b"]}). A model listed in MODEL_ENDPOINTS is served by that
+    # OpenAI-compatible endpoint, e.g. {"llama-3.1-70b": {"base_url":
+    # "https://...", "api_key": "...", "model": "<provider model id>"}}; list
+    # its prices in LLM_PRICING so its calls are billed. A model call taking
+    # more than LLM_CALL_TIMEOUT_SECONDS fails as an upstream error (0: no limit).
+    MODEL_FALLBACKS: Dict[str, List[str]] = {}
+    MODEL_ENDPOINTS: Dict[str, Dict[str, str]] = {}
+    LLM_CALL_TIMEOUT_SECONDS: float = 0
+
+    # --- Token Budgets ---
+    # Generation endpoints charge each request its estimated tokens against
+    # the client's budget per TOKEN_BUDGET_WINDOW_SECONDS (refilled
+    # continuously). Clients are identified by the TOKEN_BUDGET_CLIENT_HEADER
+    # header, else by address; TOKEN_BUDGETS sets budgets per client key.
+    # Estimates use the entity's size and the average tokens per call of the
+    # phase over TOKEN_ESTIMATE_WINDOW_HOURS of crew_run_logs, falling back to
+    # the TOKEN_ESTIMATE_* defaults when a phase has no history.
+    TOKEN_BUDGET_ENABLED: bool = True
+    TOKEN_BUDGET_WINDOW_SECONDS: int = 3600
+    TOKEN_BUDGET_DEFAULT: int = 2_000_000
+    TOKEN_BUDGETS: Dict[str, int] = {}
+    TOKEN_BUDGET_CLIENT_HEADER: str = "X-Client-Key"
+    TOKEN_ESTIMATE_WINDOW_HOURS: int = 168
+    TOKEN_ESTIMATE_CHARS_PER_TOKEN: int = 4
+    TOKEN_ESTIMATE_PROMPT_TOKENS: int = 2000
+    TOKEN_ESTIMATE_COMPLETION_TOKENS: int = 2000
+    TOKEN_ESTIMATE_BOOK_TOKENS: int = 400_000
+
+    # --- Circuit Breakers ---
+    # Model calls go through one circuit per model and one per agent, shared by
+    # every API pod and worker through Redis (in process memory without Redis).
+    # A circuit opens after CIRCUIT_BREAKER_FAILURE_THRESHOLD consecutive
+    # upstream failures and refuses calls for CIRCUIT_BREAKER_RECOVERY_SECONDS;
+    # then a single process sends a probe call, which may hold the half-open
+    # circuit for CIRCUIT_BREAKER_PROBE_TIMEOUT_SECONDS. Jobs refused by an
+    # open circuit are re-queued for when it half-opens, plus up to
+    # CIRCUIT_BREAKER_RETRY_JITTER_SECONDS so they do not all return at once.
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = 3
+    CIRCUIT_BREAKER_RECOVERY_SECONDS: int = 60
+    CIRCUIT_BREAKER_PROBE_TIMEOUT_SECONDS: int = 300
+    CIRCUIT_BREAKER_RETRY_JITTER_SECONDS: int = 15
+
+    # --- Request Hedging ---
+    # Calls of the agents listed in HEDGING_AGENTS (e.g. ["Historian AI"]) that
+    # have not answered after the HEDGING_LATENCY_PERCENTILE of their recent
+    # latencies (same agent, phase and model over MODEL_ROUTING_WINDOW_HOURS,
+    # once HEDGING_MIN_SAMPLES calls are known) are sent a second time; the
+    # first answer wins and the other call is cancelled. Hedging pauses while
+    # cancelled calls cost more than HEDGING_MAX_EXTRA_COST_RATIO of the
+    # hedged agents' spend. HEDGING_HOLDBACK_FRACTION of their calls are
+    # never hedged, as the baseline of the latency comparison in /metrics.
+    HEDGING_AGENTS: List[str] = []
+    HEDGING_LATENCY_PERCENTILE: float = 95.0
+    HEDGING_MIN_SAMPLES: int = 20
+    HEDGING_MAX_EXTRA_COST_RATIO: float = 0.1
+    HEDGING_HOLDBACK_FRACTION: float = 0.05
 
     # NEW: LLM Pricing Configuration
     LLM_PRICING: Dict[str, Dict[str, Decimal]] = {
@@ -28,4 +183,15 @@ class Settings(BaseSettings):
         "gpt-3.5-turbo-0125": {"prompt": Decimal("0.50"), "completion": Decimal("1.50")},
     }
 
+    def uses_redis(self) -> bool:
+        """
+        Whether processes connect to Redis: always with the arq backend, and
+        with the Postgres backend only if REDIS_URL is set explicitly. Without
+        it, rate limits and token budgets are counted per API process and each
+        process has its own circuit breakers (not shared across pods and workers).
+        """
+        if self.EMBEDDED_MODE:
+            return False
+        return self.QUEUE_BACKEND == "arq" or "REDIS_URL" in self.model_fields_set
+
 settings = Settings()
\ No newline at end of file
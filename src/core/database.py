@@ -1,9 +1,17 @@
-from sqlalchemy import MetaData
+import logging
+from pathlib import Path
+
+from sqlalchemy import MetaData, event, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 from src.core.config import settings
+from src.core.exceptions import SchemaRevisionError
+
+logger = logging.getLogger(__name__)
 
+# Location of the Alembic migration scripts (see `script_location` in alembic.ini)
+ALEMBIC_SCRIPT_LOCATION = Path(__file__).resolve().parents[2] / "alembic"
 
 # Naming convention for database constraints (indexes, keys, etc.)
 # This ensures consistency across the database schema.
@@ -26,6 +34,21 @@ Base = declarative_base(metadata=metadata)
 # `echo=True` is useful for debugging as it logs all SQL statements.
 engine = create_async_engine(settings.DATABASE_URL, echo=False)
 
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine.sync_engine, "connect")
+    def _configure_sqlite_connection(dbapi_connection, connection_record):
+        """
+        WAL lets readers (API requests) proceed while a writer (a job) commits;
+        foreign keys make ON DELETE CASCADE work as on PostgreSQL, and the busy
+        timeout makes concurrent writers wait instead of failing.
+        """
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.close()
+
 # Create a configured "Session" class
 # This is a factory for creating new session objects.
 AsyncSessionFactory = sessionmaker(
@@ -41,3 +64,57 @@ async def get_db_session() -> AsyncSession:
     """
     async with AsyncSessionFactory() as session:
         yield session
+
+
+async def check_schema_revision(mode: str = "warn") -> bool:
+    """
+    Compares the database's current Alembic revision with the head revision of
+    the migration scripts. This costs a single-row SELECT, unlike running
+    `create_all` against the live database on every boot.
+    Returns True if the schema is up to date. In "strict" mode a mismatch
+    raises SchemaRevisionError instead.
+    """
+    if mode == "off":
+        return True
+
+    # Alembic is only needed for this check, so it is imported on demand.
+    from alembic.script import ScriptDirectory
+
+    expected_heads = set(ScriptDirectory(str(ALEMBIC_SCRIPT_LOCATION)).get_heads())
+
+    try:
+        async with engine.connect() as conn:
+            result = await conn.execute(text("SELECT version_num FROM alembic_version"))
+            current_revisions = set(result.scalars().all())
+    except Exception as e:
+        logger.debug(f"Could not read alembic_version table: {e}")
+        current_revisions = set()
+
+    if current_revisions == expected_heads:
+        logger.info(f"Database schema is at revision {', '.join(sorted(current_revisions))}.")
+        return True
+
+    message = (
+        f"Database schema revision {sorted(current_revisions) or 'none'} does not match "
+        f"migration head {sorted(expected_heads)}. Run `alembic upgrade head`."
+    )
+    if mode == "strict":
+        raise SchemaRevisionError(message)
+    logger.warning(f"⚠️ {message}")
+    return False
+
+
+async def create_schema() -> None:
+    """
+    Creates the tables missing from the database, from the models. Only used in
+    embedded mode, whose SQLite database is not managed by Alembic (the
+    migrations target PostgreSQL).
+    """
+    # Import every model so that its table is registered on the metadata.
+    import src.core.models  # noqa: F401
+    import src.crew.models  # noqa: F401
+    import src.project.models  # noqa: F401
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    logger.info("Database schema created from the models.")
@@ -0,0 +1,5 @@
+# src/core/exceptions.py
+
+
+class SchemaRevisionError(RuntimeError):
+    """Raised when the database schema is not at the expected Alembic revision."""
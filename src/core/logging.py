@@ -36,8 +36,8 @@ def configure_logging():
     logging.getLogger("fastapi_limiter").setLevel(logging.WARNING) # Suppress limiter logs unless needed
     logging.getLogger("httpx").setLevel(logging.WARNING) # If using httpx for external calls
 
-    # Ensure circuitbreaker logs are visible if not already
-    logging.getLogger("circuitbreaker").setLevel(logging.INFO)
+    # Ensure circuit breaker transitions are visible if not already
+    logging.getLogger("src.core.circuit_breaker").setLevel(logging.INFO)
 
     # Optional: Log a message indicating logging is configured
     logging.getLogger(__name__).info(f"Logging configured for '{environment}' environment at level {logging.getLevelName(log_level)}")
\ No newline at end of file
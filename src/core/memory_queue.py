@@ -0,0 +1,320 @@
+# src/core/memory_queue.py
+"""
+In-process queue backend for embedded mode: jobs run on asyncio tasks of the
+API process, with the functions and hooks (startup and shutdown, and
+on_job_start/after_job_end around every try) of the same WorkerSettings that
+arq and the Postgres worker run. Nothing is persisted; jobs still queued or
+running when the process stops are lost, and the jobs among them that left
+checkpoints are resumed at the next start (see resume_interrupted_jobs).
+
+As with the Postgres backend, a job enqueued with `_session` is only queued
+once that session commits, and dropped if it rolls back. Each try runs on its
+own task so that `abort()` can cancel it.
+
+`start()` connects in the background, so that an embedded app serves its
+first requests without waiting for the worker settings (and arq, which pulls
+in redis) to load; jobs enqueued meanwhile wait until the runners are up.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy import event
+
+from src.core.config import settings
+from src.core.task_queue import (
+    JOB_COMPLETE, JOB_DEFERRED, JOB_IN_PROGRESS, JOB_NOT_FOUND, JOB_QUEUED,
+    JobInfo, LaneStats, QueueBackend, QueuedJob,
+)
+
+if TYPE_CHECKING:
+    from arq.worker import Function
+
+logger = logging.getLogger(__name__)
+
+# arq's defaults, used when the worker settings do not set them
+DEFAULT_JOB_TIMEOUT = 300
+DEFAULT_MAX_TRIES = 5
+# Key of the jobs waiting for a session to commit, in session.info
+PENDING_JOBS_KEY = "memory_queue_pending_jobs"
+
+
+@dataclass
+class MemoryJob:
+    job_id: str
+    function_name: str
+    args: tuple
+    status: str
+    enqueued_at: datetime
+    attempts: int = 0
+    success: bool | None = None
+    result: Any = None
+    # time.monotonic() when the job's last try started, and when it completed
+    # (kept QUEUE_RESULT_TTL seconds)
+    started_at: float | None = None
+    finished_at: float | None = None
+    cancelled: bool = False
+
+
+class MemoryQueueBackend(QueueBackend):
+    """Runs jobs on QUEUE_MAX_JOBS asyncio tasks of the current process."""
+
+    transactional = True
+
+    def __init__(self, worker_settings: str | None = None):
+        self.worker_settings = worker_settings or settings.EMBEDDED_WORKER_SETTINGS
+        self.functions: dict[str, "Function"] = {}
+        self.ctx: dict[str, Any] = {}
+        self._jobs: dict[str, MemoryJob] = {}
+        self._queue: asyncio.Queue | None = None
+        self._runners: list[asyncio.Task] = []
+        # Task of each running job's current try, and the aborted ones among them
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._aborting: set[str] = set()
+        self._on_shutdown = None
+        # Called with the job's ctx before and after each try, as by arq
+        self._on_job_start = None
+        self._after_job_end = None
+        self._connected = False
+        # Set once the runners are up; start()'s task until then
+        self._ready = asyncio.Event()
+        self._starting: asyncio.Task | None = None
+        self._last_purge = 0.0
+
+    def start(self) -> None:
+        """Connects on a background task (see the module docstring)."""
+        async def connect() -> None:
+            try:
+                await self.connect()
+            except Exception as e:
+                logger.exception(f"❌ In-process queue failed to start: {e}")
+                raise
+
+        self._starting = asyncio.create_task(connect())
+
+    async def connect(self) -> None:
+        # The worker's startup hook connects the task queue too; that nested call is a no-op.
+        if self._connected:
+            return
+        self._connected = True
+        from arq.utils import import_string
+        from arq.worker import func as arq_func
+
+        worker_settings = import_string(self.worker_settings)
+        self.functions = {f.name: f for f in (arq_func(f) for f in worker_settings.functions)}
+        self.job_timeout = getattr(worker_settings, "job_timeout", DEFAULT_JOB_TIMEOUT)
+        self.max_tries = getattr(worker_settings, "max_tries", DEFAULT_MAX_TRIES)
+        self._on_shutdown = getattr(worker_settings, "on_shutdown", None)
+        self._on_job_start = getattr(worker_settings, "on_job_start", None)
+        self._after_job_end = getattr(worker_settings, "after_job_end", None)
+        self._queue = asyncio.Queue()
+        self._runners = [asyncio.create_task(self._work()) for _ in range(settings.QUEUE_MAX_JOBS)]
+        self._ready.set()
+        on_startup = getattr(worker_settings, "on_startup", None)
+        if on_startup:
+            await on_startup(self.ctx)
+        logger.info(f"🚀 In-process queue running {len(self.functions)} functions on {len(self._runners)} tasks.")
+
+    async def close(self) -> None:
+        if not self._connected and self._starting is None:
+            return
+        if self._starting is not None:
+            await asyncio.gather(self._starting, return_exceptions=True)
+            self._starting = None
+        self._connected = False
+        self._ready.clear()
+        if self._on_shutdown:
+            await self._on_shutdown(self.ctx)
+        for runner in self._runners:
+            runner.cancel()
+        await asyncio.gather(*self._runners, *self._tasks.values(), return_exceptions=True)
+        self._runners = []
+        unfinished = sum(job.status != JOB_COMPLETE for job in self._jobs.values())
+        if unfinished:
+            logger.warning(f"⚠️ In-process queue stopped with {unfinished} unfinished jobs.")
+
+    async def enqueue(self, function_name, *args, _job_id=None, _defer_by=None, _session=None):
+        if not self._connected and self._starting is None:
+            raise ConnectionError("TaskQueue is not connected. Call .connect() first.")
+        await self._wait_ready()
+        self._purge_results()
+        job_id = _job_id or uuid.uuid4().hex
+        pending = _session.info.get(PENDING_JOBS_KEY, []) if _session is not None else []
+        if job_id in self._jobs or any(job.job_id == job_id for job, _ in pending):
+            return None
+        job = MemoryJob(
+            job_id=job_id,
+            function_name=function_name,
+            args=args,
+            status=JOB_DEFERRED if _defer_by else JOB_QUEUED,
+            enqueued_at=datetime.utcnow(),
+        )
+        if _session is None:
+            self._submit(job, _defer_by)
+        else:
+            self._track_session(_session)
+            _session.info.setdefault(PENDING_JOBS_KEY, []).append((job, _defer_by))
+        return QueuedJob(job_id=job_id)
+
+    async def _wait_ready(self) -> None:
+        if self._ready.is_set():
+            return
+        ready = asyncio.ensure_future(self._ready.wait())
+        waiting = {ready, self._starting} if self._starting is not None else {ready}
+        await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+        if not self._ready.is_set():
+            ready.cancel()
+            raise ConnectionError("The in-process queue failed to start.")
+
+    def _track_session(self, session) -> None:
+        if PENDING_JOBS_KEY in session.info:
+            return  # Its listeners are already registered
+        event.listen(session.sync_session, "after_commit", self._after_commit)
+        event.listen(session.sync_session, "after_rollback", self._after_rollback)
+
+    def _after_commit(self, session) -> None:
+        pending, session.info[PENDING_JOBS_KEY] = session.info.get(PENDING_JOBS_KEY, []), []
+        for job, defer_by in pending:
+            self._submit(job, defer_by)
+
+    def _after_rollback(self, session) -> None:
+        dropped, session.info[PENDING_JOBS_KEY] = session.info.get(PENDING_JOBS_KEY, []), []
+        if dropped:
+            logger.info(f"Dropped {len(dropped)} jobs enqueued in a rolled back transaction.")
+
+    def _submit(self, job: MemoryJob, defer_by: float | None) -> None:
+        self._jobs[job.job_id] = job
+        if defer_by:
+            job.status = JOB_DEFERRED
+            asyncio.get_running_loop().call_later(defer_by, self._release, job)
+        else:
+            self._release(job)
+
+    def _release(self, job: MemoryJob) -> None:
+        if job.status == JOB_COMPLETE:
+            return  # Aborted while deferred
+        job.status = JOB_QUEUED
+        self._queue.put_nowait(job)
+
+    async def job_info(self, job_id: str) -> JobInfo:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return JobInfo(job_id=job_id, status=JOB_NOT_FOUND)
+        if job.status != JOB_COMPLETE:
+            return JobInfo(job_id=job_id, status=job.status)
+        return JobInfo(
+            job_id=job_id, status=job.status, success=job.success, result=job.result, cancelled=job.cancelled
+        )
+
+    async def abort(self, job_id: str) -> bool:
+        job = self._jobs.get(job_id)
+        if job is None or job.status == JOB_COMPLETE:
+            return False
+        task = self._tasks.get(job_id)
+        if task is None:
+            # Deferred or queued: the runner that takes it skips it
+            self._finish(job, success=False, result="CancelledError: job aborted", cancelled=True)
+        else:
+            self._aborting.add(job_id)
+            task.cancel()
+        return True
+
+    async def lane_stats(self) -> dict[str, LaneStats]:
+        depths: dict[str, int] = {}
+        durations: dict[str, list[float]] = {}
+        for job in self._jobs.values():
+            depths.setdefault(job.function_name, 0)
+            if job.status != JOB_COMPLETE:
+                depths[job.function_name] += 1
+            elif job.started_at is not None:
+                durations.setdefault(job.function_name, []).append(job.finished_at - job.started_at)
+        return {
+            name: LaneStats(
+                depth=depth,
+                avg_duration_s=sum(durations[name]) / len(durations[name]) if name in durations else None,
+            )
+            for name, depth in depths.items()
+        }
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            if job.status == JOB_COMPLETE:
+                continue  # Aborted while queued
+            task = asyncio.create_task(self._run_job(job))
+            self._tasks[job.job_id] = task
+            try:
+                await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if not task.done():
+                    # The runner itself is being stopped
+                    task.cancel()
+                    raise
+            finally:
+                if task.done():
+                    self._tasks.pop(job.job_id, None)
+
+    async def _run_job(self, job: MemoryJob) -> None:
+        from arq.worker import Retry
+
+        function = self.functions.get(job.function_name)
+        if function is None:
+            self._finish(job, success=False, result=f"Unknown function '{job.function_name}'.")
+            return
+        job.attempts += 1
+        job.status = JOB_IN_PROGRESS
+        job.started_at = time.monotonic()
+        max_tries = function.max_tries or self.max_tries
+        ctx = {**self.ctx, "job_id": job.job_id, "job_try": job.attempts, "enqueue_time": job.enqueued_at}
+        timeout = function.timeout_s or self.job_timeout
+        try:
+            if self._on_job_start:
+                await self._on_job_start(ctx)
+            result = await asyncio.wait_for(function.coroutine(ctx, *job.args), timeout)
+        except Retry as e:
+            if job.attempts >= max_tries:
+                self._finish(job, success=False, result=f"Max tries ({max_tries}) exceeded.")
+            else:
+                defer = (e.defer_score or 0) / 1000
+                logger.info(f"🔁 Job {job.job_id} ({job.function_name}) re-queued after try {job.attempts}, in {defer:.1f}s.")
+                self._submit(job, defer)
+        except asyncio.CancelledError:
+            if job.job_id not in self._aborting:
+                raise
+            self._aborting.discard(job.job_id)
+            logger.info(f"⊘ Job {job.job_id} ({job.function_name}) aborted.")
+            self._finish(job, success=False, result="CancelledError: job aborted", cancelled=True)
+        except asyncio.TimeoutError:
+            logger.error(f"❌ Job {job.job_id} ({job.function_name}) timed out after {timeout}s.")
+            self._finish(job, success=False, result=f"TimeoutError: timed out after {timeout}s")
+        except Exception as e:
+            logger.exception(f"❌ Job {job.job_id} ({job.function_name}) raised: {e}")
+            self._finish(job, success=False, result=repr(e))
+        else:
+            self._finish(job, success=True, result=result)
+        finally:
+            if self._after_job_end:
+                await self._after_job_end(ctx)
+
+    def _finish(self, job: MemoryJob, *, success: bool, result: Any, cancelled: bool = False) -> None:
+        job.status = JOB_COMPLETE
+        job.success = success
+        job.result = result
+        job.cancelled = cancelled
+        job.finished_at = time.monotonic()
+
+    def _purge_results(self) -> None:
+        now = time.monotonic()
+        if now - self._last_purge < 60:
+            return
+        self._last_purge = now
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > settings.QUEUE_RESULT_TTL
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
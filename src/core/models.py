@@ -0,0 +1,34 @@
+from datetime import datetime
+from sqlalchemy import Column, String, Integer, DateTime, JSON, Boolean, Index
+from src.core.database import Base
+
+
+class QueueJob(Base):
+    """
+    A job of the Postgres queue backend (see src/core/pg_queue.py). Jobs are
+    claimed with FOR UPDATE SKIP LOCKED and leased until `locked_until`; the
+    row is kept after completion to serve the job's status and result.
+    """
+    __tablename__ = "queue_jobs"
+
+    # arq-style job id: random hex, or a caller-chosen id that deduplicates enqueues
+    id = Column(String, primary_key=True)
+    function_name = Column(String, nullable=False)
+    args = Column(JSON, nullable=False, default=list)
+    # queued, in_progress or complete (arq's status names)
+    status = Column(String, nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    # Not yet run before this time (deferred jobs and retries)
+    scheduled_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Lease of the worker running the job; an expired lease makes the job claimable again
+    locked_until = Column(DateTime, nullable=True)
+    worker_id = Column(String, nullable=True)
+    success = Column(Boolean, nullable=True)
+    result = Column(JSON, nullable=True)
+    enqueued_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("queue_jobs_status_scheduled_at_idx", "status", "scheduled_at"),
+    )
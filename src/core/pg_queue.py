@@ -0,0 +1,504 @@
+# src/core/pg_queue.py
+"""
+Postgres queue backend: jobs are rows of `queue_jobs`, so a job can be
+enqueued in the same transaction as the writes it depends on, and no Redis is
+needed to run the pipeline.
+
+- Workers claim jobs with `SELECT ... FOR UPDATE SKIP LOCKED`, so any number
+  of them can poll the table without blocking each other.
+- A claimed job is leased until `locked_until` and the lease is renewed while
+  it runs. A job whose worker died is claimed again once its lease expires
+  (the visibility timeout), up to the function's max_tries.
+- Enqueues send a NOTIFY (delivered on commit); idle workers LISTEN for it and
+  fall back to polling every QUEUE_POLL_INTERVAL seconds.
+- `arq.worker.Retry` re-queues a job after its defer delay, as in arq. Results
+  are kept for QUEUE_RESULT_TTL seconds.
+- `abort()` completes the job's row as cancelled and NOTIFYs the workers,
+  which cancel the job if they are running it (or notice at the next lease
+  renewal if they missed the notification).
+
+Workers run the same WorkerSettings as arq (functions, startup and shutdown
+hooks, and the on_job_start/after_job_end hooks around every try):
+    python -m src.core.pg_queue src.crew.worker.WorkerSettings
+"""
+import argparse
+import asyncio
+import json
+import logging
+import signal
+import socket
+import time
+import uuid
+from datetime import timedelta
+from typing import Any
+
+import psycopg
+from arq.utils import import_string
+from arq.worker import Function, Retry, func as arq_func
+from sqlalchemy import DateTime, and_, delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import make_url
+
+from src.core.config import settings
+from src.core.database import AsyncSessionFactory
+from src.core.models import QueueJob
+from src.core.task_queue import (
+    JOB_COMPLETE, JOB_DEFERRED, JOB_IN_PROGRESS, JOB_NOT_FOUND, JOB_QUEUED,
+    JobInfo, LaneStats, QueueBackend, QueuedJob,
+)
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY channel that enqueues signal; the payload is the job id
+QUEUE_CHANNEL = "queue_jobs"
+# NOTIFY channel of aborted jobs; the payload is the job id
+CANCEL_CHANNEL = "queue_job_cancels"
+# Result of an aborted job
+CANCELLED_RESULT = "CancelledError: job aborted"
+# arq's defaults, used when the worker settings do not set them
+DEFAULT_JOB_TIMEOUT = 300
+DEFAULT_MAX_TRIES = 5
+# How often completed jobs older than QUEUE_RESULT_TTL are purged
+PURGE_INTERVAL = 60
+
+
+def _utc_now():
+    # The database clock, so that leases do not depend on the workers' clocks
+    return func.timezone("utc", func.now(), type_=DateTime)
+
+
+def encode_args(args: tuple) -> list:
+    """Job arguments as JSON; UUIDs (the only non-JSON arguments of our jobs) are tagged."""
+    encoded = []
+    for arg in args:
+        if isinstance(arg, uuid.UUID):
+            encoded.append({"$uuid": str(arg)})
+        elif arg is None or isinstance(arg, (str, int, float, bool)):
+            encoded.append(arg)
+        else:
+            raise TypeError(f"Job argument {arg!r} of type {type(arg).__name__} cannot be queued.")
+    return encoded
+
+
+def decode_args(args: list) -> list:
+    return [uuid.UUID(arg["$uuid"]) if isinstance(arg, dict) and "$uuid" in arg else arg for arg in args]
+
+
+def _jsonable(value: Any) -> Any:
+    return json.loads(json.dumps(value, default=str))
+
+
+def listen_dsn(database_url: str) -> str:
+    """The libpq DSN of a SQLAlchemy URL, for the LISTEN connection."""
+    return make_url(database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+class PostgresQueueBackend(QueueBackend):
+    """Enqueues into `queue_jobs`. Jobs enqueued with a `_session` are committed with it."""
+
+    transactional = True
+
+    async def enqueue(self, function_name, *args, _job_id=None, _defer_by=None, _session=None):
+        job_id = _job_id or uuid.uuid4().hex
+        stmt = (
+            pg_insert(QueueJob)
+            .values(
+                id=job_id,
+                function_name=function_name,
+                args=encode_args(args),
+                status=JOB_QUEUED,
+                attempts=0,
+                scheduled_at=_utc_now() + timedelta(seconds=_defer_by or 0),
+                enqueued_at=_utc_now(),
+            )
+            .on_conflict_do_nothing(index_elements=[QueueJob.id])
+            .returning(QueueJob.id)
+        )
+        notify = select(func.pg_notify(QUEUE_CHANNEL, job_id))
+
+        if _session is not None:
+            inserted = await _session.scalar(stmt)
+            if inserted:
+                # Delivered to the workers only if the caller's transaction commits
+                await _session.execute(notify)
+        else:
+            async with AsyncSessionFactory() as session:
+                inserted = await session.scalar(stmt)
+                if inserted:
+                    await session.execute(notify)
+                await session.commit()
+        return QueuedJob(job_id=job_id) if inserted else None
+
+    async def job_info(self, job_id: str) -> JobInfo:
+        async with AsyncSessionFactory() as session:
+            job = await session.get(QueueJob, job_id)
+            if job and job.status == JOB_QUEUED:
+                if await session.scalar(select(_utc_now())) < job.scheduled_at:
+                    return JobInfo(job_id=job_id, status=JOB_DEFERRED)
+        if job is None:
+            return JobInfo(job_id=job_id, status=JOB_NOT_FOUND)
+        if job.status != JOB_COMPLETE:
+            return JobInfo(job_id=job_id, status=job.status)
+        return JobInfo(
+            job_id=job_id, status=job.status, success=job.success, result=job.result,
+            cancelled=job.success is False and job.result == CANCELLED_RESULT,
+        )
+
+    async def abort(self, job_id: str) -> bool:
+        async with AsyncSessionFactory() as session:
+            aborted = await session.scalar(
+                update(QueueJob)
+                .where(QueueJob.id == job_id, QueueJob.status.in_((JOB_QUEUED, JOB_IN_PROGRESS)))
+                .values(status=JOB_COMPLETE, success=False, result=CANCELLED_RESULT,
+                        locked_until=None, finished_at=_utc_now())
+                .returning(QueueJob.id)
+                .execution_options(synchronize_session=False)
+            )
+            if aborted:
+                await session.execute(select(func.pg_notify(CANCEL_CHANNEL, job_id)))
+            await session.commit()
+        return aborted is not None
+
+    async def lane_stats(self) -> dict[str, LaneStats]:
+        # Run times are those of the completed jobs still kept (QUEUE_RESULT_TTL)
+        async with AsyncSessionFactory() as session:
+            depths = (await session.execute(
+                select(QueueJob.function_name, func.count())
+                .where(QueueJob.status.in_((JOB_QUEUED, JOB_IN_PROGRESS)))
+                .group_by(QueueJob.function_name)
+            )).all()
+            durations = (await session.execute(
+                select(QueueJob.function_name, func.avg(func.extract("epoch", QueueJob.finished_at - QueueJob.started_at)))
+                .where(QueueJob.status == JOB_COMPLETE, QueueJob.started_at.is_not(None))
+                .group_by(QueueJob.function_name)
+            )).all()
+        depth_of = dict(depths)
+        avg_duration_of = {name: float(avg) for name, avg in durations if avg is not None}
+        return {
+            name: LaneStats(depth=depth_of.get(name, 0), avg_duration_s=avg_duration_of.get(name))
+            for name in depth_of.keys() | avg_duration_of.keys()
+        }
+
+
+class PostgresWorker:
+    """Runs the jobs of `queue_jobs` with the functions and hooks of an arq WorkerSettings class."""
+
+    def __init__(
+        self,
+        functions: list,
+        *,
+        on_startup=None,
+        on_shutdown=None,
+        on_job_start=None,
+        after_job_end=None,
+        max_jobs: int | None = None,
+        job_timeout: float = DEFAULT_JOB_TIMEOUT,
+        max_tries: int = DEFAULT_MAX_TRIES,
+    ):
+        self.functions: dict[str, Function] = {f.name: f for f in (arq_func(f) for f in functions)}
+        self.on_startup = on_startup
+        self.on_shutdown = on_shutdown
+        # Called with the job's ctx before and after each try, as by arq
+        self.on_job_start = on_job_start
+        self.after_job_end = after_job_end
+        self.max_jobs = max_jobs or settings.QUEUE_MAX_JOBS
+        self.job_timeout = job_timeout
+        self.max_tries = max_tries
+        self.worker_id = f"{socket.gethostname()}:{uuid.uuid4().hex[:8]}"
+        self.ctx: dict[str, Any] = {}
+        self.jobs_complete = 0
+        self.jobs_failed = 0
+        self.jobs_retried = 0
+        self._running: dict[str, asyncio.Task] = {}
+        # Running jobs cancelled because they were aborted
+        self._aborting: set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._last_purge = 0.0
+
+    @classmethod
+    def from_settings(cls, worker_settings: type) -> "PostgresWorker":
+        return cls(
+            worker_settings.functions,
+            on_startup=getattr(worker_settings, "on_startup", None),
+            on_shutdown=getattr(worker_settings, "on_shutdown", None),
+            on_job_start=getattr(worker_settings, "on_job_start", None),
+            after_job_end=getattr(worker_settings, "after_job_end", None),
+            max_jobs=getattr(worker_settings, "max_jobs", None),
+            job_timeout=getattr(worker_settings, "job_timeout", DEFAULT_JOB_TIMEOUT),
+            max_tries=getattr(worker_settings, "max_tries", DEFAULT_MAX_TRIES),
+        )
+
+    async def run(self, burst: bool = False) -> None:
+        """
+        Claims and runs jobs until cancelled. With `burst`, returns once no job
+        is claimable and none is running (used by the benchmark).
+        """
+        logger.info(f"🚀 Postgres queue worker {self.worker_id} starting with {len(self.functions)} functions.")
+        if self.on_startup:
+            await self.on_startup(self.ctx)
+        listener = asyncio.create_task(self._listen())
+        heartbeat = asyncio.create_task(self._heartbeat())
+        try:
+            while True:
+                self._wakeup.clear()
+                free = self.max_jobs - len(self._running)
+                claimed = await self._claim(free) if free > 0 else []
+                for job in claimed:
+                    self._running[job.id] = asyncio.create_task(self._run_job(job))
+                if burst and not claimed and not self._running:
+                    break
+                if claimed and len(claimed) == free:
+                    continue  # There may be more work; claim again once a slot frees up
+                await self._purge_results()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), settings.QUEUE_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            listener.cancel()
+            heartbeat.cancel()
+            for task in self._running.values():
+                task.cancel()
+            await asyncio.gather(listener, heartbeat, *self._running.values(), return_exceptions=True)
+            if self.on_shutdown:
+                await self.on_shutdown(self.ctx)
+            logger.info(
+                f"Postgres queue worker {self.worker_id} stopped: {self.jobs_complete} complete, "
+                f"{self.jobs_failed} failed, {self.jobs_retried} retried."
+            )
+
+    async def _claim(self, limit: int) -> list:
+        """Leases up to `limit` due jobs, including jobs whose previous lease expired."""
+        claimable = (
+            select(QueueJob.id)
+            .where(or_(
+                and_(QueueJob.status == JOB_QUEUED, QueueJob.scheduled_at <= _utc_now()),
+                and_(QueueJob.status == JOB_IN_PROGRESS, QueueJob.locked_until < _utc_now()),
+            ))
+            .order_by(QueueJob.scheduled_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            update(QueueJob)
+            .where(QueueJob.id.in_(claimable.scalar_subquery()))
+            .values(
+                status=JOB_IN_PROGRESS,
+                attempts=QueueJob.attempts + 1,
+                locked_until=_utc_now() + timedelta(seconds=settings.QUEUE_VISIBILITY_TIMEOUT),
+                worker_id=self.worker_id,
+                started_at=_utc_now(),
+            )
+            .returning(QueueJob.id, QueueJob.function_name, QueueJob.args, QueueJob.attempts, QueueJob.enqueued_at)
+            .execution_options(synchronize_session=False)
+        )
+        try:
+            async with AsyncSessionFactory() as session:
+                claimed = (await session.execute(stmt)).all()
+                await session.commit()
+        except Exception as e:
+            logger.error(f"❌ Could not claim queue jobs: {e}")
+            return []
+        return claimed
+
+    async def _run_job(self, job) -> None:
+        function = self.functions.get(job.function_name)
+        try:
+            if function is None:
+                await self._finish(job, success=False, result=f"Unknown function '{job.function_name}'.")
+                return
+            max_tries = function.max_tries or self.max_tries
+            if job.attempts > max_tries:
+                # Its last worker died (or timed out its lease) on the final try
+                await self._finish(job, success=False, result=f"Max tries ({max_tries}) exceeded.")
+                return
+
+            ctx = {
+                **self.ctx,
+                "job_id": job.id,
+                "job_try": job.attempts,
+                "enqueue_time": job.enqueued_at,
+            }
+            timeout = function.timeout_s or self.job_timeout
+            try:
+                if self.on_job_start:
+                    await self.on_job_start(ctx)
+                result = await asyncio.wait_for(function.coroutine(ctx, *decode_args(job.args)), timeout)
+            except asyncio.CancelledError:
+                if job.id in self._aborting:
+                    # The row was already completed by abort()
+                    logger.info(f"⊘ Job {job.id} ({job.function_name}) aborted.")
+                    self.jobs_failed += 1
+                    return
+                # Worker shutdown: hand the job back so that another worker picks it up
+                await self._release(job, defer=0)
+                raise
+            except Retry as e:
+                if job.attempts >= max_tries:
+                    await self._finish(job, success=False, result=f"Max tries ({max_tries}) exceeded.")
+                else:
+                    await self._release(job, defer=(e.defer_score or 0) / 1000)
+            except asyncio.TimeoutError:
+                logger.error(f"❌ Job {job.id} ({job.function_name}) timed out after {timeout}s.")
+                await self._finish(job, success=False, result=f"TimeoutError: timed out after {timeout}s")
+            except Exception as e:
+                logger.exception(f"❌ Job {job.id} ({job.function_name}) raised: {e}")
+                await self._finish(job, success=False, result=repr(e))
+            else:
+                await self._finish(job, success=True, result=_jsonable(result))
+            finally:
+                if self.after_job_end:
+                    await self.after_job_end(ctx)
+        finally:
+            self._running.pop(job.id, None)
+            self._aborting.discard(job.id)
+            self._wakeup.set()
+
+    def _owned(self, job):
+        # A job whose lease expired may have been claimed again, or the job may
+        # have been aborted; only the current holder of a running job writes to it.
+        return and_(
+            QueueJob.id == job.id, QueueJob.worker_id == self.worker_id,
+            QueueJob.attempts == job.attempts, QueueJob.status == JOB_IN_PROGRESS,
+        )
+
+    async def _finish(self, job, *, success: bool, result: Any) -> None:
+        async with AsyncSessionFactory() as session:
+            await session.execute(
+                update(QueueJob)
+                .where(self._owned(job))
+                .values(status=JOB_COMPLETE, success=success, result=result,
+                        locked_until=None, finished_at=_utc_now())
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+        if success:
+            self.jobs_complete += 1
+        else:
+            self.jobs_failed += 1
+
+    async def _release(self, job, *, defer: float) -> None:
+        async with AsyncSessionFactory() as session:
+            await session.execute(
+                update(QueueJob)
+                .where(self._owned(job))
+                .values(status=JOB_QUEUED, locked_until=None, worker_id=None,
+                        scheduled_at=_utc_now() + timedelta(seconds=defer))
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+        self.jobs_retried += 1
+        logger.info(f"🔁 Job {job.id} ({job.function_name}) re-queued after try {job.attempts}, in {defer:.1f}s.")
+
+    def _cancel_aborted(self, job_id: str) -> None:
+        task = self._running.get(job_id)
+        if task is not None and job_id not in self._aborting:
+            self._aborting.add(job_id)
+            task.cancel()
+
+    async def _heartbeat(self) -> None:
+        """Renews the leases of running jobs well before they expire, and cancels aborted ones."""
+        interval = max(settings.QUEUE_VISIBILITY_TIMEOUT / 3, 1)
+        while True:
+            await asyncio.sleep(interval)
+            if not self._running:
+                continue
+            try:
+                async with AsyncSessionFactory() as session:
+                    running = list(self._running)
+                    await session.execute(
+                        update(QueueJob)
+                        .where(
+                            QueueJob.id.in_(running),
+                            QueueJob.worker_id == self.worker_id,
+                            QueueJob.status == JOB_IN_PROGRESS,
+                        )
+                        .values(locked_until=_utc_now() + timedelta(seconds=settings.QUEUE_VISIBILITY_TIMEOUT))
+                        .execution_options(synchronize_session=False)
+                    )
+                    # Aborted while the cancel notification was missed
+                    aborted = (await session.scalars(
+                        select(QueueJob.id).where(
+                            QueueJob.id.in_(running),
+                            QueueJob.status == JOB_COMPLETE,
+                            QueueJob.success.is_(False),
+                        )
+                    )).all()
+                    await session.commit()
+                for job_id in aborted:
+                    self._cancel_aborted(job_id)
+            except Exception as e:
+                logger.warning(f"⚠️ Could not renew queue job leases: {e}")
+
+    async def _listen(self) -> None:
+        """
+        Wakes the claim loop on every enqueue NOTIFY and cancels aborted jobs;
+        reconnects after connection errors.
+        """
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(
+                    listen_dsn(settings.DATABASE_URL), autocommit=True
+                ) as conn:
+                    await conn.execute(f"LISTEN {QUEUE_CHANNEL}")
+                    await conn.execute(f"LISTEN {CANCEL_CHANNEL}")
+                    logger.debug(f"Listening for queue notifications on '{QUEUE_CHANNEL}' and '{CANCEL_CHANNEL}'.")
+                    async for notify in conn.notifies():
+                        if notify.channel == CANCEL_CHANNEL:
+                            self._cancel_aborted(notify.payload)
+                        else:
+                            self._wakeup.set()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Queue LISTEN connection lost, polling until it is back: {e}")
+                await asyncio.sleep(settings.QUEUE_POLL_INTERVAL)
+
+    async def _purge_results(self) -> None:
+        if time.monotonic() - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = time.monotonic()
+        try:
+            async with AsyncSessionFactory() as session:
+                purged = await session.execute(
+                    delete(QueueJob).where(
+                        QueueJob.status == JOB_COMPLETE,
+                        QueueJob.finished_at < _utc_now() - timedelta(seconds=settings.QUEUE_RESULT_TTL),
+                    )
+                )
+                await session.commit()
+            if purged.rowcount:
+                logger.info(f"Purged {purged.rowcount} expired queue job results.")
+        except Exception as e:
+            logger.warning(f"⚠️ Could not purge queue job results: {e}")
+
+
+def main(argv: list[str] | None = None) -> None:
+    from src.core.logging import configure_logging
+
+    parser = argparse.ArgumentParser(description="Run a Postgres queue worker.")
+    parser.add_argument("worker_settings", help="Dotted path of the worker settings, e.g. src.crew.worker.WorkerSettings")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    if settings.QUEUE_BACKEND != "postgres":
+        logger.warning(
+            f"⚠️ QUEUE_BACKEND is '{settings.QUEUE_BACKEND}': jobs enqueued by the API will not reach this worker."
+        )
+    worker = PostgresWorker.from_settings(import_string(args.worker_settings))
+
+    async def serve() -> None:
+        task = asyncio.current_task()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, task.cancel)
+        try:
+            await worker.run()
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# src/core/rate_limit.py
+"""
+Rate limiting for the API routes.
+
+`RateLimiter` is fastapi_limiter's Redis-backed limiter. Without Redis
+(embedded mode, or the Postgres queue without REDIS_URL) the same fixed-window
+limits are counted in process memory: exact for the single process of
+embedded mode, per pod otherwise. fastapi_limiter.depends, which imports
+redis, is then never loaded.
+
+`TokenBudget` charges generation requests by their estimated token cost
+instead of counting them, against a per-client budget kept in Redis (or in
+process memory without Redis).
+"""
+import time
+from typing import Awaitable, Callable
+
+from fastapi import Depends, Request, Response
+from fastapi_limiter import default_identifier, http_default_callback
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.config import settings
+from src.core.database import get_db_session
+from src.core.redis_manager import redis_manager
+
+# key -> (requests counted, monotonic time the window ends)
+_windows: dict[str, tuple[int, float]] = {}
+# Expired windows are swept once the table grows past this many keys
+_SWEEP_THRESHOLD = 10_000
+
+
+def _hit(key: str, times: int, window_ms: int) -> int:
+    """Counts a request; returns 0 if allowed, else the milliseconds until the window ends."""
+    now = time.monotonic()
+    count, ends_at = _windows.get(key, (0, 0.0))
+    if ends_at <= now:
+        if len(_windows) > _SWEEP_THRESHOLD:
+            for expired in [k for k, (_, end) in _windows.items() if end <= now]:
+                del _windows[expired]
+        _windows[key] = (1, now + window_ms / 1000)
+        return 0
+    if count + 1 > times:
+        return max(int((ends_at - now) * 1000), 1)
+    _windows[key] = (count + 1, ends_at)
+    return 0
+
+
+class RateLimiter:
+    """Drop-in for fastapi_limiter's RateLimiter that also works without Redis."""
+
+    def __init__(
+        self,
+        times: int = 1,
+        milliseconds: int = 0,
+        seconds: int = 0,
+        minutes: int = 0,
+        hours: int = 0,
+        identifier: Callable | None = None,
+        callback: Callable | None = None,
+    ):
+        self.times = times
+        self.milliseconds = milliseconds + 1000 * seconds + 60000 * minutes + 3600000 * hours
+        self.identifier = identifier
+        self.callback = callback
+        self._redis_limiter = None
+
+    async def __call__(self, request: Request, response: Response):
+        if redis_manager.connected:
+            if self._redis_limiter is None:
+                # fastapi_limiter keys its counters by route and by the
+                # limiter's position in route.dependencies (0 if not found);
+                # every route has a single limiter, so the keys are unchanged.
+                from fastapi_limiter.depends import RateLimiter as RedisRateLimiter
+                self._redis_limiter = RedisRateLimiter(
+                    times=self.times, milliseconds=self.milliseconds,
+                    identifier=self.identifier, callback=self.callback,
+                )
+            return await self._redis_limiter(request, response)
+        identifier = self.identifier or default_identifier
+        callback = self.callback or http_default_callback
+        route = request.scope.get("route")
+        key = f"{await identifier(request)}:{getattr(route, 'path', request.url.path)}:{id(self)}"
+        pexpire = _hit(key, self.times, self.milliseconds)
+        if pexpire != 0:
+            return await callback(request, response, pexpire)
+
+
+# Token bucket: the budget refills continuously at capacity / window. A request
+# costing more than the whole budget is charged the whole budget, so it still
+# runs once the bucket is full. Returns {milliseconds to wait (0 if charged),
+# tokens left}. Redis' own clock is used so that all API pods agree.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local window_ms = tonumber(ARGV[2])
+local cost = math.min(tonumber(ARGV[3]), capacity)
+local time = redis.call('TIME')
+local now = time[1] * 1000 + math.floor(time[2] / 1000)
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + (now - ts) * capacity / window_ms)
+if tokens < cost then
+    return {math.ceil((cost - tokens) * window_ms / capacity), math.floor(tokens)}
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens - cost), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], window_ms)
+return {0, math.floor(tokens - cost)}
+"""
+TOKEN_BUDGET_KEY_PREFIX = "token-budget"
+
+# client key -> (tokens left, monotonic time of the last charge), without Redis
+_buckets: dict[str, tuple[float, float]] = {}
+
+
+def _take_tokens(key: str, capacity: int, window_ms: int, cost: int) -> tuple[int, int]:
+    """In-memory TOKEN_BUCKET_SCRIPT: returns (milliseconds to wait, tokens left)."""
+    now = time.monotonic()
+    cost = min(cost, capacity)
+    tokens, charged_at = _buckets.get(key, (capacity, now))
+    tokens = min(capacity, tokens + (now - charged_at) * 1000 * capacity / window_ms)
+    if tokens < cost:
+        return max(int((cost - tokens) * window_ms / capacity), 1), int(tokens)
+    _buckets[key] = (tokens - cost, now)
+    return 0, int(tokens - cost)
+
+
+def client_key(request: Request) -> str:
+    """The TOKEN_BUDGET_CLIENT_HEADER value if sent, else the client's address."""
+    key = request.headers.get(settings.TOKEN_BUDGET_CLIENT_HEADER)
+    if key:
+        return key
+    forwarded = request.headers.get("X-Forwarded-For")
+    return forwarded.split(",")[0].strip() if forwarded else request.client.host
+
+
+class TokenBudget:
+    """
+    Dependency charging a request its estimated token cost against the
+    client's budget: TOKEN_BUDGETS[client key] (or TOKEN_BUDGET_DEFAULT) tokens
+    per TOKEN_BUDGET_WINDOW_SECONDS. Clients have separate budgets, so a client
+    running whole-book jobs does not throttle others, and a cheap call only
+    needs a few tokens left. Rejected requests get a 429 with Retry-After.
+    """
+
+    def __init__(self, estimate: Callable[[Request, AsyncSession], Awaitable[int]]):
+        self.estimate = estimate
+
+    async def __call__(self, request: Request, response: Response, session: AsyncSession = Depends(get_db_session)):
+        if not settings.TOKEN_BUDGET_ENABLED:
+            return
+        cost = await self.estimate(request, session)
+        client = client_key(request)
+        capacity = settings.TOKEN_BUDGETS.get(client, settings.TOKEN_BUDGET_DEFAULT)
+        window_ms = settings.TOKEN_BUDGET_WINDOW_SECONDS * 1000
+        if redis_manager.connected:
+            script = redis_manager.client.register_script(TOKEN_BUCKET_SCRIPT)
+            wait_ms, remaining = await script(
+                keys=[f"{TOKEN_BUDGET_KEY_PREFIX}:{client}"], args=[capacity, window_ms, cost]
+            )
+        else:
+            wait_ms, remaining = _take_tokens(client, capacity, window_ms, cost)
+        if wait_ms:
+            return await http_default_callback(request, response, wait_ms)
+        response.headers["X-Token-Estimate"] = str(cost)
+        response.headers["X-Token-Budget-Remaining"] = str(remaining)
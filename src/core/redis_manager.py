@@ -0,0 +1,200 @@
+# src/core/redis_manager.py
+"""
+The process's single Redis connection pool.
+
+The task queue (arq), the rate limiter, job status lookups and caches all use
+`redis_manager.client`, so an API pod holds at most REDIS_MAX_CONNECTIONS
+connections whatever the number of integrations. The pool blocks for up to
+REDIS_POOL_TIMEOUT seconds when all connections are busy instead of opening
+more. Idle connections are checked with a PING before reuse
+(REDIS_HEALTH_CHECK_INTERVAL), and failed commands are retried on a fresh
+connection with exponential backoff. `metrics()` reports the pool's usage.
+"""
+import asyncio
+import functools
+import json
+import logging
+import time
+from typing import TYPE_CHECKING, Any
+
+from src.core.config import settings
+
+if TYPE_CHECKING:
+    from arq.connections import ArqRedis
+    from redis.asyncio import BlockingConnectionPool
+
+logger = logging.getLogger(__name__)
+
+
+# redis and arq are imported when a pool is configured, so that processes
+# without Redis (embedded mode) do not pay for them at start-up.
+@functools.cache
+def metered_connection_pool() -> type["BlockingConnectionPool"]:
+    """The MeteredConnectionPool class, defined on first use."""
+    from redis.asyncio import BlockingConnectionPool
+    from redis.exceptions import ConnectionError as RedisConnectionError
+
+    class MeteredConnectionPool(BlockingConnectionPool):
+        """BlockingConnectionPool that records how long callers wait for a connection."""
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.acquisitions = 0
+            self.wait_seconds_total = 0.0
+            self.wait_seconds_max = 0.0
+            self.exhausted = 0
+
+        async def get_connection(self, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await super().get_connection(*args, **kwargs)
+            except RedisConnectionError as e:
+                # Raised from a TimeoutError when no connection freed up within the pool timeout
+                if isinstance(e.__cause__, asyncio.TimeoutError):
+                    self.exhausted += 1
+                raise
+            finally:
+                waited = time.perf_counter() - started
+                self.acquisitions += 1
+                self.wait_seconds_total += waited
+                self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    return MeteredConnectionPool
+
+
+class RedisManager:
+    pool: "BlockingConnectionPool | None" = None
+    # An ArqRedis is a redis.asyncio.Redis that can also enqueue arq jobs;
+    # every user of Redis shares this one client and its pool.
+    client: "ArqRedis | None" = None
+
+    def __init__(self):
+        self.failed_pings = 0
+        self.last_error: str | None = None
+        self.last_ping_ms: float | None = None
+        self._owns_pool = False
+
+    def configure(self, redis_url: str) -> None:
+        """Creates the (lazily connecting) pool for `redis_url`. Does not connect."""
+        from arq.connections import ArqRedis
+        from redis.asyncio.retry import Retry
+        from redis.backoff import ExponentialBackoff
+        from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+
+        self.pool = metered_connection_pool().from_url(
+            redis_url,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            timeout=settings.REDIS_POOL_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+            retry=Retry(
+                ExponentialBackoff(cap=settings.REDIS_BACKOFF_CAP, base=settings.REDIS_BACKOFF_BASE),
+                settings.REDIS_RETRY_ATTEMPTS,
+            ),
+            retry_on_error=[RedisConnectionError, RedisTimeoutError],
+        )
+        self.client = ArqRedis(self.pool)
+        self._owns_pool = True
+
+    def adopt(self, client: "ArqRedis") -> None:
+        """
+        Shares an existing client's pool instead of opening one, e.g. the pool
+        an arq worker creates from its WorkerSettings.
+        """
+        self.client = client
+        self.pool = client.connection_pool
+        self._owns_pool = False
+
+    @property
+    def connected(self) -> bool:
+        return self.client is not None
+
+    async def connect(self) -> None:
+        """
+        Checks that Redis answers, retrying with exponential backoff for
+        REDIS_CONNECT_ATTEMPTS attempts (e.g. while Redis restarts with the pod).
+        """
+        if self.client is None:
+            raise ConnectionError("RedisManager is not configured. Call .configure() first.")
+        from redis.backoff import ExponentialBackoff
+
+        backoff = ExponentialBackoff(cap=settings.REDIS_BACKOFF_CAP, base=settings.REDIS_BACKOFF_BASE)
+        for attempt in range(1, settings.REDIS_CONNECT_ATTEMPTS + 1):
+            if await self.ping():
+                logger.info(f"⚡ Redis connected (pool of up to {settings.REDIS_MAX_CONNECTIONS} connections).")
+                return
+            if attempt == settings.REDIS_CONNECT_ATTEMPTS:
+                break
+            delay = backoff.compute(attempt)
+            logger.warning(f"⚠️ Redis not reachable (attempt {attempt}), retrying in {delay:.1f}s: {self.last_error}")
+            await asyncio.sleep(delay)
+        raise ConnectionError(f"Redis is not reachable: {self.last_error}")
+
+    async def close(self) -> None:
+        if self.client is not None and self._owns_pool:
+            await self.client.aclose(close_connection_pool=True)
+        self.client = None
+        self.pool = None
+
+    async def ping(self) -> bool:
+        """Health check: PINGs Redis and records the round trip or the error."""
+        from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+
+        started = time.perf_counter()
+        try:
+            await self.client.ping()
+        except (RedisConnectionError, RedisTimeoutError, OSError) as e:
+            self.failed_pings += 1
+            self.last_error = str(e)
+            self.last_ping_ms = None
+            return False
+        self.last_ping_ms = round((time.perf_counter() - started) * 1000, 2)
+        return True
+
+    def pipeline(self, transaction: bool = False):
+        """A pipeline on the shared client: queue commands, then one round trip with execute()."""
+        return self.client.pipeline(transaction=transaction)
+
+    async def get_json(self, *keys: str) -> list[Any]:
+        """Reads several JSON cache entries in one round trip; missing keys are None."""
+        if not keys:
+            return []
+        values = await self.client.mget(keys)
+        return [json.loads(value) if value is not None else None for value in values]
+
+    async def set_json(self, entries: dict[str, Any], ttl: int | None = None) -> None:
+        """Writes several JSON cache entries (expiring after `ttl` seconds) in one round trip."""
+        if not entries:
+            return
+        async with self.pipeline() as pipe:
+            for key, value in entries.items():
+                pipe.set(key, json.dumps(value, default=str), ex=ttl)
+            await pipe.execute()
+
+    def metrics(self) -> dict[str, Any]:
+        """Pool usage of this process."""
+        pool = self.pool
+        if pool is None:
+            return {"configured": False}
+        metrics = {
+            "configured": True,
+            "max_connections": pool.max_connections,
+            "in_use": len(pool._in_use_connections),
+            "idle": len(pool._available_connections),
+            "last_ping_ms": self.last_ping_ms,
+            "failed_pings": self.failed_pings,
+            "last_error": self.last_error,
+        }
+        if isinstance(pool, metered_connection_pool()):
+            metrics.update({
+                "acquisitions": pool.acquisitions,
+                "wait_ms_avg": round(pool.wait_seconds_total / pool.acquisitions * 1000, 3) if pool.acquisitions else 0.0,
+                "wait_ms_max": round(pool.wait_seconds_max * 1000, 3),
+                "exhausted": pool.exhausted,
+            })
+        return metrics
+
+
+# A single instance to be used throughout the application
+redis_manager = RedisManager()
@@ -1,37 +1,188 @@
 # src/core/task_queue.py
-from arq import create_pool
-from arq.connections import ArqRedis, RedisSettings
+"""
+The job queue used by the API and the workers.
+
+`task_queue` is a facade over a pluggable backend, chosen with QUEUE_BACKEND:
+  - "arq" (default): Redis (see src/core/arq_queue.py), run workers with
+    `arq src.crew.worker.WorkerSettings`.
+  - "postgres": the `queue_jobs` table (see src/core/pg_queue.py), run workers
+    with `python -m src.core.pg_queue src.crew.worker.WorkerSettings`. Redis
+    is then optional: without REDIS_URL, rate limits and token budgets are
+    counted per API process and circuit breakers are per process, so an
+    outage seen by one worker is not seen by the others.
+  - "memory": embedded mode, jobs run inside the API process
+    (see src/core/memory_queue.py).
+Both run the same worker functions, and callers only depend on `enqueue()`
+returning an object with a `job_id`, and on `job_info()`. `lane_stats()`
+reports the backlog of each job function (its lane) for admission control,
+and `abort()` cancels a job.
+"""
+import logging
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Any
+
+from src.core.config import settings
+
+if TYPE_CHECKING:
+    from arq.connections import RedisSettings
+
+logger = logging.getLogger(__name__)
+
+# Job statuses, in arq's vocabulary (arq.jobs.JobStatus values) whatever the
+# backend. Spelled out so that arq and redis are only imported by the
+# backends that use them, not by an embedded start-up.
+JOB_DEFERRED = "deferred"
+JOB_QUEUED = "queued"
+JOB_IN_PROGRESS = "in_progress"
+JOB_COMPLETE = "complete"
+JOB_NOT_FOUND = "not_found"
+# Jobs in these states will still run (or are running); the backend owns them
+LIVE_JOB_STATUSES = (JOB_DEFERRED, JOB_QUEUED, JOB_IN_PROGRESS)
+# Reported by the API for a complete job that was aborted
+JOB_CANCELLED = "cancelled"
+
+
+@dataclass(frozen=True)
+class QueuedJob:
+    job_id: str
+
+
+@dataclass(frozen=True)
+class JobInfo:
+    job_id: str
+    status: str
+    # Set once the job is complete: whether it returned normally, and what it
+    # returned (or the error it raised)
+    success: bool | None = None
+    result: Any = None
+    # Whether the job was aborted with abort()
+    cancelled: bool = False
+
+
+@dataclass(frozen=True)
+class LaneStats:
+    # Jobs of the lane deferred, queued or in progress
+    depth: int
+    # Mean run time of the lane's recent jobs, None without history
+    avg_duration_s: float | None = None
+
+
+class QueueBackend:
+    """Interface of a queue backend. Enqueue options use arq's names (`_job_id`, `_defer_by`)."""
+
+    # True if a job enqueued with `_session` only becomes visible when that session commits
+    transactional = False
+
+    async def connect(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def enqueue(
+        self, function_name: str, *args: Any,
+        _job_id: str | None = None, _defer_by: float | None = None, _session: Any = None,
+    ) -> QueuedJob | None:
+        """
+        Queues `function_name(ctx, *args)`. Returns None if a job with `_job_id`
+        already exists. Backends that store jobs in the database insert the job
+        in `_session`'s transaction when one is given, so that it is only
+        queued if the caller's writes commit.
+        """
+        raise NotImplementedError
+
+    async def job_info(self, job_id: str) -> JobInfo:
+        raise NotImplementedError
+
+    async def lane_stats(self) -> dict[str, LaneStats]:
+        """Backlog per function name; lanes without live or recent jobs may be missing."""
+        raise NotImplementedError
+
+    async def abort(self, job_id: str) -> bool:
+        """
+        Aborts a job: a deferred or queued job will not run, a running job is
+        cancelled (asyncio.CancelledError is raised inside it). Returns False
+        if the job is unknown or already complete.
+        """
+        raise NotImplementedError
+
+    async def job_started(self, ctx: dict) -> None:
+        """arq `on_job_start` hook, for backends that track lanes in the workers."""
+
+    async def job_ended(self, ctx: dict) -> None:
+        """arq `after_job_end` hook, called after every try of a job."""
+
 
 class TaskQueue:
-    pool: ArqRedis = None
-    # This will hold the correctly configured RedisSettings object
-    redis_settings: RedisSettings = None
+    backend: QueueBackend = None
+    # This will hold the correctly configured RedisSettings object (arq workers read it)
+    redis_settings: "RedisSettings | None" = None
 
     @classmethod
-    def configure(cls, redis_settings_url: str):
-        """Configures the Redis settings from a URL. Does not connect."""
-        # Use the correct 'from_dsn' method and store the object
-        cls.redis_settings = RedisSettings.from_dsn(redis_settings_url)
+    def configure(cls, redis_settings_url: str, backend: str = "arq"):
+        """Configures the queue backend ("arq", "postgres" or "memory"). Does not connect."""
+        if backend != "memory":
+            from arq.connections import RedisSettings
+            # Use the correct 'from_dsn' method and store the object. arq workers
+            # open their pool from it, bounded and retried like redis_manager's.
+            cls.redis_settings = replace(
+                RedisSettings.from_dsn(redis_settings_url),
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                conn_retries=settings.REDIS_CONNECT_ATTEMPTS,
+            )
+        if backend == "arq":
+            from src.core.arq_queue import ArqQueueBackend
+            cls.backend = ArqQueueBackend(redis_settings_url)
+        elif backend == "postgres":
+            from src.core.pg_queue import PostgresQueueBackend
+            cls.backend = PostgresQueueBackend()
+        elif backend == "memory":
+            from src.core.memory_queue import MemoryQueueBackend
+            cls.backend = MemoryQueueBackend()
+        else:
+            raise ValueError(f"Unknown queue backend '{backend}'.")
+        logger.debug(f"Task queue configured with the '{backend}' backend.")
 
     @classmethod
     async def connect(cls):
-        """Initializes the connection pool to Redis."""
-        if not cls.redis_settings:
+        """Connects the configured backend."""
+        if not cls.backend:
             raise ConnectionError("TaskQueue is not configured. Call .configure() first.")
-        cls.pool = await create_pool(cls.redis_settings)
+        await cls.backend.connect()
 
     @classmethod
     async def close(cls):
-        """Closes the connection pool."""
-        if cls.pool:
-            await cls.pool.close()
+        """Closes the backend's connections."""
+        if cls.backend:
+            await cls.backend.close()
 
     @classmethod
     async def enqueue(cls, function_name: str, *args, **kwargs):
         """Enqueues a job to be run by a worker."""
-        if not cls.pool:
-            raise ConnectionError("TaskQueue is not connected. Call .connect() first.")
-        return await cls.pool.enqueue_job(function_name, *args, **kwargs)
+        if not cls.backend:
+            raise ConnectionError("TaskQueue is not configured. Call .configure() first.")
+        return await cls.backend.enqueue(function_name, *args, **kwargs)
+
+    @classmethod
+    async def job_info(cls, job_id: str) -> JobInfo:
+        """Returns the status (and, once complete, the result) of a job."""
+        if not cls.backend:
+            raise ConnectionError("TaskQueue is not configured. Call .configure() first.")
+        return await cls.backend.job_info(job_id)
+
+    @classmethod
+    async def lane_stats(cls) -> dict[str, LaneStats]:
+        """Returns the backlog of each job function."""
+        if not cls.backend:
+            raise ConnectionError("TaskQueue is not configured. Call .configure() first.")
+        return await cls.backend.lane_stats()
+
+    @classmethod
+    async def abort(cls, job_id: str) -> bool:
+        """Aborts a queued or running job; False if it is unknown or already complete."""
+        if not cls.backend:
+            raise ConnectionError("TaskQueue is not configured. Call .configure() first.")
+        return await cls.backend.abort(job_id)
 
 # A single instance to be used throughout the application
-task_queue = TaskQueue()
\ No newline at end of file
+task_queue = TaskQueue()
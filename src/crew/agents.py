@@ -1,9 +1,18 @@
+# src/crew/agents.py
+import logging
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, Dict
 
-from agents import Agent # This is the crucial new import
 from pydantic import BaseModel, Field # Keep pydantic for output types
 from src.core.config import settings
-from .schemas import PartListOutline  # Add this import
+from .schemas import PartListOutline, ChapterListOutline
+
+if TYPE_CHECKING:
+    # The `agents` SDK pulls in the whole OpenAI client stack, so it is only
+    # imported inside the builders below, the first time an agent is needed.
+    from agents import Agent, Model
 
+logger = logging.getLogger(__name__)
 
 
 # --- AGENT ROSTER (Single Source of Truth) ---
@@ -19,171 +28,225 @@ class StringOutput(BaseModel):
     text: str = Field(..., description="The generated text content.")
 
 
-# ORIGINAL: def create_architect_chain(): ...
-# NEW:
-architect_part_agent = Agent(
-    name="BookArchitectAgent",
-    instructions=(
-        "### Your Primary Goal\n"
-        "Your SOLE objective is to divide the user's book idea into **2 to 4 major, thematic Parts**. "
-        "A Part is a high-level section of the book, NOT a chapter.\n\n"
-
-        "### Core Definitions\n"
-        "Think of a **Part** as a major Act in a three-act play (e.g., Act I: The Setup, Act II: The Confrontation, Act III: The Resolution). "
-        "A **Chapter** is just a single scene within an Act. Your job is to define the Acts, not the scenes.\n\n"
-
-        "### Your Process\n"
-        "1. First, identify the central argument or narrative arc of the raw blueprint.\n"
-        "2. Second, group the core ideas into a logical progression with a clear beginning, middle, and end.\n"
-        "3. Third, define **NO MORE THAN FOUR** of these groupings as 'Parts'.\n"
-        "4. For each Part, provide a clear `title` and a concise `summary` explaining its overarching theme.\n\n"
-
-        "### Critical Constraint\n"
-        "You MUST NOT generate chapters. Your output must be a list containing only 2, 3, or 4 Parts. "
-        "This is your most important instruction."
-    ),
-    model=settings.DEFAULT_OPENAI_MODEL_NAME,
-    output_type=PartListOutline,
-)
-
-# ORIGINAL: def create_continuity_editor_chain(): ...
-# NEW:
-continuity_editor_agent = Agent(
-    name="ContinuityEditorAgent",
-    instructions=(
-        "You are a Continuity Editor AI focused on ensuring smooth transitions between chapters.\n"
-        "### Backstory:\n"
-        "You are a seasoned book editor with a keen eye for narrative structure and pacing. "
-        "Your specialty is ensuring a seamless reading experience. You don't rewrite content; "
-        "you identify jarring transitions, suggest bridging sentences, and point out thematic "
-        "disconnects, providing clear, concise, and constructive feedback.\n\n"
-        "### Chapter Transition Analysis:\n"
-        "Analyze the transition and provide actionable feedback to improve narrative flow."
-    ),
-    model=settings.DEFAULT_OPENAI_MODEL_NAME, # Use the default from settings
-    output_type=StringOutput, # Expecting raw text feedback
-)
-
-
-# src/crew/agents.py
-# ... (existing imports) ...
-from src.crew.schemas import PartListOutline, ChapterListOutline # Ensure ChapterListOutline is imported
-
-# ... (existing architect_part_agent definition) ...
-
-# NEW: Architect Agent for Chapter Detailing
-architect_chapter_agent = Agent(
-    name="ChapterArchitectAgent",
-    instructions=(
-        "### Your Role and Goal\n"
-        "You are a Chapter Architect. Your goal is to take the `title` and `summary` of a single book **Part** and break it down into a logical sequence of **2 to 5 detailed chapters**.\n\n"
-
-        "### Core Task: Create a Narrative Journey\n"
-        "Your primary job is to create a compelling narrative or logical progression *within* the Part. Each chapter must build upon the last, taking the reader on a clear journey. **The logical order of the chapters is the most critical aspect of your task.**\n\n"
-
-        "### Your Step-by-Step Process\n"
-        "1. **Deconstruct the Input**: Deeply analyze the Part's `title` and `summary` to understand its core theme, argument, and purpose within the book.\n"
-        "2. **Brainstorm Key Topics**: Identify the 2 to 5 essential sub-topics, arguments, or story points that are required to fully explore the Part's theme.\n"
-        "3. **Arrange in Logical Order**: Sequence these topics to create a smooth and logical flow. Consider chronological order, building from a simple concept to a more complex one, or a problem/solution structure.\n"
-        "4. **Flesh out Each Chapter**: For each topic, create a complete chapter entry with all the required fields.\n\n"
-
-        "### Output Requirements for Each Chapter Brief\n"
-        "For each chapter you generate, you **MUST** provide a detailed `brief` object containing:\n"
-        "- `thesis_statement`: The single, core argument the chapter must prove or explore.\n"
-        "- `narrative_arc`: A description of the chapter's internal structure (e.g., 'Start with a historical anecdote, introduce the main concept, then explore two case studies.').\n"
-        "- `required_inclusions`: A list of key terms, names, or concepts that MUST be included in the text.\n"
-        "- `key_questions_to_answer`: A list of specific questions the chapter's content MUST answer for the reader."
-    ),
-    model=settings.DEFAULT_OPENAI_MODEL_NAME,
-    output_type=ChapterListOutline,
-)
-
-# src/crew/agents.py
-# ... (existing imports) ...
-from src.crew.schemas import PartListOutline, ChapterListOutline # Ensure ChapterListOutline is imported
-
-# ... (existing architect_part_agent definition) ...
-
-# NEW: Architect Agent for Chapter Detailing
-architect_chapter_agent = Agent(
-    name="ChapterArchitectAgent",
-    instructions=(
-        "You are a master strategic thinker, specializing in structuring detailed chapter outlines for a book part.\n"
-        "Your goal is to generate a list of chapters for a given book part, along with detailed briefs for each chapter.\n\n"
-    ),
-    model=settings.DEFAULT_OPENAI_MODEL_NAME,
-    output_type=ChapterListOutline, # <--- This is crucial!
-)
-
-
-# ORIGINAL: def create_technologist_chain(): ...
-# NEW:
-technologist_agent = Agent(
-    name="TechnologistAIAgent",
-    instructions=(
-        "You are a Technologist AI explaining complex technical concepts.\n"
-        "### Backstory:\n"
-        "You are a brilliant technologist and educator. You excel at breaking down complex, "
-        "technical concepts into simple, intuitive explanations using powerful, clear analogies.\n\n"
-        "### Chapter Assignment:"
-    ),
-    model=settings.DEFAULT_OPENAI_MODEL_NAME, # Use the default from settings
-    output_type=StringOutput,
-)
-
-# ORIGINAL: def create_philosopher_chain(): ...
-# NEW:
-philosopher_agent = Agent(
-    name="PhilosopherAIAgent",
-    instructions=(
-        "You are a Philosopher AI exploring deeper implications.\n"
-        "### Backstory:\n"
-        "You are a philosopher of technology and a futurist. You don't just explain what something is; "
-        "you explore what it *means*. Your role is to ask the profound 'so what?' questions, exploring the ethical, "
-        "societal, and existential implications of ideas.\n\n"
-        "### Chapter Assignment:"
-    ),
-    model=settings.DEFAULT_OPENAI_MODEL_NAME, # Use the default from settings
-    output_type=StringOutput,
-)
+# --- Agent Builders ---
+# Each builder constructs one Agent. They are only called through get_agent(),
+# which memoizes the result, so every agent is built at most once per process.
+
+def _build_architect_part_agent() -> "Agent":
+    from agents import Agent
+    return Agent(
+        name="BookArchitectAgent",
+        instructions=(
+            "### Your Primary Goal\n"
+            "Your SOLE objective is to divide the user's book idea into **2 to 4 major, thematic Parts**. "
+            "A Part is a high-level section of the book, NOT a chapter.\n\n"
+
+            "### Core Definitions\n"
+            "Think of a **Part** as a major Act in a three-act play (e.g., Act I: The Setup, Act II: The Confrontation, Act III: The Resolution). "
+            "A **Chapter** is just a single scene within an Act. Your job is to define the Acts, not the scenes.\n\n"
+
+            "### Your Process\n"
+            "1. First, identify the central argument or narrative arc of the raw blueprint.\n"
+            "2. Second, group the core ideas into a logical progression with a clear beginning, middle, and end.\n"
+            "3. Third, define **NO MORE THAN FOUR** of these groupings as 'Parts'.\n"
+            "4. For each Part, provide a clear `title` and a concise `summary` explaining its overarching theme.\n\n"
+
+            "### Critical Constraint\n"
+            "You MUST NOT generate chapters. Your output must be a list containing only 2, 3, or 4 Parts. "
+            "This is your most important instruction."
+        ),
+        model=settings.DEFAULT_OPENAI_MODEL_NAME,
+        output_type=PartListOutline,
+    )
+
+def _build_architect_chapter_agent() -> "Agent":
+    from agents import Agent
+    return Agent(
+        name="ChapterArchitectAgent",
+        instructions=(
+            "### Your Role and Goal\n"
+            "You are a Chapter Architect. Your goal is to take the `title` and `summary` of a single book **Part** and break it down into a logical sequence of **2 to 5 detailed chapters**.\n\n"
+
+            "### Core Task: Create a Narrative Journey\n"
+            "Your primary job is to create a compelling narrative or logical progression *within* the Part. Each chapter must build upon the last, taking the reader on a clear journey. **The logical order of the chapters is the most critical aspect of your task.**\n\n"
+
+            "### Your Step-by-Step Process\n"
+            "1. **Deconstruct the Input**: Deeply analyze the Part's `title` and `summary` to understand its core theme, argument, and purpose within the book.\n"
+            "2. **Brainstorm Key Topics**: Identify the 2 to 5 essential sub-topics, arguments, or story points that are required to fully explore the Part's theme.\n"
+            "3. **Arrange in Logical Order**: Sequence these topics to create a smooth and logical flow. Consider chronological order, building from a simple concept to a more complex one, or a problem/solution structure.\n"
+            "4. **Flesh out Each Chapter**: For each topic, create a complete chapter entry with all the required fields.\n\n"
+
+            "### Output Requirements for Each Chapter Brief\n"
+            "For each chapter you generate, you **MUST** provide a detailed `brief` object containing:\n"
+            "- `thesis_statement`: The single, core argument the chapter must prove or explore.\n"
+            "- `narrative_arc`: A description of the chapter's internal structure (e.g., 'Start with a historical anecdote, introduce the main concept, then explore two case studies.').\n"
+            "- `required_inclusions`: A list of key terms, names, or concepts that MUST be included in the text.\n"
+            "- `key_questions_to_answer`: A list of specific questions the chapter's content MUST answer for the reader."
+        ),
+        model=settings.DEFAULT_OPENAI_MODEL_NAME,
+        output_type=ChapterListOutline,
+    )
+
+def _build_continuity_editor_agent() -> "Agent":
+    from agents import Agent
+    return Agent(
+        name="ContinuityEditorAgent",
+        instructions=(
+            "You are a Continuity Editor AI focused on ensuring smooth transitions between chapters.\n"
+            "### Backstory:\n"
+            "You are a seasoned book editor with a keen eye for narrative structure and pacing. "
+            "Your specialty is ensuring a seamless reading experience. You don't rewrite content; "
+            "you identify jarring transitions, suggest bridging sentences, and point out thematic "
+            "disconnects, providing clear, concise, and constructive feedback.\n\n"
+            "### Chapter Transition Analysis:\n"
+            "Analyze the transition and provide actionable feedback to improve narrative flow."
+        ),
+        model=settings.DEFAULT_OPENAI_MODEL_NAME, # Use the default from settings
+        output_type=StringOutput, # Expecting raw text feedback
+    )
+
+def _build_technologist_agent() -> "Agent":
+    from agents import Agent
+    return Agent(
+        name="TechnologistAIAgent",
+        instructions=(
+            "You are a Technologist AI explaining complex technical concepts.\n"
+            "### Backstory:\n"
+            "You are a brilliant technologist and educator. You excel at breaking down complex, "
+            "technical concepts into simple, intuitive explanations using powerful, clear analogies.\n\n"
+            "### Chapter Assignment:"
+        ),
+        model=settings.DEFAULT_OPENAI_MODEL_NAME, # Use the default from settings
+        output_type=StringOutput,
+    )
+
+def _build_philosopher_agent() -> "Agent":
+    from agents import Agent
+    return Agent(
+        name="PhilosopherAIAgent",
+        instructions=(
+            "You are a Philosopher AI exploring deeper implications.\n"
+            "### Backstory:\n"
+            "You are a philosopher of technology and a futurist. You don't just explain what something is; "
+            "you explore what it *means*. Your role is to ask the profound 'so what?' questions, exploring the ethical, "
+            "societal, and existential implications of ideas.\n\n"
+            "### Chapter Assignment:"
+        ),
+        model=settings.DEFAULT_OPENAI_MODEL_NAME, # Use the default from settings
+        output_type=StringOutput,
+    )
+
+def _build_theorist_agent() -> "Agent":
+    from agents import Agent
+    return Agent(
+        name="TheoristAIAgent",
+        instructions=(
+            "You are a master synthesizer, weaving together disparate ideas from history, technology, and philosophy into a single, powerful, and cohesive "
+            "narrative. You ensure the central thesis is the golden thread running through every chapter you touch.\n\n"
+            "### Assignment:"
+        ),
+        model=settings.DEFAULT_OPENAI_MODEL_NAME, # Use the default from settings
+        output_type=StringOutput,
+    )
+
+def _build_historian_agent() -> "Agent":
+    from agents import Agent
+    return Agent(
+        name="HistorianAIAgent",
+        instructions=(
+            "You are a Historian AI writing a book chapter using historical analogies.\n"
+            "### Backstory:\n"
+            "You are a master storyteller and a historian of technology and science. You have an "
+            "uncanny ability to find the perfect analogy from the past to illuminate a complex "
+            "modern idea. Your writing is engaging, rich with detail, and always serves to "
+            "clarify the core argument by showing how history repeats itself.\n\n"
+            "### Chapter Assignment:" # Inputs will be prepended by Runner.run
+        ),
+        model=settings.DEFAULT_OPENAI_MODEL_NAME, # Use the default from settings
+        output_type=StringOutput, # Expecting raw text chapter content
+    )
+
+
+# --- Agent Registry ---
+# Maps the agent names used across the app (including Chapter.suggested_agent)
+# to the builder that constructs them.
+AGENT_BUILDERS: Dict[str, Callable[[], "Agent"]] = {
+    "Architect Part AI": _build_architect_part_agent,
+    "Architect Chapter AI": _build_architect_chapter_agent,
+    "Continuity Editor AI": _build_continuity_editor_agent,
+    "Historian AI": _build_historian_agent,
+    "Technologist AI": _build_technologist_agent,
+    "Philosopher AI": _build_philosopher_agent,
+    "Theorist AI": _build_theorist_agent,
+}
 
-# ORIGINAL: def create_theorist_chain(): ...
-# NEW:
-theorist_agent = Agent(
-    name="TheoristAIAgent",
-    instructions=(
-        "You are a master synthesizer, weaving together disparate ideas from history, technology, and philosophy into a single, powerful, and cohesive "
-        "narrative. You ensure the central thesis is the golden thread running through every chapter you touch.\n\n"
-        "### Assignment:"
-    ),
-    model=settings.DEFAULT_OPENAI_MODEL_NAME, # Use the default from settings
-    output_type=StringOutput,
+@lru_cache(maxsize=None)
+def _repairable_output_schema() -> type:
+    """
+    An AgentOutputSchema that keeps the raw output of a run on the
+    ModelBehaviorError raised when it fails validation (as `invalid_output`),
+    so that it can be repaired (see repair.py).
+    """
+    from agents import AgentOutputSchema
+    from agents.exceptions import ModelBehaviorError
+
+    class RepairableOutputSchema(AgentOutputSchema):
+        def validate_json(self, json_str: str):
+            try:
+                return super().validate_json(json_str)
+            except ModelBehaviorError as error:
+                error.invalid_output = json_str
+                raise
+
+    return RepairableOutputSchema
+
+def _model_for(model: str) -> "str | Model":
+    """
+    The model an agent is bound to: the model name itself, or a client for the
+    OpenAI-compatible endpoint configured for it in MODEL_ENDPOINTS.
+    """
+    endpoint = settings.MODEL_ENDPOINTS.get(model)
+    if not endpoint:
+        return model
+    from agents import OpenAIChatCompletionsModel
+    from openai import AsyncOpenAI
+    client = AsyncOpenAI(base_url=endpoint["base_url"], api_key=endpoint.get("api_key") or settings.OPENAI_API_KEY)
+    return OpenAIChatCompletionsModel(model=endpoint.get("model") or model, openai_client=client)
+
+@lru_cache(maxsize=None)
+def get_agent(agent_name: str, model: str | None = None) -> "Agent | None":
+    """
+    Returns the Agent registered under `agent_name`, building it on first use.
+    With `model`, returns a copy of that agent bound to the given model (see
+    routing.resolve_model) or to its endpoint in MODEL_ENDPOINTS; each
+    (agent, model) pair is built once.
+    Returns None if no agent is registered under that name.
+    """
+    builder = AGENT_BUILDERS.get(agent_name)
+    if builder is None:
+        return None
+    if model is not None:
+        base_agent = get_agent(agent_name)
+        return base_agent if base_agent.model == model else base_agent.clone(model=_model_for(model))
+    logger.debug(f"Building agent '{agent_name}'.")
+    agent = builder()
+    if isinstance(agent.output_type, type) and issubclass(agent.output_type, BaseModel):
+        agent = agent.clone(output_type=_repairable_output_schema()(agent.output_type))
+    return agent
+
+
+# Instructions of the follow-up call that repairs an invalid structured output
+# (see repair.py): short, so the repair costs a fraction of a full re-run.
+OUTPUT_REPAIR_INSTRUCTIONS = (
+    "Your previous answer did not validate against the required output schema. "
+    "You are given the validation errors and your previous output. Return the corrected "
+    "output: keep its content, fix only what the errors point out."
 )
 
-# ORIGINAL: def create_historian_chain(): ...
-# NEW:
-historian_agent = Agent(
-    name="HistorianAIAgent",
-    instructions=(
-        "You are a Historian AI writing a book chapter using historical analogies.\n"
-        "### Backstory:\n"
-        "You are a master storyteller and a historian of technology and science. You have an "
-        "uncanny ability to find the perfect analogy from the past to illuminate a complex "
-        "modern idea. Your writing is engaging, rich with detail, and always serves to "
-        "clarify the core argument by showing how history repeats itself.\n\n"
-        "### Chapter Assignment:" # Inputs will be prepended by Runner.run
-    ),
-    model=settings.DEFAULT_OPENAI_MODEL_NAME, # Use the default from settings
-    output_type=StringOutput, # Expecting raw text chapter content
-)
-# --- Agent Instances Map ---
-# Update AGENT_INSTANCES to include the new agent
-AGENT_INSTANCES = {
-    "Architect Part AI": architect_part_agent,
-    "Architect Chapter AI": architect_chapter_agent, # NEW ADDITION
-    "Continuity Editor AI": continuity_editor_agent,
-    "Historian AI": historian_agent,
-    "Technologist AI": technologist_agent,
-    "Philosopher AI": philosopher_agent,
-    "Theorist AI": theorist_agent,
-}
+@lru_cache(maxsize=None)
+def get_repair_agent(agent_name: str, model: str | None = None) -> "Agent | None":
+    """The agent registered under `agent_name` (on `model`) with the output repair instructions."""
+    agent = get_agent(agent_name, model)
+    if agent is None:
+        return None
+    return agent.clone(name=f"{agent.name}Repair", instructions=OUTPUT_REPAIR_INSTRUCTIONS)
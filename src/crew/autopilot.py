@@ -0,0 +1,361 @@
+# src/crew/autopilot.py
+"""
+Autopilot: drives a project from raw blueprint to finished book.
+
+The pipeline is a dependency graph that grows as the book takes shape:
+
+    parts ──> detail:<part> ──> content:<chapter> ──> transitions:<part> ──> finalize:<task>
+
+Part generation creates one detailing node per part, detailing creates one
+content node per chapter plus the part's transition node, and the
+finalization nodes depend on everything else. A node starts as soon as its
+dependencies are done, so independent parts and chapters are processed in
+parallel, bounded by a concurrency cap shared by every run of the process.
+
+Every node checks the database before calling an agent and skips work that
+already exists, which makes a run safe to resume after a gate, a failure or a
+worker restart. Node states are persisted on the PipelineRun after each step.
+"""
+import asyncio
+import logging
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import partial
+from typing import Awaitable, Callable, Iterable
+
+from sqlalchemy import func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from src.core.config import settings
+from src.core.database import AsyncSessionFactory
+from src.project.models import Project, Part, Chapter
+from src.project.service import (
+    get_project_by_id, get_part_by_id, get_part_chapter_draft,
+    finalize_part_structure, finalize_chapter_structure
+)
+from .models import PipelineRun
+from .schemas import AutopilotGates, AutopilotRequest, PartListOutline, ChapterListOutline
+from .service import (
+    run_part_generation_crew,
+    run_chapter_detailing_crew,
+    run_chapter_generation_crew,
+    run_batch_transition_analysis_crew,
+    run_finalization_crew
+)
+
+logger = logging.getLogger(__name__)
+
+# --- Run and node states ---
+RUN_QUEUED = "QUEUED"
+RUN_RUNNING = "RUNNING"
+RUN_AWAITING_APPROVAL = "AWAITING_APPROVAL"
+RUN_COMPLETE = "COMPLETE"
+RUN_FAILED = "FAILED"
+# The run's job was aborted (DELETE /crew/jobs/{job_id})
+RUN_CANCELLED = "CANCELLED"
+ACTIVE_RUN_STATUSES = (RUN_QUEUED, RUN_RUNNING)
+
+NODE_PENDING = "pending"
+NODE_RUNNING = "running"
+NODE_DONE = "done"
+NODE_FAILED = "failed"
+NODE_AWAITING_APPROVAL = "awaiting_approval"
+# A pending node whose dependencies failed or are waiting for approval.
+NODE_BLOCKED = "blocked"
+
+_step_slots: asyncio.Semaphore | None = None
+
+
+def _get_step_slots() -> asyncio.Semaphore:
+    """
+    Returns the process-wide semaphore that caps concurrent pipeline steps.
+    Created on first use so it binds to the worker's running event loop.
+    """
+    global _step_slots
+    if _step_slots is None:
+        _step_slots = asyncio.Semaphore(settings.AUTOPILOT_MAX_CONCURRENCY)
+    return _step_slots
+
+
+@dataclass
+class PipelineNode:
+    key: str
+    run: Callable[[], Awaitable[str]]  # Returns the node's final state
+    deps: set[str] = field(default_factory=set)
+
+
+class ProjectAutopilot:
+    """Builds and executes the pipeline graph of one PipelineRun."""
+
+    def __init__(self, pipeline_run: PipelineRun):
+        self.run_id = pipeline_run.id
+        self.project_id = pipeline_run.project_id
+        request = AutopilotRequest(**(pipeline_run.config or {}))
+        self.gates: AutopilotGates = request.gates
+        self.finalize_tasks = request.finalize
+        # States recorded by previous attempts of this run. Steps whose output
+        # cannot be detected in the database are skipped when already done.
+        self.previous_states: dict[str, str] = dict(pipeline_run.node_states or {})
+        self.nodes: dict[str, PipelineNode] = {}
+        self.states: dict[str, str] = {}
+        self.final_keys: set[str] = set()
+
+    # --- Graph construction ---
+
+    def add_node(self, key: str, run: Callable[[], Awaitable[str]], deps: Iterable[str] = ()) -> None:
+        if key in self.nodes:
+            return
+        self.nodes[key] = PipelineNode(key=key, run=run, deps=set(deps))
+        self.states[key] = NODE_PENDING
+        # Finalization runs last: it depends on every other node, including
+        # the ones discovered while the pipeline runs.
+        if key not in self.final_keys:
+            for final_key in self.final_keys:
+                self.nodes[final_key].deps.add(key)
+
+    def build(self) -> None:
+        self.add_node("parts", self._parts_node)
+        for task_type in self.finalize_tasks:
+            key = f"finalize:{task_type}"
+            self.final_keys.add(key)
+            self.add_node(key, partial(self._finalize_node, key, task_type), deps=set(self.nodes) - self.final_keys)
+
+    # --- Execution ---
+
+    def _ready_keys(self) -> list[str]:
+        return [
+            key for key, node in self.nodes.items()
+            if self.states[key] == NODE_PENDING
+            and all(self.states[dep] == NODE_DONE for dep in node.deps)
+        ]
+
+    async def _run_node(self, node: PipelineNode) -> str:
+        async with _get_step_slots():
+            logger.info(f"🛫 Autopilot {self.run_id}: starting step '{node.key}'.")
+            try:
+                state = await node.run()
+            except Exception as e:
+                logger.exception(f"❌ Autopilot {self.run_id}: step '{node.key}' raised an error: {e}")
+                state = NODE_FAILED
+        logger.info(f"Autopilot {self.run_id}: step '{node.key}' finished with state '{state}'.")
+        return state
+
+    async def execute(self) -> str:
+        self.build()
+        await self._persist(RUN_RUNNING)
+
+        running: dict[asyncio.Task, str] = {}
+        try:
+            while True:
+                for key in self._ready_keys():
+                    self.states[key] = NODE_RUNNING
+                    running[asyncio.create_task(self._run_node(self.nodes[key]))] = key
+                if not running:
+                    break
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    self.states[running.pop(task)] = task.result()
+                await self._persist(RUN_RUNNING)
+        finally:
+            for task in running:
+                task.cancel()
+            # Let cancelled steps log the usage of their interrupted calls
+            await asyncio.gather(*running, return_exceptions=True)
+
+        for key, state in self.states.items():
+            if state == NODE_PENDING:
+                self.states[key] = NODE_BLOCKED
+
+        states = set(self.states.values())
+        if states == {NODE_DONE}:
+            status = RUN_COMPLETE
+        elif NODE_FAILED in states:
+            status = RUN_FAILED
+        else:
+            status = RUN_AWAITING_APPROVAL
+        await self._persist(status)
+        return status
+
+    async def _persist(self, status: str) -> None:
+        async with AsyncSessionFactory() as session:
+            await session.execute(
+                update(PipelineRun)
+                .where(PipelineRun.id == self.run_id)
+                .values(status=status, node_states=dict(self.states), updated_at=datetime.utcnow())
+            )
+            await session.commit()
+
+    def _previously_done(self, key: str) -> bool:
+        return self.previous_states.get(key) == NODE_DONE
+
+    # --- Steps ---
+
+    async def _part_ids(self, session: AsyncSession) -> list[uuid.UUID]:
+        # The introduction and conclusion are written by the finalize nodes.
+        result = await session.execute(
+            select(Part.id)
+            .where(Part.project_id == self.project_id, Part.finalization.is_(None))
+            .order_by(Part.part_number)
+        )
+        return list(result.scalars().all())
+
+    async def _parts_node(self) -> str:
+        async with AsyncSessionFactory() as session:
+            part_ids = await self._part_ids(session)
+            if not part_ids:
+                project = await get_project_by_id(session, self.project_id, with_drafts=True)
+                if not project:
+                    return NODE_FAILED
+                # A pending draft (e.g. from a gated attempt) is reused rather than regenerated.
+                if not (project.status == "PARTS_PENDING_VALIDATION" and project.draft_parts_outline):
+                    if not await run_part_generation_crew(session, self.project_id):
+                        return NODE_FAILED
+                if self.gates.parts:
+                    return NODE_AWAITING_APPROVAL
+
+                session.expire_all()
+                project = await get_project_by_id(session, self.project_id, with_drafts=True)
+                await finalize_part_structure(session, self.project_id, PartListOutline(**project.draft_parts_outline))
+                part_ids = await self._part_ids(session)
+
+        for part_id in part_ids:
+            key = f"detail:{part_id}"
+            self.add_node(key, partial(self._detail_node, key, part_id), deps={"parts"})
+        return NODE_DONE
+
+    async def _detail_node(self, key: str, part_id: uuid.UUID) -> str:
+        async with AsyncSessionFactory() as session:
+            chapter_ids = await self._chapter_ids(session, part_id)
+            if not chapter_ids:
+                draft = await self._chapter_draft(session, part_id)
+                if draft is None:
+                    if not await run_chapter_detailing_crew(session, part_id):
+                        return NODE_FAILED
+                    draft = await self._chapter_draft(session, part_id)
+                if self.gates.chapters:
+                    return NODE_AWAITING_APPROVAL
+
+                await finalize_chapter_structure(session, part_id, ChapterListOutline(**draft))
+                chapter_ids = await self._chapter_ids(session, part_id)
+
+        content_keys = set()
+        for chapter_id in chapter_ids:
+            content_key = f"content:{chapter_id}"
+            self.add_node(content_key, partial(self._content_node, chapter_id), deps={key})
+            content_keys.add(content_key)
+        transitions_key = f"transitions:{part_id}"
+        self.add_node(transitions_key, partial(self._transitions_node, transitions_key, part_id), deps={key, *content_keys})
+        return NODE_DONE
+
+    async def _chapter_ids(self, session: AsyncSession, part_id: uuid.UUID) -> list[uuid.UUID]:
+        result = await session.execute(
+            select(Chapter.id).where(Chapter.part_id == part_id).order_by(Chapter.chapter_number)
+        )
+        return list(result.scalars().all())
+
+    async def _chapter_draft(self, session: AsyncSession, part_id: uuid.UUID) -> dict | None:
+        session.expire_all()
+        part = await get_part_by_id(session, part_id)
+        if not part or part.status != "CHAPTERS_PENDING_VALIDATION":
+            return None
+        return await get_part_chapter_draft(session, part_id)
+
+    async def _content_node(self, chapter_id: uuid.UUID) -> str:
+        async with AsyncSessionFactory() as session:
+            result = await session.execute(
+                select(Chapter.content.is_not(None)).where(Chapter.id == chapter_id)
+            )
+            if result.scalar_one_or_none():
+                return NODE_DONE
+            success = await run_chapter_generation_crew(session, chapter_id)
+        return NODE_DONE if success else NODE_FAILED
+
+    async def _transitions_node(self, key: str, part_id: uuid.UUID) -> str:
+        if self._previously_done(key):
+            return NODE_DONE
+        async with AsyncSessionFactory() as session:
+            success = await run_batch_transition_analysis_crew(session, part_id=part_id)
+        return NODE_DONE if success else NODE_FAILED
+
+    async def _finalize_node(self, key: str, task_type: str) -> str:
+        if self._previously_done(key):
+            return NODE_DONE
+        async with AsyncSessionFactory() as session:
+            result = await session.execute(
+                select(func.count(Chapter.id))
+                .join(Part, Chapter.part_id == Part.id)
+                .where(
+                    Part.project_id == self.project_id,
+                    Part.finalization == task_type.lower(),
+                    Chapter.content.is_not(None),
+                )
+            )
+            if result.scalar_one():
+                return NODE_DONE
+            success = await run_finalization_crew(session, self.project_id, task_type)
+        return NODE_DONE if success else NODE_FAILED
+
+
+# --- Run management ---
+
+async def get_pipeline_run(session: AsyncSession, run_id: uuid.UUID) -> PipelineRun | None:
+    result = await session.execute(select(PipelineRun).where(PipelineRun.id == run_id))
+    return result.scalars().first()
+
+
+async def get_active_pipeline_run(session: AsyncSession, project_id: uuid.UUID) -> PipelineRun | None:
+    """Returns the project's queued or running autopilot run, if any."""
+    result = await session.execute(
+        select(PipelineRun)
+        .where(PipelineRun.project_id == project_id, PipelineRun.status.in_(ACTIVE_RUN_STATUSES))
+        .order_by(PipelineRun.created_at.desc())
+    )
+    return result.scalars().first()
+
+
+async def create_pipeline_run(
+    session: AsyncSession, project_id: uuid.UUID, request: AutopilotRequest, commit: bool = True
+) -> PipelineRun:
+    """Creates a queued run. With commit=False it is only flushed, to be committed with its job."""
+    pipeline_run = PipelineRun(
+        project_id=project_id,
+        status=RUN_QUEUED,
+        config=request.model_dump(),
+        node_states={},
+    )
+    session.add(pipeline_run)
+    if commit:
+        await session.commit()
+    else:
+        await session.flush()
+    logger.info(f"Autopilot run {pipeline_run.id} created for project {project_id}.")
+    return pipeline_run
+
+
+async def mark_pipeline_run_queued(session: AsyncSession, pipeline_run: PipelineRun, job_id: str) -> PipelineRun:
+    pipeline_run.status = RUN_QUEUED
+    pipeline_run.job_id = job_id
+    await session.commit()
+    return pipeline_run
+
+
+async def run_project_autopilot(run_id: uuid.UUID) -> str:
+    """Executes (or resumes) an autopilot run and returns its final status."""
+    async with AsyncSessionFactory() as session:
+        pipeline_run = await get_pipeline_run(session, run_id)
+        if not pipeline_run:
+            logger.error(f"❌ Autopilot run {run_id} not found.")
+            return RUN_FAILED
+        project_exists = await session.scalar(
+            select(func.count()).select_from(Project).where(Project.id == pipeline_run.project_id)
+        )
+        if not project_exists:
+            logger.error(f"❌ Autopilot run {run_id} failed: project {pipeline_run.project_id} not found.")
+            return RUN_FAILED
+
+    logger.info(f"🚀 Autopilot run {run_id} starting for project {pipeline_run.project_id}.")
+    status = await ProjectAutopilot(pipeline_run).execute()
+    logger.info(f"✅ Autopilot run {run_id} finished with status {status}.")
+    return status
@@ -0,0 +1,138 @@
+# src/crew/cancellation.py
+"""
+Cancellation of queued and running crew jobs.
+
+Enqueue endpoints record the entity each job works on (`track_job`), so that:
+  - `cancel_job` (DELETE /crew/jobs/{job_id}) aborts a job through the queue
+    backend, marks its entity with a cancelled status and discards the
+    job's checkpoints, logging the usage they hold;
+  - an edit that makes a job's output obsolete (new chapter content, a new
+    chapter structure) aborts the jobs still working on the old version,
+    leaving the edited entity's status alone (`cancel_superseded_jobs`).
+
+A running job is cancelled inside its pending agent call, which logs the
+estimated usage of the interrupted call (see _execute_model_run).
+"""
+import logging
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from src.core.task_queue import task_queue, LIVE_JOB_STATUSES, QueuedJob
+from src.project.models import Chapter, Part, Project
+from .autopilot import RUN_CANCELLED
+from .checkpoints import discard_job_checkpoints
+from .models import JobSubject, PipelineRun
+
+logger = logging.getLogger(__name__)
+
+# Entity status set when a job of the function is cancelled. Jobs of other
+# functions (batches, exports, finalization) leave their entity unchanged.
+CANCELLED_STATUSES = {
+    "part_generation_worker": (Project, "PART_GENERATION_CANCELLED"),
+    "chapter_detailing_worker": (Part, "CHAPTER_DETAILING_CANCELLED"),
+    "chapter_generation_worker": (Chapter, "CONTENT_GEN_CANCELLED"),
+    "transition_analysis_worker": (Chapter, "TRANSITION_ANALYSIS_CANCELLED"),
+    "autopilot_worker": (PipelineRun, RUN_CANCELLED),
+}
+# Queued jobs expire after a day, so older rows are purged
+JOB_SUBJECT_TTL = timedelta(days=1)
+
+
+async def chapter_project_id(session: AsyncSession, chapter_id: uuid.UUID) -> uuid.UUID | None:
+    return await session.scalar(
+        select(Part.project_id).join(Chapter, Chapter.part_id == Part.id).where(Chapter.id == chapter_id)
+    )
+
+
+async def track_job(
+    session: AsyncSession, job: QueuedJob, function_name: str, project_id: uuid.UUID, subject_id: uuid.UUID
+) -> None:
+    """Records the entity a just-enqueued job works on."""
+    await session.execute(delete(JobSubject).where(JobSubject.created_at < datetime.utcnow() - JOB_SUBJECT_TTL))
+    session.add(JobSubject(
+        job_id=job.job_id, function_name=function_name, project_id=project_id, subject_id=subject_id
+    ))
+    await session.commit()
+
+
+async def cancel_job(session: AsyncSession, job_id: str) -> bool:
+    """
+    Aborts a queued or running job and marks its entity as cancelled.
+    Returns False if the job is unknown or already complete.
+    """
+    if not await task_queue.abort(job_id):
+        return False
+    subject = await session.get(JobSubject, job_id)
+    if subject is not None:
+        cancelled = CANCELLED_STATUSES.get(subject.function_name)
+        if cancelled:
+            model, cancelled_status = cancelled
+            await session.execute(update(model).where(model.id == subject.subject_id).values(status=cancelled_status))
+        await discard_job_checkpoints(session, job_id, subject.project_id)
+        await session.delete(subject)
+    await session.commit()
+    logger.info(f"⊘ Job {job_id} cancelled.")
+    return True
+
+
+async def cancel_superseded_jobs(
+    session: AsyncSession, subject_ids: list[uuid.UUID], function_names: tuple[str, ...]
+) -> int:
+    """
+    Aborts the live jobs of `function_names` working on `subject_ids`, whose
+    output an edit has made obsolete. Returns the number of jobs aborted.
+    """
+    if not subject_ids:
+        return 0
+    result = await session.execute(
+        select(JobSubject).where(JobSubject.subject_id.in_(subject_ids), JobSubject.function_name.in_(function_names))
+    )
+    aborted = 0
+    for subject in result.scalars().all():
+        job_info = await task_queue.job_info(subject.job_id)
+        if job_info.status in LIVE_JOB_STATUSES and await task_queue.abort(subject.job_id):
+            await discard_job_checkpoints(session, subject.job_id, subject.project_id)
+            aborted += 1
+            logger.info(f"⊘ Job {subject.job_id} ({subject.function_name}) cancelled: superseded by an edit.")
+        await session.delete(subject)
+    await session.commit()
+    return aborted
+
+
+async def cancel_superseded_chapter_jobs(session: AsyncSession, chapter_id: uuid.UUID) -> int:
+    """
+    New content for a chapter supersedes its pending generation, and the
+    transition analyses that read it: its own and the next chapter's.
+    """
+    chapter = await session.get(Chapter, chapter_id)
+    if chapter is None:
+        return 0
+    next_chapter_id = await session.scalar(
+        select(Chapter.id).where(Chapter.part_id == chapter.part_id, Chapter.chapter_number == chapter.chapter_number + 1)
+    )
+    aborted = await cancel_superseded_jobs(session, [chapter_id], ("chapter_generation_worker",))
+    return aborted + await cancel_superseded_jobs(
+        session, [i for i in (chapter_id, next_chapter_id) if i], ("transition_analysis_worker",)
+    )
+
+
+async def cancel_superseded_part_jobs(
+    session: AsyncSession, part_id: uuid.UUID, chapter_ids: list[uuid.UUID] | None = None
+) -> int:
+    """
+    A new chapter structure supersedes the part's own outline and batch
+    transition jobs, and the pending jobs on the chapters it deletes, edits
+    or moves: `chapter_ids` (by default, every chapter of the part).
+    """
+    if chapter_ids is None:
+        chapter_ids = (await session.scalars(select(Chapter.id).where(Chapter.part_id == part_id))).all()
+    aborted = await cancel_superseded_jobs(
+        session, list(chapter_ids), ("chapter_generation_worker", "transition_analysis_worker")
+    )
+    return aborted + await cancel_superseded_jobs(
+        session, [part_id], ("chapter_detailing_worker", "batch_transition_analysis_worker")
+    )
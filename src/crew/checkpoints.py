@@ -0,0 +1,285 @@
+# src/crew/checkpoints.py
+"""
+Crash-safe checkpoints for crew jobs.
+
+The run_*_crew functions save the output and token usage of every LLM call
+here as soon as it returns, in its own short transaction. If the worker is
+killed before the output is applied, the next attempt of the job finds the
+checkpoint and continues from it instead of calling the model again. The
+checkpoint is deleted in the same transaction that applies the output.
+
+Each checkpoint also records the queued job that produced it, so a restarting
+worker can re-enqueue jobs that were interrupted and will not be retried by
+the queue itself (see resume_interrupted_jobs). The checkpoints of a
+cancelled job are discarded instead, and their usage logged as partial usage
+of the job (see discard_job_checkpoints). Those of a job that failed for good
+are deleted when it returns (see clears_checkpoints_on_failure).
+"""
+import functools
+import hashlib
+import logging
+import uuid
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Any
+
+from sqlalchemy import delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from src.core.circuit_breaker import calls_refused
+from src.core.config import settings
+from src.core.database import AsyncSessionFactory
+from src.core.task_queue import task_queue, JOB_COMPLETE, LIVE_JOB_STATUSES
+from src.project.models import Project
+from .models import CrewRunLog, JobCheckpoint
+from .pricing import calculate_cost
+
+logger = logging.getLogger(__name__)
+
+# The only step checkpointed so far: an agent's validated output and usage.
+STEP_AGENT_OUTPUT = "agent_output"
+
+
+@dataclass(frozen=True)
+class JobRef:
+    """The arq job currently running in this context, and how to enqueue it again."""
+    job_id: str | None
+    function_name: str
+    args: tuple
+
+
+_current_job: ContextVar[JobRef | None] = ContextVar("current_checkpoint_job", default=None)
+# Keys of the checkpoints read or saved by the crew run in this context
+_run_keys: ContextVar[set[str] | None] = ContextVar("crew_run_checkpoint_keys", default=None)
+
+
+def bind_job(ctx: dict, function_name: str, *args: Any) -> None:
+    """
+    Records the running arq job for the checkpoints saved in this context.
+    Called at the top of each worker function; asyncio tasks spawned by the
+    job (e.g. autopilot steps) inherit it.
+    """
+    _current_job.set(JobRef(job_id=ctx.get("job_id"), function_name=function_name, args=args))
+
+
+def checkpoint_key(task: str, *ids: Any) -> str:
+    return ":".join([task, *(str(i) for i in ids)])
+
+
+def input_fingerprint(agent_input: str) -> str:
+    """Checkpoints are only reused for the exact same agent input."""
+    return hashlib.sha256(agent_input.encode("utf-8")).hexdigest()
+
+
+class RestoredRunResult:
+    """
+    Stands in for the RunResult of a checkpointed agent call. Exposes the
+    attributes the crew functions read: final_output_as() and the usage and
+    model of raw_responses[0].
+    """
+
+    def __init__(self, payload: dict):
+        self.final_output = payload["output"]
+        usage = payload.get("usage")
+        if usage:
+            prompt_tokens, completion_tokens, model_name = usage
+            self.raw_responses = [SimpleNamespace(
+                usage=SimpleNamespace(
+                    input_tokens=prompt_tokens,
+                    output_tokens=completion_tokens,
+                    total_tokens=prompt_tokens + completion_tokens,
+                ),
+                model=model_name,
+            )]
+        else:
+            self.raw_responses = []
+
+    def final_output_as(self, output_type: type) -> Any:
+        return output_type.model_validate(self.final_output)
+
+
+async def load_agent_output(job_key: str, agent_input: str) -> RestoredRunResult | None:
+    """Returns the checkpointed agent output for this unit of work, if it matches the input."""
+    _track_key(job_key)
+    try:
+        async with AsyncSessionFactory() as session:
+            result = await session.execute(select(JobCheckpoint).where(JobCheckpoint.job_key == job_key))
+            checkpoint = result.scalars().first()
+    except Exception as e:
+        logger.warning(f"⚠️ Could not read checkpoint '{job_key}': {e}")
+        return None
+
+    if not checkpoint or checkpoint.step != STEP_AGENT_OUTPUT:
+        return None
+    if checkpoint.payload.get("input_hash") != input_fingerprint(agent_input):
+        logger.info(f"Ignoring checkpoint '{job_key}': the agent input has changed since it was saved.")
+        return None
+    logger.info(f"♻️ Resuming '{job_key}' from checkpoint saved at {checkpoint.updated_at}.")
+    return RestoredRunResult(checkpoint.payload)
+
+
+async def save_agent_output(
+    job_key: str, agent_input: str, output: Any, usage: tuple[int, int, str] | None
+) -> None:
+    """
+    Persists an agent's validated output and usage in its own transaction.
+    A failure to checkpoint is logged and never fails the job itself.
+    """
+    payload = {
+        "input_hash": input_fingerprint(agent_input),
+        "output": output.model_dump(mode="json"),
+        "usage": list(usage) if usage else None,
+    }
+    job = _current_job.get()
+    _track_key(job_key)
+    try:
+        async with AsyncSessionFactory() as session:
+            result = await session.execute(select(JobCheckpoint).where(JobCheckpoint.job_key == job_key))
+            checkpoint = result.scalars().first() or JobCheckpoint(job_key=job_key)
+            checkpoint.step = STEP_AGENT_OUTPUT
+            checkpoint.payload = payload
+            checkpoint.job_id = job.job_id if job else None
+            checkpoint.function_name = job.function_name if job else None
+            checkpoint.job_args = [str(arg) if isinstance(arg, uuid.UUID) else arg for arg in job.args] if job else None
+            checkpoint.updated_at = datetime.utcnow()
+            session.add(checkpoint)
+            await session.commit()
+        logger.debug(f"Checkpoint '{job_key}' saved.")
+    except Exception as e:
+        logger.warning(f"⚠️ Could not save checkpoint '{job_key}': {e}")
+
+
+async def clear_checkpoints(session: AsyncSession, *job_keys: str) -> None:
+    """
+    Deletes checkpoints in the caller's transaction, so that they disappear
+    exactly when the output they hold is committed.
+    """
+    if job_keys:
+        await session.execute(delete(JobCheckpoint).where(JobCheckpoint.job_key.in_(job_keys)))
+
+
+def _track_key(job_key: str) -> None:
+    keys = _run_keys.get()
+    if keys is not None:
+        keys.add(job_key)
+
+
+def clears_checkpoints_on_failure(crew_function):
+    """
+    Decorator for the run_*_crew functions. When one returns False the job
+    fails for good (worker functions report the failure, the queue does not
+    retry it), so the checkpoints the run read or saved are deleted in their
+    own transaction; left behind, they would have the job resumed once the
+    queue forgets it. They are kept if the run was refused by an open circuit
+    (the job is deferred and retried) or interrupted by an exception, e.g.
+    the job was cancelled or timed out.
+    """
+    @functools.wraps(crew_function)
+    async def run(*args, **kwargs) -> bool:
+        keys: set[str] = set()
+        token = _run_keys.set(keys)
+        try:
+            succeeded = await crew_function(*args, **kwargs)
+        finally:
+            _run_keys.reset(token)
+        if not succeeded and keys and not calls_refused():
+            try:
+                async with AsyncSessionFactory() as session:
+                    await clear_checkpoints(session, *keys)
+                    await session.commit()
+                logger.info(f"Cleared {len(keys)} checkpoints of failed run {crew_function.__name__}.")
+            except Exception as e:
+                logger.warning(f"⚠️ Could not clear the checkpoints of failed run {crew_function.__name__}: {e}")
+        return succeeded
+    return run
+
+
+async def discard_job_checkpoints(session: AsyncSession, job_id: str, project_id: uuid.UUID) -> int:
+    """
+    Deletes the checkpoints of a cancelled job. Their outputs will never be
+    applied, but the calls were paid for: their usage is logged against the
+    project (as failed runs) in the same transaction. Returns the number of
+    checkpoints discarded.
+    """
+    result = await session.execute(select(JobCheckpoint).where(JobCheckpoint.job_id == job_id))
+    checkpoints = result.scalars().all()
+    for checkpoint in checkpoints:
+        usage = checkpoint.payload.get("usage")
+        if usage:
+            prompt_tokens, completion_tokens, model_name = usage
+            run_cost = calculate_cost(model_name, prompt_tokens, completion_tokens)
+            session.add(CrewRunLog(
+                project_id=project_id, initiating_task_name=f"Cancelled: {checkpoint.job_key}",
+                model_name=model_name, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                total_tokens=prompt_tokens + completion_tokens, total_cost=run_cost, succeeded=False,
+            ))
+            await session.execute(
+                update(Project).where(Project.id == project_id).values(total_cost=Project.total_cost + run_cost)
+            )
+        await session.delete(checkpoint)
+    if checkpoints:
+        logger.info(f"Discarded {len(checkpoints)} checkpoints of cancelled job {job_id}.")
+    return len(checkpoints)
+
+
+def _decode_job_arg(value: Any) -> Any:
+    # Job arguments are stored as JSON with ids as strings; ids are turned back into UUIDs.
+    if not isinstance(value, str):
+        return value
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        return value
+
+
+async def resume_interrupted_jobs(ctx: dict) -> None:
+    """
+    Worker startup hook. Re-enqueues the jobs that left checkpoints behind and
+    are no longer queued or running, e.g. after a rolling deploy killed
+    the worker mid-job. Checkpoints older than CHECKPOINT_TTL_HOURS are
+    discarded instead.
+    """
+    cutoff = datetime.utcnow() - timedelta(hours=settings.CHECKPOINT_TTL_HOURS)
+    try:
+        async with AsyncSessionFactory() as session:
+            expired = await session.execute(delete(JobCheckpoint).where(JobCheckpoint.updated_at < cutoff))
+            if expired.rowcount:
+                logger.info(f"Discarded {expired.rowcount} expired job checkpoints.")
+            await session.commit()
+            result = await session.execute(
+                select(JobCheckpoint).where(JobCheckpoint.function_name.is_not(None))
+            )
+            checkpoints = result.scalars().all()
+    except Exception as e:
+        logger.error(f"❌ Could not scan job checkpoints on startup: {e}")
+        return
+
+    # Several checkpoints can belong to one job (e.g. a batch or autopilot run).
+    jobs: dict[str, JobCheckpoint] = {}
+    for checkpoint in checkpoints:
+        jobs.setdefault(checkpoint.job_id or checkpoint.job_key, checkpoint)
+
+    resumed = 0
+    for job_id, checkpoint in jobs.items():
+        if checkpoint.job_id:
+            job_info = await task_queue.job_info(checkpoint.job_id)
+            if job_info.status in LIVE_JOB_STATUSES:
+                continue  # the queue will run or retry it itself
+            if job_info.cancelled:
+                continue  # cancel_job discards its checkpoints
+            # Worker functions catch their own errors, so a job the queue records
+            # as successful finished normally; only cancelled, timed-out or
+            # out-of-retries jobs are resumed.
+            if job_info.status == JOB_COMPLETE and job_info.success:
+                continue
+        args = [_decode_job_arg(arg) for arg in checkpoint.job_args or []]
+        # A deterministic id keeps several restarting workers from resuming the same job twice.
+        job = await task_queue.enqueue(checkpoint.function_name, *args, _job_id=f"resume-{job_id}")
+        if job:
+            resumed += 1
+            logger.info(f"♻️ Re-enqueued interrupted job {job_id} ({checkpoint.function_name}) as {job.job_id}.")
+    if resumed:
+        logger.info(f"✅ Resumed {resumed} interrupted jobs from checkpoints.")
@@ -0,0 +1,202 @@
+# src/crew/cost_estimate.py
+"""
+Token cost estimates of the generation endpoints, charged by TokenBudget.
+
+A call is estimated as the larger of the phase's average prompt and the
+entity's own text (characters / TOKEN_ESTIMATE_CHARS_PER_TOKEN), plus the
+phase's average completion. Averages are computed from the successful calls
+in crew_run_logs over TOKEN_ESTIMATE_WINDOW_HOURS and cached. Endpoints that
+queue several calls (a batch over a part or a book) are charged for each.
+
+Estimators read the request's path parameters; an unknown entity is charged
+nothing, the endpoint answers 404 anyway.
+"""
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from fastapi import Request
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from src.core.config import settings
+from src.project.models import Chapter, Part, Project
+from .models import CrewRunLog
+from .routing import (
+    PHASE_CHAPTER_DETAILING, PHASE_CHAPTER_GENERATION, PHASE_FINALIZATION,
+    PHASE_PART_GENERATION, PHASE_SECTION_SMOOTHING, PHASE_TRANSITION_ANALYSIS,
+)
+from .service import TRANSITION_SNIPPET_LENGTH
+
+# Averages are refreshed at most this often (seconds)
+AVERAGES_TTL = 300
+
+
+@dataclass(frozen=True)
+class PhaseTokens:
+    prompt_tokens: float
+    completion_tokens: float
+
+
+@dataclass(frozen=True)
+class TokenAverages:
+    phases: dict[str, PhaseTokens]
+    # Average tokens spent on a project, for whole-book runs
+    book_tokens: float | None
+
+
+# (monotonic time fetched, averages)
+_averages_cache: tuple[float, TokenAverages] | None = None
+
+
+async def get_token_averages(session: AsyncSession) -> TokenAverages:
+    global _averages_cache
+    if _averages_cache and time.monotonic() - _averages_cache[0] < AVERAGES_TTL:
+        return _averages_cache[1]
+
+    since = datetime.utcnow() - timedelta(hours=settings.TOKEN_ESTIMATE_WINDOW_HOURS)
+    recent = (CrewRunLog.created_at >= since, CrewRunLog.succeeded)
+    rows = (await session.execute(
+        select(
+            CrewRunLog.phase,
+            func.avg(CrewRunLog.prompt_tokens).label("prompt_tokens"),
+            func.avg(CrewRunLog.completion_tokens).label("completion_tokens"),
+        )
+        .where(*recent, CrewRunLog.phase.is_not(None))
+        .group_by(CrewRunLog.phase)
+    )).all()
+    per_project = (
+        select(func.sum(CrewRunLog.total_tokens).label("tokens"))
+        .where(*recent)
+        .group_by(CrewRunLog.project_id)
+        .subquery()
+    )
+    book_tokens = await session.scalar(select(func.avg(per_project.c.tokens)))
+
+    averages = TokenAverages(
+        phases={
+            row.phase: PhaseTokens(float(row.prompt_tokens), float(row.completion_tokens))
+            for row in rows
+        },
+        book_tokens=float(book_tokens) if book_tokens is not None else None,
+    )
+    _averages_cache = (time.monotonic(), averages)
+    return averages
+
+
+def call_tokens(averages: TokenAverages, phase: str, input_chars: int = 0) -> int:
+    """Estimated tokens of one call of `phase` whose prompt includes `input_chars` characters of content."""
+    phase_tokens = averages.phases.get(phase) or PhaseTokens(
+        settings.TOKEN_ESTIMATE_PROMPT_TOKENS, settings.TOKEN_ESTIMATE_COMPLETION_TOKENS
+    )
+    prompt = max(phase_tokens.prompt_tokens, input_chars / settings.TOKEN_ESTIMATE_CHARS_PER_TOKEN)
+    return int(prompt + phase_tokens.completion_tokens)
+
+
+def _path_id(request: Request, name: str) -> uuid.UUID | None:
+    try:
+        return uuid.UUID(str(request.path_params[name]))
+    except (KeyError, ValueError):
+        return None
+
+
+async def estimate_part_generation(request: Request, session: AsyncSession) -> int:
+    project_id = _path_id(request, "project_id")
+    blueprint_chars = await session.scalar(
+        select(func.length(Project.raw_blueprint)).where(Project.id == project_id)
+    )
+    if blueprint_chars is None:
+        return 0
+    return call_tokens(await get_token_averages(session), PHASE_PART_GENERATION, blueprint_chars)
+
+
+async def estimate_chapter_detailing(request: Request, session: AsyncSession) -> int:
+    part_id = _path_id(request, "part_id")
+    summary_chars = await session.scalar(
+        select(func.coalesce(func.length(Part.summary), 0)).where(Part.id == part_id)
+    )
+    if summary_chars is None:
+        return 0
+    return call_tokens(await get_token_averages(session), PHASE_CHAPTER_DETAILING, summary_chars)
+
+
+async def estimate_project_chapter_detailing(request: Request, session: AsyncSession) -> int:
+    parts = await session.scalar(
+        select(func.count()).select_from(Part).where(
+            Part.project_id == _path_id(request, "project_id"), Part.status != "CHAPTERS_VALIDATED"
+        )
+    )
+    return parts * call_tokens(await get_token_averages(session), PHASE_CHAPTER_DETAILING)
+
+
+async def estimate_chapter_generation(request: Request, session: AsyncSession) -> int:
+    if not await session.scalar(select(Chapter.id).where(Chapter.id == _path_id(request, "chapter_id"))):
+        return 0
+    averages = await get_token_averages(session)
+    sectioned = request.query_params.get("sectioned")
+    if sectioned is None:
+        sectioned = settings.CHAPTER_SECTION_PARALLEL
+    else:
+        sectioned = sectioned.lower() in ("1", "true", "yes", "on")
+    if not sectioned:
+        return call_tokens(averages, PHASE_CHAPTER_GENERATION)
+    # Up to CHAPTER_SECTION_MAX section calls, and a bridging call between each two sections
+    sections = settings.CHAPTER_SECTION_MAX
+    return sections * call_tokens(averages, PHASE_CHAPTER_GENERATION) + (sections - 1) * call_tokens(
+        averages, PHASE_SECTION_SMOOTHING
+    )
+
+
+async def _transition_tokens(session: AsyncSession, transitions: int) -> int:
+    # Each call reads the end of one chapter and the start of the next
+    return max(transitions, 0) * call_tokens(
+        await get_token_averages(session), PHASE_TRANSITION_ANALYSIS, 2 * TRANSITION_SNIPPET_LENGTH
+    )
+
+
+async def estimate_transition_analysis(request: Request, session: AsyncSession) -> int:
+    if not await session.scalar(select(Chapter.id).where(Chapter.id == _path_id(request, "chapter_id"))):
+        return 0
+    return await _transition_tokens(session, 1)
+
+
+async def estimate_part_transition_analysis(request: Request, session: AsyncSession) -> int:
+    chapters = await session.scalar(
+        select(func.count()).select_from(Chapter).where(Chapter.part_id == _path_id(request, "part_id"))
+    )
+    return await _transition_tokens(session, chapters - 1)
+
+
+async def estimate_project_transition_analysis(request: Request, session: AsyncSession) -> int:
+    project_id = _path_id(request, "project_id")
+    chapters = await session.scalar(
+        select(func.count()).select_from(Chapter).join(Part, Chapter.part_id == Part.id)
+        .where(Part.project_id == project_id)
+    )
+    parts = await session.scalar(select(func.count()).select_from(Part).where(Part.project_id == project_id))
+    # Transitions are analyzed within each part
+    return await _transition_tokens(session, chapters - parts)
+
+
+async def estimate_finalization(request: Request, session: AsyncSession) -> int:
+    """The whole book is in the prompt."""
+    project_id = _path_id(request, "project_id")
+    content_chars = await session.scalar(
+        select(func.coalesce(func.sum(func.length(Chapter.content)), 0))
+        .join(Part, Chapter.part_id == Part.id)
+        .where(Part.project_id == project_id)
+    )
+    summary_chars = await session.scalar(
+        select(func.coalesce(func.sum(func.length(Part.summary)), 0)).where(Part.project_id == project_id)
+    )
+    return call_tokens(await get_token_averages(session), PHASE_FINALIZATION, content_chars + summary_chars)
+
+
+async def estimate_autopilot(request: Request, session: AsyncSession) -> int:
+    """A whole book: the average tokens spent per project, or TOKEN_ESTIMATE_BOOK_TOKENS without history."""
+    if not await session.scalar(select(Project.id).where(Project.id == _path_id(request, "project_id"))):
+        return 0
+    book_tokens = (await get_token_averages(session)).book_tokens
+    return int(book_tokens) if book_tokens is not None else settings.TOKEN_ESTIMATE_BOOK_TOKENS
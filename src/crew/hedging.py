@@ -0,0 +1,230 @@
+# src/crew/hedging.py
+"""
+Request hedging: cuts the latency tail of agent calls.
+
+A call of an agent listed in HEDGING_AGENTS that has not answered after the
+HEDGING_LATENCY_PERCENTILE of its recent latencies is sent a second time.
+The first answer wins and the other call is cancelled. Both are logged in
+crew_run_logs. The answer is logged as usual, labelled with the call that
+produced it. A cancelled call is logged with its estimated prompt usage,
+labelled "lost"; that is the extra spend of hedging.
+
+Hedging pauses while the lost calls of the window cost more than
+HEDGING_MAX_EXTRA_COST_RATIO of the hedged agents' spend.
+HEDGING_HOLDBACK_FRACTION of their calls are never hedged, so that
+hedging_report() can compare p99 latencies with and without hedging.
+"""
+import asyncio
+import logging
+import math
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import case, func
+from sqlalchemy.future import select
+
+from src.core.config import settings
+from src.core.database import AsyncSessionFactory
+from .models import CrewRunLog
+
+logger = logging.getLogger(__name__)
+
+# --- CrewRunLog.hedge labels ---
+# A call of a hedged agent run without hedging, as the baseline
+HEDGE_HOLDBACK = "holdback"
+# The answer came from the first call (whether or not a duplicate was sent)
+HEDGE_PRIMARY = "primary"
+# The answer came from the duplicate
+HEDGE_DUPLICATE = "duplicate"
+# The call cancelled because the other one answered first
+HEDGE_LOST = "lost"
+
+
+@dataclass(frozen=True)
+class HedgePlan:
+    # CrewRunLog.hedge of the call; None when the agent is not hedged
+    label: str | None
+    # Seconds to wait before sending the duplicate; None sends no duplicate
+    delay_s: float | None
+
+
+def percentile(values: list[float], pct: float) -> float | None:
+    """Nearest-rank percentile of `values`; None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(math.ceil(pct / 100 * len(ordered)), 1) - 1]
+
+
+def _window_start() -> datetime:
+    return datetime.utcnow() - timedelta(hours=settings.MODEL_ROUTING_WINDOW_HOURS)
+
+
+# (agent, phase, model) -> (monotonic time fetched, delay in seconds or None)
+_delay_cache: dict[tuple[str, str, str], tuple[float, float | None]] = {}
+# (monotonic time fetched, extra cost ratio)
+_extra_cost_cache: tuple[float, float] | None = None
+
+
+async def get_hedge_delay(agent_name: str, phase: str, model_name: str) -> float | None:
+    """
+    The HEDGING_LATENCY_PERCENTILE of the successful calls of this agent,
+    phase and model over MODEL_ROUTING_WINDOW_HOURS, in seconds, cached for
+    MODEL_ROUTING_STATS_TTL seconds. None under HEDGING_MIN_SAMPLES calls.
+    """
+    key = (agent_name, phase, model_name)
+    cached = _delay_cache.get(key)
+    if cached and time.monotonic() - cached[0] < settings.MODEL_ROUTING_STATS_TTL:
+        return cached[1]
+
+    stmt = select(CrewRunLog.latency_ms).where(
+        CrewRunLog.agent_name == agent_name,
+        CrewRunLog.phase == phase,
+        CrewRunLog.model_name == model_name,
+        CrewRunLog.created_at >= _window_start(),
+        CrewRunLog.succeeded,
+        CrewRunLog.latency_ms.is_not(None),
+    )
+    async with AsyncSessionFactory() as session:
+        latencies = (await session.scalars(stmt)).all()
+
+    delay = None
+    if len(latencies) >= settings.HEDGING_MIN_SAMPLES:
+        delay = percentile(latencies, settings.HEDGING_LATENCY_PERCENTILE) / 1000
+    _delay_cache[key] = (time.monotonic(), delay)
+    return delay
+
+
+async def get_extra_cost_ratio() -> float:
+    """Cost of the lost calls over the window, relative to all calls of hedged agents."""
+    global _extra_cost_cache
+    if _extra_cost_cache and time.monotonic() - _extra_cost_cache[0] < settings.MODEL_ROUTING_STATS_TTL:
+        return _extra_cost_cache[1]
+
+    stmt = select(
+        func.coalesce(func.sum(case((CrewRunLog.hedge == HEDGE_LOST, CrewRunLog.total_cost))), 0),
+        func.coalesce(func.sum(CrewRunLog.total_cost), 0),
+    ).where(CrewRunLog.hedge.is_not(None), CrewRunLog.created_at >= _window_start())
+    async with AsyncSessionFactory() as session:
+        extra_cost, total_cost = (await session.execute(stmt)).one()
+
+    ratio = float(extra_cost) / float(total_cost) if total_cost else 0.0
+    _extra_cost_cache = (time.monotonic(), ratio)
+    return ratio
+
+
+async def plan_hedge(agent_name: str, phase: str, model_name: str) -> HedgePlan:
+    """Decides whether (and after how long) a call of this agent gets a duplicate."""
+    if agent_name not in settings.HEDGING_AGENTS:
+        return HedgePlan(label=None, delay_s=None)
+    if random.random() < settings.HEDGING_HOLDBACK_FRACTION:
+        return HedgePlan(label=HEDGE_HOLDBACK, delay_s=None)
+    try:
+        delay_s = await get_hedge_delay(agent_name, phase, model_name)
+        if delay_s is not None and await get_extra_cost_ratio() > settings.HEDGING_MAX_EXTRA_COST_RATIO:
+            logger.debug(f"Hedging paused: extra cost is over {settings.HEDGING_MAX_EXTRA_COST_RATIO:.0%} of spend.")
+            delay_s = None
+    except Exception as e:
+        logger.warning(f"⚠️ Could not plan hedging for {agent_name} ({phase}), not hedging: {e}")
+        delay_s = None
+    return HedgePlan(label=HEDGE_PRIMARY, delay_s=delay_s)
+
+
+async def hedged_call(
+    call: Callable[[], Awaitable[Any]],
+    delay_s: float,
+    on_failed: Callable[[BaseException, int], Awaitable[None]],
+    on_lost: Callable[[], Awaitable[None]],
+) -> tuple[Any, str]:
+    """
+    Awaits `call()`, starting a second `call()` if the first has not returned
+    after `delay_s`. Returns the first successful result and HEDGE_PRIMARY or
+    HEDGE_DUPLICATE. The slower call is cancelled and reported to `on_lost`;
+    a call that fails while the other is still running is reported to
+    `on_failed` with its latency in ms. When both fail, the last error is
+    raised. If the caller is cancelled, so are both calls, and the duplicate
+    is reported to `on_lost` (the caller accounts for the first).
+    """
+    started = time.perf_counter()
+    primary = asyncio.ensure_future(call())
+    calls = {primary: HEDGE_PRIMARY}
+    caller_cancelled = False
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay_s)
+        if not done:
+            logger.info(f"🪁 No answer after {delay_s:.1f}s, sending a hedged duplicate call.")
+            duplicate_started = time.perf_counter()
+            calls[asyncio.ensure_future(call())] = HEDGE_DUPLICATE
+        pending = set(calls)
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            answered = [task for task in done if task.exception() is None]
+            if answered:
+                return answered[0].result(), calls[answered[0]]
+            failed = list(done)
+            # The last failure is raised, and accounted for by the caller
+            last = failed.pop() if not pending else None
+            for task in failed:
+                task_started = started if calls[task] == HEDGE_PRIMARY else duplicate_started
+                await on_failed(task.exception(), int((time.perf_counter() - task_started) * 1000))
+            if last is not None:
+                raise last.exception()
+    except asyncio.CancelledError:
+        caller_cancelled = True
+        raise
+    finally:
+        running = [task for task in calls if not task.done()]
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        for task in running:
+            if not (caller_cancelled and calls[task] == HEDGE_PRIMARY):
+                await asyncio.shield(on_lost())
+
+
+async def hedging_report() -> dict[str, dict[str, Any]]:
+    """
+    Per hedged agent over MODEL_ROUTING_WINDOW_HOURS: p99 latency of hedged
+    calls against the holdback calls, and the extra spend of lost calls.
+    """
+    stmt = select(
+        CrewRunLog.agent_name, CrewRunLog.hedge, CrewRunLog.succeeded,
+        CrewRunLog.latency_ms, CrewRunLog.total_cost,
+    ).where(CrewRunLog.hedge.is_not(None), CrewRunLog.created_at >= _window_start())
+    async with AsyncSessionFactory() as session:
+        rows = (await session.execute(stmt)).all()
+
+    by_agent: dict[str, list[Any]] = {}
+    for row in rows:
+        by_agent.setdefault(row.agent_name, []).append(row)
+
+    report = {}
+    for agent_name, agent_rows in by_agent.items():
+        def latencies(labels: tuple[str, ...]) -> list[int]:
+            return [
+                r.latency_ms for r in agent_rows
+                if r.hedge in labels and r.succeeded and r.latency_ms is not None
+            ]
+
+        hedged = latencies((HEDGE_PRIMARY, HEDGE_DUPLICATE))
+        holdback = latencies((HEDGE_HOLDBACK,))
+        p99_ms, holdback_p99_ms = percentile(hedged, 99), percentile(holdback, 99)
+        extra_cost = sum(float(r.total_cost) for r in agent_rows if r.hedge == HEDGE_LOST)
+        total_cost = sum(float(r.total_cost) for r in agent_rows)
+        report[agent_name] = {
+            "calls": len(hedged),
+            "duplicates_sent": sum(1 for r in agent_rows if r.hedge == HEDGE_LOST),
+            "duplicate_wins": sum(1 for r in agent_rows if r.hedge == HEDGE_DUPLICATE),
+            "p99_ms": p99_ms,
+            "holdback_calls": len(holdback),
+            "holdback_p99_ms": holdback_p99_ms,
+            "p99_improvement_ms": (
+                holdback_p99_ms - p99_ms if p99_ms is not None and holdback_p99_ms is not None else None
+            ),
+            "extra_cost": round(extra_cost, 8),
+            "extra_cost_ratio": round(extra_cost / total_cost, 4) if total_cost else 0.0,
+        }
+    return report
@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, Numeric, DateTime, ForeignKey, UUID
+from sqlalchemy import Column, String, Integer, Numeric, DateTime, ForeignKey, UUID, JSON, Boolean, Index, true
 from src.core.database import Base
 
 
@@ -16,4 +16,73 @@ class CrewRunLog(Base):
     completion_tokens = Column(Integer, nullable=False)
     total_tokens = Column(Integer, nullable=False)
     total_cost = Column(Numeric(10, 8), nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # Routing statistics: which agent ran in which pipeline phase, how long the
+    # call took and whether it succeeded (failed calls are logged with 0 tokens).
+    agent_name = Column(String, nullable=True)
+    phase = Column(String, nullable=True)
+    latency_ms = Column(Integer, nullable=True)
+    succeeded = Column(Boolean, nullable=False, default=True, server_default=true())
+    # Request hedging (see hedging.py): "holdback", "primary" or "duplicate"
+    # for an answered call of a hedged agent, "lost" for a cancelled duplicate
+    hedge = Column(String, nullable=True)
+    # Output repair (see repair.py): "coerced" or "follow_up" for an invalid
+    # structured output that was repaired, "failed" when it could not be
+    repair = Column(String, nullable=True)
+
+    __table_args__ = (
+        Index("crew_run_logs_phase_created_at_idx", "phase", "created_at"),
+    )
+
+
+class PipelineRun(Base):
+    """Persisted state of an autopilot run, so that it can be resumed."""
+    __tablename__ = "pipeline_runs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    # QUEUED, RUNNING, AWAITING_APPROVAL, COMPLETE or FAILED
+    status = Column(String, nullable=False, default="QUEUED")
+    # The AutopilotRequest the run was started with (gates, finalization tasks)
+    config = Column(JSON, nullable=False, default=dict)
+    # Map of DAG node key (e.g. "content:<chapter_id>") to its last known state
+    node_states = Column(JSON, nullable=False, default=dict)
+    job_id = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class JobCheckpoint(Base):
+    """
+    Output of an expensive step (an LLM call) of a crew job, saved as soon as
+    it is produced so that an interrupted job can resume without paying for
+    the call again. Deleted in the same transaction that applies the output.
+    """
+    __tablename__ = "job_checkpoints"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # Identifies the unit of work, e.g. "chapter_generation:<chapter_id>"
+    job_key = Column(String, nullable=False, unique=True)
+    step = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    # The arq job that produced the checkpoint and how to enqueue it again
+    job_id = Column(String, nullable=True)
+    function_name = Column(String, nullable=True)
+    job_args = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, index=True)
+
+
+class JobSubject(Base):
+    """
+    The entity a queued job works on, so the job can be cancelled by id (and
+    its entity marked) or when a later edit makes its output obsolete.
+    """
+    __tablename__ = "job_subjects"
+
+    job_id = Column(String, primary_key=True)
+    function_name = Column(String, nullable=False)
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    # The project, part, chapter or pipeline run the job was queued for
+    subject_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
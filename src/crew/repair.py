@@ -0,0 +1,236 @@
+# src/crew/repair.py
+"""
+Repair of structured agent outputs that fail validation.
+
+An agent run whose output does not validate against its output type (too
+few parts, an empty list, a field of the wrong shape) raises
+ModelBehaviorError, carrying the invalid output (see
+agents._repairable_output_schema). Rather than failing the job, whose retry
+re-runs the whole call, the output is repaired:
+  1. locally (REPAIR_COERCED): the JSON is cut out of any code fence or text
+     around it, a bare list or a list under another key is moved to the
+     output's list field, missing item numbers are filled in, and the
+     result is validated in pydantic's lax mode ("2" is accepted for 2);
+  2. else by a short follow-up call on the same model (REPAIR_FOLLOW_UP)
+     given only the validation errors and the previous output.
+The repaired output is logged with the tokens of every call it took.
+CrewRunLog.repair records how each invalid output was handled, which
+repair_report() aggregates per agent.
+"""
+import json
+import logging
+import re
+import typing
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import case, func
+from sqlalchemy.future import select
+
+from src.core.config import settings
+from src.core.database import AsyncSessionFactory
+from .models import CrewRunLog
+
+logger = logging.getLogger(__name__)
+
+# --- CrewRunLog.repair labels ---
+REPAIR_COERCED = "coerced"
+REPAIR_FOLLOW_UP = "follow_up"
+REPAIR_FAILED = "failed"
+
+
+@dataclass(frozen=True)
+class InvalidOutput:
+    raw: str
+    prompt_tokens: int
+    completion_tokens: int
+
+
+class RepairedRunResult:
+    """
+    Stands in for the RunResult of a repaired output. Its usage is the sum
+    over the calls it took; `repair` is its CrewRunLog.repair label.
+    """
+
+    def __init__(self, final_output: Any, repair: str, usages: list[tuple[int, int]]):
+        self.final_output = final_output
+        self.repair = repair
+        self.raw_responses = [SimpleNamespace(usage=SimpleNamespace(
+            input_tokens=sum(prompt for prompt, _ in usages),
+            output_tokens=sum(completion for _, completion in usages),
+        ))]
+
+    def final_output_as(self, cls: type, raise_if_incorrect_type: bool = False) -> Any:
+        return self.final_output
+
+
+def _responses_usage(responses: list[Any]) -> tuple[int, int] | None:
+    usages = [r.usage for r in responses if getattr(r, "usage", None)]
+    if not usages:
+        return None
+    return sum(u.input_tokens for u in usages), sum(u.output_tokens for u in usages)
+
+
+def invalid_output(error: BaseException, agent_input: str) -> InvalidOutput | None:
+    """
+    The output of a run that failed validation, with the run's usage (or an
+    estimate, when the SDK did not keep the failed response). None if
+    `error` is anything else.
+    """
+    raw = getattr(error, "invalid_output", None)
+    if raw is None:
+        return None
+    run_data = getattr(error, "run_data", None)
+    usage = _responses_usage(run_data.raw_responses) if run_data else None
+    if usage is None:
+        chars_per_token = settings.TOKEN_ESTIMATE_CHARS_PER_TOKEN
+        usage = (len(agent_input) // chars_per_token, len(raw) // chars_per_token)
+    return InvalidOutput(raw, *usage)
+
+
+def _extract_json(raw: str) -> Any:
+    """Parses the JSON in `raw`, ignoring a code fence or text around it. Raises ValueError."""
+    text = raw.strip()
+    fenced = re.search(r"```(?:json)?\s*(.*?)```", text, re.DOTALL)
+    if fenced:
+        text = fenced.group(1).strip()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        raise ValueError("no JSON object or array found")
+    start = min(starts)
+    end = text.rfind("}" if text[start] == "{" else "]")
+    return json.loads(text[start:end + 1])
+
+
+def _list_field(output_type: type[BaseModel]) -> str | None:
+    """The output type's only field, when it is a list (e.g. PartListOutline.parts)."""
+    fields = output_type.model_fields
+    if len(fields) != 1:
+        return None
+    name, field = next(iter(fields.items()))
+    return name if typing.get_origin(field.annotation) is list else None
+
+
+def _number_key(output_type: type[BaseModel], list_field: str) -> str | None:
+    """The numbering field of the list's items (e.g. part_number), if any."""
+    item_type = typing.get_args(output_type.model_fields[list_field].annotation)[0]
+    return next((name for name in getattr(item_type, "model_fields", {}) if name.endswith("_number")), None)
+
+
+def _coerce_shape(data: Any, output_type: type[BaseModel]) -> Any:
+    list_field = _list_field(output_type)
+    if list_field is None:
+        return data
+    if isinstance(data, list):
+        data = {list_field: data}
+    elif isinstance(data, dict) and list_field not in data:
+        lists = [value for value in data.values() if isinstance(value, list)]
+        if len(lists) == 1:
+            data = {list_field: lists[0]}
+
+    items = data.get(list_field) if isinstance(data, dict) else None
+    number_key = _number_key(output_type, list_field)
+    if number_key and isinstance(items, list) and all(isinstance(item, dict) for item in items):
+        def valid_number(value: Any) -> bool:
+            try:
+                return int(value) >= 1
+            except (TypeError, ValueError):
+                return False
+
+        if not all(valid_number(item.get(number_key)) for item in items):
+            data[list_field] = [{**item, number_key: i} for i, item in enumerate(items, start=1)]
+    return data
+
+
+def _format_errors(error: ValidationError) -> str:
+    return "\n".join(
+        f"- {'.'.join(str(part) for part in err['loc']) or 'output'}: {err['msg']}" for err in error.errors()
+    )
+
+
+def coerce_output(raw: str, output_type: type[BaseModel]) -> tuple[BaseModel | None, str]:
+    """
+    Validates `raw` against `output_type` after the local fixes. Returns the
+    output, or None and the validation errors to send back to the model.
+    """
+    try:
+        data = _extract_json(raw)
+    except ValueError as e:
+        return None, f"- output: not valid JSON ({e})"
+    try:
+        return output_type.model_validate(_coerce_shape(data, output_type)), ""
+    except ValidationError as e:
+        return None, _format_errors(e)
+
+
+def repair_prompt(raw: str, errors: str) -> str:
+    return f"Validation errors:\n{errors}\n\nPrevious output:\n{raw}"
+
+
+async def repair_output(
+    invalid: InvalidOutput,
+    output_type: type[BaseModel],
+    follow_up: Callable[[str], Awaitable[Any]],
+) -> RepairedRunResult | None:
+    """
+    Repairs an invalid output locally, else with `follow_up(prompt)` (an
+    agent run returning a RunResult). Returns None if neither worked.
+    """
+    usages = [(invalid.prompt_tokens, invalid.completion_tokens)]
+    output, errors = coerce_output(invalid.raw, output_type)
+    if output is not None:
+        return RepairedRunResult(output, REPAIR_COERCED, usages)
+
+    logger.info(f"🩹 Output failed validation, asking for a repair:\n{errors}")
+    try:
+        result = await follow_up(repair_prompt(invalid.raw, errors))
+        output = result.final_output_as(output_type)
+    except Exception as e:
+        logger.warning(f"⚠️ Output repair failed: {e}")
+        return None
+    follow_up_usage = _responses_usage(getattr(result, "raw_responses", None) or [])
+    if follow_up_usage:
+        usages.append(follow_up_usage)
+    return RepairedRunResult(output, REPAIR_FOLLOW_UP, usages)
+
+
+async def repair_report() -> dict[str, dict[str, Any]]:
+    """Per agent over MODEL_ROUTING_WINDOW_HOURS: calls, invalid outputs and how they were repaired."""
+    since = datetime.utcnow() - timedelta(hours=settings.MODEL_ROUTING_WINDOW_HOURS)
+
+    def count(label: str) -> Any:
+        return func.count(case((CrewRunLog.repair == label, 1)))
+
+    stmt = (
+        select(
+            CrewRunLog.agent_name,
+            func.count().label("calls"),
+            func.count(CrewRunLog.repair).label("invalid_outputs"),
+            count(REPAIR_COERCED).label("coerced"),
+            count(REPAIR_FOLLOW_UP).label("follow_up"),
+            count(REPAIR_FAILED).label("failed"),
+        )
+        .where(CrewRunLog.created_at >= since, CrewRunLog.agent_name.is_not(None))
+        .group_by(CrewRunLog.agent_name)
+        .having(func.count(CrewRunLog.repair) > 0)
+    )
+    async with AsyncSessionFactory() as session:
+        rows = (await session.execute(stmt)).all()
+    return {
+        row.agent_name: {
+            "calls": row.calls,
+            "invalid_outputs": row.invalid_outputs,
+            "coerced": row.coerced,
+            "follow_up": row.follow_up,
+            "failed": row.failed,
+            "repair_rate": round((row.coerced + row.follow_up) / row.invalid_outputs, 4),
+        }
+        for row in rows
+    }
@@ -1,14 +1,19 @@
 # src/crew/router.py
 import uuid
 from typing import List # Import List for the new endpoint's response model
-from fastapi import APIRouter, Depends, status, Body
+from fastapi import APIRouter, Depends, status, Body, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.core.task_queue import task_queue
+from src.core.task_queue import task_queue, JOB_CANCELLED, JOB_COMPLETE, JOB_NOT_FOUND, LIVE_JOB_STATUSES
+from src.core.admission import QueueAdmission, QueueLoad, admit_jobs
 from src.project.dependencies import valid_project_id, valid_part_id
 from src.project.schemas import ProjectRead, PartRead
-from src.crew.schemas import TaskStatus, FinalizationRequest
-from arq.jobs import Job
-from fastapi_limiter.depends import RateLimiter
+from src.core.database import get_db_session
+from src.crew.schemas import TaskStatus, FinalizationRequest, AutopilotRequest, PipelineRunRead
+from src.crew import autopilot, cost_estimate
+from src.crew.cancellation import cancel_job, track_job
+from src.project import service as project_service
+from src.core.rate_limit import RateLimiter, TokenBudget
 
 # NEW IMPORT: Import AGENT_ROSTER from src.crew.agents
 from src.crew.agents import AGENT_ROSTER
@@ -21,17 +26,23 @@ router = APIRouter(prefix="/crew", tags=["Crew AI"])
     status_code=status.HTTP_202_ACCEPTED,
     response_model=TaskStatus,
     summary="Generate High-Level Part Structure",
-    dependencies=[Depends(RateLimiter(times=5, seconds=60))] # NEW: 5 requests per minute
+    dependencies=[
+        Depends(RateLimiter(times=5, seconds=60)), # NEW: 5 requests per minute
+        Depends(TokenBudget(cost_estimate.estimate_part_generation)),
+    ]
 )
 async def queue_part_generation(
     project: ProjectRead = Depends(valid_project_id),
+    session: AsyncSession = Depends(get_db_session),
+    load: QueueLoad = Depends(QueueAdmission("part_generation_worker")),
 ):
     """
     Queues a background job for the Architect AI to generate a high-level
     list of Parts and their summaries from the project's raw blueprint.
     """
     job = await task_queue.enqueue("part_generation_worker", project.id)
-    return TaskStatus(job_id=job.job_id, status="queued")
+    await track_job(session, job, "part_generation_worker", project.id, project.id)
+    return TaskStatus(job_id=job.job_id, status="queued", queue_depth=load.depth, eta_seconds=load.eta_seconds)
 
 # --- NEW: Phase 2 Endpoint ---
 @router.post(
@@ -39,17 +50,103 @@ async def queue_part_generation(
     status_code=status.HTTP_202_ACCEPTED,
     response_model=TaskStatus,
     summary="Generate Detailed Chapter Outline for a Part",
-    dependencies=[Depends(RateLimiter(times=10, seconds=60))] # NEW: 10 requests per minute
+    dependencies=[
+        Depends(RateLimiter(times=10, seconds=60)), # NEW: 10 requests per minute
+        Depends(TokenBudget(cost_estimate.estimate_chapter_detailing)),
+    ]
 )
 async def queue_chapter_detailing(
     part: PartRead = Depends(valid_part_id),
+    session: AsyncSession = Depends(get_db_session),
+    load: QueueLoad = Depends(QueueAdmission("chapter_detailing_worker")),
 ):
     """
     Queues a background job to generate a detailed chapter outline for a
     specific part of the book.
     """
     job = await task_queue.enqueue("chapter_detailing_worker", part.id)
-    return TaskStatus(job_id=job.job_id, status="queued")
+    await track_job(session, job, "chapter_detailing_worker", part.project_id, part.id)
+    return TaskStatus(job_id=job.job_id, status="queued", queue_depth=load.depth, eta_seconds=load.eta_seconds)
+
+@router.post(
+    "/projects/{project_id}/generate-chapters",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=List[TaskStatus],
+    summary="Generate Detailed Chapter Outlines for All Parts",
+    dependencies=[
+        Depends(RateLimiter(times=5, seconds=60)),
+        Depends(TokenBudget(cost_estimate.estimate_project_chapter_detailing)),
+    ]
+)
+async def queue_project_chapter_detailing(
+    project: ProjectRead = Depends(valid_project_id),
+    session: AsyncSession = Depends(get_db_session),
+):
+    """
+    Queues one chapter detailing job per part whose chapters are not yet
+    validated. The jobs run in parallel; each stores its own part's draft.
+    They are admitted into the queue together.
+    """
+    parts = await project_service.get_parts_to_detail(session, project.id)
+    if not parts:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Project has no parts awaiting chapter detailing. Validate the part structure first."
+        )
+    loads = await admit_jobs("chapter_detailing_worker", len(parts))
+    statuses = []
+    for part, load in zip(parts, loads):
+        job = await task_queue.enqueue("chapter_detailing_worker", part.id)
+        await track_job(session, job, "chapter_detailing_worker", project.id, part.id)
+        statuses.append(TaskStatus(job_id=job.job_id, status="queued", queue_depth=load.depth, eta_seconds=load.eta_seconds))
+    return statuses
+
+# Phase 4 (batch): transition analysis for a whole part or a whole book
+@router.post(
+    "/analyze-transitions/part/{part_id}",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=TaskStatus,
+    summary="Analyze All Chapter Transitions of a Part",
+    dependencies=[
+        Depends(RateLimiter(times=10, seconds=60)),
+        Depends(TokenBudget(cost_estimate.estimate_part_transition_analysis)),
+    ]
+)
+async def queue_part_transition_analysis(
+    part: PartRead = Depends(valid_part_id),
+    session: AsyncSession = Depends(get_db_session),
+    load: QueueLoad = Depends(QueueAdmission("batch_transition_analysis_worker")),
+):
+    """
+    Queues a single background job for the Continuity Editor AI to analyze
+    every transition between consecutive chapters of the part.
+    """
+    job = await task_queue.enqueue("batch_transition_analysis_worker", None, part.id)
+    await track_job(session, job, "batch_transition_analysis_worker", part.project_id, part.id)
+    return TaskStatus(job_id=job.job_id, status="queued", queue_depth=load.depth, eta_seconds=load.eta_seconds)
+
+@router.post(
+    "/projects/{project_id}/analyze-transitions",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=TaskStatus,
+    summary="Analyze All Chapter Transitions of a Book",
+    dependencies=[
+        Depends(RateLimiter(times=5, seconds=60)),
+        Depends(TokenBudget(cost_estimate.estimate_project_transition_analysis)),
+    ]
+)
+async def queue_project_transition_analysis(
+    project: ProjectRead = Depends(valid_project_id),
+    session: AsyncSession = Depends(get_db_session),
+    load: QueueLoad = Depends(QueueAdmission("batch_transition_analysis_worker")),
+):
+    """
+    Queues a single background job for the Continuity Editor AI to analyze
+    every chapter transition of every part of the book.
+    """
+    job = await task_queue.enqueue("batch_transition_analysis_worker", project.id)
+    await track_job(session, job, "batch_transition_analysis_worker", project.id, project.id)
+    return TaskStatus(job_id=job.job_id, status="queued", queue_depth=load.depth, eta_seconds=load.eta_seconds)
 
 # NEW: Phase 5 Endpoint
 @router.post(
@@ -57,11 +154,16 @@ async def queue_chapter_detailing(
     status_code=status.HTTP_202_ACCEPTED,
     response_model=TaskStatus,
     summary="Generate Introduction or Conclusion",
-    dependencies=[Depends(RateLimiter(times=2, seconds=300))] # NEW: 2 requests per 5 minutes (finalization is heavy)
+    dependencies=[
+        Depends(RateLimiter(times=2, seconds=300)), # NEW: 2 requests per 5 minutes (finalization is heavy)
+        Depends(TokenBudget(cost_estimate.estimate_finalization)),
+    ]
 )
 async def queue_finalization(
     project: ProjectRead = Depends(valid_project_id),
-    request: FinalizationRequest = Body(...)
+    request: FinalizationRequest = Body(...),
+    session: AsyncSession = Depends(get_db_session),
+    load: QueueLoad = Depends(QueueAdmission("finalization_worker")),
 ):
     """
     Queues a background job for the Theorist AI to write the book's
@@ -72,7 +174,98 @@ async def queue_finalization(
         project.id,
         request.task_type
     )
-    return TaskStatus(job_id=job.job_id, status="queued")
+    await track_job(session, job, "finalization_worker", project.id, project.id)
+    return TaskStatus(job_id=job.job_id, status="queued", queue_depth=load.depth, eta_seconds=load.eta_seconds)
+
+# --- Autopilot Endpoints ---
+async def _ensure_no_live_run(project_id: uuid.UUID, session: AsyncSession) -> None:
+    """Rejects a start/resume while another autopilot job of the project is queued or running."""
+    active_run = await autopilot.get_active_pipeline_run(session, project_id)
+    if active_run is None or active_run.job_id is None:
+        return
+    job_info = await task_queue.job_info(active_run.job_id)
+    if job_info.status in LIVE_JOB_STATUSES:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Autopilot run {active_run.id} is already {job_info.status} for this project."
+        )
+
+def _queued_run(pipeline_run, load: QueueLoad) -> PipelineRunRead:
+    return PipelineRunRead.model_validate(pipeline_run).model_copy(
+        update={"queue_depth": load.depth, "eta_seconds": load.eta_seconds}
+    )
+
+@router.post(
+    "/projects/{project_id}/autopilot",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=PipelineRunRead,
+    summary="Run the Whole Pipeline Automatically",
+    dependencies=[
+        Depends(RateLimiter(times=2, seconds=300)),
+        Depends(TokenBudget(cost_estimate.estimate_autopilot)),
+    ]
+)
+async def start_autopilot(
+    project: ProjectRead = Depends(valid_project_id),
+    request: AutopilotRequest = Body(default_factory=AutopilotRequest),
+    session: AsyncSession = Depends(get_db_session),
+    load: QueueLoad = Depends(QueueAdmission("autopilot_worker")),
+):
+    """
+    Queues a single background job that takes the project from its raw
+    blueprint to a finished book: parts, chapter outlines, chapter content,
+    transition analysis and finalization, running independent steps in
+    parallel. Gated phases pause the run until a person finalizes them.
+    """
+    await _ensure_no_live_run(project.id, session)
+    # A transactional queue commits the run and its job together; otherwise the
+    # run must be committed before a worker can pick the job up.
+    pipeline_run = await autopilot.create_pipeline_run(
+        session, project.id, request, commit=not task_queue.backend.transactional
+    )
+    job = await task_queue.enqueue("autopilot_worker", pipeline_run.id, _session=session)
+    pipeline_run = await autopilot.mark_pipeline_run_queued(session, pipeline_run, job.job_id)
+    await track_job(session, job, "autopilot_worker", pipeline_run.project_id, pipeline_run.id)
+    return _queued_run(pipeline_run, load)
+
+@router.get(
+    "/autopilot/{run_id}",
+    response_model=PipelineRunRead,
+    summary="Get Autopilot Run Progress"
+)
+async def get_autopilot_run(run_id: uuid.UUID, session: AsyncSession = Depends(get_db_session)):
+    """Returns the run's status and the state of every pipeline step."""
+    pipeline_run = await autopilot.get_pipeline_run(session, run_id)
+    if not pipeline_run:
+        raise HTTPException(status_code=404, detail=f"Autopilot run with ID {run_id} not found.")
+    return pipeline_run
+
+@router.post(
+    "/autopilot/{run_id}/resume",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=PipelineRunRead,
+    summary="Resume an Autopilot Run",
+    dependencies=[Depends(RateLimiter(times=5, seconds=60))]
+)
+async def resume_autopilot_run(
+    run_id: uuid.UUID,
+    session: AsyncSession = Depends(get_db_session),
+    load: QueueLoad = Depends(QueueAdmission("autopilot_worker")),
+):
+    """
+    Re-queues a run that is waiting for approval, has failed, or was
+    interrupted. Steps whose output already exists are skipped.
+    """
+    pipeline_run = await autopilot.get_pipeline_run(session, run_id)
+    if not pipeline_run:
+        raise HTTPException(status_code=404, detail=f"Autopilot run with ID {run_id} not found.")
+    if pipeline_run.status == autopilot.RUN_COMPLETE:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Autopilot run {run_id} is already complete.")
+    await _ensure_no_live_run(pipeline_run.project_id, session)
+    job = await task_queue.enqueue("autopilot_worker", pipeline_run.id, _session=session)
+    pipeline_run = await autopilot.mark_pipeline_run_queued(session, pipeline_run, job.job_id)
+    await track_job(session, job, "autopilot_worker", pipeline_run.project_id, pipeline_run.id)
+    return _queued_run(pipeline_run, load)
 
 # backend router
 # The corrected status endpoint
@@ -81,32 +274,23 @@ async def queue_finalization(
 @router.get("/status/{job_id}", response_model=TaskStatus, summary="Get Job Status")
 async def get_job_status(job_id: str):
     """
-    Checks the status of a background job using the direct status() method.
+    Checks the status of a background job in the configured task queue.
     """
-    job = Job(job_id, task_queue.pool)
-    
-    status_string = await job.status()
+    job_info = await task_queue.job_info(job_id)
+
+    status_string = job_info.status
     result_data = None
     error_message = None
 
-    if status_string == 'complete':
-        # Retrieve the job result if completed successfully
-        try:
-            result_data = await job.result()
-        except Exception as e:
-            # If retrieving the result itself fails, log and consider it an error
-            print(f"❌ Error retrieving result for job {job_id}: {e}")
-            error_message = f"Failed to retrieve job result: {str(e)}"
-            status_string = "error_retrieving_result" # Or change to 'failed' if appropriate
-            
-    elif status_string == 'failed':
-        # Retrieve the exception/error message if the job failed
-        try:
-            # arq's job.result() on a failed job will return the exception object or message
-            error_message = str(await job.result())
-        except Exception as e:
-            print(f"❌ Error retrieving error message for job {job_id}: {e}")
-            error_message = f"Failed to retrieve error details: {str(e)}"
+    if job_info.cancelled:
+        status_string = JOB_CANCELLED
+    elif status_string == 'complete':
+        if job_info.success is not False:
+            result_data = job_info.result
+        else:
+            # The job raised (or ran out of retries); its result is the error
+            status_string = 'failed'
+            error_message = str(job_info.result)
     
     # Check for the double-prefix issue mentioned in analysis:
     # If this endpoint path appears as /crew/crew/status in OpenAPI, the base router
@@ -126,6 +310,27 @@ async def get_job_status(job_id: str):
         error=error_message
     )
 
+@router.delete(
+    "/jobs/{job_id}",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=TaskStatus,
+    summary="Cancel a Job",
+    dependencies=[Depends(RateLimiter(times=30, seconds=60))]
+)
+async def cancel_queued_job(job_id: str, session: AsyncSession = Depends(get_db_session)):
+    """
+    Cancels a queued or running job. A queued job will not run; a running job
+    is interrupted in its current model call, whose usage is still logged.
+    The job's chapter, part, project or autopilot run gets a cancelled status.
+    Running jobs stop asynchronously: poll the job's status to see it end.
+    """
+    job_info = await task_queue.job_info(job_id)
+    if job_info.status == JOB_NOT_FOUND:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+    if job_info.status == JOB_COMPLETE or not await cancel_job(session, job_id):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Job {job_id} has already finished.")
+    return TaskStatus(job_id=job_id, status=JOB_CANCELLED)
+
 # NEW ENDPOINT: Get list of available AI agent names
 @router.get(
     "/agents",
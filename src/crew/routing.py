@@ -0,0 +1,173 @@
+# src/crew/routing.py
+"""
+Model routing: decides which model serves an agent call.
+
+Static routes come from AGENT_MODEL_ROUTES and PHASE_MODEL_ROUTES. With
+MODEL_ROUTING_POLICY = "adaptive", calls of a phase (or agent) that has
+MODEL_ROUTING_CANDIDATES are routed to the candidate with the best rolling
+cost / latency / failure score, computed from crew_run_logs. Costs in those
+logs come from calculate_cost, so routing and billing use the same prices.
+"""
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import case, func
+from sqlalchemy.future import select
+
+from src.core.config import settings
+from src.core.database import AsyncSessionFactory
+from .models import CrewRunLog
+
+logger = logging.getLogger(__name__)
+
+# --- Pipeline phases ---
+PHASE_PART_GENERATION = "part_generation"
+PHASE_CHAPTER_DETAILING = "chapter_detailing"
+PHASE_CHAPTER_GENERATION = "chapter_generation"
+PHASE_TRANSITION_ANALYSIS = "transition_analysis"
+PHASE_FINALIZATION = "finalization"
+# Bridging sentences between concurrently drafted chapter sections
+PHASE_SECTION_SMOOTHING = "section_smoothing"
+
+ROUTING_POLICY_STATIC = "static"
+ROUTING_POLICY_ADAPTIVE = "adaptive"
+
+
+@dataclass(frozen=True)
+class ModelStats:
+    calls: int
+    # None when the model has no successful call in the window
+    avg_cost: float | None
+    avg_latency_ms: float | None
+    failure_rate: float
+
+
+class RoutedRunResult:
+    """
+    A RunResult (or a checkpointed stand-in) annotated with how the call was
+    routed. Every other attribute is read from the wrapped result.
+    """
+
+    def __init__(
+        self, result: Any, agent_name: str, phase: str, model_name: str | None, latency_ms: int | None,
+        hedge: str | None = None
+    ):
+        self.result = result
+        self.agent_name = agent_name
+        self.phase = phase
+        self.model_name = model_name
+        self.latency_ms = latency_ms
+        # Which call of a hedged agent answered (see hedging.py)
+        self.hedge = hedge
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.result, name)
+
+
+def resolve_static_model(agent_name: str, phase: str) -> str:
+    return (
+        settings.PHASE_MODEL_ROUTES.get(phase)
+        or settings.AGENT_MODEL_ROUTES.get(agent_name)
+        or settings.DEFAULT_OPENAI_MODEL_NAME
+    )
+
+
+def _routing_candidates(agent_name: str, phase: str) -> list[str]:
+    return settings.MODEL_ROUTING_CANDIDATES.get(phase) or settings.MODEL_ROUTING_CANDIDATES.get(agent_name) or []
+
+
+# phase -> (monotonic time fetched, stats per model)
+_stats_cache: dict[str, tuple[float, dict[str, ModelStats]]] = {}
+
+
+async def get_model_stats(phase: str) -> dict[str, ModelStats]:
+    """
+    Rolling per-model statistics of a phase over MODEL_ROUTING_WINDOW_HOURS,
+    cached for MODEL_ROUTING_STATS_TTL seconds. Calls restored from a
+    checkpoint carry no latency and are left out.
+    """
+    cached = _stats_cache.get(phase)
+    if cached and time.monotonic() - cached[0] < settings.MODEL_ROUTING_STATS_TTL:
+        return cached[1]
+
+    since = datetime.utcnow() - timedelta(hours=settings.MODEL_ROUTING_WINDOW_HOURS)
+    stmt = (
+        select(
+            CrewRunLog.model_name,
+            func.count().label("calls"),
+            func.avg(case((CrewRunLog.succeeded, CrewRunLog.total_cost))).label("avg_cost"),
+            func.avg(case((CrewRunLog.succeeded, CrewRunLog.latency_ms))).label("avg_latency_ms"),
+            func.avg(case((CrewRunLog.succeeded, 0.0), else_=1.0)).label("failure_rate"),
+        )
+        .where(
+            CrewRunLog.phase == phase,
+            CrewRunLog.created_at >= since,
+            CrewRunLog.latency_ms.is_not(None),
+        )
+        .group_by(CrewRunLog.model_name)
+    )
+    async with AsyncSessionFactory() as session:
+        rows = (await session.execute(stmt)).all()
+
+    stats = {
+        row.model_name: ModelStats(
+            calls=row.calls,
+            avg_cost=float(row.avg_cost) if row.avg_cost is not None else None,
+            avg_latency_ms=float(row.avg_latency_ms) if row.avg_latency_ms is not None else None,
+            failure_rate=float(row.failure_rate or 0),
+        )
+        for row in rows
+    }
+    _stats_cache[phase] = (time.monotonic(), stats)
+    return stats
+
+
+def choose_model(candidates: list[str], stats: dict[str, ModelStats]) -> str:
+    """
+    Picks the candidate with the lowest weighted score. Cost and latency are
+    normalized against the worst candidate (a candidate without a successful
+    call counts as the worst), the failure rate is used as is.
+    Candidates with fewer than MODEL_ROUTING_MIN_SAMPLES calls are tried
+    first, so every candidate gets measured; ties keep the configured order.
+    """
+    empty = ModelStats(calls=0, avg_cost=0.0, avg_latency_ms=0.0, failure_rate=0.0)
+    under_sampled = [m for m in candidates if stats.get(m, empty).calls < settings.MODEL_ROUTING_MIN_SAMPLES]
+    if under_sampled:
+        return min(under_sampled, key=lambda m: stats.get(m, empty).calls)
+
+    max_cost = max((stats[m].avg_cost or 0.0 for m in candidates), default=0.0) or 1.0
+    max_latency = max((stats[m].avg_latency_ms or 0.0 for m in candidates), default=0.0) or 1.0
+    weights = settings.MODEL_ROUTING_WEIGHTS
+
+    def score(model: str) -> float:
+        s = stats[model]
+        cost = s.avg_cost / max_cost if s.avg_cost is not None else 1.0
+        latency = s.avg_latency_ms / max_latency if s.avg_latency_ms is not None else 1.0
+        return (
+            weights.get("cost", 0.0) * cost
+            + weights.get("latency", 0.0) * latency
+            + weights.get("failure", 0.0) * s.failure_rate
+        )
+
+    return min(candidates, key=score)
+
+
+async def resolve_model(agent_name: str, phase: str) -> str:
+    """Returns the model that should serve this agent in this phase."""
+    static_model = resolve_static_model(agent_name, phase)
+    if settings.MODEL_ROUTING_POLICY != ROUTING_POLICY_ADAPTIVE:
+        return static_model
+
+    candidates = _routing_candidates(agent_name, phase)
+    if not candidates:
+        return static_model
+    try:
+        model = choose_model(candidates, await get_model_stats(phase))
+    except Exception as e:
+        logger.warning(f"⚠️ Adaptive routing failed for {agent_name} ({phase}), using '{static_model}': {e}")
+        return static_model
+    logger.debug(f"Routing {agent_name} ({phase}) to '{model}'.")
+    return model
@@ -1,5 +1,7 @@
-from pydantic import BaseModel, Field
-from typing import List, Union, Any # Add Any for the result field
+import uuid
+from datetime import datetime
+from pydantic import BaseModel, Field, ConfigDict
+from typing import List, Union, Any, Dict # Add Any for the result field
 import json # Keep if still used by PartListOutline validator, otherwise remove
 from pydantic import field_validator
 
@@ -9,6 +11,9 @@ class TaskStatus(BaseModel):
     status: str
     result: Any | None = Field(None, description="The result of the completed job, if available.")
     error: str | None = Field(None, description="An error message if the job failed.")
+    # Set on enqueue responses
+    queue_depth: int | None = Field(None, description="Jobs of the same kind queued or running when this one was queued.")
+    eta_seconds: float | None = Field(None, description="Estimated seconds until the job is done, when it was queued.")
 
 # --- Brief and Chapter Schemas (No changes here) ---
 class ChapterBrief(BaseModel):
@@ -66,15 +71,23 @@ class PartListOutline(BaseModel):
     @field_validator('parts')
     @classmethod
     def check_min_parts(cls, v):
-        """Ensure at least 3 parts are generated"""
-        if len(v) < 3:
-            raise ValueError('At least 3 parts are required')
+        """Ensure at least 2 parts are generated (the Architect is asked for 2 to 4)"""
+        if len(v) < 2:
+            raise ValueError('At least 2 parts are required')
         return v
 
 class ChapterListOutline(BaseModel):
     """A Pydantic model for a list of chapters for a single part."""
     chapters: List[ChapterOutline]
 
+    @field_validator('chapters')
+    @classmethod
+    def check_not_empty(cls, v):
+        """An empty outline is invalid, so that it is repaired rather than saved"""
+        if not v:
+            raise ValueError('At least 1 chapter is required')
+        return v
+
 
 # --- Original Schemas for Final Assembly ---
 
@@ -91,4 +104,33 @@ class BookOutline(BaseModel):
 
 # NEW: Schema for the finalization request body
 class FinalizationRequest(BaseModel):
-    task_type: str = Field(..., description="The type of finalization task to run, e.g., 'introduction' or 'conclusion'.")
\ No newline at end of file
+    task_type: str = Field(..., description="The type of finalization task to run, e.g., 'introduction' or 'conclusion'.")
+
+# --- Autopilot Schemas ---
+
+class AutopilotGates(BaseModel):
+    """Human approval gates of an autopilot run. A gated phase pauses the run until a person validates it."""
+    parts: bool = Field(True, description="Wait for the part outline to be finalized by a person.")
+    chapters: bool = Field(True, description="Wait for each part's chapter outline to be finalized by a person.")
+
+class AutopilotRequest(BaseModel):
+    gates: AutopilotGates = Field(default_factory=AutopilotGates)
+    finalize: List[str] = Field(
+        default_factory=lambda: ["introduction", "conclusion"],
+        description="Finalization tasks to run once every chapter is written and its transitions analyzed."
+    )
+
+class PipelineRunRead(BaseModel):
+    id: uuid.UUID
+    project_id: uuid.UUID
+    status: str
+    config: Dict[str, Any]
+    node_states: Dict[str, str]
+    job_id: str | None = None
+    created_at: datetime
+    updated_at: datetime
+    # Set when the run was just queued, as on TaskStatus
+    queue_depth: int | None = None
+    eta_seconds: float | None = None
+
+    model_config = ConfigDict(from_attributes=True)
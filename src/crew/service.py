@@ -1,95 +1,125 @@
 # src/crew/service.py
 import asyncio
+import time
 import uuid
 from typing import Any, Dict
 from decimal import Decimal
 import logging # NEW: Import logging module
+from typing import TYPE_CHECKING
 
-# NEW IMPORT: Circuit Breaker
-from circuitbreaker import CircuitBreaker, CircuitBreakerError
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import update, delete
 from sqlalchemy.orm import selectinload
 
-# NEW IMPORTS for openai-agents
-from agents import Runner, RunResult # Make sure 'agents' is correctly importable
-
-# Make sure these are the new Agent instances you defined in agents.py
-from .agents import (
-    AGENT_INSTANCES,
-    architect_part_agent,
-    architect_chapter_agent,
-    continuity_editor_agent,
-    historian_agent,
-    technologist_agent,
-    philosopher_agent,
-    theorist_agent,
-    StringOutput # Your custom Pydantic model for string output
-)
+# Agents are built lazily through the registry; the `agents` SDK itself is
+# only imported when the first run is executed.
+from .agents import get_agent, get_repair_agent, StringOutput
+
+if TYPE_CHECKING:
+    from agents import RunResult
 
+from src.core.circuit_breaker import CircuitOpenError, DistributedCircuitBreaker
 from src.core.config import settings
+from src.core.database import AsyncSessionFactory
 from src.project.models import Project, Part, Chapter
+from src.project.retrieval import RetrievedPassage, retrieve_passages
 from src.project.service import (
     get_chapter_by_id, get_project_by_id, get_part_by_id,
     get_project_with_details, update_chapter_content,
-    update_chapter_status
+    update_chapter_status, get_transition_snippets,
+    save_part_chapter_draft, delete_part_chapter_drafts,
+    part_outline_key, attach_prefetched_chapter_outlines
 )
 from .schemas import PartListOutline, ChapterListOutline
 from .models import CrewRunLog
+from .checkpoints import (
+    checkpoint_key, clear_checkpoints, clears_checkpoints_on_failure, load_agent_output, save_agent_output,
+)
+from .hedging import HEDGE_LOST, hedged_call, plan_hedge
+from .repair import REPAIR_FAILED, invalid_output, repair_output
+from .routing import (
+    RoutedRunResult, resolve_model,
+    PHASE_PART_GENERATION, PHASE_CHAPTER_DETAILING, PHASE_CHAPTER_GENERATION,
+    PHASE_TRANSITION_ANALYSIS, PHASE_FINALIZATION, PHASE_SECTION_SMOOTHING
+)
+from .tasks import prepare_chapter_section_briefs
 from .pricing import calculate_cost
 
 # NEW: Get a logger instance for this module
 logger = logging.getLogger(__name__)
 
-# NEW: Configure a circuit breaker for OpenAI API calls
-# This will wrap calls to Runner.run
-# - failure_threshold: After 3 consecutive failures, the circuit opens.
-# - recovery_timeout: The circuit stays open for 60 seconds before attempting a half-open state.
-# - expected_exception: The types of exceptions that should trigger a failure.
-openai_circuit_breaker = CircuitBreaker(
-    failure_threshold=3,
-    recovery_timeout=60, # seconds
-    expected_exception=(
-        ConnectionError, # Network issues
-        asyncio.TimeoutError, # If requests time out
-        # Consider adding specific exceptions from your 'agents' library if it exposes them for API errors
-    )
-)
+def _upstream_failures() -> tuple[type[BaseException], ...]:
+    """Exceptions that mean the model API is failing (not that it rejected our request)."""
+    failures = (ConnectionError, asyncio.TimeoutError)
+    try:
+        import openai
+    except ImportError:
+        return failures
+    # APIConnectionError includes timeouts
+    return failures + (openai.APIConnectionError, openai.InternalServerError, openai.RateLimitError)
+
+
+def _timeouts() -> tuple[type[BaseException], ...]:
+    try:
+        import openai
+    except ImportError:
+        return (asyncio.TimeoutError,)
+    return (asyncio.TimeoutError, openai.APITimeoutError)
+
+
+# Circuit breaker for model API calls, shared by every API pod and worker
+# through Redis (see src/core/circuit_breaker.py). Each call goes through the
+# circuit of its model and the circuit of its agent; fallback calls only go
+# through their model's circuit, as the agent's may be open because of the
+# model it falls back from.
+llm_circuit_breaker = DistributedCircuitBreaker(expected_exception=_upstream_failures)
 
-# NEW: Helper function to execute an agent run, wrapped by the circuit breaker
-@openai_circuit_breaker
-async def _execute_agent_run(agent_instance: Any, agent_input: str) -> RunResult:
-    """Helper function to execute an agent run, wrapped by the circuit breaker."""
+
+def agent_run_circuits(agent_name: str, model_name: str) -> tuple[str, str]:
+    return f"model:{model_name}", f"agent:{agent_name}"
+
+
+def fallback_run_circuits(model_name: str) -> tuple[str]:
+    return (f"model:{model_name}",)
+
+
+# Run through llm_circuit_breaker (and hedged) by _execute_model_run
+async def _execute_agent_run(agent_instance: Any, agent_input: str) -> "RunResult":
+    """Helper function to execute an agent run."""
+    from agents import Runner
     logger.debug(f"Attempting agent run for '{agent_instance.name}' with input: {agent_input[:200]}...")
     return await Runner.run(agent_instance, agent_input)
 
 
-async def log_crew_run(
-    session: AsyncSession,
-    project_id: uuid.UUID,
-    initiating_task_name: str,
-    usage_metrics: Any, # This is the full RunResult object now
-):
-    """Logs the metrics of a completed LLM run."""
+async def _execute_timed_agent_run(agent_instance: Any, agent_input: str) -> "RunResult":
+    """An agent run that fails with asyncio.TimeoutError after LLM_CALL_TIMEOUT_SECONDS."""
+    return await asyncio.wait_for(
+        _execute_agent_run(agent_instance, agent_input), settings.LLM_CALL_TIMEOUT_SECONDS or None
+    )
+
+
+def _extract_run_usage(run_result: Any) -> tuple[int, int, str] | None:
+    """
+    Extracts (prompt_tokens, completion_tokens, model_name) from a RunResult.
+    Returns None if the result carries no usage data.
+    """
     # Ensure we have a valid RunResult object and it has raw_responses
-    if not usage_metrics or not hasattr(usage_metrics, 'raw_responses') or not usage_metrics.raw_responses:
-        logger.warning(f"Could not log run for '{initiating_task_name}': Invalid RunResult or no raw_responses found.")
-        return
+    if not run_result or not hasattr(run_result, 'raw_responses') or not run_result.raw_responses:
+        return None
 
     # Extract the specific response (assuming the first one for simplicity for now)
     # The 'usage' object structure can vary slightly by LLM provider/library.
     # Ensure you are correctly extracting 'input_tokens' and 'output_tokens'.
-    response_usage = getattr(usage_metrics.raw_responses[0], 'usage', None)
-
+    response_usage = getattr(run_result.raw_responses[0], 'usage', None)
     if not response_usage:
-        logger.warning(f"Could not log run for '{initiating_task_name}': No usage data found in raw_response.")
-        return
+        return None
 
     prompt_tokens = 0
     completion_tokens = 0
-    model_name_for_logging = settings.DEFAULT_OPENAI_MODEL_NAME # Default to general setting
+    # Default to the model the call was routed to, then to the general setting
+    model_name_for_logging = getattr(run_result, 'model_name', None) or settings.DEFAULT_OPENAI_MODEL_NAME
 
     # Attempt to extract tokens and model name from the usage object
     if hasattr(response_usage, 'input_tokens'):
@@ -98,8 +128,8 @@ async def log_crew_run(
         completion_tokens = response_usage.output_tokens
     if hasattr(response_usage, 'model_name'): # Check if the usage object itself has model_name
         model_name_for_logging = response_usage.model_name
-    elif hasattr(usage_metrics.raw_responses[0], 'model'): # Or if raw_response has model
-        model_name_for_logging = usage_metrics.raw_responses[0].model
+    elif hasattr(run_result.raw_responses[0], 'model'): # Or if raw_response has model
+        model_name_for_logging = run_result.raw_responses[0].model
     # Fallback if keys are different (less likely with consistent openai-agents usage)
     elif isinstance(response_usage, dict):
         prompt_tokens = response_usage.get('input_tokens', 0)
@@ -109,6 +139,184 @@ async def log_crew_run(
              completion_tokens = response_usage.get('completion_tokens', 0)
         model_name_for_logging = response_usage.get('model', model_name_for_logging) # Get model from dict
 
+    # The model the call was routed (or fell back) to is its LLM_PRICING key,
+    # which an OpenAI-compatible endpoint may name differently
+    if getattr(run_result, 'model_name', None):
+        model_name_for_logging = run_result.model_name
+
+    return prompt_tokens, completion_tokens, model_name_for_logging
+
+
+async def _log_failed_run(
+    project_id: uuid.UUID, agent_name: str, phase: str, model_name: str, latency_ms: int,
+    repair: str | None = None
+) -> None:
+    """
+    Records a failed agent call (no tokens, no cost) so adaptive routing can
+    see failure rates; repair=REPAIR_FAILED for an output that could not be
+    repaired. Written in its own session, leaving the caller's transaction
+    untouched; a logging failure is never raised.
+    """
+    try:
+        async with AsyncSessionFactory() as log_session:
+            log_session.add(CrewRunLog(
+                project_id=project_id, initiating_task_name=f"Failed: {phase}",
+                model_name=model_name, prompt_tokens=0, completion_tokens=0, total_tokens=0,
+                total_cost=Decimal("0"), agent_name=agent_name, phase=phase,
+                latency_ms=latency_ms, succeeded=False, repair=repair
+            ))
+            await log_session.commit()
+    except Exception as e:
+        logger.warning(f"⚠️ Could not log failed run of {agent_name} ({phase}): {e}")
+
+
+async def _log_cancelled_run(
+    project_id: uuid.UUID, agent_name: str, phase: str, model_name: str, agent_input: str,
+    hedge: str | None = None
+) -> None:
+    """
+    Records an agent call interrupted by a job cancellation, or a hedged call
+    that lost the race (hedge=HEDGE_LOST). The prompt was sent and is billed,
+    but the response never arrived, so its usage is estimated from the input
+    (TOKEN_ESTIMATE_CHARS_PER_TOKEN) and charged to the project. Written in
+    its own session; a logging failure is never raised.
+    """
+    task_name = f"Hedge lost: {phase}" if hedge == HEDGE_LOST else f"Cancelled: {phase}"
+    prompt_tokens = len(agent_input) // settings.TOKEN_ESTIMATE_CHARS_PER_TOKEN
+    run_cost = calculate_cost(model_name=model_name, prompt_tokens=prompt_tokens, completion_tokens=0)
+    try:
+        async with AsyncSessionFactory() as log_session:
+            log_session.add(CrewRunLog(
+                project_id=project_id, initiating_task_name=task_name,
+                model_name=model_name, prompt_tokens=prompt_tokens, completion_tokens=0,
+                total_tokens=prompt_tokens, total_cost=run_cost, agent_name=agent_name, phase=phase,
+                succeeded=False, hedge=hedge
+            ))
+            await log_session.execute(
+                update(Project)
+                .where(Project.id == project_id)
+                .values(total_cost=Project.total_cost + run_cost)
+            )
+            await log_session.commit()
+        logger.info(f"📊 {task_name} logged ({model_name}) - ~{prompt_tokens} prompt tokens, Cost: ${run_cost:.6f}")
+    except Exception as e:
+        logger.warning(f"⚠️ Could not log cancelled run of {agent_name} ({phase}): {e}")
+
+
+async def _execute_model_run(
+    agent_name: str,
+    phase: str,
+    model_name: str,
+    circuits: tuple[str, ...],
+    agent_input: str,
+    output_type: type,
+    project_id: uuid.UUID,
+) -> RoutedRunResult:
+    """
+    Runs an agent on one model, through `circuits`, within
+    LLM_CALL_TIMEOUT_SECONDS. Calls of hedged agents may be sent twice (see
+    hedging.py), and an output that fails validation is repaired (see
+    repair.py). Failed and cancelled calls are logged.
+    """
+    agent_instance = get_agent(agent_name, model_name)
+
+    async def call() -> "RunResult":
+        return await llm_circuit_breaker.call(circuits, _execute_timed_agent_run, agent_instance, agent_input)
+
+    async def follow_up(repair_input: str) -> "RunResult":
+        return await llm_circuit_breaker.call(
+            circuits, _execute_timed_agent_run, get_repair_agent(agent_name, model_name), repair_input
+        )
+
+    async def on_failed(error: BaseException, latency_ms: int) -> None:
+        if not isinstance(error, CircuitOpenError):
+            await _log_failed_run(project_id, agent_name, phase, model_name, latency_ms)
+
+    async def on_lost() -> None:
+        await _log_cancelled_run(project_id, agent_name, phase, model_name, agent_input, hedge=HEDGE_LOST)
+
+    plan = await plan_hedge(agent_name, phase, model_name)
+    hedge = plan.label
+    started = time.perf_counter()
+    try:
+        if plan.delay_s is None:
+            run_result = await call()
+        else:
+            run_result, hedge = await hedged_call(call, plan.delay_s, on_failed, on_lost)
+    except CircuitOpenError:
+        raise # The call never reached the model
+    except asyncio.CancelledError:
+        # The job was aborted while waiting for the model
+        await asyncio.shield(_log_cancelled_run(project_id, agent_name, phase, model_name, agent_input))
+        raise
+    except Exception as e:
+        invalid = invalid_output(e, agent_input)
+        run_result = await repair_output(invalid, output_type, follow_up) if invalid else None
+        if run_result is None:
+            await _log_failed_run(
+                project_id, agent_name, phase, model_name, int((time.perf_counter() - started) * 1000),
+                repair=REPAIR_FAILED if invalid else None
+            )
+            raise
+        logger.info(f"🩹 Invalid output of {agent_name} ({phase}) repaired ({run_result.repair}).")
+    return RoutedRunResult(
+        run_result, agent_name, phase, model_name=model_name,
+        latency_ms=int((time.perf_counter() - started) * 1000), hedge=hedge
+    )
+
+
+async def _execute_checkpointed_run(
+    job_key: str,
+    agent_name: str,
+    phase: str,
+    agent_input: str,
+    output_type: type,
+    project_id: uuid.UUID,
+) -> RoutedRunResult:
+    """
+    Runs an agent on the model routed for its phase (see routing.py), unless a
+    checkpoint saved under `job_key` already holds its output for this exact
+    input (the job was interrupted after paying for the call). If the model's
+    circuit is open or its call times out, the agent's MODEL_FALLBACKS are
+    tried in order; CircuitOpenError is only raised when none could serve it.
+    A fresh, non-empty output is checkpointed before it is returned; the
+    caller clears the checkpoint in the transaction that applies it.
+    """
+    restored = await load_agent_output(job_key, agent_input)
+    if restored is not None:
+        return RoutedRunResult(restored, agent_name, phase, model_name=None, latency_ms=None)
+
+    routed_model = await resolve_model(agent_name, phase)
+    models = [routed_model] + [m for m in settings.MODEL_FALLBACKS.get(agent_name, []) if m != routed_model]
+    for attempt, model_name in enumerate(models):
+        circuits = agent_run_circuits(agent_name, model_name) if attempt == 0 else fallback_run_circuits(model_name)
+        try:
+            routed = await _execute_model_run(
+                agent_name, phase, model_name, circuits, agent_input, output_type, project_id
+            )
+            break
+        except (CircuitOpenError, *_timeouts()) as e:
+            if attempt == len(models) - 1:
+                raise
+            reason = "circuit is open" if isinstance(e, CircuitOpenError) else "call timed out"
+            logger.warning(
+                f"↪️ {agent_name} ({phase}): '{model_name}' {reason}, falling back to '{models[attempt + 1]}'."
+            )
+
+    output = routed.final_output_as(output_type)
+    if output and getattr(output, "text", True):
+        await save_agent_output(job_key, agent_input, output, _extract_run_usage(routed))
+    return routed
+
+
+def _build_crew_run_log(project_id: uuid.UUID, initiating_task_name: str, run_result: Any) -> CrewRunLog | None:
+    """Builds (but does not persist) the CrewRunLog row for a completed LLM run."""
+    usage = _extract_run_usage(run_result)
+    if usage is None:
+        logger.warning(f"Could not log run for '{initiating_task_name}': Invalid RunResult or no usage data found.")
+        return None
+
+    prompt_tokens, completion_tokens, model_name_for_logging = usage
     total_tokens = prompt_tokens + completion_tokens
 
     run_cost = calculate_cost(
@@ -117,28 +325,47 @@ async def log_crew_run(
         completion_tokens=completion_tokens,
     )
 
-    new_log = CrewRunLog(
+    return CrewRunLog(
         project_id=project_id, initiating_task_name=initiating_task_name,
         model_name=model_name_for_logging, prompt_tokens=prompt_tokens, # Log the actual model name
         completion_tokens=completion_tokens, total_tokens=total_tokens,
-        total_cost=run_cost
+        total_cost=run_cost,
+        agent_name=getattr(run_result, 'agent_name', None),
+        phase=getattr(run_result, 'phase', None),
+        latency_ms=getattr(run_result, 'latency_ms', None),
+        hedge=getattr(run_result, 'hedge', None),
+        repair=getattr(run_result, 'repair', None)
     )
+
+
+async def log_crew_run(
+    session: AsyncSession,
+    project_id: uuid.UUID,
+    initiating_task_name: str,
+    usage_metrics: Any, # This is the full RunResult object now
+):
+    """Logs the metrics of a completed LLM run."""
+    new_log = _build_crew_run_log(project_id, initiating_task_name, usage_metrics)
+    if new_log is None:
+        return
+
     session.add(new_log)
 
     await session.execute(
         update(Project)
         .where(Project.id == project_id)
-        .values(total_cost=Project.total_cost + run_cost)
+        .values(total_cost=Project.total_cost + new_log.total_cost)
     )
 
     await session.commit()
-    logger.info(f"📊 Run Logged: '{initiating_task_name}' ({model_name_for_logging}) - Tokens: {total_tokens}, Cost: ${run_cost:.6f}")
+    logger.info(f"📊 Run Logged: '{initiating_task_name}' ({new_log.model_name}) - Tokens: {new_log.total_tokens}, Cost: ${new_log.total_cost:.6f}")
 
+@clears_checkpoints_on_failure
 async def run_part_generation_crew(session: AsyncSession, project_id: uuid.UUID) -> bool:
     logger.info(f"🚀 Starting Part generation for project: {project_id}")
     project = None
     try:
-        project = await get_project_by_id(session, project_id=project_id)
+        project = await get_project_by_id(session, project_id=project_id, with_blueprint=True)
         if not project:
             logger.error(f"❌ Part generation failed: Project {project_id} not found.")
             return False
@@ -147,12 +374,15 @@ async def run_part_generation_crew(session: AsyncSession, project_id: uuid.UUID)
             return False
 
         agent_input = project.raw_blueprint
+        job_key = checkpoint_key("part_generation", project_id)
 
         logger.info(f"🤖 Architect AI preparing part outline for project {project_id}...")
 
         try:
-            run_result: RunResult = await _execute_agent_run(architect_part_agent, agent_input)
-        except CircuitBreakerError:
+            run_result: RunResult = await _execute_checkpointed_run(
+                job_key, "Architect Part AI", PHASE_PART_GENERATION, agent_input, PartListOutline, project.id
+            )
+        except CircuitOpenError:
             logger.error(f"🔴 Circuit breaker is OPEN for OpenAI API. Cannot perform Part generation for project {project_id}.")
             if project:
                 project.status = "API_CIRCUIT_OPEN"
@@ -171,8 +401,8 @@ async def run_part_generation_crew(session: AsyncSession, project_id: uuid.UUID)
             logger.warning(f"⚠️ Part generation failed: Agent returned an empty 'parts' list despite schema. Retrying or manual intervention may be needed for project {project_id}.")
             return False
 
-        if len(part_list_outline.parts) < 3:
-            logger.warning(f"⚠️ Part generation warning for project {project_id}: Agent generated only {len(part_list_outline.parts)} parts, expected at least 3 as per schema. Review agent instructions or model.")
+        if len(part_list_outline.parts) < 2:
+            logger.warning(f"⚠️ Part generation warning for project {project_id}: Agent generated only {len(part_list_outline.parts)} parts, expected at least 2 as per schema. Review agent instructions or model.")
             pass
 
         logger.info(f"🔍 Generated {len(part_list_outline.parts)} parts for project {project_id}:")
@@ -185,13 +415,14 @@ async def run_part_generation_crew(session: AsyncSession, project_id: uuid.UUID)
         project.draft_parts_outline = part_list_outline.model_dump()
         logger.debug(f"Updated project {project.id} draft_parts_outline.")
         
-        # Clear draft_chapters_outline as we are starting a new parts generation cycle
-        project.draft_chapters_outline = None
-        logger.debug(f"Cleared draft_chapters_outline for project {project.id} during part generation.")
+        # Clear the chapter drafts as we are starting a new parts generation cycle
+        await delete_part_chapter_drafts(session, project_id=project.id)
+        logger.debug(f"Cleared draft chapter outlines for project {project.id} during part generation.")
         # --- END UPDATED STRATEGIC LOGIC ---
 
         project.status = "PARTS_PENDING_VALIDATION"
         session.add(project) # Mark project as dirty
+        await clear_checkpoints(session, job_key)
         await session.commit()
         logger.info(f"✅ Part structure generated for project {project_id}. Status: {project.status}")
 
@@ -224,6 +455,26 @@ async def run_part_generation_crew(session: AsyncSession, project_id: uuid.UUID)
 
 
 
+def _build_chapter_detailing_input(part_title: str, part_summary: str) -> str:
+    """Builds the Architect prompt for one part's chapter outline."""
+    return (
+        f"Generate a detailed chapter outline for a book part. "
+        f"The part title is '{part_title}' and its summary is '{part_summary}'.\n\n"
+        "Provide a list of chapters, each chapter must have:\n"
+        "- chapter_number: Positive integer, sequential.\n"
+        "- title: A descriptive chapter title.\n"
+        "- brief: A structured brief containing:\n"
+        "  - thesis_statement: The central argument (string).\n"
+        "  - narrative_arc: The chapter's structure (string).\n"
+        "  - required_inclusions: List of key concepts to include (list of strings).\n"
+        "  - key_questions_to_answer: List of specific questions the chapter must answer (list of strings).\n"
+        "- suggested_agent: The name of the specialist AI agent best suited to write this chapter (e.g., 'Historian AI', 'Technologist AI', 'Philosopher AI', 'Theorist AI'). "
+        "Choose from: 'Historian AI', 'Technologist AI', 'Philosopher AI', 'Theorist AI'."
+        "\n\nOutput ONLY JSON matching the ChapterListOutline schema. Ensure at least 3 chapters are generated."
+    )
+
+
+@clears_checkpoints_on_failure
 async def run_chapter_detailing_crew(session: AsyncSession, part_id: uuid.UUID) -> bool:
     logger.info(f"🚀 Starting chapter detailing for part: {part_id}")
     part = None
@@ -242,27 +493,17 @@ async def run_chapter_detailing_crew(session: AsyncSession, part_id: uuid.UUID)
             logger.error(f"❌ Chapter detailing failed: Project for part {part_id} not found.")
             return False
 
-        agent_input = (
-            f"Generate a detailed chapter outline for a book part. "
-            f"The part title is '{part.title}' and its summary is '{part.summary}'.\n\n"
-            "Provide a list of chapters, each chapter must have:\n"
-            "- chapter_number: Positive integer, sequential.\n"
-            "- title: A descriptive chapter title.\n"
-            "- brief: A structured brief containing:\n"
-            "  - thesis_statement: The central argument (string).\n"
-            "  - narrative_arc: The chapter's structure (string).\n"
-            "  - required_inclusions: List of key concepts to include (list of strings).\n"
-            "  - key_questions_to_answer: List of specific questions the chapter must answer (list of strings).\n"
-            "- suggested_agent: The name of the specialist AI agent best suited to write this chapter (e.g., 'Historian AI', 'Technologist AI', 'Philosopher AI', 'Theorist AI'). "
-            "Choose from: 'Historian AI', 'Technologist AI', 'Philosopher AI', 'Theorist AI'."
-            "\n\nOutput ONLY JSON matching the ChapterListOutline schema. Ensure at least 3 chapters are generated."
-        )
+        agent_input = _build_chapter_detailing_input(part.title, part.summary)
+
+        job_key = checkpoint_key("chapter_detailing", part_id)
 
         logger.info(f"🤖 Architect AI preparing chapter outline for part {part.part_number} - '{part.title}'...")
 
         try:
-            run_result: RunResult = await _execute_agent_run(architect_chapter_agent, agent_input)
-        except CircuitBreakerError:
+            run_result: RunResult = await _execute_checkpointed_run(
+                job_key, "Architect Chapter AI", PHASE_CHAPTER_DETAILING, agent_input, ChapterListOutline, project.id
+            )
+        except CircuitOpenError:
             logger.error(f"🔴 Circuit breaker is OPEN for OpenAI API. Cannot perform Chapter detailing for part {part_id}.")
             if part:
                 part.status = "API_CIRCUIT_OPEN"
@@ -285,29 +526,19 @@ async def run_chapter_detailing_crew(session: AsyncSession, part_id: uuid.UUID)
              logger.warning(f"⚠️ Chapter detailing warning for part {part.id}: Agent generated only {len(chapter_list_outline.chapters)} chapters. Consider reviewing agent output or instructions.")
 
 
-        # --- CRITICAL FIX FOR ACCUMULATING DRAFT CHAPTERS OUTLINE ---
-        # Get the current draft_chapters_outline. If null, initialize to an empty dict.
-        # IMPORTANT: Make a SHALLOW COPY if project.draft_chapters_outline is already an object.
-        # This forces SQLAlchemy to recognize a new object assignment.
-        current_draft_chapters_map = project.draft_chapters_outline.copy() if project.draft_chapters_outline is not None else {}
-        
-        # Store ChapterListOutline under the part's UUID in the map
-        current_draft_chapters_map[str(part.id)] = chapter_list_outline.model_dump()
-        logger.debug(f"Added/updated draft chapters for part {part.id} in map.")
-        
-        # Assign the updated map back to the project's draft_chapters_outline
-        project.draft_chapters_outline = current_draft_chapters_map
-        logger.debug(f"Assigned updated draft_chapters_outline to project {project.id}.")
+        # Upsert this part's own draft row: other parts of the book may be
+        # detailed concurrently, and their drafts are separate rows.
+        await save_part_chapter_draft(session, project.id, part.id, chapter_list_outline.model_dump())
         
         # Clear draft_parts_outline as this is a new chapter detailing cycle
         project.draft_parts_outline = None
         logger.debug(f"Cleared draft_parts_outline for project {project.id} during chapter detailing.")
-        # --- END CRITICAL FIX ---
 
         part.status = "CHAPTERS_PENDING_VALIDATION"
         
-        session.add(project) # Mark project as dirty (draft_chapters_outline changed)
+        session.add(project) # Mark project as dirty (draft_parts_outline changed)
         session.add(part) # Mark part as dirty (status changed)
+        await clear_checkpoints(session, job_key)
         await session.commit()
         
         logger.info(f"✅ Chapter structure generated for part {part.id}. Status: {part.status}")
@@ -337,21 +568,254 @@ async def run_chapter_detailing_crew(session: AsyncSession, part_id: uuid.UUID)
         
         logger.critical(f"🔥 Critical error during Chapter detailing{part_status_message}: {e}", exc_info=True)
         return False
-    
-async def run_chapter_generation_crew(session: AsyncSession, chapter_id: uuid.UUID) -> bool:
+
+
+@clears_checkpoints_on_failure
+async def run_chapter_prefetch_crew(session: AsyncSession, project_id: uuid.UUID) -> bool:
+    """
+    Speculatively details the chapters of every drafted part while the parts
+    await validation. Outlines are stored by part_outline_key(title, summary)
+    and attached by finalize_part_structure to the parts accepted unchanged;
+    parts validated in the meantime get theirs as soon as this finishes.
+    The prompt is the one run_chapter_detailing_crew uses, so an attached
+    outline is what detailing the part would have produced.
+    """
+    logger.info(f"🚀 Starting speculative chapter detailing for project: {project_id}")
+    result = await session.execute(
+        select(Project.status, Project.draft_parts_outline, Project.speculative_chapters_outline)
+        .where(Project.id == project_id)
+    )
+    project = result.first()
+    if not project:
+        logger.error(f"❌ Speculative chapter detailing failed: Project {project_id} not found.")
+        return False
+    if project.status != "PARTS_PENDING_VALIDATION" or not project.draft_parts_outline:
+        logger.info(f"Skipping speculative chapter detailing for project {project_id}: parts are no longer pending validation (status {project.status}).")
+        return False
+
+    prefetched = project.speculative_chapters_outline or {}
+    pending = {}
+    for part_data in PartListOutline(**project.draft_parts_outline).parts:
+        key = part_outline_key(part_data.title, part_data.summary)
+        if key not in prefetched:
+            pending[key] = part_data
+    if not pending:
+        logger.info(f"All drafted parts of project {project_id} already have a prefetched chapter outline.")
+        return True
+
+    semaphore = asyncio.Semaphore(settings.CHAPTER_PREFETCH_CONCURRENCY)
+
+    async def detail(key: str, part_data: Any) -> Any:
+        async with semaphore:
+            return await _execute_checkpointed_run(
+                checkpoint_key("chapter_prefetch", project_id, key), "Architect Chapter AI", PHASE_CHAPTER_DETAILING,
+                _build_chapter_detailing_input(part_data.title, part_data.summary), ChapterListOutline, project_id
+            )
+
+    logger.info(f"🤖 Architect AI prefetching chapter outlines for {len(pending)} drafted parts of project {project_id}...")
+    results = await asyncio.gather(*(detail(key, part_data) for key, part_data in pending.items()), return_exceptions=True)
+
+    outlines = {}
+    runs = []
+    for (key, part_data), run_result in zip(pending.items(), results):
+        if isinstance(run_result, BaseException):
+            # The part is simply detailed on demand after validation.
+            logger.warning(f"⚠️ Speculative chapter detailing failed for part {part_data.part_number} of project {project_id}: {run_result}")
+            continue
+        chapter_list_outline: ChapterListOutline = run_result.final_output_as(ChapterListOutline)
+        if not chapter_list_outline.chapters:
+            logger.warning(f"⚠️ Speculative chapter detailing returned no chapters for part {part_data.part_number} of project {project_id}.")
+            continue
+        outlines[key] = chapter_list_outline.model_dump()
+        runs.append((f"Phase 2: Speculative Chapter Detailing for Part {part_data.part_number}", run_result))
+
+    if not outlines:
+        return False
+
+    # Merge under the project row lock; finalize_part_structure may be reading the map concurrently.
+    result = await session.execute(
+        select(Project.speculative_chapters_outline).where(Project.id == project_id).with_for_update()
+    )
+    merged = dict(result.scalar_one_or_none() or {})
+    merged.update(outlines)
+    await session.execute(update(Project).where(Project.id == project_id).values(speculative_chapters_outline=merged))
+    # Parts validated while the outlines were being generated get them now.
+    await attach_prefetched_chapter_outlines(session, project_id)
+    await clear_checkpoints(session, *(checkpoint_key("chapter_prefetch", project_id, key) for key in outlines))
+    await session.commit()
+    logger.info(f"✅ Prefetched chapter outlines for {len(outlines)} of {len(pending)} drafted parts of project {project_id}.")
+
+    for task_name, run_result in runs:
+        if hasattr(run_result, 'raw_responses') and run_result.raw_responses and hasattr(run_result.raw_responses[0], 'usage'):
+            await log_crew_run(
+                session=session,
+                project_id=project_id,
+                initiating_task_name=task_name,
+                usage_metrics=run_result
+            )
+        else:
+            logger.warning(f"⚠️ No usage metrics available in raw_responses for Speculative Chapter Detailing run for project {project_id}.")
+    return True
+
+
+def _format_retrieved_passages(passages: list[RetrievedPassage]) -> str:
+    """Renders retrieved passages as a bounded prompt section (empty if there are none)."""
+    if not passages:
+        return ""
+    max_chars = settings.RETRIEVAL_PASSAGE_MAX_CHARS
+    excerpts = "\n\n".join(
+        f"[Part {p.part_number}, Chapter {p.chapter_number}: {p.chapter_title}]\n"
+        + (p.text if len(p.text) <= max_chars else p.text[:max_chars].rsplit(" ", 1)[0] + " ...")
+        for p in passages
+    )
+    return (
+        "Relevant passages from earlier chapters (for continuity; build on them, do not repeat them):\n"
+        f"{excerpts}\n\n"
+    )
+
+
+def _extract_total_tokens(run_result: Any) -> int:
+    """Total tokens of a run, as stored on ChapterVersion.token_count."""
+    usage = _extract_run_usage(run_result)
+    return usage[0] + usage[1] if usage else 0
+
+
+def _build_section_input(chapter: Chapter, brief_data: dict, section: dict, retrieved_context: str) -> str:
+    """Builds the writer prompt for one section of a chapter drafted in parallel."""
+    index, count = section["index"], section["count"]
+    opening = (
+        "Open the chapter." if index == 1
+        else "Do not re-introduce the chapter; start directly with this section's material."
+    )
+    closing = (
+        "Close the chapter." if index == count
+        else "Do not conclude the chapter; end where the next section can pick up."
+    )
+    return (
+        f"Chapter Title: {chapter.title}\n"
+        f"Chapter Thesis Statement: {brief_data.get('thesis_statement', 'N/A')}\n"
+        f"Full Narrative Arc (for orientation only): {brief_data.get('narrative_arc', 'N/A')}\n\n"
+        f"You are writing SECTION {index} of {count} of this chapter. The other sections are written "
+        "separately and joined to yours.\n"
+        f"Section Brief:\n"
+        f"- This section covers: {section['narrative_arc']}\n"
+        f"- Required Inclusions: {', '.join(section['required_inclusions']) or 'N/A'}\n"
+        f"- Key Questions to Answer: {', '.join(section['key_questions_to_answer']) or 'N/A'}\n\n"
+        f"{retrieved_context}"
+        f"{opening} {closing} Write the full content of this section only."
+    )
+
+
+def _build_bridge_input(preceding_end: str, next_start: str) -> str:
+    """Builds the Continuity Editor prompt for the seam between two drafted sections."""
+    return (
+        "Two consecutive sections of the same chapter were written separately. Write one or two bridging "
+        "sentences to place at the start of the second section so the reader moves smoothly from one to the "
+        "other. Output only the bridging sentences.\n\n"
+        f"End of the first section:\n{preceding_end}\n\n"
+        f"Start of the second section:\n{next_start}"
+    )
+
+
+async def _draft_chapter_in_sections(
+    chapter: Chapter, brief_data: dict, sections: list[dict], retrieved_context: str, project_id: uuid.UUID
+) -> tuple[str | None, list[tuple[str, Any]], list[str]]:
+    """
+    Drafts the sections of a chapter concurrently with its suggested agent,
+    then asks the Continuity Editor for bridging sentences at every seam (also
+    concurrently) and stitches everything together. Each call is checkpointed
+    on its own, so a retry only pays for the sections that did not finish.
+    Returns (content or None, [(task name, run result)], checkpoint keys).
+    """
+    label = f"Ch {chapter.chapter_number} - {chapter.title[:30]}"
+    semaphore = asyncio.Semaphore(settings.CHAPTER_SECTION_CONCURRENCY)
+
+    async def draft(section: dict) -> Any:
+        async with semaphore:
+            return await _execute_checkpointed_run(
+                checkpoint_key("chapter_generation", chapter.id, f"section-{section['index']}"),
+                chapter.suggested_agent, PHASE_CHAPTER_GENERATION,
+                _build_section_input(chapter, brief_data, section, retrieved_context), StringOutput, project_id
+            )
+
+    started = time.perf_counter()
+    section_results = await asyncio.gather(*(draft(section) for section in sections))
+    drafting_ms = int((time.perf_counter() - started) * 1000)
+
+    texts = []
+    runs = []
+    for section, run_result in zip(sections, section_results):
+        output = run_result.final_output_as(StringOutput)
+        text = output.text.strip() if output and output.text else ""
+        timing = f"{run_result.latency_ms} ms" if run_result.latency_ms is not None else "restored from checkpoint"
+        logger.info(
+            f"⏱️ Chapter {chapter.id} section {section['index']}/{section['count']}: {timing}, "
+            f"{_extract_total_tokens(run_result)} tokens, {len(text)} chars."
+        )
+        if not text:
+            logger.error(f"❌ Section {section['index']} of chapter {chapter.id} came back empty.")
+            return None, [], []
+        texts.append(text)
+        runs.append((f"Chapter: {label} (section {section['index']}/{section['count']})", run_result))
+
+    # --- Smoothing pass: a bridging sentence or two at each seam ---
+    async def bridge(index: int) -> Any:
+        async with semaphore:
+            return await _execute_checkpointed_run(
+                checkpoint_key("chapter_generation", chapter.id, f"bridge-{index}"),
+                "Continuity Editor AI", PHASE_SECTION_SMOOTHING,
+                _build_bridge_input(texts[index - 1][-TRANSITION_SNIPPET_LENGTH:], texts[index][:TRANSITION_SNIPPET_LENGTH]),
+                StringOutput, project_id
+            )
+
+    started = time.perf_counter()
+    bridge_results = await asyncio.gather(*(bridge(i) for i in range(1, len(texts))), return_exceptions=True)
+    smoothing_ms = int((time.perf_counter() - started) * 1000)
+
+    content = texts[0]
+    for index, bridge_result in enumerate(bridge_results, start=1):
+        bridge_text = ""
+        if isinstance(bridge_result, BaseException):
+            # A missing bridge only costs some flow; the sections are still joined.
+            logger.warning(f"⚠️ No bridge between sections {index} and {index + 1} of chapter {chapter.id}: {bridge_result}")
+        else:
+            output = bridge_result.final_output_as(StringOutput)
+            bridge_text = output.text.strip() if output and output.text else ""
+            runs.append((f"Chapter: {label} (bridge {index}/{len(texts) - 1})", bridge_result))
+        content += "\n\n" + (f"{bridge_text} {texts[index]}" if bridge_text else texts[index])
+
+    logger.info(
+        f"⏱️ Chapter {chapter.id}: {len(sections)} sections drafted in {drafting_ms} ms "
+        f"(longest section {max((r.latency_ms or 0) for r in section_results)} ms), smoothing {smoothing_ms} ms."
+    )
+    job_keys = [checkpoint_key("chapter_generation", chapter.id, f"section-{s['index']}") for s in sections]
+    job_keys += [checkpoint_key("chapter_generation", chapter.id, f"bridge-{i}") for i in range(1, len(texts))]
+    return content, runs, job_keys
+
+
+@clears_checkpoints_on_failure
+async def run_chapter_generation_crew(session: AsyncSession, chapter_id: uuid.UUID, sectioned: bool | None = None) -> bool:
+    """
+    Writes a chapter's content with its suggested agent. With `sectioned`
+    (default: CHAPTER_SECTION_PARALLEL) the brief is split into sections that
+    are drafted concurrently and stitched together.
+    """
     logger.info(f"🚀 Starting content generation for chapter: {chapter_id}")
+    if sectioned is None:
+        sectioned = settings.CHAPTER_SECTION_PARALLEL
     chapter = None
     project_id = None
     try:
         # Load chapter with part and project relationships
-        chapter = await get_chapter_by_id(session, chapter_id=chapter_id)
+        chapter = await get_chapter_by_id(session, chapter_id=chapter_id, with_brief=True)
         if not chapter or not chapter.part or not chapter.part.project:
             logger.error(f"❌ Chapter content generation failed: Chapter {chapter_id} not found or is missing relationships.")
             return False
 
         project_id = chapter.part.project.id
         
-        agent_instance = AGENT_INSTANCES.get(chapter.suggested_agent)
+        # Validates the agent name; the instance itself is built per routed model.
+        agent_instance = get_agent(chapter.suggested_agent) if chapter.suggested_agent else None
         if not agent_instance:
             logger.error(f"❌ Chapter content generation failed: Agent instance not found for '{chapter.suggested_agent}'.")
             chapter.status = "AGENT_NOT_FOUND" # Set status
@@ -365,6 +829,21 @@ async def run_chapter_generation_crew(session: AsyncSession, chapter_id: uuid.UU
             return False
 
         brief_data = chapter.brief
+        # Relevant passages of earlier chapters, for continuity without pasting whole chapters
+        passages = await retrieve_passages(
+            session, project_id,
+            query=" ".join([
+                chapter.title, brief_data.get('thesis_statement', ''),
+                *brief_data.get('required_inclusions', []), *brief_data.get('key_questions_to_answer', []),
+            ]),
+            top_k=settings.RETRIEVAL_TOP_K,
+            before=(chapter.part.part_number, chapter.chapter_number),
+        )
+        retrieved_context = _format_retrieved_passages(passages)
+        # Retrieval may have indexed older chapters; commit them now rather than
+        # hold a write transaction across the agent calls (on SQLite it would
+        # block every other writer, including this job's checkpoints).
+        await session.commit()
         agent_input = (
             f"Chapter Title: {chapter.title}\n\n"
             f"Brief:\n"
@@ -372,14 +851,31 @@ async def run_chapter_generation_crew(session: AsyncSession, chapter_id: uuid.UU
             f"- Narrative Arc: {brief_data.get('narrative_arc', 'N/A')}\n"
             f"- Required Inclusions: {', '.join(brief_data.get('required_inclusions', ['N/A']))}\n"
             f"- Key Questions to Answer: {', '.join(brief_data.get('key_questions_to_answer', ['N/A']))}\n\n"
+            f"{retrieved_context}"
             "Write the full content of this chapter. Ensure it adheres to the brief."
         )
         
-        logger.info(f"✍️ {chapter.suggested_agent} generating content for chapter {chapter.chapter_number} - '{chapter.title}'...")
+        job_key = checkpoint_key("chapter_generation", chapter_id)
+        sections = prepare_chapter_section_briefs(brief_data, settings.CHAPTER_SECTION_MAX) if sectioned else []
+        task_name = f"Chapter: Ch {chapter.chapter_number} - {chapter.title[:30]}..."
 
         try:
-            run_result: RunResult = await _execute_agent_run(agent_instance, agent_input)
-        except CircuitBreakerError:
+            if len(sections) > 1:
+                logger.info(f"✍️ {chapter.suggested_agent} drafting chapter {chapter.chapter_number} - '{chapter.title}' in {len(sections)} parallel sections...")
+                content, runs, job_keys = await _draft_chapter_in_sections(
+                    chapter, brief_data, sections, retrieved_context, project_id
+                )
+                generated_token_count = sum(_extract_total_tokens(run_result) for _, run_result in runs)
+            else:
+                logger.info(f"✍️ {chapter.suggested_agent} generating content for chapter {chapter.chapter_number} - '{chapter.title}'...")
+                run_result: RunResult = await _execute_checkpointed_run(
+                    job_key, chapter.suggested_agent, PHASE_CHAPTER_GENERATION, agent_input, StringOutput, project_id
+                )
+                content_output: StringOutput = run_result.final_output_as(StringOutput)
+                content = content_output.text if content_output else None
+                generated_token_count = _extract_total_tokens(run_result)
+                runs, job_keys = [(task_name, run_result)], [job_key]
+        except CircuitOpenError:
             logger.error(f"🔴 Circuit breaker is OPEN for OpenAI API. Cannot perform Chapter content generation for chapter {chapter_id}.")
             if chapter:
                 chapter.status = "API_CIRCUIT_OPEN"
@@ -389,44 +885,26 @@ async def run_chapter_generation_crew(session: AsyncSession, chapter_id: uuid.UU
             logger.exception(f"❌ Error during agent execution for Chapter content generation for chapter {chapter_id}: {e}")
             raise
         
-        content_output: StringOutput = run_result.final_output_as(StringOutput)
-        content = content_output.text if content_output else None
-
-        # Extract token count from run_result.usage
-        generated_token_count = 0
-        # More robust extraction logic
-        response_usage = getattr(run_result, 'raw_responses', [None])[0] # Get the first raw response
-        if response_usage and hasattr(response_usage, 'usage'):
-            usage_data = getattr(response_usage, 'usage')
-            if hasattr(usage_data, 'total_tokens'):
-                generated_token_count = usage_data.total_tokens
-            elif hasattr(usage_data, 'input_tokens') and hasattr(usage_data, 'output_tokens'):
-                generated_token_count = usage_data.input_tokens + usage_data.output_tokens
-            # Fallback to dict if usage is dict-like
-            elif isinstance(usage_data, dict):
-                generated_token_count = usage_data.get('total_tokens', 0)
-                if generated_token_count == 0:
-                    generated_token_count = usage_data.get('input_tokens', 0) + usage_data.get('output_tokens', 0)
-
-
         if content:
+            # The checkpoints are deleted in the same commit as the new content.
+            await clear_checkpoints(session, *job_keys)
            # 1. Update content and save version
             await update_chapter_content(session=session, chapter_id=chapter.id, content=content, token_count=generated_token_count)
             # 2. Set the status
             await update_chapter_status(session=session, chapter_id=chapter.id, new_status="CONTENT_GENERATED")
             logger.info(f"✅ Content generated successfully for chapter: {chapter_id}. Status set to CONTENT_GENERATED.")
             
-            # Log token usage via log_crew_run
-            if hasattr(run_result, 'raw_responses') and run_result.raw_responses and hasattr(run_result.raw_responses[0], 'usage'):
-                task_name = f"Chapter: Ch {chapter.chapter_number} - {chapter.title[:30]}..."
-                await log_crew_run(
-                    session=session,
-                    project_id=project_id,
-                    initiating_task_name=task_name,
-                    usage_metrics=run_result
-                )
-            else:
-                logger.warning(f"⚠️ No usage metrics available in raw_responses for Chapter Content Generation run for chapter {chapter_id}.")
+            # Log token usage via log_crew_run (one entry per section and bridge in sectioned mode)
+            for run_task_name, run_result in runs:
+                if hasattr(run_result, 'raw_responses') and run_result.raw_responses and hasattr(run_result.raw_responses[0], 'usage'):
+                    await log_crew_run(
+                        session=session,
+                        project_id=project_id,
+                        initiating_task_name=run_task_name,
+                        usage_metrics=run_result
+                    )
+                else:
+                    logger.warning(f"⚠️ No usage metrics available in raw_responses for Chapter Content Generation run for chapter {chapter_id}.")
             return True
         else:
             logger.error(f"❌ Content generation failed for chapter: {chapter_id}. Agent returned no content.")
@@ -445,6 +923,18 @@ async def run_chapter_generation_crew(session: AsyncSession, chapter_id: uuid.UU
         logger.critical(f"🔥 Critical error during Chapter content generation{chapter_status_message}: {e}", exc_info=True)
         return False
 
+# Characters taken from each side of a chapter boundary for transition analysis
+TRANSITION_SNIPPET_LENGTH = 500
+
+def _build_transition_input(preceding_end: str, current_start: str) -> str:
+    """Builds the Continuity Editor prompt for one chapter boundary."""
+    return (
+        f"Analyze the transition between two chapters and provide actionable feedback to improve narrative flow.\n\n"
+        f"Previous Chapter Ending (last {TRANSITION_SNIPPET_LENGTH} chars):\n{preceding_end}\n\n"
+        f"Current Chapter Beginning (first {TRANSITION_SNIPPET_LENGTH} chars):\n{current_start}"
+    )
+
+@clears_checkpoints_on_failure
 async def run_transition_analysis_crew(session: AsyncSession, chapter_id: uuid.UUID) -> bool:
     logger.info(f"🚀 Starting transition analysis for chapter: {chapter_id}")
     current_chapter = None
@@ -457,12 +947,10 @@ async def run_transition_analysis_crew(session: AsyncSession, chapter_id: uuid.U
 
         project_id = current_chapter.part.project_id
 
-        part_chapters_stmt = select(Chapter).where(
-            Chapter.part_id == current_chapter.part_id
-        ).order_by(Chapter.chapter_number)
-        
-        result = await session.execute(part_chapters_stmt)
-        chapters_in_part = result.scalars().all()
+        # Only the boundary snippets of the part's chapters are fetched.
+        chapters_in_part = await get_transition_snippets(
+            session, part_id=current_chapter.part_id, snippet_length=TRANSITION_SNIPPET_LENGTH
+        )
         
         try:
             current_index = [c.id for c in chapters_in_part].index(current_chapter.id)
@@ -478,34 +966,32 @@ async def run_transition_analysis_crew(session: AsyncSession, chapter_id: uuid.U
             return True
 
         preceding_chapter = chapters_in_part[current_index - 1]
+        current_snippets = chapters_in_part[current_index]
 
-        if not current_chapter.content:
+        if not current_snippets.head:
             error_msg = f"❌ Transition analysis failed: Current chapter {current_chapter.id} content is missing."
             logger.error(error_msg)
             current_chapter.status = "CONTENT_MISSING_FOR_TRANSITION"
             await session.commit()
             raise ValueError(error_msg)
         
-        if not preceding_chapter.content:
+        if not preceding_chapter.tail:
             error_msg = f"❌ Transition analysis failed: Preceding chapter {preceding_chapter.id} content is missing."
             logger.error(error_msg)
             current_chapter.status = "CONTENT_MISSING_FOR_TRANSITION"
             await session.commit()
             raise ValueError(error_msg)
 
-        agent_instance = continuity_editor_agent
-
-        agent_input = (
-            f"Analyze the transition between two chapters and provide actionable feedback to improve narrative flow.\n\n"
-            f"Previous Chapter Ending (last 500 chars):\n{preceding_chapter.content[-500:]}\n\n"
-            f"Current Chapter Beginning (first 500 chars):\n{current_chapter.content[:500]}"
-        )
+        agent_input = _build_transition_input(preceding_chapter.tail, current_snippets.head)
+        job_key = checkpoint_key("transition_analysis", chapter_id)
         
         logger.info(f"✂️ Continuity Editor AI analyzing transition for chapter {current_chapter.chapter_number}...")
 
         try:
-            run_result: RunResult = await _execute_agent_run(agent_instance, agent_input)
-        except CircuitBreakerError:
+            run_result: RunResult = await _execute_checkpointed_run(
+                job_key, "Continuity Editor AI", PHASE_TRANSITION_ANALYSIS, agent_input, StringOutput, project_id
+            )
+        except CircuitOpenError:
             logger.error(f"🔴 Circuit breaker is OPEN for OpenAI API. Cannot perform Transition analysis for chapter {chapter_id}.")
             if current_chapter:
                 current_chapter.status = "API_CIRCUIT_OPEN"
@@ -521,6 +1007,7 @@ async def run_transition_analysis_crew(session: AsyncSession, chapter_id: uuid.U
         if feedback:
             current_chapter.transition_feedback = feedback
             current_chapter.status = "TRANSITION_ANALYZED"
+            await clear_checkpoints(session, job_key)
             await session.commit()
             logger.info(f"✅ Transition analysis complete for chapter: {chapter_id}. Feedback saved.")
             
@@ -553,11 +1040,125 @@ async def run_transition_analysis_crew(session: AsyncSession, chapter_id: uuid.U
         return False
 
 
+@clears_checkpoints_on_failure
+async def run_batch_transition_analysis_crew(
+    session: AsyncSession,
+    project_id: uuid.UUID | None = None,
+    part_id: uuid.UUID | None = None,
+) -> bool:
+    """
+    Analyzes every chapter transition of a part (part_id) or a whole book
+    (project_id) in one job. Only the boundary snippets are fetched, the
+    adjacent pairs are analyzed concurrently, and all feedback, statuses and
+    run logs are written in a single transaction.
+    Returns True if every transition was analyzed successfully.
+    """
+    scope = f"part {part_id}" if part_id else f"project {project_id}"
+    logger.info(f"🚀 Starting batch transition analysis for {scope}")
+    try:
+        rows = await get_transition_snippets(
+            session, project_id=project_id, part_id=part_id, snippet_length=TRANSITION_SNIPPET_LENGTH
+        )
+        if not rows:
+            logger.error(f"❌ Batch transition analysis failed: No chapters found for {scope}.")
+            return False
+        project_id = rows[0].project_id
+
+        # Same semantics as the single-chapter job: transitions are analyzed
+        # between consecutive chapters of the same part.
+        updates: dict[uuid.UUID, dict] = {}
+        pairs = []  # (preceding row, current row)
+        for index, row in enumerate(rows):
+            if index == 0 or rows[index - 1].part_id != row.part_id:
+                updates[row.id] = {
+                    "id": row.id,
+                    "transition_feedback": "First chapter - no transition needed.",
+                    "status": "TRANSITION_DONE",
+                }
+            elif not row.head or not rows[index - 1].tail:
+                logger.warning(f"⚠️ Skipping transition for chapter {row.id}: content missing on one side of the boundary.")
+                updates[row.id] = {"id": row.id, "status": "CONTENT_MISSING_FOR_TRANSITION"}
+            else:
+                pairs.append((rows[index - 1], row))
+
+        semaphore = asyncio.Semaphore(settings.TRANSITION_BATCH_CONCURRENCY)
+
+        async def analyze(preceding, current) -> "RunResult":
+            async with semaphore:
+                return await _execute_checkpointed_run(
+                    checkpoint_key("transition_analysis", current.id), "Continuity Editor AI",
+                    PHASE_TRANSITION_ANALYSIS, _build_transition_input(preceding.tail, current.head),
+                    StringOutput, project_id
+                )
+
+        logger.info(f"✂️ Continuity Editor AI analyzing {len(pairs)} transitions for {scope}...")
+        results = await asyncio.gather(*(analyze(p, c) for p, c in pairs), return_exceptions=True)
+
+        run_logs = []
+        all_succeeded = all(update["status"] != "CONTENT_MISSING_FOR_TRANSITION" for update in updates.values())
+        for (preceding, current), run_result in zip(pairs, results):
+            if isinstance(run_result, CircuitOpenError):
+                logger.error(f"🔴 Circuit breaker is OPEN for OpenAI API. Transition for chapter {current.id} not analyzed.")
+                updates[current.id] = {"id": current.id, "status": "API_CIRCUIT_OPEN"}
+                all_succeeded = False
+                continue
+            if isinstance(run_result, BaseException):
+                logger.error(f"❌ Error during agent execution for Transition analysis for chapter {current.id}: {run_result}")
+                updates[current.id] = {"id": current.id, "status": "TRANSITION_ANALYSIS_ERROR"}
+                all_succeeded = False
+                continue
+
+            feedback_output: StringOutput = run_result.final_output_as(StringOutput)
+            feedback = feedback_output.text if feedback_output else None
+            if not feedback:
+                updates[current.id] = {"id": current.id, "status": "TRANSITION_ANALYSIS_FAILED"}
+                all_succeeded = False
+                continue
+
+            updates[current.id] = {"id": current.id, "transition_feedback": feedback, "status": "TRANSITION_ANALYZED"}
+            run_log = _build_crew_run_log(
+                project_id, f"Transition: Part {current.part_number} Ch {current.chapter_number}", run_result
+            )
+            if run_log is not None:
+                run_logs.append(run_log)
+
+        # --- Single transaction for all feedback, statuses and run logs ---
+        # Rows without a feedback key keep their existing feedback, so the
+        # bulk UPDATE is grouped by the set of columns it touches.
+        for columns in {tuple(sorted(u)) for u in updates.values()}:
+            batch = [u for u in updates.values() if tuple(sorted(u)) == columns]
+            await session.execute(update(Chapter), batch)
+        session.add_all(run_logs)
+        await clear_checkpoints(session, *(
+            checkpoint_key("transition_analysis", u["id"]) for u in updates.values() if u["status"] == "TRANSITION_ANALYZED"
+        ))
+        batch_cost = sum((log.total_cost for log in run_logs), Decimal("0"))
+        if run_logs:
+            await session.execute(
+                update(Project)
+                .where(Project.id == project_id)
+                .values(total_cost=Project.total_cost + batch_cost)
+            )
+        await session.commit()
+
+        logger.info(
+            f"✅ Batch transition analysis for {scope} complete: {len(pairs)} transitions analyzed, "
+            f"{len(run_logs)} runs logged, cost ${batch_cost:.6f}."
+        )
+        return all_succeeded
+
+    except Exception as e:
+        await session.rollback()
+        logger.critical(f"🔥 Critical error during batch transition analysis for {scope}: {e}", exc_info=True)
+        return False
+
+
+@clears_checkpoints_on_failure
 async def run_finalization_crew(session: AsyncSession, project_id: uuid.UUID, task_type: str) -> bool:
     logger.info(f"🚀 Starting Finalization Task ({task_type}) for project: {project_id}")
     project = None
     try:
-        project = await get_project_with_details(session, project_id=project_id)
+        project = await get_project_with_details(session, project_id=project_id, with_content=True)
         if not project:
             logger.error(f"❌ Finalization failed: Project {project_id} not found.")
             return False
@@ -579,19 +1180,21 @@ async def run_finalization_crew(session: AsyncSession, project_id: uuid.UUID, ta
             await session.commit()
             return False
 
-        agent_instance = theorist_agent
-
         agent_input = (
             f"You are writing the {task_type} for a book.\n"
             f"The full content of the book is provided below. Synthesize it into a compelling {task_type}.\n\n"
             f"Book Content:\n{full_book_content}"
         )
         
+        job_key = checkpoint_key("finalization", project_id, task_type.lower())
+
         logger.info(f"🎓 Theorist AI generating {task_type} for project {project_id}...")
 
         try:
-            run_result: RunResult = await _execute_agent_run(agent_instance, agent_input)
-        except CircuitBreakerError:
+            run_result: RunResult = await _execute_checkpointed_run(
+                job_key, "Theorist AI", PHASE_FINALIZATION, agent_input, StringOutput, project.id
+            )
+        except CircuitOpenError:
             logger.error(f"🔴 Circuit breaker is OPEN for OpenAI API. Cannot perform Finalization ({task_type}) for project {project_id}.")
             if project:
                 project.status = "API_CIRCUIT_OPEN"
@@ -610,19 +1213,16 @@ async def run_finalization_crew(session: AsyncSession, project_id: uuid.UUID, ta
                 part_number = 0 # Convention for introduction part
                 chapter_number = 1
                 title = "Introduction"
-                # Check if an introduction part already exists (part_number 0)
-                final_part = next((p for p in project.parts if p.part_number == part_number), None)
             elif task_type.lower() == 'conclusion':
-                # Find the maximum existing part number and add 1
-                max_part_number = max((p.part_number for p in project.parts), default=0)
-                part_number = max_part_number + 1
+                # After the last part of the outline
+                part_number = max((p.part_number for p in project.parts if p.finalization is None), default=0) + 1
                 chapter_number = 1
                 title = "Conclusion"
-                # Check if a conclusion part with this number already exists
-                final_part = next((p for p in project.parts if p.part_number == part_number), None)
             else:
                 logger.error(f"❌ Finalization failed: Invalid task_type '{task_type}'. Must be 'introduction' or 'conclusion'.")
                 return False
+            # A rerun rewrites the part written by the previous one
+            final_part = next((p for p in project.parts if p.finalization == task_type.lower()), None)
 
             if not final_part:
                 # Create a new part for introduction/conclusion if it doesn't exist
@@ -630,7 +1230,9 @@ async def run_finalization_crew(session: AsyncSession, project_id: uuid.UUID, ta
                     project_id=project.id,
                     part_number=part_number,
                     title=f"The Book's {title}",
-                    summary=f"This part contains the book's {task_type}."
+                    summary=f"This part contains the book's {task_type}.",
+                    finalization=task_type.lower(),
+                    chapters=[] # Initialized so the check below doesn't lazy-load in async
                 )
                 session.add(final_part)
                 await session.flush() # Flush to get an ID for the new part immediately
@@ -659,6 +1261,7 @@ async def run_finalization_crew(session: AsyncSession, project_id: uuid.UUID, ta
                 session.add(new_chapter)
 
             project.status = "COMPLETE" # Project is considered complete after finalization
+            await clear_checkpoints(session, job_key)
             await session.commit()
             logger.info(f"✅ {task_type} created/updated successfully for project {project_id}. Project status: {project.status}.")
 
@@ -1,6 +1,6 @@
 # src/crew/tasks.py
-
-from typing import Dict
+import re
+from typing import Dict, List
 
 from src.project.schemas import ChapterRead
 from .schemas import PartListOutline, ChapterListOutline
@@ -45,4 +45,39 @@ def prepare_finalization_inputs(task_type: str, full_book_content: str) -> dict:
     return {
         "task_type": task_type,
         "full_book_content": full_book_content
-    }
\ No newline at end of file
+    }
+
+def _split_narrative_arc(narrative_arc: str) -> List[str]:
+    """Splits a narrative arc into its steps: sentences, or comma-separated clauses for a one-sentence arc."""
+    steps = [s.strip() for s in re.split(r"(?<=[.;!?])\s+|\n+", narrative_arc) if s.strip()]
+    if len(steps) == 1:
+        clauses = [c.strip() for c in re.split(r",\s*(?:and\s+)?(?=then\b|finally\b|next\b|followed\b)|;\s*", steps[0]) if c.strip()]
+        if len(clauses) > 1:
+            steps = clauses
+    return steps
+
+def prepare_chapter_section_briefs(brief: dict, max_sections: int) -> List[dict]:
+    """
+    Splits a chapter brief into section briefs for parallel drafting.
+    Consecutive narrative arc steps are grouped into at most `max_sections`
+    sections; key questions and required inclusions are dealt out
+    round-robin, so each one is covered by exactly one section.
+    Returns a single section when the arc cannot be split.
+    """
+    steps = _split_narrative_arc(brief.get("narrative_arc") or "")
+    count = max(1, min(max_sections, len(steps)))
+
+    sections = []
+    start = 0
+    for index in range(count):
+        size = len(steps) // count + (1 if index < len(steps) % count else 0)
+        sections.append({
+            "index": index + 1,
+            "count": count,
+            "narrative_arc": " ".join(steps[start:start + size]),
+            "key_questions_to_answer": (brief.get("key_questions_to_answer") or [])[index::count],
+            "required_inclusions": (brief.get("required_inclusions") or [])[index::count],
+        })
+        start += size
+    return sections
+
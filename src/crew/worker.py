@@ -1,37 +1,75 @@
 # src/crew/worker.py
+import functools
+import random
 import uuid
 import logging # NEW: Import logging module
+from pathlib import Path
 from arq.connections import RedisSettings
+from arq.worker import Retry, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.core.circuit_breaker import track_refusals
 from src.core.database import AsyncSessionFactory
 from src.core.config import settings
 from .service import (
     run_part_generation_crew,
     run_chapter_detailing_crew,
+    run_chapter_prefetch_crew,
     run_chapter_generation_crew,
     run_transition_analysis_crew,
+    run_batch_transition_analysis_crew,
     run_finalization_crew
 )
+from .autopilot import run_project_autopilot, RUN_FAILED
+from .checkpoints import bind_job, resume_interrupted_jobs
+from src.core.redis_manager import redis_manager
 from src.core.task_queue import task_queue # Ensure task_queue is imported and configured
+from src.project.export import write_book_export
+from src.project.schemas import ExportFormat
 
 
 # NEW: Get a logger instance for this module
 logger = logging.getLogger(__name__)
 
 # Configure task_queue when the worker module is imported, before WorkerSettings uses it
-# This ensures redis_settings is available for ARQ.
-task_queue.configure(settings.REDIS_URL)
+# This ensures redis_settings is available for ARQ. In embedded mode the API
+# process has configured it already and imports this module to run the jobs.
+if task_queue.backend is None:
+    task_queue.configure(settings.REDIS_URL, backend=settings.QUEUE_BACKEND)
 
 
+def defer_on_open_circuit(worker):
+    """
+    Re-queues a job that did not succeed because a model circuit was open
+    (its entity is left as API_CIRCUIT_OPEN), for when the circuit lets a
+    probe through, instead of failing it. Jittered so that the jobs refused
+    during an outage do not all come back at once. Counts as a try.
+    """
+    @functools.wraps(worker)
+    async def wrapper(ctx, *args, **kwargs):
+        refusals = track_refusals()
+        result = await worker(ctx, *args, **kwargs)
+        if refusals and result.get("status") != "success":
+            defer = max(refusals.values()) + random.uniform(0, settings.CIRCUIT_BREAKER_RETRY_JITTER_SECONDS)
+            logger.warning(f"🔴 Job {ctx.get('job_id')} refused by open circuits {sorted(refusals)}; re-queued in {defer:.0f}s.")
+            raise Retry(defer=defer)
+        return result
+    return wrapper
+
+
+@defer_on_open_circuit
 async def part_generation_worker(ctx, project_id: uuid.UUID) -> dict:
     """Worker for generating book parts"""
     logger.info(f"Worker received part_generation job for project {project_id}")
+    bind_job(ctx, "part_generation_worker", project_id)
     async with AsyncSessionFactory() as session:
         try:
             success = await run_part_generation_crew(session, project_id)
             status_msg = "success" if success else "failure"
             logger.info(f"Part generation job for project {project_id} finished with status: {status_msg}")
+            if success and settings.SPECULATIVE_CHAPTER_DETAILING:
+                # Detail the drafted parts' chapters while a person reviews the parts.
+                await task_queue.enqueue("chapter_prefetch_worker", project_id)
             return {
                 "status": status_msg,
                 "project_id": str(project_id)
@@ -45,9 +83,11 @@ async def part_generation_worker(ctx, project_id: uuid.UUID) -> dict:
             }
 
 
+@defer_on_open_circuit
 async def chapter_detailing_worker(ctx, part_id: uuid.UUID) -> dict:
     """Worker for generating chapter details"""
     logger.info(f"Worker received chapter_detailing job for part {part_id}")
+    bind_job(ctx, "chapter_detailing_worker", part_id)
     async with AsyncSessionFactory() as session:
         try:
             success = await run_chapter_detailing_crew(session, part_id)
@@ -63,12 +103,34 @@ async def chapter_detailing_worker(ctx, part_id: uuid.UUID) -> dict:
             }
 
 
-async def chapter_generation_worker(ctx, chapter_id: uuid.UUID) -> dict:
-    """Worker for generating chapter content"""
+@defer_on_open_circuit
+async def chapter_prefetch_worker(ctx, project_id: uuid.UUID) -> dict:
+    """Worker for speculatively detailing the chapters of drafted parts"""
+    logger.info(f"Worker received chapter_prefetch job for project {project_id}")
+    bind_job(ctx, "chapter_prefetch_worker", project_id)
+    async with AsyncSessionFactory() as session:
+        try:
+            success = await run_chapter_prefetch_crew(session, project_id)
+            status_msg = "success" if success else "failure"
+            logger.info(f"Chapter prefetch job for project {project_id} finished with status: {status_msg}")
+            return {"status": status_msg, "project_id": str(project_id)}
+        except Exception as e:
+            logger.exception(f"❌ Chapter prefetch worker encountered an error for project {project_id}: {e}")
+            return {
+                "status": "error",
+                "project_id": str(project_id),
+                "error": str(e)
+            }
+
+
+@defer_on_open_circuit
+async def chapter_generation_worker(ctx, chapter_id: uuid.UUID, sectioned: bool | None = None) -> dict:
+    """Worker for generating chapter content (sectioned=None uses CHAPTER_SECTION_PARALLEL)"""
     logger.info(f"Worker received chapter_generation job for chapter {chapter_id}")
+    bind_job(ctx, "chapter_generation_worker", chapter_id, sectioned)
     async with AsyncSessionFactory() as session:
         try:
-            success = await run_chapter_generation_crew(session, chapter_id)
+            success = await run_chapter_generation_crew(session, chapter_id, sectioned=sectioned)
             status_msg = "success" if success else "failure"
             logger.info(f"Chapter generation job for chapter {chapter_id} finished with status: {status_msg}")
             return {"status": status_msg, "chapter_id": str(chapter_id)}
@@ -81,9 +143,11 @@ async def chapter_generation_worker(ctx, chapter_id: uuid.UUID) -> dict:
             }
 
 
+@defer_on_open_circuit
 async def transition_analysis_worker(ctx, chapter_id: uuid.UUID) -> dict:
     """Worker for analyzing chapter transitions"""
     logger.info(f"Worker received transition_analysis job for chapter {chapter_id}")
+    bind_job(ctx, "transition_analysis_worker", chapter_id)
     async with AsyncSessionFactory() as session:
         try:
             success = await run_transition_analysis_crew(session, chapter_id)
@@ -99,9 +163,32 @@ async def transition_analysis_worker(ctx, chapter_id: uuid.UUID) -> dict:
             }
 
 
+@defer_on_open_circuit
+async def batch_transition_analysis_worker(ctx, project_id: uuid.UUID | None = None, part_id: uuid.UUID | None = None) -> dict:
+    """Worker for analyzing every chapter transition of a part or a whole book"""
+    scope = {"part_id": str(part_id)} if part_id else {"project_id": str(project_id)}
+    logger.info(f"Worker received batch_transition_analysis job for {scope}")
+    bind_job(ctx, "batch_transition_analysis_worker", project_id, part_id)
+    async with AsyncSessionFactory() as session:
+        try:
+            success = await run_batch_transition_analysis_crew(session, project_id=project_id, part_id=part_id)
+            status_msg = "success" if success else "failure"
+            logger.info(f"Batch transition analysis job for {scope} finished with status: {status_msg}")
+            return {"status": status_msg, **scope}
+        except Exception as e:
+            logger.exception(f"❌ Batch transition analysis worker encountered an error for {scope}: {e}")
+            return {
+                "status": "error",
+                **scope,
+                "error": str(e)
+            }
+
+
+@defer_on_open_circuit
 async def finalization_worker(ctx, project_id: uuid.UUID, task_type: str) -> dict:
     """Worker for writing introduction/conclusion"""
     logger.info(f"Worker received finalization job ({task_type}) for project {project_id}")
+    bind_job(ctx, "finalization_worker", project_id, task_type)
     async with AsyncSessionFactory() as session:
         try:
             success = await run_finalization_crew(session, project_id, task_type)
@@ -120,13 +207,99 @@ async def finalization_worker(ctx, project_id: uuid.UUID, task_type: str) -> dic
                 "error": str(e)
             }
 
+async def book_export_worker(ctx, project_id: uuid.UUID, export_format: str, title: str | None = None) -> dict:
+    """Worker for writing the assembled book to disk"""
+    logger.info(f"Worker received book_export job ({export_format}) for project {project_id}")
+    async with AsyncSessionFactory() as session:
+        try:
+            fmt = ExportFormat(export_format)
+            destination = Path(settings.EXPORT_DIR) / f"book-{project_id}.{fmt.file_extension}"
+            path = await write_book_export(session, project_id, fmt, destination, title)
+            logger.info(f"Book export job ({export_format}) for project {project_id} finished: {path}")
+            return {
+                "status": "success",
+                "project_id": str(project_id),
+                "format": fmt.value,
+                "path": str(path)
+            }
+        except Exception as e:
+            logger.exception(f"❌ Book export worker ({export_format}) encountered an error for project {project_id}: {e}")
+            return {
+                "status": "error",
+                "project_id": str(project_id),
+                "error": str(e)
+            }
+
+@defer_on_open_circuit
+async def autopilot_worker(ctx, run_id: uuid.UUID) -> dict:
+    """Worker for driving a project through the whole pipeline"""
+    logger.info(f"Worker received autopilot job for run {run_id}")
+    bind_job(ctx, "autopilot_worker", run_id)
+    try:
+        run_status = await run_project_autopilot(run_id)
+        logger.info(f"Autopilot job for run {run_id} finished with status: {run_status}")
+        return {
+            "status": "failure" if run_status == RUN_FAILED else "success",
+            "run_id": str(run_id),
+            "run_status": run_status
+        }
+    except Exception as e:
+        logger.exception(f"❌ Autopilot worker encountered an error for run {run_id}: {e}")
+        return {
+            "status": "error",
+            "run_id": str(run_id),
+            "error": str(e)
+        }
+
+async def worker_startup(ctx) -> None:
+    """Connects the task queue jobs enqueue into, then resumes interrupted jobs."""
+    if "redis" in ctx:
+        # arq opened a pool for this worker; share it rather than opening another
+        redis_manager.adopt(ctx["redis"])
+    elif settings.uses_redis():
+        # Postgres queue with REDIS_URL: share circuit breakers with the API and other workers
+        redis_manager.configure(settings.REDIS_URL)
+        await redis_manager.connect()
+    elif settings.QUEUE_BACKEND == "postgres":
+        logger.warning("⚠️ No Redis (REDIS_URL is not set): circuit breakers are per worker process, not shared.")
+    await task_queue.connect()
+    # Re-enqueue jobs interrupted by a previous shutdown; they resume from their checkpoints
+    await resume_interrupted_jobs(ctx)
+
+
+async def worker_shutdown(ctx) -> None:
+    await task_queue.close()
+    # Closes the pool only if worker_startup opened it (arq closes its own)
+    await redis_manager.close()
+
+
+async def job_start(ctx) -> None:
+    # Lane bookkeeping for admission control (a no-op unless the backend needs it)
+    await task_queue.backend.job_started(ctx)
+
+
+async def job_end(ctx) -> None:
+    await task_queue.backend.job_ended(ctx)
+
+
 class WorkerSettings:
-    """ARQ worker settings with all task handlers"""
+    """Worker settings with all task handlers (read by arq and by src.core.pg_queue)"""
     functions = [
         part_generation_worker,
         chapter_detailing_worker,
+        chapter_prefetch_worker,
         chapter_generation_worker,
         transition_analysis_worker,
-        finalization_worker
+        batch_transition_analysis_worker,
+        finalization_worker,
+        book_export_worker,
+        # A whole book takes far longer than arq's default 5-minute job timeout.
+        func(autopilot_worker, timeout=settings.AUTOPILOT_JOB_TIMEOUT)
     ]
-    redis_settings = task_queue.redis_settings
\ No newline at end of file
+    redis_settings = task_queue.redis_settings
+    on_startup = worker_startup
+    on_shutdown = worker_shutdown
+    on_job_start = job_start
+    after_job_end = job_end
+    # DELETE /crew/jobs/{job_id} aborts jobs (arq polls its abort set)
+    allow_abort_jobs = True
\ No newline at end of file
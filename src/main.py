@@ -1,16 +1,20 @@
 # src/main.py
 from fastapi import FastAPI
+from src.core.circuit_breaker import CIRCUIT_OPEN
 from src.core.config import settings
-from src.core.database import Base, engine
+from src.core.database import check_schema_revision, create_schema
+from src.core.redis_manager import redis_manager
 from src.core.task_queue import task_queue
 from src.project.chapter_router import router as chapter_router
 from src.project.router import router as project_router
 from src.project.part_router import router as part_router
 from src.crew.router import router as crew_router
+from src.crew.service import llm_circuit_breaker
+from src.crew.hedging import hedging_report
+from src.crew.repair import repair_report
 
 # NEW IMPORTS for Rate Limiter
 from fastapi_limiter import FastAPILimiter
-from redis.asyncio import Redis # Use async Redis client
 
 # NEW: Import CORSMiddleware
 from fastapi.middleware.cors import CORSMiddleware
@@ -40,25 +44,47 @@ app.add_middleware(
 @app.on_event("startup")
 async def startup_event():
     logger.info("Application startup initiated.")
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-        logger.info("Database schema creation/check completed.")
+    if settings.EMBEDDED_MODE:
+        # Single process, no Redis: the local database is created from the
+        # models, jobs run in this process and rate limits are kept in memory.
+        await create_schema()
+        task_queue.configure(settings.REDIS_URL, backend="memory")
+        # The job runners start in the background; jobs enqueued before they
+        # are up wait for them (see src/core/memory_queue.py).
+        task_queue.backend.start()
+        logger.info("Embedded mode: task queue starting in process.")
+        logger.info("Application startup complete.")
+        return
+
+    await check_schema_revision(settings.SCHEMA_REVISION_CHECK)
+    logger.info("Database schema revision check completed.")
     
-    task_queue.configure(settings.REDIS_URL)
+    if settings.uses_redis():
+        # One pool for every Redis user of this process: queue, rate limiter, status lookups
+        redis_manager.configure(settings.REDIS_URL)
+        await redis_manager.connect()
+
+    task_queue.configure(settings.REDIS_URL, backend=settings.QUEUE_BACKEND)
     await task_queue.connect()
-    logger.info("Task queue connected to Redis.")
+    logger.info(f"Task queue connected ({settings.QUEUE_BACKEND} backend).")
 
-    redis_client = Redis.from_url(settings.REDIS_URL, encoding="utf-8", decode_responses=True)
-    await FastAPILimiter.init(redis_client)
-    logger.info("⚡ FastAPILimiter initialized.")
+    if redis_manager.connected:
+        await FastAPILimiter.init(redis_manager.client)
+        logger.info("⚡ FastAPILimiter initialized.")
+    else:
+        logger.warning(
+            "⚠️ No Redis (REDIS_URL is not set): rate limits and token budgets are counted in this process, "
+            "and circuit breakers are per process, not shared with other API pods and workers."
+        )
     logger.info("Application startup complete.")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Application shutdown initiated.")
     await task_queue.close()
-    await FastAPILimiter.close()
-    logger.info("🔌 FastAPILimiter closed.")
+    # FastAPILimiter shares the manager's client; closing the manager closes it.
+    await redis_manager.close()
+    logger.info("🔌 Redis connections closed.")
     logger.info("Application shutdown complete.")
 
 
@@ -70,4 +96,29 @@ app.include_router(crew_router)
 @app.get("/", tags=["Health Check"])
 async def health_check():
     logger.debug("Health check requested.") # Example of debug logging
-    return {"status": "ok", "version": settings.APP_VERSION}
\ No newline at end of file
+    return {"status": "ok", "version": settings.APP_VERSION}
+
+@app.get("/health/redis", tags=["Health Check"])
+async def redis_health_check():
+    """Pings Redis and reports the connection pool's usage."""
+    if not redis_manager.connected:
+        return {"status": "disabled", "pool": redis_manager.metrics()}
+    healthy = await redis_manager.ping()
+    return {"status": "ok" if healthy else "unavailable", "pool": redis_manager.metrics()}
+
+@app.get("/metrics", tags=["Health Check"])
+async def metrics():
+    """
+    Redis pool usage of this process, the state of the model circuit breakers
+    (shared by all processes) and, per hedged agent, the p99 latency of hedged
+    calls against unhedged ones with the extra spend of hedging, and how
+    invalid structured outputs were repaired.
+    """
+    circuits = await llm_circuit_breaker.states()
+    return {
+        "redis_pool": redis_manager.metrics(),
+        "circuits": circuits,
+        "open_circuits": sorted(name for name, circuit in circuits.items() if circuit["state"] == CIRCUIT_OPEN),
+        "hedging": await hedging_report(),
+        "output_repairs": await repair_report(),
+    }
@@ -2,14 +2,17 @@
 # src/project/chapter_router.py
 import uuid
 # NEW: Import HTTPException
-from fastapi import APIRouter, Depends, status, Body, HTTPException
+from fastapi import APIRouter, Depends, status, Body, HTTPException, Query
 from pydantic import BaseModel, Field
 
 from src.core.task_queue import task_queue
+from src.core.admission import QueueAdmission, QueueLoad
 from src.project.schemas import ChapterRead
 from src.crew.schemas import TaskStatus
 from src.project.dependencies import valid_chapter_id
-from fastapi_limiter.depends import RateLimiter
+from src.core.rate_limit import RateLimiter, TokenBudget
+from src.crew import cost_estimate
+from src.crew.cancellation import cancel_superseded_chapter_jobs, chapter_project_id, track_job
 from src.project import service 
 # NEW: Import AsyncSession and get_db_session
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -32,7 +35,8 @@ async def review_chapter_content(
 ):
     """
     Allows a user to review and optionally edit generated chapter content,
-    and set its status to 'CONTENT_REVIEWED'. A new version is saved.
+    and set its status to 'CONTENT_REVIEWED'. A new version is saved, and
+    pending jobs working on the previous content are cancelled.
     """
     updated_chapter = await service.update_chapter_content(
         session=session,
@@ -49,6 +53,7 @@ async def review_chapter_content(
         )
     if not updated_chapter:
         raise HTTPException(status_code=404, detail="Chapter not found after update")
+    await cancel_superseded_chapter_jobs(session, updated_chapter.id)
     return updated_chapter
 
 @router.post(
@@ -56,17 +61,26 @@ async def review_chapter_content(
     status_code=status.HTTP_202_ACCEPTED,
     response_model=TaskStatus,
     summary="Queue Chapter Content Generation",
-    dependencies=[Depends(RateLimiter(times=20, seconds=60))] # NEW: 20 requests per minute (can be many chapters)
+    dependencies=[
+        Depends(RateLimiter(times=20, seconds=60)), # NEW: 20 requests per minute (can be many chapters)
+        Depends(TokenBudget(cost_estimate.estimate_chapter_generation)),
+    ]
 )
 async def queue_chapter_generation(
     chapter: ChapterRead = Depends(valid_chapter_id),
+    sectioned: bool | None = Query(
+        None, description="Draft the chapter as concurrent sections stitched together. Defaults to the server setting."
+    ),
+    session: AsyncSession = Depends(get_db_session),
+    load: QueueLoad = Depends(QueueAdmission("chapter_generation_worker")),
 ):
     """
     Queues a background job to write the content for a specific chapter
     using the dynamically selected AI agent.
     """
-    job = await task_queue.enqueue("chapter_generation_worker", chapter.id)
-    return TaskStatus(job_id=job.job_id, status="queued")
+    job = await task_queue.enqueue("chapter_generation_worker", chapter.id, sectioned)
+    await track_job(session, job, "chapter_generation_worker", await chapter_project_id(session, chapter.id), chapter.id)
+    return TaskStatus(job_id=job.job_id, status="queued", queue_depth=load.depth, eta_seconds=load.eta_seconds)
 
 
 # --- NEW ENDPOINT ---
@@ -75,10 +89,15 @@ async def queue_chapter_generation(
     status_code=status.HTTP_202_ACCEPTED,
     response_model=TaskStatus,
     summary="Queue Transition Analysis",
-    dependencies=[Depends(RateLimiter(times=30, seconds=60))] # NEW: Higher rate for analysis
+    dependencies=[
+        Depends(RateLimiter(times=30, seconds=60)), # NEW: Higher rate for analysis
+        Depends(TokenBudget(cost_estimate.estimate_transition_analysis)),
+    ]
 )
 async def queue_transition_analysis(
     chapter: ChapterRead = Depends(valid_chapter_id),
+    session: AsyncSession = Depends(get_db_session),
+    load: QueueLoad = Depends(QueueAdmission("transition_analysis_worker")),
 ):
     """
     Queues a background job for the Continuity Editor AI to analyze the
@@ -86,7 +105,8 @@ async def queue_transition_analysis(
     The feedback is saved directly to the chapter in the database.
     """
     job = await task_queue.enqueue("transition_analysis_worker", chapter.id)
-    return TaskStatus(job_id=job.job_id, status="queued")
+    await track_job(session, job, "transition_analysis_worker", await chapter_project_id(session, chapter.id), chapter.id)
+    return TaskStatus(job_id=job.job_id, status="queued", queue_depth=load.depth, eta_seconds=load.eta_seconds)
 
 class ChapterReviewRequest(BaseModel):
     content: str = Field(..., description="The reviewed or edited content for the chapter.")
@@ -105,7 +125,8 @@ async def review_chapter_content(
 ):
     """
     Allows a user to review and optionally edit generated chapter content,
-    and set its status. A new version of the content is saved.
+    and set its status. A new version of the content is saved, and pending
+    jobs working on the previous content are cancelled.
     """
     # Save the new content (this also creates a new version)
     updated_chapter = await service.update_chapter_content(
@@ -126,6 +147,7 @@ async def review_chapter_content(
     
     if not updated_chapter:
         raise HTTPException(status_code=404, detail=f"Chapter with ID {chapter.id} not found or failed to update.")
-    
+
+    await cancel_superseded_chapter_jobs(session, updated_chapter.id)
     return updated_chapter
 
@@ -0,0 +1,268 @@
+# src/project/export.py
+import html
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from .models import Part, Chapter
+from .schemas import ExportFormat
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched per round-trip from the server-side cursor. Each row carries at
+# most one chapter's content, so memory is bounded by the largest chapters,
+# never by the size of the book.
+EXPORT_CURSOR_BATCH_SIZE = 16
+# Size of the chunks used when copying a finished EPUB to the HTTP response.
+EXPORT_COPY_CHUNK_SIZE = 64 * 1024
+
+DEFAULT_BOOK_TITLE = "Untitled Manuscript"
+
+
+async def _iter_book_rows(session: AsyncSession, project_id: uuid.UUID):
+    """
+    Streams (part, chapter) rows of a project in reading order from a
+    server-side cursor. Parts without chapters yield one row with NULL chapter
+    columns so their heading is still exported.
+    """
+    stmt = (
+        select(
+            Part.part_number,
+            Part.title.label("part_title"),
+            Part.summary.label("part_summary"),
+            Chapter.chapter_number,
+            Chapter.title.label("chapter_title"),
+            Chapter.content,
+        )
+        .select_from(Part)
+        .outerjoin(Chapter, Chapter.part_id == Part.id)
+        .where(Part.project_id == project_id)
+        .order_by(Part.part_number, Chapter.chapter_number)
+        .execution_options(yield_per=EXPORT_CURSOR_BATCH_SIZE)
+    )
+    result = await session.stream(stmt)
+    async for row in result:
+        yield row
+
+
+def _paragraphs_to_html(text: str) -> str:
+    """Converts plain chapter text into escaped HTML paragraphs."""
+    paragraphs = [p.strip() for p in text.split("\n\n") if p.strip()]
+    return "\n".join(
+        f"<p>{html.escape(p).replace(chr(10), '<br/>')}</p>" for p in paragraphs
+    )
+
+
+# --- Markdown ---
+
+async def _iter_markdown(session: AsyncSession, project_id: uuid.UUID, title: str) -> AsyncIterator[str]:
+    yield f"# {title}\n"
+    current_part = None
+    async for row in _iter_book_rows(session, project_id):
+        if row.part_number != current_part:
+            current_part = row.part_number
+            yield f"\n## Part {row.part_number}: {row.part_title}\n"
+            if row.part_summary:
+                yield f"\n_{row.part_summary.strip()}_\n"
+        if row.chapter_number is None:
+            continue
+        yield f"\n### Chapter {row.chapter_number}: {row.chapter_title}\n\n"
+        if row.content:
+            yield row.content.strip() + "\n"
+
+
+# --- HTML ---
+
+_HTML_HEAD = (
+    "<!DOCTYPE html>\n<html lang=\"en\">\n<head>\n<meta charset=\"utf-8\"/>\n"
+    "<title>{title}</title>\n</head>\n<body>\n<h1>{title}</h1>\n"
+)
+
+async def _iter_html(session: AsyncSession, project_id: uuid.UUID, title: str) -> AsyncIterator[str]:
+    yield _HTML_HEAD.format(title=html.escape(title))
+    current_part = None
+    async for row in _iter_book_rows(session, project_id):
+        if row.part_number != current_part:
+            if current_part is not None:
+                yield "</section>\n"
+            current_part = row.part_number
+            yield f"<section class=\"part\">\n<h2>Part {row.part_number}: {html.escape(row.part_title)}</h2>\n"
+            if row.part_summary:
+                yield f"<p class=\"part-summary\"><em>{html.escape(row.part_summary.strip())}</em></p>\n"
+        if row.chapter_number is None:
+            continue
+        yield f"<h3>Chapter {row.chapter_number}: {html.escape(row.chapter_title)}</h3>\n"
+        if row.content:
+            yield _paragraphs_to_html(row.content) + "\n"
+    if current_part is not None:
+        yield "</section>\n"
+    yield "</body>\n</html>\n"
+
+
+# --- EPUB ---
+
+_EPUB_CONTAINER = (
+    "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n"
+    "<container version=\"1.0\" xmlns=\"urn:oasis:names:tc:opendocument:xmlns:container\">\n"
+    "  <rootfiles>\n"
+    "    <rootfile full-path=\"OEBPS/content.opf\" media-type=\"application/oebps-package+xml\"/>\n"
+    "  </rootfiles>\n"
+    "</container>\n"
+)
+
+_EPUB_XHTML = (
+    "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n"
+    "<!DOCTYPE html>\n"
+    "<html xmlns=\"http://www.w3.org/1999/xhtml\" xmlns:epub=\"http://www.idpf.org/2007/ops\" lang=\"en\">\n"
+    "<head><meta charset=\"utf-8\"/><title>{title}</title></head>\n"
+    "<body>\n{body}\n</body>\n</html>\n"
+)
+
+
+def _epub_package(title: str, book_id: str, items: list[tuple[str, str, str]]) -> str:
+    manifest = "\n".join(
+        f"    <item id=\"{item_id}\" href=\"{href}\" media-type=\"application/xhtml+xml\"/>"
+        for item_id, href, _ in items
+    )
+    spine = "\n".join(f"    <itemref idref=\"{item_id}\"/>" for item_id, _, _ in items)
+    modified = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+    return (
+        "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n"
+        "<package xmlns=\"http://www.idpf.org/2007/opf\" version=\"3.0\" unique-identifier=\"book-id\">\n"
+        "  <metadata xmlns:dc=\"http://purl.org/dc/elements/1.1/\">\n"
+        f"    <dc:identifier id=\"book-id\">urn:uuid:{book_id}</dc:identifier>\n"
+        f"    <dc:title>{html.escape(title)}</dc:title>\n"
+        "    <dc:language>en</dc:language>\n"
+        f"    <meta property=\"dcterms:modified\">{modified}</meta>\n"
+        "  </metadata>\n"
+        "  <manifest>\n"
+        "    <item id=\"nav\" href=\"nav.xhtml\" media-type=\"application/xhtml+xml\" properties=\"nav\"/>\n"
+        f"{manifest}\n"
+        "  </manifest>\n"
+        "  <spine>\n"
+        f"{spine}\n"
+        "  </spine>\n"
+        "</package>\n"
+    )
+
+
+def _epub_nav(title: str, items: list[tuple[str, str, str]]) -> str:
+    entries = "\n".join(
+        f"<li><a href=\"{href}\">{html.escape(label)}</a></li>" for _, href, label in items
+    )
+    body = f"<nav epub:type=\"toc\" id=\"toc\"><h1>{html.escape(title)}</h1>\n<ol>\n{entries}\n</ol>\n</nav>"
+    return _EPUB_XHTML.format(title=html.escape(title), body=body)
+
+
+async def _write_epub(session: AsyncSession, project_id: uuid.UUID, title: str, fileobj: BinaryIO) -> None:
+    """
+    Writes the book as an EPUB 3 archive to a seekable binary file object.
+    Every part and chapter becomes its own XHTML document, written to the
+    archive as soon as its row arrives; only the table of contents entries
+    (ids and titles) are kept until the end.
+    """
+    items: list[tuple[str, str, str]] = []  # (manifest id, href, toc label)
+    with zipfile.ZipFile(fileobj, "w") as archive:
+        # The mimetype entry must come first and be stored uncompressed.
+        archive.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        archive.writestr("META-INF/container.xml", _EPUB_CONTAINER, compress_type=zipfile.ZIP_DEFLATED)
+
+        current_part = None
+        async for row in _iter_book_rows(session, project_id):
+            if row.part_number != current_part:
+                current_part = row.part_number
+                label = f"Part {row.part_number}: {row.part_title}"
+                item_id = f"part-{len(items)}"
+                body = f"<h1>{html.escape(label)}</h1>"
+                if row.part_summary:
+                    body += f"\n<p><em>{html.escape(row.part_summary.strip())}</em></p>"
+                archive.writestr(
+                    f"OEBPS/{item_id}.xhtml",
+                    _EPUB_XHTML.format(title=html.escape(label), body=body),
+                    compress_type=zipfile.ZIP_DEFLATED,
+                )
+                items.append((item_id, f"{item_id}.xhtml", label))
+            if row.chapter_number is None:
+                continue
+            label = f"Chapter {row.chapter_number}: {row.chapter_title}"
+            item_id = f"chapter-{len(items)}"
+            body = f"<h2>{html.escape(label)}</h2>\n{_paragraphs_to_html(row.content or '')}"
+            archive.writestr(
+                f"OEBPS/{item_id}.xhtml",
+                _EPUB_XHTML.format(title=html.escape(label), body=body),
+                compress_type=zipfile.ZIP_DEFLATED,
+            )
+            items.append((item_id, f"{item_id}.xhtml", label))
+
+        archive.writestr("OEBPS/nav.xhtml", _epub_nav(title, items), compress_type=zipfile.ZIP_DEFLATED)
+        archive.writestr(
+            "OEBPS/content.opf", _epub_package(title, str(project_id), items), compress_type=zipfile.ZIP_DEFLATED
+        )
+
+
+# --- Public API ---
+
+async def iter_book_export(
+    session: AsyncSession,
+    project_id: uuid.UUID,
+    export_format: ExportFormat,
+    title: str | None = None,
+) -> AsyncIterator[bytes]:
+    """
+    Yields the assembled book as encoded chunks, part by part and chapter by
+    chapter. Markdown and HTML are streamed straight from the database cursor.
+    An EPUB is a ZIP archive whose index is written last, so it is assembled in
+    an on-disk temporary file first and then streamed out in fixed-size chunks.
+    """
+    title = title or DEFAULT_BOOK_TITLE
+    logger.info(f"Streaming {export_format.value} export for project {project_id}.")
+
+    if export_format == ExportFormat.EPUB:
+        with tempfile.TemporaryFile() as spool:
+            await _write_epub(session, project_id, title, spool)
+            spool.seek(0)
+            while chunk := spool.read(EXPORT_COPY_CHUNK_SIZE):
+                yield chunk
+        return
+
+    text_chunks = _iter_markdown if export_format == ExportFormat.MARKDOWN else _iter_html
+    async for chunk in text_chunks(session, project_id, title):
+        yield chunk.encode("utf-8")
+
+
+async def write_book_export(
+    session: AsyncSession,
+    project_id: uuid.UUID,
+    export_format: ExportFormat,
+    destination: Path,
+    title: str | None = None,
+) -> Path:
+    """
+    Writes the assembled book to `destination`. The file is written under a
+    temporary name and moved into place once complete, so readers never see a
+    partial export.
+    """
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=destination.parent, prefix=f".{destination.name}.", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            if export_format == ExportFormat.EPUB:
+                await _write_epub(session, project_id, title or DEFAULT_BOOK_TITLE, out)
+            else:
+                async for chunk in iter_book_export(session, project_id, export_format, title):
+                    out.write(chunk)
+        shutil.move(tmp_name, destination)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    logger.info(f"Export for project {project_id} written to {destination}.")
+    return destination
@@ -0,0 +1,219 @@
+# src/project/ingest.py
+"""
+Bulk ingest of blueprint files, for onboarding many books at once:
+
+    python -m src.project.ingest books --enqueue --concurrency 8
+
+Every file matching --pattern (default: input.json) under the directory
+becomes a project. Its raw blueprint is:
+  - the "raw_blueprint" string of a JSON object that has one (as in
+    books/book1/input.txt, ingested with --pattern input.txt);
+  - else the JSON document itself, pretty-printed (books/book1/input.json);
+  - else the file's text.
+Projects are created with multi-row INSERTs of --batch-size rows. With
+--enqueue, part generation is then queued for each new project, at most
+--concurrency enqueues at a time and within the queue's admission limits
+(a refused enqueue waits for its Retry-After, up to --admission-timeout).
+
+Files that cannot be read, batches that fail to insert and projects whose
+job could not be queued are reported, without stopping the run; the exit
+status is 1 if there was any failure.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from fastapi import HTTPException
+from sqlalchemy import insert
+
+from src.core.admission import QueueAdmission
+from src.core.config import settings
+from src.core.database import AsyncSessionFactory
+from src.core.task_queue import task_queue
+from .models import Project
+
+logger = logging.getLogger(__name__)
+
+PART_GENERATION_JOB = "part_generation_worker"
+
+
+@dataclass
+class IngestReport:
+    files: int = 0
+    created: int = 0
+    enqueued: int = 0
+    # (file or project, reason)
+    failures: list[tuple[str, str]] = field(default_factory=list)
+    insert_seconds: float = 0.0
+    enqueue_seconds: float = 0.0
+
+    def summary(self) -> str:
+        lines = [f"{self.files} blueprint files, {self.created} projects created in {self.insert_seconds:.2f}s"
+                 f" ({self.created / self.insert_seconds if self.insert_seconds else 0:.0f}/s)"]
+        if self.enqueue_seconds:
+            lines.append(f"{self.enqueued} part generation jobs queued in {self.enqueue_seconds:.2f}s"
+                         f" ({self.enqueued / self.enqueue_seconds:.0f}/s)")
+        lines.append(f"{len(self.failures)} failures")
+        lines.extend(f"  {source}: {reason}" for source, reason in self.failures)
+        return "\n".join(lines)
+
+
+def find_blueprints(root: Path, pattern: str) -> list[Path]:
+    return sorted(path for path in root.rglob(pattern) if path.is_file())
+
+
+def read_blueprint(path: Path) -> str:
+    """The raw blueprint of a file (see the module docstring). Raises ValueError if it is empty."""
+    text = path.read_text(encoding="utf-8")
+    try:
+        document = json.loads(text)
+    except json.JSONDecodeError:
+        document = None
+    if isinstance(document, dict) and isinstance(document.get("raw_blueprint"), str):
+        blueprint = document["raw_blueprint"]
+    elif isinstance(document, (dict, list)):
+        blueprint = json.dumps(document, indent=2, ensure_ascii=False)
+    else:
+        blueprint = text
+    if not blueprint.strip():
+        raise ValueError("empty blueprint")
+    return blueprint
+
+
+async def insert_projects(
+    blueprints: list[tuple[Path, str]], batch_size: int, report: IngestReport
+) -> list[uuid.UUID]:
+    """Creates a project per blueprint, one multi-row INSERT per batch. Returns the new project ids."""
+    created = []
+    started = time.perf_counter()
+    for start in range(0, len(blueprints), batch_size):
+        batch = blueprints[start:start + batch_size]
+        rows = [{"id": uuid.uuid4(), "raw_blueprint": blueprint} for _, blueprint in batch]
+        try:
+            async with AsyncSessionFactory() as session:
+                await session.execute(insert(Project), rows)
+                await session.commit()
+        except Exception as e:
+            logger.error(f"❌ Could not insert {len(batch)} projects: {e}")
+            report.failures.extend((str(path), f"insert failed: {e}") for path, _ in batch)
+            continue
+        created.extend(row["id"] for row in rows)
+        logger.info(f"Inserted {len(created)}/{len(blueprints)} projects.")
+    report.created = len(created)
+    report.insert_seconds = time.perf_counter() - started
+    return created
+
+
+async def _enqueue_part_generation(project_id: uuid.UUID, admission_timeout: float) -> None:
+    # Imported here: the crew package is only needed to queue jobs
+    from src.crew.cancellation import track_job
+
+    admission = QueueAdmission(PART_GENERATION_JOB)
+    deadline = time.monotonic() + admission_timeout
+    while True:
+        try:
+            await admission()
+            break
+        except HTTPException as e:
+            retry_after = float(e.headers.get("Retry-After", 1))
+            if time.monotonic() + retry_after > deadline:
+                raise RuntimeError(f"refused by the queue: {e.detail['message']}") from e
+            await asyncio.sleep(retry_after)
+
+    job = await task_queue.enqueue(PART_GENERATION_JOB, project_id)
+    async with AsyncSessionFactory() as session:
+        await track_job(session, job, PART_GENERATION_JOB, project_id, project_id)
+
+
+async def enqueue_part_generation(
+    project_ids: list[uuid.UUID], concurrency: int, admission_timeout: float, report: IngestReport
+) -> None:
+    """Queues part generation for each project, at most `concurrency` at a time."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def enqueue(project_id: uuid.UUID) -> None:
+        async with semaphore:
+            try:
+                await _enqueue_part_generation(project_id, admission_timeout)
+                report.enqueued += 1
+            except Exception as e:
+                logger.error(f"❌ Could not queue part generation for project {project_id}: {e}")
+                report.failures.append((f"project {project_id}", f"enqueue failed: {e}"))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(enqueue(project_id) for project_id in project_ids))
+    report.enqueue_seconds = time.perf_counter() - started
+
+
+async def ingest(
+    root: Path,
+    *,
+    pattern: str = "input.json",
+    batch_size: int = 500,
+    enqueue: bool = False,
+    concurrency: int = 8,
+    admission_timeout: float = 600.0,
+) -> IngestReport:
+    """Creates a project per blueprint file under `root`, optionally queuing part generation for each."""
+    report = IngestReport()
+    blueprints = []
+    for path in find_blueprints(root, pattern):
+        report.files += 1
+        try:
+            blueprints.append((path, read_blueprint(path)))
+        except (OSError, UnicodeDecodeError, ValueError) as e:
+            report.failures.append((str(path), f"unreadable: {e}"))
+    logger.info(f"📚 Found {report.files} blueprint files under {root}, {len(blueprints)} readable.")
+
+    project_ids = await insert_projects(blueprints, batch_size, report)
+    if enqueue and project_ids:
+        task_queue.configure(settings.REDIS_URL, backend=settings.QUEUE_BACKEND)
+        await task_queue.connect()
+        try:
+            await enqueue_part_generation(project_ids, concurrency, admission_timeout, report)
+        finally:
+            await task_queue.close()
+    return report
+
+
+def main(argv: list[str] | None = None) -> None:
+    from src.core.logging import configure_logging
+
+    parser = argparse.ArgumentParser(description="Create a project per blueprint file of a directory tree.")
+    parser.add_argument("root", type=Path, help="Directory to scan, e.g. books")
+    parser.add_argument("--pattern", default="input.json", help="File name pattern of the blueprints (default: input.json)")
+    parser.add_argument("--batch-size", type=int, default=500, help="Projects per INSERT (default: 500)")
+    parser.add_argument("--enqueue", action="store_true", help="Queue part generation for each new project")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent enqueues (default: 8)")
+    parser.add_argument(
+        "--admission-timeout", type=float, default=600.0,
+        help="Seconds an enqueue may wait for the queue to admit it (default: 600)",
+    )
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    if not args.root.is_dir():
+        parser.error(f"{args.root} is not a directory")
+    if args.enqueue and settings.EMBEDDED_MODE:
+        parser.error("--enqueue needs a shared queue; in embedded mode, jobs only run in the app's process")
+
+    report = asyncio.run(ingest(
+        args.root,
+        pattern=args.pattern,
+        batch_size=args.batch_size,
+        enqueue=args.enqueue,
+        concurrency=args.concurrency,
+        admission_timeout=args.admission_timeout,
+    ))
+    print(report.summary())
+    sys.exit(1 if report.failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,59 @@
 # src/project/models.py
 import uuid
-from sqlalchemy import Column, String, TEXT, Integer, Numeric, DateTime, ForeignKey, UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, TEXT, Integer, Numeric, DateTime, ForeignKey, UUID, Index, FetchedValue
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.types import JSON
 from datetime import datetime
 from src.core.database import Base
 
+# --- Deferred column groups ---
+# Large TEXT/JSON columns are not loaded with their row. A query that needs
+# them asks for their group with `undefer_group(...)` (see project/service.py);
+# everything else only pays for the small columns.
+PROJECT_BLUEPRINT = "project_blueprint"
+PROJECT_DRAFTS = "project_drafts"
+PROJECT_SPECULATIVE_DRAFTS = "project_speculative_drafts"
+PROJECT_SUMMARY_OUTLINE = "project_summary_outline"
+CHAPTER_BRIEF = "chapter_brief"
+CHAPTER_CONTENT = "chapter_content"
+CHAPTER_FEEDBACK = "chapter_feedback"
+CHAPTER_VERSION_CONTENT = "chapter_version_content"
+
+# Briefs and outlines are JSONB on PostgreSQL, so they can be GIN-indexed and
+# filtered server-side (see query_chapter_briefs); plain JSON elsewhere.
+JSON_DOCUMENT = JSON().with_variant(JSONB(), "postgresql")
+# Full-text search documents (see project/search.py). On PostgreSQL they are
+# generated columns maintained by the database from the row's text; the ORM
+# never writes them and only the search queries read them.
+SEARCH_DOCUMENT = TEXT().with_variant(TSVECTOR(), "postgresql")
+
 class Project(Base):
     __tablename__ = "projects"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    raw_blueprint = Column(TEXT, nullable=False)
+    raw_blueprint = deferred(Column(TEXT, nullable=False), group=PROJECT_BLUEPRINT)
     # structured_outline = Column(JSON, nullable=True) # OLD: Remove or comment out this line
     
     # NEW: Dedicated JSON columns for drafts
-    draft_parts_outline = Column(JSON, nullable=True) # Will store PartListOutline JSON
-    draft_chapters_outline = Column(JSON, nullable=True) # Will store a map: {part_id: ChapterListOutline JSON}
+    draft_parts_outline = deferred(Column(JSON_DOCUMENT, nullable=True), group=PROJECT_DRAFTS) # Will store PartListOutline JSON
+    # Chapter outlines prepared while the parts await validation: {part_outline_key(title, summary): ChapterListOutline JSON}
+    speculative_chapters_outline = deferred(Column(JSON_DOCUMENT, nullable=True), group=PROJECT_SPECULATIVE_DRAFTS)
 
     status = Column(String, default="RAW_IDEA", nullable=False)
-    summary_outline = Column(TEXT, nullable=True) # Keep existing
+    summary_outline = deferred(Column(TEXT, nullable=True), group=PROJECT_SUMMARY_OUTLINE) # Keep existing
     total_cost = Column(Numeric(10, 8), nullable=False, default=0.0)
     parts = relationship("Part", back_populates="project", cascade="all, delete-orphan")
+    # Written row by row through project/service.py (save_part_chapter_draft), never through the ORM
+    chapter_drafts = relationship("PartChapterDraft", viewonly=True)
+
+    @property
+    def draft_chapters_outline(self) -> dict | None:
+        """
+        The drafted chapter outlines as a map {part_id: ChapterListOutline JSON},
+        as exposed by ProjectRead. Needs `chapter_drafts` to be loaded, which
+        the `with_drafts` loaders of project/service.py do.
+        """
+        return {str(draft.part_id): draft.outline for draft in self.chapter_drafts} or None
 
 class Part(Base):
     __tablename__ = "parts"
@@ -30,6 +64,9 @@ class Part(Base):
     summary = Column(TEXT, nullable=True)
 
     status = Column(String, default="DEFINED", nullable=False)
+    # "introduction" or "conclusion" for the parts written by the finalization
+    # step; None for the parts of the outline.
+    finalization = Column(String, nullable=True)
 
     project = relationship("Project", back_populates="parts")
     chapters = relationship("Chapter", back_populates="part", cascade="all, delete-orphan", order_by="Chapter.chapter_number")
@@ -40,12 +77,18 @@ class Chapter(Base):
     part_id = Column(UUID(as_uuid=True), ForeignKey("parts.id"), nullable=False)
     chapter_number = Column(Integer, nullable=False)
     title = Column(String, nullable=False)
-    brief = Column(JSON, nullable=True)
-    content = Column(TEXT, nullable=True)
+    brief = deferred(Column(JSON_DOCUMENT, nullable=True), group=CHAPTER_BRIEF)
+    content = deferred(Column(TEXT, nullable=True), group=CHAPTER_CONTENT)
     status = Column(String, default="BRIEF_COMPLETE")
     suggested_agent = Column(String, nullable=True)
-    transition_feedback = Column(TEXT, nullable=True)
+    transition_feedback = deferred(Column(TEXT, nullable=True), group=CHAPTER_FEEDBACK)
+    search_vector = deferred(Column(SEARCH_DOCUMENT, nullable=True, server_default=FetchedValue(), server_onupdate=FetchedValue()))
     part = relationship("Part", back_populates="chapters")
+    __table_args__ = (
+        # jsonb_path_ops: containment (@>) lookups such as {"required_inclusions": ["..."]}
+        Index("chapters_brief_idx", "brief", postgresql_using="gin", postgresql_ops={"brief": "jsonb_path_ops"}),
+        Index("chapters_search_vector_idx", "search_vector", postgresql_using="gin"),
+    )
     versions = relationship(
         "ChapterVersion",
         backref="chapter_object", # Renamed backref to avoid conflict with `chapter` column name (if one existed, though unlikely here)
@@ -57,6 +100,38 @@ class ChapterVersion(Base):
     __tablename__ = "chapter_versions"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     chapter_id = Column(UUID(as_uuid=True), ForeignKey("chapters.id", ondelete="CASCADE"), nullable=False)
-    content = Column(TEXT, nullable=False)
+    content = deferred(Column(TEXT, nullable=False), group=CHAPTER_VERSION_CONTENT)
     token_count = Column(Integer, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    search_vector = deferred(Column(SEARCH_DOCUMENT, nullable=True, server_default=FetchedValue(), server_onupdate=FetchedValue()))
+    __table_args__ = (
+        Index("chapter_versions_search_vector_idx", "search_vector", postgresql_using="gin"),
+    )
+class PartChapterDraft(Base):
+    """
+    A part's chapter outline awaiting validation (ChapterListOutline JSON).
+    One row per part: parts detailed concurrently each upsert their own row.
+    """
+    __tablename__ = "part_chapter_drafts"
+    part_id = Column(UUID(as_uuid=True), ForeignKey("parts.id", ondelete="CASCADE"), primary_key=True)
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False, index=True)
+    outline = Column(JSON_DOCUMENT, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    __table_args__ = (
+        Index("part_chapter_drafts_outline_idx", "outline", postgresql_using="gin", postgresql_ops={"outline": "jsonb_path_ops"}),
+    )
+
+class ChapterPassage(Base):
+    """
+    One paragraph-sized chunk of a chapter's current content, with the term
+    statistics the BM25 passage index needs (see project/retrieval.py).
+    Rebuilt for a chapter whenever its content is updated.
+    """
+    __tablename__ = "chapter_passages"
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False, index=True)
+    chapter_id = Column(UUID(as_uuid=True), ForeignKey("chapters.id", ondelete="CASCADE"), nullable=False, index=True)
+    position = Column(Integer, nullable=False) # Order of the chunk within the chapter
+    text = Column(TEXT, nullable=False)
+    term_counts = Column(JSON, nullable=False) # {term: occurrences in this chunk}
+    length = Column(Integer, nullable=False) # Number of indexed terms in the chunk
@@ -0,0 +1,75 @@
+# src/project/outline_diff.py
+"""
+Diff between a validated outline (parts of a project, chapters of a part)
+and the rows already stored for it, so that finalization only writes what
+changed (see finalize_part_structure and finalize_chapter_structure).
+
+Outline entries carry no row id, so each entry is matched to a stored row
+by title (ignoring case and surrounding spaces), then the entries left by
+number: renaming a part keeps its row, as does moving a chapter. Matched
+rows keep their id, status, content and history.
+"""
+import uuid
+from dataclasses import dataclass, field
+from typing import Any
+
+
+@dataclass(frozen=True)
+class OutlineRow:
+    # None for an outline entry
+    id: uuid.UUID | None
+    number: int
+    title: str
+    # The other columns the outline sets, e.g. {"summary": ...}
+    fields: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class OutlineDiff:
+    # Outline entries without a stored row
+    inserts: list[OutlineRow] = field(default_factory=list)
+    # Stored rows whose title or fields change: id -> the matched entry
+    updates: dict[uuid.UUID, OutlineRow] = field(default_factory=dict)
+    # Stored rows whose number changes: id -> new number
+    renumbers: dict[uuid.UUID, int] = field(default_factory=dict)
+    # Stored rows missing from the outline
+    deletes: list[uuid.UUID] = field(default_factory=list)
+    # Stored rows the outline leaves exactly as they are
+    unchanged: list[uuid.UUID] = field(default_factory=list)
+
+    @property
+    def changed_ids(self) -> set[uuid.UUID]:
+        """Stored rows deleted, updated or renumbered."""
+        return set(self.deletes) | set(self.updates) | set(self.renumbers)
+
+
+def _title_key(title: str) -> str:
+    return " ".join(title.split()).casefold()
+
+
+def diff_outline(stored: list[OutlineRow], outline: list[OutlineRow]) -> OutlineDiff:
+    matches: dict[int, OutlineRow] = {}  # outline index -> stored row
+    unmatched = list(stored)
+    for pass_key in (lambda row: _title_key(row.title), lambda row: row.number):
+        for i, entry in enumerate(outline):
+            if i in matches:
+                continue
+            row = next((r for r in unmatched if pass_key(r) == pass_key(entry)), None)
+            if row is not None:
+                matches[i] = row
+                unmatched.remove(row)
+
+    diff = OutlineDiff(deletes=[row.id for row in unmatched])
+    for i, entry in enumerate(outline):
+        row = matches.get(i)
+        if row is None:
+            diff.inserts.append(entry)
+            continue
+        changed = row.title != entry.title or any(row.fields.get(k) != v for k, v in entry.fields.items())
+        if changed:
+            diff.updates[row.id] = entry
+        if row.number != entry.number:
+            diff.renumbers[row.id] = entry.number
+        if not changed and row.number == entry.number:
+            diff.unchanged.append(row.id)
+    return diff
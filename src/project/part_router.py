@@ -9,6 +9,7 @@ from . import service
 # Import the necessary schemas and dependencies
 from .schemas import PartReadWithChapters
 from src.crew.schemas import ChapterListOutline
+from src.crew.cancellation import cancel_superseded_part_jobs
 from .dependencies import valid_part_id
 
 router = APIRouter(
@@ -29,8 +30,11 @@ async def finalize_part_chapters(
 ):
     """
     Takes a validated list of Chapters for a specific Part and creates the
-    official Chapter records in the database.
+    official Chapter records in the database. Pending jobs working on the
+    chapters it deletes, edits or moves are cancelled.
     """
+    diff = await service.diff_chapter_structure(session, part_id, validated_chapters)
+    await cancel_superseded_part_jobs(session, part_id, list(diff.changed_ids))
     updated_part = await service.finalize_chapter_structure(
         session=session,
         part_id=part_id,
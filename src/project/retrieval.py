@@ -0,0 +1,205 @@
+# src/project/retrieval.py
+"""
+Lexical passage retrieval over a project's chapter content.
+
+Each chapter's current content is split into paragraph-sized passages, and
+their term counts are stored in `chapter_passages`. A chapter's passages are
+rebuilt in the same transaction as every content update, so the index is
+maintained incrementally and never needs a full rebuild. Queries are scored
+with Okapi BM25 in NumPy: only the query terms' columns of the passage-term
+matrix are materialized, and only the text of the top-k passages is fetched.
+Agents get a few relevant passages instead of whole chapters, so prompts
+stay small and bounded, without an external vector service.
+"""
+import logging
+import re
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from sqlalchemy import and_, delete, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from .models import Part, Chapter, ChapterPassage
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Standard Okapi BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Consecutive short paragraphs are merged into one passage up to this size.
+PASSAGE_TARGET_CHARS = 1200
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a about also an and any are as at be because been being but by can could did do does for from had has have "
+    "he her here his how i if in into is it its just may more most much must my no not of on once only or other "
+    "our out over own same she should so some such than that the their them then there these they this those "
+    "through to too under until up very was we were what when where which while who whom why will with would "
+    "you your".split()
+)
+
+
+@dataclass(frozen=True)
+class RetrievedPassage:
+    chapter_id: uuid.UUID
+    part_number: int
+    chapter_number: int
+    chapter_title: str
+    text: str
+    score: float
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased alphanumeric terms, without stopwords and one-letter tokens."""
+    return [t for t in _TOKEN_PATTERN.findall(text.lower()) if len(t) > 1 and t not in _STOPWORDS]
+
+
+def split_passages(content: str, target_chars: int = PASSAGE_TARGET_CHARS) -> list[str]:
+    """Splits content on blank lines, merging consecutive short paragraphs up to `target_chars`."""
+    passages: list[str] = []
+    current = ""
+    for paragraph in (p.strip() for p in content.split("\n\n")):
+        if not paragraph:
+            continue
+        if current and len(current) + len(paragraph) + 2 > target_chars:
+            passages.append(current)
+            current = paragraph
+        else:
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        passages.append(current)
+    return passages
+
+
+async def reindex_chapter_passages(
+    session: AsyncSession, project_id: uuid.UUID, chapter_id: uuid.UUID, content: str | None
+) -> int:
+    """
+    Replaces a chapter's passages with ones built from `content`, in the
+    caller's transaction (nothing is committed here). Returns the number of
+    passages indexed.
+    """
+    await session.execute(delete(ChapterPassage).where(ChapterPassage.chapter_id == chapter_id))
+    passages = []
+    for position, text in enumerate(split_passages(content or "")):
+        terms = tokenize(text)
+        if not terms:
+            continue
+        passages.append(ChapterPassage(
+            project_id=project_id,
+            chapter_id=chapter_id,
+            position=position,
+            text=text,
+            term_counts=dict(Counter(terms)),
+            length=len(terms),
+        ))
+    session.add_all(passages)
+    logger.debug(f"Indexed {len(passages)} passages for chapter {chapter_id}.")
+    return len(passages)
+
+
+async def _index_missing_chapters(session: AsyncSession, project_id: uuid.UUID) -> None:
+    """
+    Indexes chapters whose content predates the passage index (or was written
+    without update_chapter_content). Only those chapters' content is loaded.
+    """
+    indexed = select(ChapterPassage.chapter_id).where(ChapterPassage.project_id == project_id)
+    result = await session.execute(
+        select(Chapter.id, Chapter.content)
+        .join(Part, Chapter.part_id == Part.id)
+        .where(
+            Part.project_id == project_id,
+            Chapter.content.is_not(None),
+            Chapter.id.not_in(indexed),
+        )
+    )
+    missing = result.all()
+    for row in missing:
+        await reindex_chapter_passages(session, project_id, row.id, row.content)
+    if missing:
+        await session.flush()
+        logger.info(f"Indexed {len(missing)} previously unindexed chapters of project {project_id}.")
+
+
+def bm25_scores(term_counts: list[dict], lengths: "np.ndarray", query_terms: list[str]) -> "np.ndarray":
+    """
+    BM25 score of every passage for the query. Builds only the
+    (passages x query terms) slice of the term-frequency matrix.
+    """
+    import numpy as np
+
+    n_passages = len(term_counts)
+    tf = np.array([[counts.get(term, 0) for term in query_terms] for counts in term_counts], dtype=np.float64)
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((n_passages - df + 0.5) / (df + 0.5))
+    avg_length = lengths.mean() or 1.0
+    norm = BM25_K1 * (1.0 - BM25_B + BM25_B * lengths / avg_length)
+    return (idf * tf * (BM25_K1 + 1.0) / (tf + norm[:, None])).sum(axis=1)
+
+
+async def retrieve_passages(
+    session: AsyncSession,
+    project_id: uuid.UUID,
+    query: str,
+    top_k: int,
+    *,
+    before: tuple[int, int] | None = None,
+) -> list[RetrievedPassage]:
+    """
+    Returns the `top_k` passages of the project most relevant to `query`, best
+    first. With `before=(part_number, chapter_number)`, only chapters that come
+    earlier in reading order are searched.
+    """
+    query_terms = sorted(set(tokenize(query)))
+    if not query_terms or top_k <= 0:
+        return []
+
+    await _index_missing_chapters(session, project_id)
+
+    stmt = (
+        select(ChapterPassage.id, ChapterPassage.term_counts, ChapterPassage.length)
+        .join(Chapter, ChapterPassage.chapter_id == Chapter.id)
+        .join(Part, Chapter.part_id == Part.id)
+        .where(ChapterPassage.project_id == project_id)
+    )
+    if before is not None:
+        part_number, chapter_number = before
+        stmt = stmt.where(or_(
+            Part.part_number < part_number,
+            and_(Part.part_number == part_number, Chapter.chapter_number < chapter_number),
+        ))
+    rows = (await session.execute(stmt)).all()
+    if not rows:
+        return []
+
+    # NumPy is only needed to score queries, so it is imported on demand (it
+    # is a large share of the API's import time).
+    import numpy as np
+    lengths = np.fromiter((row.length for row in rows), dtype=np.float64, count=len(rows))
+    scores = bm25_scores([row.term_counts for row in rows], lengths, query_terms)
+    best = [i for i in np.argsort(-scores, kind="stable")[:top_k] if scores[i] > 0]
+    if not best:
+        return []
+
+    score_by_id = {rows[i].id: float(scores[i]) for i in best}
+    result = await session.execute(
+        select(ChapterPassage.id, ChapterPassage.chapter_id, ChapterPassage.text,
+               Part.part_number, Chapter.chapter_number, Chapter.title)
+        .join(Chapter, ChapterPassage.chapter_id == Chapter.id)
+        .join(Part, Chapter.part_id == Part.id)
+        .where(ChapterPassage.id.in_(score_by_id))
+    )
+    passages = [
+        RetrievedPassage(
+            chapter_id=row.chapter_id, part_number=row.part_number, chapter_number=row.chapter_number,
+            chapter_title=row.title, text=row.text, score=score_by_id[row.id],
+        )
+        for row in result.all()
+    ]
+    return sorted(passages, key=lambda p: p.score, reverse=True)
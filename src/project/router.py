@@ -1,14 +1,23 @@
 # src/project/router.py
 import uuid
 from typing import List # Make sure List is imported
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, status, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.core.database import get_db_session
+from src.core.database import get_db_session, AsyncSessionFactory
+from src.core.task_queue import task_queue
+from src.core.admission import QueueAdmission, QueueLoad
 from . import service
-from .schemas import ProjectCreate, ProjectRead, ProjectDetailRead
-from src.crew.schemas import PartListOutline
+from .export import iter_book_export
+from .search import search_manuscripts
+from .schemas import (
+    ProjectCreate, ProjectRead, ProjectDetailRead, ChapterRead, ChapterBriefMatch, ExportFormat,
+    ManuscriptSearchHit, ManuscriptSearchResults,
+)
+from src.crew.schemas import PartListOutline, TaskStatus
 from .dependencies import valid_project_id
+from src.core.rate_limit import RateLimiter
 
 router = APIRouter(
     prefix="/projects",
@@ -54,6 +63,35 @@ async def create_new_project(
     new_project = await service.create_project(session=session, project_data=project_data)
     return new_project
 
+# Declared before "/{project_id}" so that "search" is not taken for a project id
+@router.get(
+    "/search",
+    response_model=ManuscriptSearchResults,
+    summary="Full-Text Search Across Manuscripts",
+    dependencies=[Depends(RateLimiter(times=60, seconds=60))]
+)
+async def search_projects(
+    q: str = Query(..., min_length=1, max_length=200, description='Search terms; supports "phrases", -excluded and or.'),
+    project_id: uuid.UUID | None = Query(None, description="Only search this project."),
+    part_id: uuid.UUID | None = Query(None, description="Only search this part."),
+    include_versions: bool = Query(False, description="Also search saved chapter versions."),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    session: AsyncSession = Depends(get_db_session)
+):
+    """
+    Searches chapter content across the catalog, a project or a part. Results
+    are ranked by relevance and include highlighted excerpts.
+    """
+    hits, has_more = await search_manuscripts(
+        session, q, project_id=project_id, part_id=part_id,
+        include_versions=include_versions, limit=limit, offset=offset,
+    )
+    return ManuscriptSearchResults(
+        query=q, limit=limit, offset=offset, has_more=has_more,
+        results=[ManuscriptSearchHit.model_validate(hit) for hit in hits],
+    )
+
 @router.get(
     "/{project_id}",
     response_model=ProjectDetailRead,
@@ -67,7 +105,10 @@ async def get_project_details(
     Retrieves the full details of a project, including all its
     parts and chapters, for display on a dashboard.
     """
-    project = await service.get_project_with_details(session=session, project_id=project_id)
+    project = await service.get_project_with_details(
+        session=session, project_id=project_id,
+        with_blueprint=True, with_drafts=True, with_briefs=True
+    )
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     return project
@@ -95,3 +136,90 @@ async def finalize_project_parts(
     if not updated_project:
         raise HTTPException(status_code=404, detail="Project not found")
     return updated_project
+
+
+@router.get(
+    "/{project_id}/briefs",
+    response_model=List[ChapterBriefMatch],
+    summary="Query Chapter Briefs",
+    dependencies=[Depends(RateLimiter(times=30, seconds=60))]
+)
+async def query_chapter_briefs(
+    project: ProjectRead = Depends(valid_project_id),
+    part_id: uuid.UUID | None = Query(None, description="Only chapters of this part."),
+    agent: str | None = Query(None, description="Suggested agent, e.g. 'Historian AI'."),
+    chapter_status: str | None = Query(None, alias="status", description="Chapter status, e.g. 'BRIEF_COMPLETE'."),
+    inclusion: str | None = Query(None, description="Exact required inclusion (uses the brief index)."),
+    inclusion_mentions: str | None = Query(None, description="Text contained in any required inclusion."),
+    question_mentions: str | None = Query(None, description="Text contained in any key question."),
+    has_key_questions: bool | None = Query(None, description="false: chapters whose key-questions list is empty."),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    session: AsyncSession = Depends(get_db_session)
+):
+    """
+    Answers editorial questions about a project's chapter briefs (e.g. all
+    chapters assigned to Historian AI with no key questions) with filters
+    evaluated by the database, in reading order.
+    """
+    matches = await service.query_chapter_briefs(
+        session, project.id,
+        part_id=part_id, agent=agent, status=chapter_status,
+        inclusion=inclusion, inclusion_mentions=inclusion_mentions, question_mentions=question_mentions,
+        has_key_questions=has_key_questions, limit=limit, offset=offset,
+    )
+    return [
+        ChapterBriefMatch(**ChapterRead.model_validate(chapter).model_dump(), part_id=chapter.part_id, part_number=part_number)
+        for chapter, part_number in matches
+    ]
+
+@router.get(
+    "/{project_id}/export",
+    summary="Export the Assembled Book",
+    response_class=StreamingResponse,
+    dependencies=[Depends(RateLimiter(times=10, seconds=60))]
+)
+async def export_project(
+    project: ProjectRead = Depends(valid_project_id),
+    format: ExportFormat = Query(ExportFormat.MARKDOWN, description="Output format of the manuscript."),
+    title: str | None = Query(None, description="Book title used in headings and EPUB metadata."),
+):
+    """
+    Streams the whole manuscript, part by part and chapter by chapter, in
+    Markdown, HTML or EPUB. The book is never assembled in memory.
+    """
+    project_id = project.id
+
+    async def body():
+        # The response outlives the request-scoped session, so the stream
+        # opens its own session for the server-side cursor.
+        async with AsyncSessionFactory() as session:
+            async for chunk in iter_book_export(session, project_id, format, title):
+                yield chunk
+
+    filename = f"book-{project_id}.{format.file_extension}"
+    return StreamingResponse(
+        body(),
+        media_type=format.media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.post(
+    "/{project_id}/export",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=TaskStatus,
+    summary="Queue a Book Export to Disk",
+    dependencies=[Depends(RateLimiter(times=5, seconds=60))]
+)
+async def queue_project_export(
+    project: ProjectRead = Depends(valid_project_id),
+    format: ExportFormat = Query(ExportFormat.EPUB, description="Output format of the manuscript."),
+    title: str | None = Query(None, description="Book title used in headings and EPUB metadata."),
+    load: QueueLoad = Depends(QueueAdmission("book_export_worker")),
+):
+    """
+    Queues a background job that writes the manuscript to the export directory.
+    The job result contains the path of the written file.
+    """
+    job = await task_queue.enqueue("book_export_worker", project.id, format.value, title)
+    return TaskStatus(job_id=job.job_id, status="queued", queue_depth=load.depth, eta_seconds=load.eta_seconds)
@@ -1,7 +1,9 @@
 # src/project/schemas.py
 # src/project/schemas.py
 import uuid
+from datetime import datetime
 from decimal import Decimal
+from enum import Enum
 from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Dict, Any
 from src.crew.schemas import ChapterBrief
@@ -9,6 +11,25 @@ from pydantic import field_validator
 
 # --- Main Application Schemas ---
 
+class ExportFormat(str, Enum):
+    """Output formats supported by the whole-book export."""
+    MARKDOWN = "markdown"
+    HTML = "html"
+    EPUB = "epub"
+
+    @property
+    def media_type(self) -> str:
+        return {
+            ExportFormat.MARKDOWN: "text/markdown; charset=utf-8",
+            ExportFormat.HTML: "text/html; charset=utf-8",
+            ExportFormat.EPUB: "application/epub+zip",
+        }[self]
+
+    @property
+    def file_extension(self) -> str:
+        return {ExportFormat.MARKDOWN: "md", ExportFormat.HTML: "html", ExportFormat.EPUB: "epub"}[self]
+
+
 class ProjectCreate(BaseModel):
     """The schema for creating a project from a raw text blueprint."""
     # UPDATED: Renamed to match the new database model.
@@ -35,6 +56,8 @@ class PartRead(BaseModel):
     title: str
     summary: str | None = None
     status: str # NEW: Add the status field here
+    # "introduction" or "conclusion" for the parts written by finalization
+    finalization: str | None = None
 
     # FIX: Replace Config class with model_config
     model_config = ConfigDict(from_attributes=True)
@@ -54,6 +77,33 @@ class ChapterRead(BaseModel):
     # FIX: Replace Config class with model_config
     model_config = ConfigDict(from_attributes=True)
 
+class ChapterBriefMatch(ChapterRead):
+    """A chapter matched by the brief query, with its place in the book."""
+    part_id: uuid.UUID
+    part_number: int
+
+class ManuscriptSearchHit(BaseModel):
+    """A chapter (or saved version) matching a full-text search, with highlighted excerpts."""
+    project_id: uuid.UUID
+    part_id: uuid.UUID
+    part_number: int
+    chapter_id: uuid.UUID
+    chapter_number: int
+    chapter_title: str
+    version_id: uuid.UUID | None = None
+    version_created_at: datetime | None = None
+    rank: float
+    headline: str = Field(..., description="Matching excerpts, with matches wrapped in <mark> tags.")
+
+    model_config = ConfigDict(from_attributes=True)
+
+class ManuscriptSearchResults(BaseModel):
+    query: str
+    limit: int
+    offset: int
+    has_more: bool
+    results: list[ManuscriptSearchHit] = []
+
 class PartReadWithChapters(PartRead):
     chapters: list[ChapterRead] = []
     
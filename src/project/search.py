@@ -0,0 +1,254 @@
+# src/project/search.py
+"""
+Full-text search across manuscripts.
+
+chapters.search_vector (title and content) and chapter_versions.search_vector
+(content) are tsvector columns generated by PostgreSQL and indexed with GIN,
+so a search never loads chapter text to find matches. Matches are ranked with
+ts_rank_cd and only the page being returned is highlighted with ts_headline,
+which is the one step that reads the content.
+
+SQLite (embedded mode) has no text search types; there the query's terms are
+matched as substrings, ranked by occurrence count and highlighted in Python.
+"""
+import logging
+import re
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import and_, cast, func, literal, null, union_all, UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from .models import Part, Chapter, ChapterVersion
+from .retrieval import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Must match the configuration of the generated columns (see the migration).
+SEARCH_CONFIG = "english"
+HEADLINE_OPTIONS = "MaxFragments=2, MinWords=12, MaxWords=35, FragmentDelimiter=\" … \", StartSel=<mark>, StopSel=</mark>"
+# Words around the first match in SQLite headlines (ts_headline's MaxWords)
+HEADLINE_WORDS = 35
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    project_id: uuid.UUID
+    part_id: uuid.UUID
+    part_number: int
+    chapter_id: uuid.UUID
+    chapter_number: int
+    chapter_title: str
+    # Set when the match is in a saved version rather than the current content
+    version_id: uuid.UUID | None
+    version_created_at: datetime | None
+    rank: float
+    headline: str
+
+
+async def search_manuscripts(
+    session: AsyncSession,
+    query: str,
+    *,
+    project_id: uuid.UUID | None = None,
+    part_id: uuid.UUID | None = None,
+    include_versions: bool = False,
+    limit: int = 20,
+    offset: int = 0,
+) -> tuple[list[SearchHit], bool]:
+    """
+    Searches current chapter content (and saved versions with
+    `include_versions`) of the whole catalog, a project or a part. `query` uses
+    web search syntax ("quoted phrases", -excluded, or). Returns the hits of
+    the requested page, best first, and whether more hits follow.
+    """
+    def scoped(stmt):
+        if project_id is not None:
+            stmt = stmt.where(Part.project_id == project_id)
+        if part_id is not None:
+            stmt = stmt.where(Part.id == part_id)
+        return stmt
+
+    if session.get_bind().dialect.name == "sqlite":
+        return await _search_by_terms(session, query, scoped, include_versions, limit, offset)
+
+    tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+
+    # 1. Rank the matches from the GIN indexes, without touching the content.
+    matches = scoped(
+        select(
+            Chapter.id.label("chapter_id"),
+            cast(null(), UUID).label("version_id"),
+            func.ts_rank_cd(Chapter.search_vector, tsquery).label("rank"),
+        )
+        .join(Part, Chapter.part_id == Part.id)
+        .where(Chapter.search_vector.op("@@")(tsquery))
+    )
+    if include_versions:
+        version_matches = scoped(
+            select(
+                ChapterVersion.chapter_id,
+                ChapterVersion.id,
+                func.ts_rank_cd(ChapterVersion.search_vector, tsquery),
+            )
+            .join(Chapter, ChapterVersion.chapter_id == Chapter.id)
+            .join(Part, Chapter.part_id == Part.id)
+            .where(ChapterVersion.search_vector.op("@@")(tsquery))
+        )
+        matches = union_all(matches, version_matches)
+    ranked = matches.subquery("ranked")
+    page = (await session.execute(
+        select(ranked.c.chapter_id, ranked.c.version_id, ranked.c.rank)
+        .order_by(ranked.c.rank.desc(), ranked.c.chapter_id, ranked.c.version_id)
+        .limit(limit + 1)
+        .offset(offset)
+    )).all()
+    has_more = len(page) > limit
+    page = page[:limit]
+    if not page:
+        return [], False
+
+    # 2. Highlight only the rows of this page.
+    chapter_rows = {
+        row.id: row for row in (await session.execute(
+            select(
+                Chapter.id, Chapter.chapter_number, Chapter.title, Chapter.part_id,
+                Part.project_id, Part.part_number,
+                func.ts_headline(SEARCH_CONFIG, func.coalesce(Chapter.content, ""), tsquery, HEADLINE_OPTIONS).label("headline"),
+            )
+            .join(Part, Chapter.part_id == Part.id)
+            .where(Chapter.id.in_({row.chapter_id for row in page}))
+        )).all()
+    }
+    version_ids = {row.version_id for row in page if row.version_id is not None}
+    version_rows = {}
+    if version_ids:
+        version_rows = {
+            row.id: row for row in (await session.execute(
+                select(
+                    ChapterVersion.id, ChapterVersion.created_at,
+                    func.ts_headline(SEARCH_CONFIG, ChapterVersion.content, tsquery, HEADLINE_OPTIONS).label("headline"),
+                )
+                .where(ChapterVersion.id.in_(version_ids))
+            )).all()
+        }
+
+    hits = []
+    for row in page:
+        chapter = chapter_rows[row.chapter_id]
+        version = version_rows.get(row.version_id)
+        hits.append(SearchHit(
+            project_id=chapter.project_id,
+            part_id=chapter.part_id,
+            part_number=chapter.part_number,
+            chapter_id=chapter.id,
+            chapter_number=chapter.chapter_number,
+            chapter_title=chapter.title,
+            version_id=row.version_id,
+            version_created_at=version.created_at if version else None,
+            rank=float(row.rank),
+            headline=(version or chapter).headline,
+        ))
+    logger.info(f"Search '{query}' (project={project_id}, part={part_id}) returned {len(hits)} hits at offset {offset}.")
+    return hits, has_more
+
+
+def _occurrences(column, term: str):
+    """How many times `term` occurs in the column (case-insensitive), in SQL."""
+    text = func.lower(func.coalesce(column, ""))
+    return (func.length(text) - func.length(func.replace(text, term, ""))) / len(term)
+
+
+def _highlight(text: str, terms: list[str]) -> str:
+    """A ts_headline-like excerpt: the words around the first match, with the terms marked."""
+    words = text.split()
+    pattern = re.compile("|".join(re.escape(term) for term in terms), re.IGNORECASE)
+    first = next((i for i, word in enumerate(words) if pattern.search(word)), 0)
+    start = max(first - HEADLINE_WORDS // 3, 0)
+    excerpt = " ".join(words[start:start + HEADLINE_WORDS])
+    return pattern.sub(lambda m: f"<mark>{m.group(0)}</mark>", excerpt)
+
+
+async def _search_by_terms(session, query, scoped, include_versions, limit, offset) -> tuple[list[SearchHit], bool]:
+    """
+    search_manuscripts on SQLite: every term of the query must occur in the
+    title or content; rows are ranked by occurrences, title matches counting
+    double as with the 'A' weight of the PostgreSQL vectors.
+    """
+    terms = sorted(set(tokenize(query)))
+    if not terms:
+        return [], False
+
+    chapter_rank = sum(2 * _occurrences(Chapter.title, t) + _occurrences(Chapter.content, t) for t in terms)
+    matches = scoped(
+        select(Chapter.id.label("chapter_id"), cast(null(), UUID).label("version_id"), chapter_rank.label("rank"))
+        .join(Part, Chapter.part_id == Part.id)
+        .where(and_(*(
+            func.lower(func.coalesce(Chapter.title, "") + literal(" ") + func.coalesce(Chapter.content, "")).contains(t)
+            for t in terms
+        )))
+    )
+    if include_versions:
+        version_matches = scoped(
+            select(
+                ChapterVersion.chapter_id,
+                ChapterVersion.id,
+                sum(_occurrences(ChapterVersion.content, t) for t in terms),
+            )
+            .join(Chapter, ChapterVersion.chapter_id == Chapter.id)
+            .join(Part, Chapter.part_id == Part.id)
+            .where(and_(*(func.lower(ChapterVersion.content).contains(t) for t in terms)))
+        )
+        matches = union_all(matches, version_matches)
+    ranked = matches.subquery("ranked")
+    page = (await session.execute(
+        select(ranked.c.chapter_id, ranked.c.version_id, ranked.c.rank)
+        .order_by(ranked.c.rank.desc(), ranked.c.chapter_id, ranked.c.version_id)
+        .limit(limit + 1)
+        .offset(offset)
+    )).all()
+    has_more = len(page) > limit
+    page = page[:limit]
+    if not page:
+        return [], False
+
+    chapters = {
+        row.id: row for row in (await session.execute(
+            select(
+                Chapter.id, Chapter.chapter_number, Chapter.title, Chapter.part_id, Chapter.content,
+                Part.project_id, Part.part_number,
+            )
+            .join(Part, Chapter.part_id == Part.id)
+            .where(Chapter.id.in_({row.chapter_id for row in page}))
+        )).all()
+    }
+    version_ids = {row.version_id for row in page if row.version_id is not None}
+    versions = {}
+    if version_ids:
+        versions = {
+            row.id: row for row in (await session.execute(
+                select(ChapterVersion.id, ChapterVersion.created_at, ChapterVersion.content)
+                .where(ChapterVersion.id.in_(version_ids))
+            )).all()
+        }
+
+    hits = []
+    for row in page:
+        chapter = chapters[row.chapter_id]
+        version = versions.get(row.version_id)
+        hits.append(SearchHit(
+            project_id=chapter.project_id,
+            part_id=chapter.part_id,
+            part_number=chapter.part_number,
+            chapter_id=chapter.id,
+            chapter_number=chapter.chapter_number,
+            chapter_title=chapter.title,
+            version_id=row.version_id,
+            version_created_at=version.created_at if version else None,
+            rank=float(row.rank),
+            headline=_highlight((version or chapter).content or "", terms),
+        ))
+    logger.info(f"Search '{query}' (SQLite term match) returned {len(hits)} hits at offset {offset}.")
+    return hits, has_more
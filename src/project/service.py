@@ -1,12 +1,21 @@
 # src/project/service.py
+import hashlib
 import uuid
 import logging # NEW: Import logging module
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload, subqueryload
-from sqlalchemy import delete, update # Ensure update is imported for potential future use
+from sqlalchemy.orm import selectinload, subqueryload, undefer_group
+from sqlalchemy import case, delete, update, func, type_coerce, ColumnElement # Ensure update is imported for potential future use
+from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from datetime import datetime
 
-from .models import Project, Part, Chapter, ChapterVersion
+from .models import (
+    Project, Part, Chapter, ChapterVersion, PartChapterDraft,
+    PROJECT_BLUEPRINT, PROJECT_DRAFTS, CHAPTER_BRIEF, CHAPTER_CONTENT, CHAPTER_FEEDBACK,
+)
+from .outline_diff import OutlineDiff, OutlineRow, diff_outline
+from .retrieval import reindex_chapter_passages
 from .schemas import ProjectCreate, ProjectRead # Add ProjectRead here if it's not already imported
 from src.crew.schemas import PartListOutline, ChapterListOutline # Ensure these are imported
 from typing import List # Import List
@@ -15,10 +24,27 @@ from typing import List # Import List
 logger = logging.getLogger(__name__)
 
 
+# Column groups needed to serialize a Project as ProjectRead
+PROJECT_READ_GROUPS = (PROJECT_BLUEPRINT, PROJECT_DRAFTS)
+
+
+def _project_group_options(with_blueprint: bool, with_drafts: bool) -> list:
+    """Loader options undeferring the requested Project column groups (drafts include the per-part chapter drafts)."""
+    groups = [g for g, wanted in ((PROJECT_BLUEPRINT, with_blueprint), (PROJECT_DRAFTS, with_drafts)) if wanted]
+    options = [undefer_group(g) for g in groups]
+    if with_drafts:
+        options.append(selectinload(Project.chapter_drafts))
+    return options
+
+
 async def get_all_projects(session: AsyncSession) -> List[Project]:
-    """Retrieves all projects."""
+    """Retrieves all projects, with the columns needed for ProjectRead."""
     logger.debug("Fetching all projects.")
-    result = await session.execute(select(Project).order_by(Project.id.desc()))
+    result = await session.execute(
+        select(Project)
+        .options(*_project_group_options(with_blueprint=True, with_drafts=True))
+        .order_by(Project.id.desc())
+    )
     projects = result.scalars().all()
     logger.info(f"Retrieved {len(projects)} projects.")
     return projects
@@ -28,14 +54,28 @@ async def create_project(session: AsyncSession, project_data: ProjectCreate) ->
     new_project = Project(**project_data.model_dump())
     session.add(new_project)
     await session.commit()
-    await session.refresh(new_project)
     logger.info(f"New project created with ID: {new_project.id}")
-    return new_project
+    # Re-select with the ProjectRead columns rather than refresh(), which
+    # would leave the deferred groups unloaded.
+    return await get_project_by_id(session, new_project.id, with_blueprint=True, with_drafts=True)
 
-async def get_project_by_id(session: AsyncSession, project_id: uuid.UUID) -> Project | None:
-    """Retrieves a single project by its ID."""
+async def get_project_by_id(
+    session: AsyncSession,
+    project_id: uuid.UUID,
+    *,
+    with_blueprint: bool = False,
+    with_drafts: bool = False,
+) -> Project | None:
+    """
+    Retrieves a single project by its ID. The raw blueprint and the draft
+    outlines are deferred; request them with `with_blueprint` / `with_drafts`.
+    """
     logger.debug(f"Fetching project with ID: {project_id}")
-    result = await session.execute(select(Project).where(Project.id == project_id))
+    result = await session.execute(
+        select(Project)
+        .options(*_project_group_options(with_blueprint, with_drafts))
+        .where(Project.id == project_id)
+    )
     project = result.scalars().first()
     if project:
         logger.info(f"Project {project_id} found.")
@@ -43,12 +83,30 @@ async def get_project_by_id(session: AsyncSession, project_id: uuid.UUID) -> Pro
         logger.warning(f"Project {project_id} not found.")
     return project
 
-async def get_project_with_details(session: AsyncSession, project_id: uuid.UUID) -> Project | None:
-    """Retrieves a project and eagerly loads its parts and their chapters."""
+async def get_project_with_details(
+    session: AsyncSession,
+    project_id: uuid.UUID,
+    *,
+    with_blueprint: bool = False,
+    with_drafts: bool = False,
+    with_briefs: bool = False,
+    with_content: bool = False,
+) -> Project | None:
+    """
+    Retrieves a project and eagerly loads its parts and their chapters.
+    Large columns are only loaded when requested: `with_blueprint`/`with_drafts`
+    for the project, `with_briefs`/`with_content` for its chapters.
+    """
     logger.debug(f"Fetching project with details for ID: {project_id}")
+    chapters_loader = subqueryload(Project.parts).subqueryload(Part.chapters)
+    if with_briefs:
+        chapters_loader = chapters_loader.undefer_group(CHAPTER_BRIEF)
+    if with_content:
+        chapters_loader = chapters_loader.undefer_group(CHAPTER_CONTENT)
     result = await session.execute(
         select(Project).options(
-            subqueryload(Project.parts).subqueryload(Part.chapters)
+            chapters_loader,
+            *_project_group_options(with_blueprint, with_drafts),
         ).where(Project.id == project_id)
     )
     project = result.scalars().first()
@@ -58,11 +116,22 @@ async def get_project_with_details(session: AsyncSession, project_id: uuid.UUID)
         logger.warning(f"Project {project_id} with details not found.")
     return project
 
-async def get_part_by_id(session: AsyncSession, part_id: uuid.UUID) -> Part | None:
-    """Retrieves a single part by its ID, including its parent project."""
+async def get_part_by_id(
+    session: AsyncSession,
+    part_id: uuid.UUID,
+    *,
+    with_project_drafts: bool = False,
+) -> Part | None:
+    """
+    Retrieves a single part by its ID, including its parent project. The
+    project's draft outlines are only loaded with `with_project_drafts`.
+    """
     logger.debug(f"Fetching part with ID: {part_id}")
+    project_loader = selectinload(Part.project)
+    if with_project_drafts:
+        project_loader = project_loader.options(*_project_group_options(with_blueprint=False, with_drafts=True))
     result = await session.execute(
-        select(Part).options(selectinload(Part.project)).where(Part.id == part_id)
+        select(Part).options(project_loader).where(Part.id == part_id)
     )
     part = result.scalars().first()
     if part:
@@ -71,12 +140,26 @@ async def get_part_by_id(session: AsyncSession, part_id: uuid.UUID) -> Part | No
         logger.warning(f"Part {part_id} not found.")
     return part
 
-async def get_chapter_by_id(session: AsyncSession, chapter_id: uuid.UUID) -> Chapter | None:
-    """Retrieves a single chapter by its ID, and pre-loads its parent part and project."""
+async def get_chapter_by_id(
+    session: AsyncSession,
+    chapter_id: uuid.UUID,
+    *,
+    with_brief: bool = False,
+    with_content: bool = False,
+    with_feedback: bool = False,
+) -> Chapter | None:
+    """
+    Retrieves a single chapter by its ID, and pre-loads its parent part and project.
+    The brief, content and transition feedback are only loaded when requested.
+    """
     logger.debug(f"Fetching chapter with ID: {chapter_id}")
+    groups = [g for g, wanted in (
+        (CHAPTER_BRIEF, with_brief), (CHAPTER_CONTENT, with_content), (CHAPTER_FEEDBACK, with_feedback)
+    ) if wanted]
     result = await session.execute(
         select(Chapter).options(
-            selectinload(Chapter.part).selectinload(Part.project)
+            selectinload(Chapter.part).selectinload(Part.project),
+            *[undefer_group(g) for g in groups],
         ).where(Chapter.id == chapter_id)
     )
     chapter = result.scalars().first()
@@ -86,111 +169,316 @@ async def get_chapter_by_id(session: AsyncSession, chapter_id: uuid.UUID) -> Cha
         logger.warning(f"Chapter {chapter_id} not found.")
     return chapter
 
+async def get_transition_snippets(
+    session: AsyncSession,
+    project_id: uuid.UUID | None = None,
+    part_id: uuid.UUID | None = None,
+    snippet_length: int = 500,
+) -> list:
+    """
+    Returns, in reading order, one row per chapter of a part or a whole project
+    with only the first and last `snippet_length` characters of its content.
+    The snippets are cut in SQL, so full chapter contents never leave the database.
+    Row fields: id, part_id, project_id, part_number, chapter_number, head, tail.
+    """
+    if project_id is None and part_id is None:
+        raise ValueError("Either project_id or part_id is required.")
+
+    if _is_sqlite(session):
+        # SQLite has no right(); a negative start counts from the end.
+        head = func.substr(Chapter.content, 1, snippet_length)
+        tail = func.substr(Chapter.content, -snippet_length)
+    else:
+        head = func.substring(Chapter.content, 1, snippet_length)
+        tail = func.right(Chapter.content, snippet_length)
+    stmt = (
+        select(
+            Chapter.id,
+            Chapter.part_id,
+            Part.project_id,
+            Part.part_number,
+            Chapter.chapter_number,
+            head.label("head"),
+            tail.label("tail"),
+        )
+        .join(Part, Chapter.part_id == Part.id)
+        .order_by(Part.part_number, Chapter.chapter_number)
+    )
+    if part_id is not None:
+        stmt = stmt.where(Chapter.part_id == part_id)
+    if project_id is not None:
+        stmt = stmt.where(Part.project_id == project_id)
+
+    result = await session.execute(stmt)
+    rows = result.all()
+    logger.info(f"Fetched transition snippets for {len(rows)} chapters (project={project_id}, part={part_id}).")
+    return rows
+
+def _is_sqlite(session: AsyncSession) -> bool:
+    # Embedded installs run on SQLite; servers run on PostgreSQL.
+    return session.get_bind().dialect.name == "sqlite"
+
+def _dialect_insert(session: AsyncSession):
+    """The INSERT construct of the session's dialect, for INSERT ... ON CONFLICT upserts."""
+    return sqlite_insert if _is_sqlite(session) else pg_insert
+
+async def save_part_chapter_draft(
+    session: AsyncSession, project_id: uuid.UUID, part_id: uuid.UUID, outline: dict
+) -> None:
+    """
+    Stores a part's draft chapter outline, replacing any previous one, with a
+    single INSERT ... ON CONFLICT in the caller's transaction. Only the part's
+    own row is written, so parts of a book can be detailed concurrently.
+    """
+    insert = _dialect_insert(session)
+    stmt = insert(PartChapterDraft).values(
+        part_id=part_id, project_id=project_id, outline=outline, updated_at=datetime.utcnow()
+    )
+    await session.execute(stmt.on_conflict_do_update(
+        index_elements=[PartChapterDraft.part_id],
+        set_={"outline": stmt.excluded.outline, "updated_at": stmt.excluded.updated_at},
+    ))
+    logger.debug(f"Saved draft chapter outline for part {part_id}.")
+
+async def get_part_chapter_draft(session: AsyncSession, part_id: uuid.UUID) -> dict | None:
+    """Returns a part's draft chapter outline, if it has one."""
+    result = await session.execute(select(PartChapterDraft.outline).where(PartChapterDraft.part_id == part_id))
+    return result.scalar_one_or_none()
+
+async def delete_part_chapter_drafts(
+    session: AsyncSession, *, project_id: uuid.UUID | None = None, part_id: uuid.UUID | None = None
+) -> None:
+    """Deletes the draft chapter outlines of a part or of a whole project, in the caller's transaction."""
+    stmt = delete(PartChapterDraft)
+    if part_id is not None:
+        stmt = stmt.where(PartChapterDraft.part_id == part_id)
+    if project_id is not None:
+        stmt = stmt.where(PartChapterDraft.project_id == project_id)
+    await session.execute(stmt)
+
+async def get_parts_to_detail(session: AsyncSession, project_id: uuid.UUID) -> List[Part]:
+    """Returns the project's parts whose chapter structure has not been validated yet, in order."""
+    result = await session.execute(
+        select(Part)
+        .where(Part.project_id == project_id, Part.status != "CHAPTERS_VALIDATED")
+        .order_by(Part.part_number)
+    )
+    return list(result.scalars().all())
+
+def part_outline_key(title: str, summary: str | None) -> str:
+    """Identifies a part by its content, so a chapter outline prepared for a draft part can be matched to it."""
+    return hashlib.sha256(f"{title}\n{summary or ''}".encode("utf-8")).hexdigest()
+
+async def attach_prefetched_chapter_outlines(session: AsyncSession, project_id: uuid.UUID) -> int:
+    """
+    Attaches speculatively generated chapter outlines to the project's parts
+    whose title and summary are unchanged, as if each part had just been
+    detailed. Once the parts exist, outlines left over (their part was edited)
+    are discarded. Nothing is committed here; the project row stays locked
+    until the caller commits. Returns the number of parts attached.
+    """
+    result = await session.execute(
+        select(Project.speculative_chapters_outline)
+        .where(Project.id == project_id)
+        .with_for_update()
+    )
+    prefetched = result.scalar_one_or_none()
+    if not prefetched:
+        return 0
+
+    parts = (await session.execute(select(Part).where(Part.project_id == project_id))).scalars().all()
+    if not parts:
+        return 0  # Parts not validated yet; keep the outlines for finalize_part_structure
+
+    drafted = set((await session.execute(
+        select(PartChapterDraft.part_id).where(PartChapterDraft.project_id == project_id)
+    )).scalars())
+    attached = 0
+    for part in parts:
+        outline = prefetched.get(part_outline_key(part.title, part.summary))
+        if outline and part.status == "DEFINED" and part.id not in drafted:
+            await save_part_chapter_draft(session, project_id, part.id, outline)
+            part.status = "CHAPTERS_PENDING_VALIDATION"
+            attached += 1
+            logger.debug(f"Attached prefetched chapter outline to part {part.id}.")
+
+    await session.execute(
+        update(Project).where(Project.id == project_id).values(speculative_chapters_outline=None)
+    )
+    logger.info(f"Attached {attached} prefetched chapter outlines to project {project_id}, discarded {len(prefetched) - attached}.")
+    return attached
+
+def _outline_upsert_rows(
+    diff: OutlineDiff, parent_column: str, parent_id: uuid.UUID, number_column: str, new_status: str
+) -> list[dict]:
+    """Rows for the upsert: new entries with a fresh id and `new_status`, and the updated rows."""
+    rows = []
+    for row_id, entry in [(uuid.uuid4(), entry) for entry in diff.inserts] + list(diff.updates.items()):
+        rows.append({
+            "id": row_id, parent_column: parent_id, number_column: entry.number,
+            "title": entry.title, "status": new_status, **entry.fields,
+        })
+    return rows
+
+async def _apply_outline_diff(
+    session: AsyncSession, model: type, diff: OutlineDiff, rows: list[dict], number_column: str
+) -> None:
+    """
+    Writes an outline diff in the caller's transaction: a targeted DELETE of
+    the removed rows, one INSERT ... ON CONFLICT (id) for the new and updated
+    rows (existing rows keep their status) and one UPDATE renumbering the
+    moved rows.
+    """
+    if diff.deletes:
+        await session.execute(
+            delete(model).where(model.id.in_(diff.deletes)).execution_options(synchronize_session=False)
+        )
+    if rows:
+        stmt = _dialect_insert(session)(model).values(rows)
+        updated_columns = [c for c in rows[0] if c not in ("id", "status", number_column)]
+        await session.execute(stmt.on_conflict_do_update(
+            index_elements=[model.id],
+            set_={c: stmt.excluded[c] for c in updated_columns},
+        ))
+    if diff.renumbers:
+        number = getattr(model, number_column)
+        await session.execute(
+            update(model)
+            .where(model.id.in_(list(diff.renumbers)))
+            .values({number: case(diff.renumbers, value=model.id)})
+            .execution_options(synchronize_session=False)
+        )
+
+async def diff_part_structure(
+    session: AsyncSession, project_id: uuid.UUID, validated_parts: PartListOutline
+) -> OutlineDiff:
+    """Diff between a validated part structure and the project's stored parts (except the introduction and conclusion)."""
+    result = await session.execute(
+        select(Part.id, Part.part_number, Part.title, Part.summary)
+        .where(Part.project_id == project_id, Part.finalization.is_(None))
+    )
+    stored = [OutlineRow(r.id, r.part_number, r.title, {"summary": r.summary}) for r in result.all()]
+    return diff_outline(stored, [
+        OutlineRow(None, p.part_number, p.title, {"summary": p.summary}) for p in validated_parts.parts
+    ])
+
+async def diff_chapter_structure(
+    session: AsyncSession, part_id: uuid.UUID, validated_chapters: ChapterListOutline
+) -> OutlineDiff:
+    """Diff between a validated chapter structure and the part's stored chapters."""
+    result = await session.execute(
+        select(Chapter.id, Chapter.chapter_number, Chapter.title, Chapter.brief, Chapter.suggested_agent)
+        .where(Chapter.part_id == part_id)
+    )
+    stored = [
+        OutlineRow(r.id, r.chapter_number, r.title, {"brief": r.brief, "suggested_agent": r.suggested_agent})
+        for r in result.all()
+    ]
+    return diff_outline(stored, [
+        OutlineRow(None, c.chapter_number, c.title, {"brief": c.brief.model_dump(), "suggested_agent": c.suggested_agent})
+        for c in validated_chapters.chapters
+    ])
+
 async def finalize_part_structure(
     session: AsyncSession, project_id: uuid.UUID, validated_parts: PartListOutline
 ) -> Project:
     """
-    Deletes existing parts for a project and creates new ones based on the
-    user-validated structure. Updates the project status.
+    Applies the user-validated part structure to the project's parts (see
+    outline_diff): unchanged parts keep their chapters and chapter drafts,
+    edited ones are updated in place, and only parts no longer in the outline
+    are deleted, with their chapters. Updates the project status.
     """
-    project = await get_project_with_details(session, project_id) # Using get_project_with_details for comprehensive load
+    project = await get_project_by_id(session, project_id)
     if not project:
         logger.error(f"Cannot finalize parts: Project {project_id} not found.")
         return None
 
-    await session.execute(
-        delete(Part).where(Part.project_id == project.id)
-    )
-    logger.info(f"Existing parts for project {project_id} cleared from database.")
-    
-    for part_data in validated_parts.parts:
-        new_part = Part(
-            project_id=project.id,
-            part_number=part_data.part_number,
-            title=part_data.title,
-            summary=part_data.summary,
-            status="DEFINED"
+    diff = await diff_part_structure(session, project.id, validated_parts)
+    # Chapter drafts were prepared for the previous title and summary
+    stale_drafts = diff.deletes + list(diff.updates)
+    if stale_drafts:
+        await session.execute(delete(PartChapterDraft).where(PartChapterDraft.part_id.in_(stale_drafts)))
+        await session.execute(
+            update(Part)
+            .where(Part.id.in_(list(diff.updates)), Part.status == "CHAPTERS_PENDING_VALIDATION")
+            .values(status="DEFINED")
+            .execution_options(synchronize_session=False)
         )
-        session.add(new_part)
-        logger.debug(f"Added new part: {new_part.title} (Part {new_part.part_number}) to project {project_id}")
+    if diff.deletes:
+        await session.execute(delete(Chapter).where(Chapter.part_id.in_(diff.deletes)))
+    await _apply_outline_diff(
+        session, Part, diff,
+        _outline_upsert_rows(diff, "project_id", project.id, "part_number", "DEFINED"),
+        "part_number",
+    )
+    logger.info(
+        f"Part structure of project {project_id}: {len(diff.inserts)} added, {len(diff.updates)} updated, "
+        f"{len(diff.renumbers)} renumbered, {len(diff.deletes)} deleted, {len(diff.unchanged)} unchanged."
+    )
 
     project.status = "PARTS_VALIDATED"
 
     # --- UPDATED STRATEGIC LOGIC: Clear dedicated draft fields after finalization ---
     project.draft_parts_outline = None # Clear draft after it's finalized into real parts
-    project.draft_chapters_outline = None # Also clear chapter drafts if re-finalizing parts
-    logger.debug(f"Cleared draft_parts_outline and draft_chapters_outline for project {project_id} after parts finalization.")
+    logger.debug(f"Cleared draft_parts_outline and stale chapter drafts for project {project_id} after parts finalization.")
     # --- END UPDATED STRATEGIC LOGIC ---
 
     session.add(project) # Mark project as dirty
+    await session.flush()
+    # Parts accepted unchanged get the chapter outline prepared for them while they awaited validation.
+    await attach_prefetched_chapter_outlines(session, project.id)
     await session.commit()
-    await session.refresh(project)
     logger.info(f"Part structure finalized for project {project_id}. Status: {project.status}")
 
-    return project
+    # Reload with the columns ProjectDetailRead needs; expire first so the
+    # rows written above replace the ones cached in the session.
+    session.expire_all()
+    return await get_project_with_details(
+        session, project_id, with_blueprint=True, with_drafts=True, with_briefs=True
+    )
 async def finalize_chapter_structure(
     session: AsyncSession, part_id: uuid.UUID, validated_chapters: ChapterListOutline
 ) -> Part:
     """
-    Deletes existing chapters for a part and creates new ones based on the
-    user-validated structure. Updates the part's status.
+    Applies the user-validated chapter structure to the part's chapters (see
+    outline_diff): unchanged and moved chapters keep their content and
+    versions, edited ones are updated in place, and only chapters no longer
+    in the outline are deleted. Updates the part's status.
     """
     part = await get_part_by_id(session, part_id)
     if not part:
         logger.error(f"Cannot finalize chapters: Part {part_id} not found.")
         return None
 
-    await session.execute(
-        delete(Chapter).where(Chapter.part_id == part.id)
-    )
-    logger.info(f"Existing chapters for part {part_id} cleared.")
-
-    for chapter_data in validated_chapters.chapters:
-        new_chapter = Chapter(
-            part_id=part.id,
-            chapter_number=chapter_data.chapter_number,
-            title=chapter_data.title,
-            brief=chapter_data.brief.model_dump(),
-            suggested_agent=chapter_data.suggested_agent,
-            status="BRIEF_COMPLETE"
-        )
-        session.add(new_chapter)
-        logger.debug(f"Added new chapter: {new_chapter.title} to part {part_id}")
+    diff = await diff_chapter_structure(session, part.id, validated_chapters)
+    await _apply_outline_diff(
+        session, Chapter, diff,
+        _outline_upsert_rows(diff, "part_id", part.id, "chapter_number", "BRIEF_COMPLETE"),
+        "chapter_number",
+    )
+    logger.info(
+        f"Chapter structure of part {part_id}: {len(diff.inserts)} added, {len(diff.updates)} updated, "
+        f"{len(diff.renumbers)} renumbered, {len(diff.deletes)} deleted, {len(diff.unchanged)} unchanged."
+    )
 
     part.status = "CHAPTERS_VALIDATED"
     
-    # --- UPDATED STRATEGIC LOGIC: Clear specific chapter draft after finalization ---
-    project = part.project # Need project object to update its draft_chapters_outline
-    if project and project.draft_chapters_outline: # Check if the map exists
-        current_draft_chapters_map = project.draft_chapters_outline
-        if str(part.id) in current_draft_chapters_map:
-            del current_draft_chapters_map[str(part.id)]
-            logger.debug(f"Cleared draft_chapters_outline for part {part.id} from project {project.id} after chapter finalization.")
-            
-            # If the map becomes empty, set the entire draft_chapters_outline to None
-            if not current_draft_chapters_map:
-                project.draft_chapters_outline = None
-                logger.debug(f"Set draft_chapters_outline to None as it became empty for project {project.id}.")
-            else:
-                # Explicitly re-assign if the map itself changed (item deleted)
-                project.draft_chapters_outline = current_draft_chapters_map
-                logger.debug(f"Re-assigned draft_chapters_outline for project {project.id} after deleting part's entry.")
-        
-        session.add(project) # Mark project as dirty
-    # --- END UPDATED STRATEGIC LOGIC ---
+    # Clear this part's chapter draft after finalization; other parts' drafts are untouched.
+    await delete_part_chapter_drafts(session, part_id=part.id)
+    logger.debug(f"Cleared draft chapter outline for part {part.id} after chapter finalization.")
 
     await session.commit()
     logger.info(f"Chapter structure finalized for part {part_id}. Status: {part.status}")
 
     refreshed_part_stmt = select(Part).options(
-        selectinload(Part.chapters)
-    ).where(Part.id == part_id)
+        selectinload(Part.chapters).undefer_group(CHAPTER_BRIEF)
+    ).where(Part.id == part_id).execution_options(populate_existing=True)
     
     result = await session.execute(refreshed_part_stmt)
     refreshed_part = result.scalars().first()
     
     if refreshed_part:
-        logger.info(f"Refreshed part {part_id} with {len(refreshed_part.chapters)} new chapters for response.")
+        logger.info(f"Refreshed part {part_id} with {len(refreshed_part.chapters)} chapters for response.")
     else:
         logger.error(f"Failed to re-fetch part {part_id} after finalizing chapters.")
 
@@ -198,33 +486,37 @@ async def finalize_chapter_structure(
 async def update_project_summary_outline(session: AsyncSession, project_id: uuid.UUID, outline: str) -> Project | None:
     """(Legacy) Updates the summary_outline field of a project."""
     logger.info(f"Attempting to update summary outline for project {project_id}.")
-    project = await get_project_by_id(session, project_id)
+    project = await get_project_by_id(session, project_id, with_blueprint=True, with_drafts=True)
     if project:
         project.summary_outline = outline
         await session.commit()
-        await session.refresh(project)
         logger.info(f"Summary outline updated for project {project_id}.")
     else:
         logger.warning(f"Failed to update summary outline: Project {project_id} not found.")
     return project
 
 async def update_chapter_status(session: AsyncSession, chapter_id: uuid.UUID, new_status: str) -> Chapter | None:
-    """Updates the status of a specific chapter."""
+    """Updates the status of a specific chapter. The returned chapter includes its brief (ChapterRead)."""
     logger.info(f"Updating status for chapter {chapter_id} to '{new_status}'.")
-    chapter = await get_chapter_by_id(session, chapter_id)
+    chapter = await get_chapter_by_id(session, chapter_id, with_brief=True)
     if chapter:
         chapter.status = new_status
+        # No refresh(): it would drop the deferred brief, and with
+        # expire_on_commit=False the loaded attributes are already current.
         await session.commit()
-        await session.refresh(chapter)
         logger.info(f"Chapter {chapter_id} status updated to '{new_status}'.")
     else:
         logger.warning(f"Failed to update status: Chapter {chapter_id} not found.")
     return chapter
 
 async def update_chapter_content(session: AsyncSession, chapter_id: uuid.UUID, content: str, token_count: int | None = None) -> Chapter | None:
-    """Updates the content of a specific chapter and also creates a new ChapterVersion record."""
+    """
+    Updates the content of a specific chapter and also creates a new ChapterVersion record.
+    The chapter's retrieval passages are rebuilt in the same transaction.
+    The previous content is never loaded; the returned chapter includes its brief (ChapterRead).
+    """
     logger.info(f"Updating content for chapter {chapter_id}. Token count: {token_count}")
-    chapter = await get_chapter_by_id(session, chapter_id)
+    chapter = await get_chapter_by_id(session, chapter_id, with_brief=True)
     if chapter:
         # Create a new version record
         new_version = ChapterVersion(
@@ -236,9 +528,79 @@ async def update_chapter_content(session: AsyncSession, chapter_id: uuid.UUID, c
         logger.debug(f"Created new version for chapter {chapter_id}.")
         
         chapter.content = content # Update the current content
+        await reindex_chapter_passages(session, chapter.part.project_id, chapter.id, content)
         await session.commit()
-        await session.refresh(chapter)
         logger.info(f"Content and new version saved for chapter {chapter_id}.")
     else:
         logger.warning(f"Failed to update content: Chapter {chapter_id} not found.")
-    return chapter
\ No newline at end of file
+    return chapter
+
+def _brief_list_values(sqlite: bool, field: str):
+    """The elements of the brief's `field` list, as a table with a `value` column."""
+    if sqlite:
+        return func.json_each(Chapter.brief, f"$.{field}").table_valued("value")
+    return func.jsonb_array_elements_text(type_coerce(Chapter.brief, JSONB)[field]).table_valued("value")
+
+def _brief_list_mentions(sqlite: bool, field: str, text: str) -> ColumnElement:
+    """EXISTS condition: some element of the brief's `field` list contains `text` (case-insensitive)."""
+    elements = _brief_list_values(sqlite, field)
+    pattern = "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    return select(elements.c.value).where(elements.c.value.ilike(pattern, escape="\\")).exists()
+
+async def query_chapter_briefs(
+    session: AsyncSession,
+    project_id: uuid.UUID,
+    *,
+    part_id: uuid.UUID | None = None,
+    agent: str | None = None,
+    status: str | None = None,
+    inclusion: str | None = None,
+    inclusion_mentions: str | None = None,
+    question_mentions: str | None = None,
+    has_key_questions: bool | None = None,
+    limit: int = 50,
+    offset: int = 0,
+) -> list[tuple[Chapter, int]]:
+    """
+    Filters a project's chapters on their briefs inside PostgreSQL and returns
+    (chapter with brief, part number) pairs in reading order. `inclusion` is an
+    exact required inclusion, answered by the GIN index on chapters.brief
+    (brief @> {"required_inclusions": [...]}); the `*_mentions` filters match
+    a substring of any required inclusion / key question. On SQLite (embedded
+    mode) the same filters use the JSON1 functions, without an index.
+    """
+    sqlite = _is_sqlite(session)
+    brief = type_coerce(Chapter.brief, JSONB)
+    stmt = (
+        select(Chapter, Part.part_number)
+        .join(Part, Chapter.part_id == Part.id)
+        .options(undefer_group(CHAPTER_BRIEF))
+        .where(Part.project_id == project_id)
+    )
+    if part_id is not None:
+        stmt = stmt.where(Chapter.part_id == part_id)
+    if agent is not None:
+        stmt = stmt.where(Chapter.suggested_agent == agent)
+    if status is not None:
+        stmt = stmt.where(Chapter.status == status)
+    if inclusion is not None:
+        if sqlite:
+            inclusions = _brief_list_values(sqlite, "required_inclusions")
+            stmt = stmt.where(select(inclusions.c.value).where(inclusions.c.value == inclusion).exists())
+        else:
+            stmt = stmt.where(brief.contains({"required_inclusions": [inclusion]}))
+    if inclusion_mentions:
+        stmt = stmt.where(_brief_list_mentions(sqlite, "required_inclusions", inclusion_mentions))
+    if question_mentions:
+        stmt = stmt.where(_brief_list_mentions(sqlite, "key_questions_to_answer", question_mentions))
+    if has_key_questions is not None:
+        if sqlite:
+            question_count = func.coalesce(func.json_array_length(Chapter.brief, "$.key_questions_to_answer"), 0)
+        else:
+            question_count = func.coalesce(func.jsonb_array_length(brief["key_questions_to_answer"]), 0)
+        stmt = stmt.where(question_count > 0 if has_key_questions else question_count == 0)
+
+    stmt = stmt.order_by(Part.part_number, Chapter.chapter_number).limit(limit).offset(offset)
+    rows = (await session.execute(stmt)).all()
+    logger.info(f"Brief query on project {project_id} matched {len(rows)} chapters.")
+    return [(row.Chapter, row.part_number) for row in rows]
@@ -0,0 +1,30 @@
+import os
+import tempfile
+
+# Settings are read when src.core.config is imported. The tests drop and
+# recreate the tables, so they never use DATABASE_URL: they run on a throwaway
+# SQLite database, or on TEST_DATABASE_URL (e.g. a scratch Postgres database,
+# which the Postgres-only tests need).
+os.environ["DATABASE_URL"] = os.environ.get("TEST_DATABASE_URL") or f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/test.db"
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("DEFAULT_OPENAI_MODEL_NAME", "gpt-4o-mini")
+
+import pytest_asyncio
+
+
+@pytest_asyncio.fixture
+async def db_session():
+    """A session on freshly created tables; the connections are closed afterwards."""
+    from src.core.database import AsyncSessionFactory, Base, engine
+    # Registers every table, as create_schema does
+    import src.core.models  # noqa: F401
+    import src.crew.models  # noqa: F401
+    import src.project.models  # noqa: F401
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionFactory() as session:
+        yield session
+    # Pooled connections belong to this test's event loop
+    await engine.dispose()
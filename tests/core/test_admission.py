@@ -0,0 +1,119 @@
+import pytest
+from fastapi import HTTPException
+
+from src.core.admission import QueueAdmission, QueueLoad, admit_jobs, estimate_load
+from src.core.config import settings
+from src.core.task_queue import LaneStats, task_queue
+
+LANE = "chapter_generation_worker"
+OTHER = "book_export_worker"
+
+
+@pytest.fixture(autouse=True)
+def limits(monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDED_MODE", False)
+    monkeypatch.setattr(settings, "QUEUE_WORKER_CONCURRENCY", 10)
+    monkeypatch.setattr(settings, "QUEUE_DEFAULT_JOB_SECONDS", 60.0)
+    monkeypatch.setattr(settings, "QUEUE_MAX_DEPTH_DEFAULT", 100)
+    monkeypatch.setattr(settings, "QUEUE_MAX_DEPTH", {LANE: 20})
+    monkeypatch.setattr(settings, "QUEUE_MAX_ETA_SECONDS", 600)
+
+
+@pytest.mark.parametrize("stats, expected", [
+    # Empty queue: the lane's own run time
+    ({}, QueueLoad(LANE, 0, 60.0)),
+    ({LANE: LaneStats(depth=0, avg_duration_s=30.0)}, QueueLoad(LANE, 0, 30.0)),
+    # 10 jobs of 30 s over 10 workers wait 30 s
+    ({LANE: LaneStats(depth=10, avg_duration_s=30.0)}, QueueLoad(LANE, 10, 60.0)),
+    # Other lanes' backlogs count too; lanes without history take the default
+    ({LANE: LaneStats(depth=10, avg_duration_s=30.0), OTHER: LaneStats(depth=5)}, QueueLoad(LANE, 10, 90.0)),
+    ({OTHER: LaneStats(depth=20, avg_duration_s=120.0)}, QueueLoad(LANE, 0, 300.0)),
+])
+def test_estimate_load(stats, expected):
+    assert estimate_load(LANE, stats) == expected
+
+
+def test_estimate_load_in_embedded_mode_uses_the_process_concurrency(monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDED_MODE", True)
+    monkeypatch.setattr(settings, "QUEUE_MAX_JOBS", 2)
+    assert estimate_load(LANE, {LANE: LaneStats(depth=4, avg_duration_s=30.0)}).eta_seconds == 90.0
+
+
+@pytest.fixture
+def lane_stats(monkeypatch):
+    """Sets the stats task_queue.lane_stats() returns."""
+    stats: dict[str, LaneStats] = {}
+
+    async def fake_lane_stats():
+        return stats
+
+    monkeypatch.setattr(task_queue, "lane_stats", fake_lane_stats)
+    return stats
+
+
+@pytest.mark.parametrize("lane, stats, status_code, retry_after", [
+    # Lane at its own QUEUE_MAX_DEPTH: until one job of it is done
+    (LANE, {LANE: LaneStats(depth=20, avg_duration_s=10.0)}, 429, "1"),
+    # Five over: five jobs of 60 s (the default) over 10 workers
+    (LANE, {LANE: LaneStats(depth=25)}, 429, "36"),
+    # Other lanes use QUEUE_MAX_DEPTH_DEFAULT
+    (OTHER, {OTHER: LaneStats(depth=100, avg_duration_s=1.0)}, 429, "1"),
+    # A 6000 s backlog over 10 workers, then 60 s: 60 s over QUEUE_MAX_ETA_SECONDS
+    (LANE, {OTHER: LaneStats(depth=50, avg_duration_s=120.0)}, 503, "60"),
+    # 0.4 s over, rounded up
+    (LANE, {OTHER: LaneStats(depth=4, avg_duration_s=1351.0)}, 503, "1"),
+])
+@pytest.mark.asyncio
+async def test_refusals(lane_stats, lane, stats, status_code, retry_after):
+    lane_stats.update(stats)
+    with pytest.raises(HTTPException) as refused:
+        await QueueAdmission(lane)()
+    assert refused.value.status_code == status_code
+    assert refused.value.headers == {"Retry-After": retry_after}
+    load = estimate_load(lane, stats)
+    assert refused.value.detail["queue_depth"] == load.depth
+    assert refused.value.detail["eta_seconds"] == load.eta_seconds
+
+
+@pytest.mark.parametrize("stats", [
+    {},
+    {LANE: LaneStats(depth=19, avg_duration_s=10.0)},
+    # Exactly QUEUE_MAX_ETA_SECONDS
+    {OTHER: LaneStats(depth=45, avg_duration_s=120.0)},
+])
+@pytest.mark.asyncio
+async def test_admitted(lane_stats, stats):
+    lane_stats.update(stats)
+    assert await QueueAdmission(LANE)() == estimate_load(LANE, stats)
+
+
+@pytest.mark.asyncio
+async def test_jobs_admitted_together_queue_behind_each_other(lane_stats):
+    lane_stats[LANE] = LaneStats(depth=2, avg_duration_s=30.0)
+    loads = await admit_jobs(LANE, 3)
+    assert [(load.depth, load.eta_seconds) for load in loads] == [(2, 36.0), (3, 39.0), (4, 42.0)]
+
+
+@pytest.mark.parametrize("jobs, admitted", [(18, True), (19, False)])
+@pytest.mark.asyncio
+async def test_jobs_admitted_together_count_against_the_max_depth(lane_stats, jobs, admitted):
+    lane_stats[LANE] = LaneStats(depth=2, avg_duration_s=30.0)
+    if admitted:
+        assert len(await admit_jobs(LANE, jobs)) == jobs
+        return
+    with pytest.raises(HTTPException) as refused:
+        await admit_jobs(LANE, jobs)
+    assert refused.value.status_code == 429
+    assert refused.value.headers == {"Retry-After": "3"}
+
+
+@pytest.mark.asyncio
+async def test_jobs_admitted_together_are_refused_on_the_last_ones_estimate(lane_stats, monkeypatch):
+    monkeypatch.setattr(settings, "QUEUE_MAX_ETA_SECONDS", 100)
+    lane_stats[LANE] = LaneStats(depth=0, avg_duration_s=60.0)
+    # The last of 6 jobs is done in 60 + 5 * 6 = 90 s, the last of 10 in 114 s
+    assert len(await admit_jobs(LANE, 6)) == 6
+    with pytest.raises(HTTPException) as refused:
+        await admit_jobs(LANE, 10)
+    assert (refused.value.status_code, refused.value.headers) == (503, {"Retry-After": "14"})
+    assert refused.value.detail["queue_depth"] == 9
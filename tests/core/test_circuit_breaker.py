@@ -0,0 +1,184 @@
+import pytest
+from arq.worker import Retry
+
+from src.core import circuit_breaker
+from src.core.circuit_breaker import (
+    CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN, OUTCOME_FAILURE, OUTCOME_RELEASE, OUTCOME_SUCCESS,
+    CircuitOpenError, DistributedCircuitBreaker, _LocalCircuits, track_refusals,
+)
+from src.core.config import settings
+
+KEY = "circuit:model:gpt-4o-mini"
+THRESHOLD = 3
+RECOVERY_MS = 30_000
+PROBE_TIMEOUT_MS = 60_000
+
+
+class Clock:
+    def __init__(self):
+        self.now_ms = 1_000_000
+
+    def __call__(self) -> int:
+        return self.now_ms
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker, "_now_ms", clock)
+    return clock
+
+
+def acquire(circuits: _LocalCircuits, token: str, keys=(KEY,)) -> int:
+    return circuits.acquire(list(keys), token, PROBE_TIMEOUT_MS, RECOVERY_MS)
+
+
+def record(circuits: _LocalCircuits, token: str, outcome: str, keys=(KEY,)) -> list[str]:
+    return circuits.record(list(keys), token, outcome, THRESHOLD, RECOVERY_MS)
+
+
+def opened(clock: Clock) -> _LocalCircuits:
+    """Circuits whose KEY has just been opened by THRESHOLD failures."""
+    circuits = _LocalCircuits()
+    for _ in range(THRESHOLD):
+        record(circuits, "call", OUTCOME_FAILURE)
+    return circuits
+
+
+def test_opens_at_the_failure_threshold(clock):
+    circuits = _LocalCircuits()
+    for _ in range(THRESHOLD - 1):
+        assert record(circuits, "call", OUTCOME_FAILURE) == [""]
+        assert acquire(circuits, "call") == 0
+    assert record(circuits, "call", OUTCOME_FAILURE) == ["opened"]
+    assert circuits.circuits[KEY]["state"] == CIRCUIT_OPEN
+    assert acquire(circuits, "call") == RECOVERY_MS
+    clock.now_ms += 10_000
+    assert acquire(circuits, "call") == RECOVERY_MS - 10_000
+
+
+def test_success_resets_the_failure_count(clock):
+    circuits = _LocalCircuits()
+    for _ in range(THRESHOLD - 1):
+        record(circuits, "call", OUTCOME_FAILURE)
+    record(circuits, "call", OUTCOME_SUCCESS)
+    assert record(circuits, "call", OUTCOME_FAILURE) == [""]
+    assert circuits.circuits[KEY]["state"] == CIRCUIT_CLOSED
+
+
+def test_a_single_probe_after_the_recovery_timeout(clock):
+    circuits = opened(clock)
+    clock.now_ms += RECOVERY_MS
+    assert acquire(circuits, "probe") == 0
+    assert circuits.circuits[KEY]["state"] == CIRCUIT_HALF_OPEN
+    # Others wait for the probe's outcome, at most a recovery timeout at a time
+    assert acquire(circuits, "other") == RECOVERY_MS
+    # The outcome of a call that is not the probe changes nothing
+    assert record(circuits, "other", OUTCOME_FAILURE) == [""]
+    assert circuits.circuits[KEY]["probe"] == "probe"
+
+
+def test_probe_success_closes_the_circuit(clock):
+    circuits = opened(clock)
+    clock.now_ms += RECOVERY_MS
+    acquire(circuits, "probe")
+    assert record(circuits, "probe", OUTCOME_SUCCESS) == ["closed"]
+    assert circuits.circuits[KEY]["state"] == CIRCUIT_CLOSED
+    assert acquire(circuits, "other") == 0
+
+
+def test_probe_failure_reopens_the_circuit(clock):
+    circuits = opened(clock)
+    clock.now_ms += RECOVERY_MS
+    acquire(circuits, "probe")
+    assert record(circuits, "probe", OUTCOME_FAILURE) == ["opened"]
+    assert circuits.circuits[KEY]["times_opened"] == 2
+    assert acquire(circuits, "other") == RECOVERY_MS
+
+
+def test_released_probe_lets_the_next_call_probe(clock):
+    circuits = opened(clock)
+    clock.now_ms += RECOVERY_MS
+    acquire(circuits, "probe")
+    assert record(circuits, "probe", OUTCOME_RELEASE) == [""]
+    assert circuits.circuits[KEY]["state"] == CIRCUIT_OPEN
+    assert acquire(circuits, "next") == 0
+    assert circuits.circuits[KEY]["probe"] == "next"
+
+
+def test_probe_that_never_reports_is_replaced(clock):
+    circuits = opened(clock)
+    clock.now_ms += RECOVERY_MS
+    acquire(circuits, "lost")
+    clock.now_ms += PROBE_TIMEOUT_MS
+    assert acquire(circuits, "next") == 0
+    assert circuits.circuits[KEY]["probe"] == "next"
+
+
+def test_call_is_refused_if_any_of_its_circuits_is_open(clock):
+    circuits = opened(clock)
+    agent_key = "circuit:agent:Theorist AI"
+    assert acquire(circuits, "call", keys=(agent_key,)) == 0
+    assert acquire(circuits, "call", keys=(agent_key, KEY)) == RECOVERY_MS
+    # A refused call takes no probe
+    clock.now_ms += RECOVERY_MS
+    assert acquire(circuits, "call", keys=(agent_key, KEY)) == 0
+    assert KEY in circuits.circuits and agent_key not in circuits.circuits
+
+
+# --- Refusals and job deferral ---
+
+class UpstreamError(Exception):
+    pass
+
+
+async def failing():
+    raise UpstreamError()
+
+
+async def answered():
+    return "ok"
+
+
+@pytest.fixture
+def breaker(monkeypatch, clock):
+    monkeypatch.setattr(settings, "CIRCUIT_BREAKER_FAILURE_THRESHOLD", 1)
+    monkeypatch.setattr(settings, "CIRCUIT_BREAKER_RECOVERY_SECONDS", 30)
+    monkeypatch.setattr(settings, "CIRCUIT_BREAKER_RETRY_JITTER_SECONDS", 0)
+    return DistributedCircuitBreaker(expected_exception=lambda: (UpstreamError,))
+
+
+@pytest.mark.asyncio
+async def test_refusals_are_tracked(breaker):
+    refusals = track_refusals()
+    with pytest.raises(UpstreamError):
+        await breaker.call(("model:a",), failing)
+    assert refusals == {}
+    with pytest.raises(CircuitOpenError) as refused:
+        await breaker.call(("model:a",), answered)
+    assert refused.value.retry_after == 30
+    assert refusals == {"model:a": 30}
+    # Other circuits still answer
+    assert await breaker.call(("model:b",), answered) == "ok"
+
+
+@pytest.mark.asyncio
+async def test_job_refused_by_an_open_circuit_is_deferred(breaker):
+    from src.crew.worker import defer_on_open_circuit
+
+    with pytest.raises(UpstreamError):
+        await breaker.call(("model:a",), failing)
+
+    @defer_on_open_circuit
+    async def job(ctx, circuit):
+        try:
+            await breaker.call((circuit,), answered)
+        except CircuitOpenError:
+            return {"status": "failure"}
+        return {"status": "success"}
+
+    with pytest.raises(Retry) as retry:
+        await job({"job_id": "refused"}, "model:a")
+    assert retry.value.defer_score == 30_000
+    # Refused by nothing: the job's own outcome stands
+    assert await job({"job_id": "answered"}, "model:b") == {"status": "success"}
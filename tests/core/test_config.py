@@ -0,0 +1,23 @@
+import pytest
+
+from src.core.config import Settings
+
+
+@pytest.fixture
+def no_redis_env(monkeypatch):
+    for name in ("REDIS_URL", "QUEUE_BACKEND", "EMBEDDED_MODE"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_arq_always_uses_redis(no_redis_env):
+    assert Settings(QUEUE_BACKEND="arq", _env_file=None).uses_redis()
+
+
+def test_postgres_uses_redis_only_if_redis_url_is_set(no_redis_env, monkeypatch):
+    assert not Settings(QUEUE_BACKEND="postgres", _env_file=None).uses_redis()
+    monkeypatch.setenv("REDIS_URL", "redis://cache:6379")
+    assert Settings(QUEUE_BACKEND="postgres", _env_file=None).uses_redis()
+
+
+def test_embedded_mode_never_uses_redis(no_redis_env):
+    assert not Settings(EMBEDDED_MODE=True, REDIS_URL="redis://cache:6379", _env_file=None).uses_redis()
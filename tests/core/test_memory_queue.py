@@ -0,0 +1,158 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from arq.worker import Retry
+from sqlalchemy import text
+
+from src.core.config import settings
+from src.core.memory_queue import MemoryQueueBackend
+from src.core.task_queue import JOB_COMPLETE, JOB_DEFERRED, JOB_IN_PROGRESS, JOB_NOT_FOUND, JOB_QUEUED
+
+
+class Recorder:
+    """Worker hooks that record the tries they see."""
+
+    def __init__(self):
+        self.started: list[tuple[str, int]] = []
+        self.ended: list[tuple[str, int]] = []
+
+    async def on_job_start(self, ctx):
+        self.started.append((ctx["job_id"], ctx["job_try"]))
+
+    async def after_job_end(self, ctx):
+        self.ended.append((ctx["job_id"], ctx["job_try"]))
+
+
+recorder = Recorder()
+
+
+async def echo(ctx, value):
+    return value
+
+
+async def retried_once(ctx, value):
+    if ctx["job_try"] == 1:
+        raise Retry(defer=0.2)
+    return value
+
+
+async def always_retried(ctx):
+    raise Retry(defer=0)
+
+
+async def sleeper(ctx):
+    await asyncio.sleep(60)
+
+
+class WorkerSettings:
+    functions = [echo, retried_once, always_retried, sleeper]
+    on_job_start = recorder.on_job_start
+    after_job_end = recorder.after_job_end
+    max_tries = 2
+
+
+@pytest_asyncio.fixture
+async def queue(monkeypatch):
+    # A single runner, so that a second job stays queued behind a running one
+    monkeypatch.setattr(settings, "QUEUE_MAX_JOBS", 1)
+    recorder.started.clear()
+    recorder.ended.clear()
+    backend = MemoryQueueBackend(f"{__name__}.WorkerSettings")
+    await backend.connect()
+    yield backend
+    await backend.close()
+
+
+async def wait_for(predicate, timeout: float = 5.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+async def finished(queue: MemoryQueueBackend, job_id: str):
+    await wait_for(lambda: queue._jobs[job_id].status == JOB_COMPLETE)
+    return await queue.job_info(job_id)
+
+
+@pytest.mark.asyncio
+async def test_job_runs_with_the_job_hooks(queue):
+    job = await queue.enqueue("echo", "done", _job_id="echo-1")
+    info = await finished(queue, job.job_id)
+    assert (info.success, info.result) == (True, "done")
+    assert recorder.started == recorder.ended == [("echo-1", 1)]
+    # Job ids are unique while the job is known
+    assert await queue.enqueue("echo", "again", _job_id="echo-1") is None
+
+
+@pytest.mark.asyncio
+async def test_job_enqueued_in_a_session_waits_for_the_commit(queue, db_session):
+    await db_session.execute(text("SELECT 1"))
+    job = await queue.enqueue("echo", "committed", _session=db_session)
+    assert (await queue.job_info(job.job_id)).status == JOB_NOT_FOUND
+    # Its id is taken until then
+    assert await queue.enqueue("echo", "twice", _job_id=job.job_id, _session=db_session) is None
+    await db_session.commit()
+    info = await finished(queue, job.job_id)
+    assert (info.success, info.result) == (True, "committed")
+
+
+@pytest.mark.asyncio
+async def test_job_enqueued_in_a_rolled_back_session_is_dropped(queue, db_session):
+    await db_session.execute(text("SELECT 1"))
+    job = await queue.enqueue("echo", "rolled back", _session=db_session)
+    await db_session.rollback()
+    # A later transaction of the session does not bring it back
+    await db_session.execute(text("SELECT 1"))
+    await db_session.commit()
+    await asyncio.sleep(0.05)
+    assert (await queue.job_info(job.job_id)).status == JOB_NOT_FOUND
+    assert recorder.started == []
+
+
+@pytest.mark.asyncio
+async def test_abort_queued_and_running_jobs(queue):
+    running = await queue.enqueue("sleeper", _job_id="running")
+    await wait_for(lambda: queue._jobs["running"].status == JOB_IN_PROGRESS)
+    queued = await queue.enqueue("echo", "never", _job_id="queued")
+    assert (await queue.job_info("queued")).status == JOB_QUEUED
+
+    assert await queue.abort(queued.job_id)
+    info = await queue.job_info(queued.job_id)
+    assert (info.status, info.success, info.cancelled) == (JOB_COMPLETE, False, True)
+
+    assert await queue.abort(running.job_id)
+    info = await finished(queue, running.job_id)
+    assert (info.success, info.cancelled) == (False, True)
+    # The queued job was skipped, not run
+    assert recorder.started == recorder.ended == [("running", 1)]
+    assert not await queue.abort(running.job_id)
+    assert not await queue.abort("unknown")
+
+
+@pytest.mark.asyncio
+async def test_retry_defers_the_job(queue):
+    job = await queue.enqueue("retried_once", "done", _job_id="retried")
+    await wait_for(lambda: queue._jobs["retried"].status == JOB_DEFERRED)
+    assert recorder.ended == [("retried", 1)]
+    info = await finished(queue, job.job_id)
+    assert (info.success, info.result) == (True, "done")
+    assert recorder.started == recorder.ended == [("retried", 1), ("retried", 2)]
+
+
+@pytest.mark.asyncio
+async def test_retries_stop_at_max_tries(queue):
+    job = await queue.enqueue("always_retried")
+    info = await finished(queue, job.job_id)
+    assert (info.success, info.result) == (False, "Max tries (2) exceeded.")
+    assert len(recorder.ended) == 2
+
+
+@pytest.mark.asyncio
+async def test_abort_deferred_job(queue):
+    job = await queue.enqueue("echo", "later", _defer_by=60)
+    assert (await queue.job_info(job.job_id)).status == JOB_DEFERRED
+    assert await queue.abort(job.job_id)
+    assert (await queue.job_info(job.job_id)).cancelled
+    assert recorder.started == []
@@ -0,0 +1,190 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from arq.worker import Retry
+from sqlalchemy import select
+
+from src.core.config import settings
+from src.core.models import QueueJob
+from src.core.pg_queue import (
+    CANCELLED_RESULT, PostgresQueueBackend, PostgresWorker, decode_args, encode_args, listen_dsn,
+)
+from src.core.task_queue import JOB_COMPLETE, JOB_IN_PROGRESS
+
+requires_postgres = pytest.mark.skipif(
+    not settings.DATABASE_URL.startswith("postgresql"),
+    reason="needs a Postgres database (set TEST_DATABASE_URL)",
+)
+
+
+def test_args_round_trip():
+    project_id = uuid.uuid4()
+    args = (project_id, "introduction", 3, 0.5, True, None)
+    encoded = encode_args(args)
+    assert encoded[0] == {"$uuid": str(project_id)}
+    assert decode_args(encoded) == list(args)
+
+
+def test_encode_args_rejects_other_types():
+    with pytest.raises(TypeError, match="datetime"):
+        encode_args((datetime.utcnow(),))
+    with pytest.raises(TypeError):
+        encode_args(({"$uuid": "not queued as is"},))
+
+
+def test_decode_args_leaves_plain_values():
+    assert decode_args(["a", 1, None]) == ["a", 1, None]
+
+
+def test_listen_dsn_drops_the_driver():
+    assert listen_dsn("postgresql+asyncpg://user:secret@db:5432/books") == "postgresql://user:secret@db:5432/books"
+
+
+def test_from_settings_reads_the_job_hooks():
+    async def started(ctx): ...
+    async def ended(ctx): ...
+
+    class WorkerSettings:
+        functions = [sleeper]
+        on_job_start = started
+        after_job_end = ended
+        max_tries = 2
+
+    worker = PostgresWorker.from_settings(WorkerSettings)
+    assert list(worker.functions) == ["sleeper"]
+    assert (worker.on_job_start, worker.after_job_end, worker.max_tries) == (started, ended, 2)
+
+
+# --- Worker, on Postgres ---
+
+class Recorder:
+    """Worker hooks that record the tries they see."""
+
+    def __init__(self):
+        self.started: list[int] = []
+        self.ended: list[int] = []
+
+    async def on_job_start(self, ctx):
+        self.started.append(ctx["job_try"])
+
+    async def after_job_end(self, ctx):
+        self.ended.append(ctx["job_try"])
+
+
+async def retried_once(ctx, value):
+    if ctx["job_try"] == 1:
+        raise Retry(defer=0)
+    return value
+
+
+async def sleeper(ctx):
+    await asyncio.sleep(60)
+
+
+def make_worker(*functions, recorder: Recorder, max_tries: int = 3) -> PostgresWorker:
+    return PostgresWorker(
+        list(functions), on_job_start=recorder.on_job_start, after_job_end=recorder.after_job_end, max_tries=max_tries,
+    )
+
+
+async def wait_for(predicate, timeout: float = 10.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.05)
+
+
+@pytest.mark.asyncio
+async def test_job_hooks_run_around_every_try(monkeypatch):
+    recorder, outcomes = Recorder(), []
+    worker = make_worker(retried_once, sleeper, recorder=recorder)
+
+    async def finish(job, *, success, result):
+        outcomes.append(("finish", success, result))
+
+    async def release(job, *, defer):
+        outcomes.append(("release", defer))
+
+    monkeypatch.setattr(worker, "_finish", finish)
+    monkeypatch.setattr(worker, "_release", release)
+
+    for attempts in (1, 2):
+        await worker._run_job(SimpleNamespace(
+            id="retried", function_name="retried_once", args=["done"], attempts=attempts, enqueued_at=None,
+        ))
+    # Aborted while running
+    job = SimpleNamespace(id="aborted", function_name="sleeper", args=[], attempts=1, enqueued_at=None)
+    worker._running[job.id] = task = asyncio.create_task(worker._run_job(job))
+    await wait_for(lambda: len(recorder.started) == 3)
+    worker._cancel_aborted(job.id)
+    await task
+
+    assert outcomes == [("release", 0.0), ("finish", True, "done")]
+    assert recorder.started == recorder.ended == [1, 2, 1]
+    assert not worker._running
+
+
+@requires_postgres
+@pytest.mark.asyncio
+async def test_retry_requeues_the_job(db_session):
+    backend, recorder = PostgresQueueBackend(), Recorder()
+    job = await backend.enqueue("retried_once", "done")
+
+    worker = make_worker(retried_once, recorder=recorder)
+    await worker.run(burst=True)
+
+    info = await backend.job_info(job.job_id)
+    assert (info.status, info.success, info.result) == (JOB_COMPLETE, True, "done")
+    assert (worker.jobs_retried, worker.jobs_complete) == (1, 1)
+    assert recorder.started == recorder.ended == [1, 2]
+
+
+@requires_postgres
+@pytest.mark.asyncio
+async def test_abort_cancels_the_running_job(db_session, monkeypatch):
+    # Heartbeats every second, in case the cancel NOTIFY precedes the worker's LISTEN
+    monkeypatch.setattr(settings, "QUEUE_VISIBILITY_TIMEOUT", 3)
+    backend, recorder = PostgresQueueBackend(), Recorder()
+    job = await backend.enqueue("sleeper")
+    worker = make_worker(sleeper, recorder=recorder)
+    run = asyncio.create_task(worker.run())
+    try:
+        await wait_for(lambda: job.job_id in worker._running)
+        assert await backend.abort(job.job_id)
+        await wait_for(lambda: job.job_id not in worker._running)
+    finally:
+        run.cancel()
+        await asyncio.gather(run, return_exceptions=True)
+
+    info = await backend.job_info(job.job_id)
+    assert info.cancelled and info.result == CANCELLED_RESULT
+    assert recorder.ended == [1]
+    assert not await backend.abort(job.job_id)
+
+
+@requires_postgres
+@pytest.mark.asyncio
+async def test_expired_lease_is_claimed_again(db_session):
+    # Left in progress by a worker that died during its first try
+    expired = datetime.utcnow() - timedelta(minutes=1)
+    db_session.add_all([
+        QueueJob(id="orphan", function_name="retried_once", args=["done"], status=JOB_IN_PROGRESS,
+                 attempts=1, locked_until=expired, worker_id="dead"),
+        QueueJob(id="exhausted", function_name="retried_once", args=["done"], status=JOB_IN_PROGRESS,
+                 attempts=3, locked_until=expired, worker_id="dead"),
+        # Still leased: not claimed
+        QueueJob(id="leased", function_name="retried_once", args=["done"], status=JOB_IN_PROGRESS,
+                 attempts=1, locked_until=datetime.utcnow() + timedelta(minutes=5), worker_id="alive"),
+    ])
+    await db_session.commit()
+
+    await make_worker(retried_once, recorder=Recorder(), max_tries=3).run(burst=True)
+
+    db_session.expire_all()
+    jobs = {job.id: job for job in (await db_session.scalars(select(QueueJob))).all()}
+    assert (jobs["orphan"].status, jobs["orphan"].success, jobs["orphan"].attempts) == (JOB_COMPLETE, True, 2)
+    assert (jobs["exhausted"].success, jobs["exhausted"].result) == (False, "Max tries (3) exceeded.")
+    assert (jobs["leased"].status, jobs["leased"].worker_id) == (JOB_IN_PROGRESS, "alive")
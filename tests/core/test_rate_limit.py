@@ -0,0 +1,134 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException, Request, Response
+
+from src.core import rate_limit
+from src.core.config import settings
+from src.core.rate_limit import TokenBudget, _take_tokens, client_key
+
+CAPACITY = 1000
+WINDOW_MS = 10_000
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(monotonic=clock))
+    monkeypatch.setattr(rate_limit, "_buckets", {})
+    return clock
+
+
+def make_request(headers: dict[str, str] | None = None, host: str = "10.0.0.1") -> Request:
+    return Request({
+        "type": "http",
+        "method": "POST",
+        "path": "/crew/generate-parts",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        "client": (host, 50000),
+    })
+
+
+def test_charges_the_estimate(clock):
+    assert _take_tokens("client", CAPACITY, WINDOW_MS, 300) == (0, 700)
+    assert _take_tokens("client", CAPACITY, WINDOW_MS, 700) == (0, 0)
+    # Separate budget per key
+    assert _take_tokens("other", CAPACITY, WINDOW_MS, 100) == (0, 900)
+
+
+def test_refills_continuously(clock):
+    _take_tokens("client", CAPACITY, WINDOW_MS, CAPACITY)
+    # 1000 tokens per 10 s: 100 tokens per second
+    assert _take_tokens("client", CAPACITY, WINDOW_MS, 300) == (3000, 0)
+    clock.now += 1
+    assert _take_tokens("client", CAPACITY, WINDOW_MS, 300) == (2000, 100)
+    clock.now += 2
+    assert _take_tokens("client", CAPACITY, WINDOW_MS, 300) == (0, 0)
+    # Never beyond the capacity
+    clock.now += 3600
+    assert _take_tokens("client", CAPACITY, WINDOW_MS, 0) == (0, CAPACITY)
+
+
+def test_cheap_call_goes_through_while_an_expensive_one_waits(clock):
+    _take_tokens("client", CAPACITY, WINDOW_MS, 900)
+    wait_ms, left = _take_tokens("client", CAPACITY, WINDOW_MS, 800)
+    assert (wait_ms, left) == (7000, 100)
+    # A refused call is not charged
+    assert _take_tokens("client", CAPACITY, WINDOW_MS, 50) == (0, 50)
+
+
+def test_call_costing_more_than_the_budget_is_charged_the_whole_budget(clock):
+    assert _take_tokens("client", CAPACITY, WINDOW_MS, 5 * CAPACITY) == (0, 0)
+    wait_ms, _ = _take_tokens("client", CAPACITY, WINDOW_MS, 5 * CAPACITY)
+    assert wait_ms == WINDOW_MS
+
+
+def test_client_key_resolution(monkeypatch):
+    monkeypatch.setattr(settings, "TOKEN_BUDGET_CLIENT_HEADER", "X-Client-Key")
+    assert client_key(make_request({"X-Client-Key": "team-a", "X-Forwarded-For": "1.2.3.4"})) == "team-a"
+    assert client_key(make_request({"X-Forwarded-For": "1.2.3.4, 10.0.0.9"})) == "1.2.3.4"
+    assert client_key(make_request()) == "10.0.0.1"
+    # An empty header counts as not sent
+    assert client_key(make_request({"X-Client-Key": ""})) == "10.0.0.1"
+
+
+@pytest.fixture
+def budgets(monkeypatch, clock):
+    monkeypatch.setattr(settings, "TOKEN_BUDGET_ENABLED", True)
+    monkeypatch.setattr(settings, "TOKEN_BUDGET_CLIENT_HEADER", "X-Client-Key")
+    monkeypatch.setattr(settings, "TOKEN_BUDGET_WINDOW_SECONDS", 10)
+    monkeypatch.setattr(settings, "TOKEN_BUDGET_DEFAULT", CAPACITY)
+    monkeypatch.setattr(settings, "TOKEN_BUDGETS", {"big": 10 * CAPACITY})
+    return clock
+
+
+def budget(cost: int) -> TokenBudget:
+    async def estimate(request, session) -> int:
+        return cost
+    return TokenBudget(estimate)
+
+
+@pytest.mark.asyncio
+async def test_token_budget_charges_and_reports(budgets):
+    response = Response()
+    await budget(400)(make_request({"X-Client-Key": "team-a"}), response, session=None)
+    assert response.headers["X-Token-Estimate"] == "400"
+    assert response.headers["X-Token-Budget-Remaining"] == "600"
+
+
+@pytest.mark.asyncio
+async def test_token_budget_refuses_with_retry_after(budgets):
+    request = make_request({"X-Client-Key": "team-a"})
+    await budget(900)(request, Response(), session=None)
+    with pytest.raises(HTTPException) as refused:
+        await budget(600)(request, Response(), session=None)
+    assert refused.value.status_code == 429
+    # 500 tokens missing at 100 tokens per second
+    assert refused.value.headers["Retry-After"] == "5"
+    # A cheap call still fits, and other clients have their own budget
+    await budget(100)(request, Response(), session=None)
+    await budget(600)(make_request({"X-Client-Key": "team-b"}), Response(), session=None)
+    # Budgets set per client key
+    response = Response()
+    await budget(5000)(make_request({"X-Client-Key": "big"}), response, session=None)
+    assert response.headers["X-Token-Budget-Remaining"] == "5000"
+
+
+@pytest.mark.asyncio
+async def test_token_budget_disabled(budgets, monkeypatch):
+    monkeypatch.setattr(settings, "TOKEN_BUDGET_ENABLED", False)
+
+    async def estimate(request, session):
+        raise AssertionError("no estimate when budgets are disabled")
+
+    response = Response()
+    await TokenBudget(estimate)(make_request(), response, session=None)
+    assert "X-Token-Estimate" not in response.headers
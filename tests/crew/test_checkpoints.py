@@ -0,0 +1,92 @@
+import pytest
+from sqlalchemy import select
+
+from src.core.circuit_breaker import CircuitOpenError, DistributedCircuitBreaker, track_refusals
+from src.core.config import settings
+from src.crew.agents import StringOutput
+from src.crew.checkpoints import (
+    clears_checkpoints_on_failure, load_agent_output, save_agent_output,
+)
+from src.crew.models import JobCheckpoint
+
+USAGE = (120, 80, "gpt-4o-mini")
+
+
+async def checkpoint_keys(session) -> set[str]:
+    session.expire_all()
+    return set((await session.execute(select(JobCheckpoint.job_key))).scalars())
+
+
+@clears_checkpoints_on_failure
+async def crew_run(outcome: str, *keys: str) -> bool:
+    """Saves a checkpoint per key (after looking up the first), then ends as `outcome` says."""
+    await load_agent_output(keys[0], "input")
+    for key in keys:
+        await save_agent_output(key, "input", StringOutput(text=f"output of {key}"), USAGE)
+    if outcome == "interrupted":
+        raise TimeoutError("job timed out")
+    return outcome == "success"
+
+
+@pytest.mark.asyncio
+async def test_checkpoints_of_a_failed_run_are_cleared(db_session):
+    await save_agent_output("other:1", "input", StringOutput(text="another run"), USAGE)
+    assert await crew_run("failure", "task:1", "task:2") is False
+    # Only the run's own checkpoints
+    assert await checkpoint_keys(db_session) == {"other:1"}
+
+
+@pytest.mark.asyncio
+async def test_restored_checkpoints_of_a_failed_run_are_cleared(db_session):
+    await save_agent_output("task:1", "input", StringOutput(text="saved by an earlier try"), USAGE)
+
+    @clears_checkpoints_on_failure
+    async def restoring_run() -> bool:
+        assert await load_agent_output("task:1", "input") is not None
+        return False
+
+    assert await restoring_run() is False
+    assert await checkpoint_keys(db_session) == set()
+
+
+@pytest.mark.asyncio
+async def test_successful_run_leaves_clearing_to_its_transaction(db_session):
+    assert await crew_run("success", "task:1") is True
+    assert await checkpoint_keys(db_session) == {"task:1"}
+
+
+class UpstreamError(Exception):
+    pass
+
+
+@pytest.mark.asyncio
+async def test_checkpoints_are_kept_for_a_refused_run(db_session, monkeypatch):
+    monkeypatch.setattr(settings, "CIRCUIT_BREAKER_FAILURE_THRESHOLD", 1)
+    breaker = DistributedCircuitBreaker(expected_exception=lambda: (UpstreamError,))
+
+    async def failing():
+        raise UpstreamError()
+
+    with pytest.raises(UpstreamError):
+        await breaker.call(("model:checkpoints",), failing)
+
+    @clears_checkpoints_on_failure
+    async def refused_run() -> bool:
+        await save_agent_output("task:1", "input", StringOutput(text="first call"), USAGE)
+        try:
+            await breaker.call(("model:checkpoints",), failing)
+        except CircuitOpenError:
+            return False
+        return True
+
+    # As defer_on_open_circuit does for each job: the job will be retried
+    track_refusals()
+    assert await refused_run() is False
+    assert await checkpoint_keys(db_session) == {"task:1"}
+
+
+@pytest.mark.asyncio
+async def test_checkpoints_are_kept_for_an_interrupted_run(db_session):
+    with pytest.raises(TimeoutError):
+        await crew_run("interrupted", "task:1")
+    assert await checkpoint_keys(db_session) == {"task:1"}
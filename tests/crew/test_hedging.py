@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+from src.crew.hedging import HEDGE_DUPLICATE, HEDGE_PRIMARY, hedged_call, percentile
+
+# Seconds before the duplicate is sent; call timings are set well apart from it
+DELAY = 0.05
+
+
+def test_percentile_is_nearest_rank():
+    latencies = [500, 100, 400, 200, 300]
+    assert percentile(latencies, 50) == 300
+    assert percentile(latencies, 95) == 500
+    assert percentile(latencies, 100) == 500
+    assert percentile(latencies, 0) == 100
+    assert percentile([70], 99) == 70
+    assert percentile([], 95) is None
+
+
+def answer(value, after: float):
+    async def run():
+        await asyncio.sleep(after)
+        return value
+    return run
+
+
+def fail(error: Exception, after: float):
+    async def run():
+        await asyncio.sleep(after)
+        raise error
+    return run
+
+
+class Calls:
+    """`call` for hedged_call: the n-th call runs the n-th behaviour; records what happened to each."""
+
+    def __init__(self, *behaviours):
+        self.behaviours = behaviours
+        self.started = 0
+        self.cancelled: list[int] = []
+        self.failed: list[tuple[str, int]] = []
+        self.lost = 0
+
+    async def __call__(self):
+        index = self.started
+        self.started += 1
+        try:
+            return await self.behaviours[index]()
+        except asyncio.CancelledError:
+            self.cancelled.append(index)
+            raise
+
+    async def on_failed(self, error: BaseException, latency_ms: int) -> None:
+        self.failed.append((str(error), latency_ms))
+
+    async def on_lost(self) -> None:
+        self.lost += 1
+
+    def hedged(self):
+        return hedged_call(self, DELAY, self.on_failed, self.on_lost)
+
+
+@pytest.mark.asyncio
+async def test_fast_primary_sends_no_duplicate():
+    calls = Calls(answer("first", after=0.0))
+    assert await calls.hedged() == ("first", HEDGE_PRIMARY)
+    assert (calls.started, calls.lost, calls.cancelled) == (1, 0, [])
+
+
+@pytest.mark.asyncio
+async def test_primary_wins_after_the_duplicate_is_sent():
+    calls = Calls(answer("first", after=DELAY * 2), answer("second", after=1.0))
+    assert await calls.hedged() == ("first", HEDGE_PRIMARY)
+    # The duplicate is cancelled and reported lost
+    assert (calls.started, calls.cancelled, calls.lost) == (2, [1], 1)
+
+
+@pytest.mark.asyncio
+async def test_duplicate_wins():
+    calls = Calls(answer("first", after=1.0), answer("second", after=0.0))
+    assert await calls.hedged() == ("second", HEDGE_DUPLICATE)
+    assert (calls.cancelled, calls.lost) == ([0], 1)
+
+
+@pytest.mark.asyncio
+async def test_failed_call_is_reported_while_the_other_runs():
+    calls = Calls(fail(TimeoutError("primary timed out"), after=DELAY * 2), answer("second", after=DELAY * 4))
+    assert await calls.hedged() == ("second", HEDGE_DUPLICATE)
+    assert [error for error, _ in calls.failed] == ["primary timed out"]
+    assert calls.failed[0][1] >= DELAY * 2 * 1000 * 0.9
+    assert (calls.cancelled, calls.lost) == ([], 0)
+
+
+@pytest.mark.asyncio
+async def test_both_fail_raises_the_last_error():
+    calls = Calls(fail(TimeoutError("primary"), after=DELAY * 2), fail(ConnectionError("duplicate"), after=DELAY * 4))
+    with pytest.raises(ConnectionError, match="duplicate"):
+        await calls.hedged()
+    # The raised error is left to the caller to account for
+    assert [error for error, _ in calls.failed] == ["primary"]
+    assert calls.lost == 0
+
+
+@pytest.mark.asyncio
+async def test_primary_failing_before_the_delay_is_raised():
+    calls = Calls(fail(ConnectionError("refused"), after=0.0))
+    with pytest.raises(ConnectionError):
+        await calls.hedged()
+    assert (calls.started, calls.failed, calls.lost) == (1, [], 0)
+
+
+@pytest.mark.asyncio
+async def test_caller_cancellation_cancels_both_calls():
+    calls = Calls(answer("first", after=1.0), answer("second", after=1.0))
+    task = asyncio.create_task(calls.hedged())
+    await asyncio.sleep(DELAY * 2)
+    assert calls.started == 2
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert sorted(calls.cancelled) == [0, 1]
+    # Only the duplicate: the caller accounts for the primary
+    assert calls.lost == 1
+
+
+@pytest.mark.asyncio
+async def test_caller_cancellation_before_the_duplicate():
+    calls = Calls(answer("first", after=1.0))
+    task = asyncio.create_task(calls.hedged())
+    await asyncio.sleep(DELAY / 5)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert (calls.started, calls.cancelled, calls.lost) == (1, [0], 0)
@@ -0,0 +1,132 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from src.crew.repair import (
+    REPAIR_COERCED, REPAIR_FOLLOW_UP, InvalidOutput, _coerce_shape, _extract_json, coerce_output, repair_output,
+)
+from src.crew.schemas import PartListOutline
+
+PARTS = [
+    {"part_number": 1, "title": "Origins", "summary": "Where it began."},
+    {"part_number": 2, "title": "Spread", "summary": "How it travelled."},
+]
+
+
+def unnumbered(parts: list[dict]) -> list[dict]:
+    return [{key: value for key, value in part.items() if key != "part_number"} for part in parts]
+
+
+@pytest.mark.parametrize("raw", [
+    json.dumps({"parts": PARTS}),
+    f"```json\n{json.dumps({'parts': PARTS}, indent=2)}\n```",
+    f"```\n{json.dumps({'parts': PARTS})}\n```",
+    f"Here is the outline:\n{json.dumps({'parts': PARTS})}\nLet me know if it needs changes.",
+])
+def test_extract_json_ignores_fences_and_text(raw):
+    assert _extract_json(raw) == {"parts": PARTS}
+
+
+def test_extract_json_finds_a_bare_list():
+    assert _extract_json(f"The parts: {json.dumps(PARTS)}.") == PARTS
+
+
+def test_extract_json_without_json():
+    with pytest.raises(ValueError, match="no JSON"):
+        _extract_json("I could not write the outline.")
+
+
+@pytest.mark.parametrize("data", [
+    # A bare list
+    PARTS,
+    # The list under another key
+    {"book_parts": PARTS},
+    # Missing or invalid numbers are numbered in order
+    {"parts": unnumbered(PARTS)},
+    {"parts": [{**PARTS[0], "part_number": 0}, {**PARTS[1], "part_number": "two"}]},
+])
+def test_coerce_shape(data):
+    assert _coerce_shape(data, PartListOutline) == {"parts": PARTS}
+
+
+def test_coerce_shape_keeps_valid_numbers():
+    parts = [{**PARTS[0], "part_number": 3}, {**PARTS[1], "part_number": "1"}]
+    assert _coerce_shape({"parts": parts}, PartListOutline) == {"parts": parts}
+
+
+def test_coerce_shape_leaves_ambiguous_outputs():
+    # Two lists: which one holds the parts is not guessed
+    data = {"parts_a": PARTS, "parts_b": PARTS}
+    assert _coerce_shape(data, PartListOutline) == data
+
+
+def test_coerce_output_validates_in_lax_mode():
+    raw = "```json\n" + json.dumps([{**PARTS[0], "part_number": "1"}, {**PARTS[1], "part_number": "2"}]) + "\n```"
+    output, errors = coerce_output(raw, PartListOutline)
+    assert errors == ""
+    assert [part.part_number for part in output.parts] == [1, 2]
+
+
+def test_coerce_output_reports_validation_errors():
+    output, errors = coerce_output(json.dumps({"parts": PARTS[:1]}), PartListOutline)
+    assert output is None
+    assert "parts: Value error, At least 2 parts are required" in errors
+    output, errors = coerce_output("Sorry.", PartListOutline)
+    assert (output, errors) == (None, "- output: not valid JSON (no JSON object or array found)")
+
+
+class FollowUp:
+    """`follow_up` for repair_output: records its prompts and answers with `output`."""
+
+    def __init__(self, output=None, error: Exception | None = None):
+        self.output = output
+        self.error = error
+        self.prompts: list[str] = []
+
+    async def __call__(self, prompt: str):
+        self.prompts.append(prompt)
+        if self.error:
+            raise self.error
+        return SimpleNamespace(
+            final_output_as=lambda output_type: self.output,
+            raw_responses=[SimpleNamespace(usage=SimpleNamespace(input_tokens=40, output_tokens=60))],
+        )
+
+
+def usage(result) -> tuple[int, int]:
+    return result.raw_responses[0].usage.input_tokens, result.raw_responses[0].usage.output_tokens
+
+
+@pytest.mark.asyncio
+async def test_repaired_locally_without_a_follow_up():
+    follow_up = FollowUp()
+    invalid = InvalidOutput(f"```json\n{json.dumps({'outline': unnumbered(PARTS)})}\n```", 500, 200)
+    result = await repair_output(invalid, PartListOutline, follow_up)
+    assert result.repair == REPAIR_COERCED
+    assert result.final_output == PartListOutline(parts=PARTS)
+    assert usage(result) == (500, 200)
+    assert follow_up.prompts == []
+
+
+@pytest.mark.asyncio
+async def test_still_invalid_output_falls_through_to_a_follow_up():
+    repaired = PartListOutline(parts=PARTS)
+    follow_up = FollowUp(output=repaired)
+    raw = json.dumps({"parts": PARTS[:1]})
+    result = await repair_output(InvalidOutput(raw, 500, 200), PartListOutline, follow_up)
+    assert result.repair == REPAIR_FOLLOW_UP
+    assert result.final_output is repaired
+    # Usage of both calls
+    assert usage(result) == (540, 260)
+    # The follow-up gets the errors and the previous output, not the original input
+    [prompt] = follow_up.prompts
+    assert "At least 2 parts are required" in prompt
+    assert prompt.endswith(f"Previous output:\n{raw}")
+
+
+@pytest.mark.asyncio
+async def test_failed_follow_up_is_not_a_repair():
+    follow_up = FollowUp(error=ValueError("still invalid"))
+    assert await repair_output(InvalidOutput("Sorry.", 500, 10), PartListOutline, follow_up) is None
+    assert len(follow_up.prompts) == 1
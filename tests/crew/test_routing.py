@@ -0,0 +1,101 @@
+import pytest
+
+from src.core.config import settings
+from src.crew import routing
+from src.crew.routing import (
+    PHASE_CHAPTER_GENERATION, PHASE_FINALIZATION, ROUTING_POLICY_ADAPTIVE, ROUTING_POLICY_STATIC,
+    ModelStats, choose_model, resolve_model, resolve_static_model,
+)
+
+AGENT = "Historian AI"
+
+
+@pytest.fixture
+def routes(monkeypatch):
+    monkeypatch.setattr(settings, "DEFAULT_OPENAI_MODEL_NAME", "default-model")
+    monkeypatch.setattr(settings, "AGENT_MODEL_ROUTES", {AGENT: "agent-model"})
+    monkeypatch.setattr(settings, "PHASE_MODEL_ROUTES", {PHASE_FINALIZATION: "phase-model"})
+    monkeypatch.setattr(settings, "MODEL_ROUTING_CANDIDATES", {PHASE_CHAPTER_GENERATION: ["small", "large"]})
+    monkeypatch.setattr(settings, "MODEL_ROUTING_WEIGHTS", {"cost": 0.5, "latency": 0.3, "failure": 0.2})
+    monkeypatch.setattr(settings, "MODEL_ROUTING_MIN_SAMPLES", 5)
+
+
+def stats(calls=10, avg_cost=0.01, avg_latency_ms=1000.0, failure_rate=0.0) -> ModelStats:
+    return ModelStats(calls=calls, avg_cost=avg_cost, avg_latency_ms=avg_latency_ms, failure_rate=failure_rate)
+
+
+def test_static_routes_phase_then_agent_then_default(routes):
+    assert resolve_static_model(AGENT, PHASE_FINALIZATION) == "phase-model"
+    assert resolve_static_model(AGENT, PHASE_CHAPTER_GENERATION) == "agent-model"
+    assert resolve_static_model("Theorist AI", PHASE_CHAPTER_GENERATION) == "default-model"
+
+
+def test_under_sampled_candidates_are_tried_first(routes):
+    assert choose_model(["small", "large"], {}) == "small"
+    assert choose_model(["small", "large"], {"small": stats(calls=3)}) == "large"
+    assert choose_model(["small", "large"], {"small": stats(calls=3), "large": stats(calls=4)}) == "small"
+
+
+def test_cheaper_and_faster_candidate_wins(routes):
+    candidates = ["large", "small"]
+    assert choose_model(candidates, {
+        "large": stats(avg_cost=0.02, avg_latency_ms=3000),
+        "small": stats(avg_cost=0.005, avg_latency_ms=800),
+    }) == "small"
+    # Failures outweigh a lower price
+    assert choose_model(candidates, {
+        "large": stats(avg_cost=0.02, avg_latency_ms=1000),
+        "small": stats(avg_cost=0.015, avg_latency_ms=1000, failure_rate=0.9),
+    }) == "large"
+
+
+def test_candidate_without_a_successful_call_counts_as_the_worst(routes):
+    assert choose_model(["small", "large"], {
+        "small": stats(avg_cost=None, avg_latency_ms=None, failure_rate=1.0),
+        "large": stats(avg_cost=0.05, avg_latency_ms=5000),
+    }) == "large"
+
+
+def test_ties_keep_the_configured_order(routes):
+    same = {"small": stats(), "large": stats()}
+    assert choose_model(["small", "large"], same) == "small"
+    assert choose_model(["large", "small"], same) == "large"
+
+
+@pytest.mark.asyncio
+async def test_static_policy_ignores_candidates(routes, monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_ROUTING_POLICY", ROUTING_POLICY_STATIC)
+
+    async def no_stats(phase):
+        raise AssertionError("static routing reads no stats")
+
+    monkeypatch.setattr(routing, "get_model_stats", no_stats)
+    assert await resolve_model(AGENT, PHASE_CHAPTER_GENERATION) == "agent-model"
+
+
+@pytest.mark.asyncio
+async def test_adaptive_policy_routes_on_stats(routes, monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_ROUTING_POLICY", ROUTING_POLICY_ADAPTIVE)
+    phases = []
+
+    async def model_stats(phase):
+        phases.append(phase)
+        return {"small": stats(avg_cost=0.001), "large": stats(avg_cost=0.03)}
+
+    monkeypatch.setattr(routing, "get_model_stats", model_stats)
+    assert await resolve_model(AGENT, PHASE_CHAPTER_GENERATION) == "small"
+    assert phases == [PHASE_CHAPTER_GENERATION]
+    # No candidates for this phase: its static route
+    assert await resolve_model(AGENT, PHASE_FINALIZATION) == "phase-model"
+    assert phases == [PHASE_CHAPTER_GENERATION]
+
+
+@pytest.mark.asyncio
+async def test_adaptive_policy_falls_back_to_the_static_route(routes, monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_ROUTING_POLICY", ROUTING_POLICY_ADAPTIVE)
+
+    async def unavailable(phase):
+        raise ConnectionError("database is down")
+
+    monkeypatch.setattr(routing, "get_model_stats", unavailable)
+    assert await resolve_model(AGENT, PHASE_CHAPTER_GENERATION) == "agent-model"
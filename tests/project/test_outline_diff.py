@@ -0,0 +1,145 @@
+import uuid
+
+import pytest
+from sqlalchemy import func, select
+
+from src.crew.schemas import ChapterListOutline
+from src.project.models import Chapter, ChapterVersion, Part, Project
+from src.project.outline_diff import OutlineRow, diff_outline
+from src.project.service import finalize_chapter_structure
+
+
+def stored(*rows: tuple[int, str], **fields) -> list[OutlineRow]:
+    return [OutlineRow(uuid.uuid4(), number, title, dict(fields)) for number, title in rows]
+
+
+def outline(*rows: tuple[int, str], **fields) -> list[OutlineRow]:
+    return [OutlineRow(None, number, title, dict(fields)) for number, title in rows]
+
+
+def test_unchanged_outline_writes_nothing():
+    rows = stored((1, "Origins"), (2, "Methods"))
+    diff = diff_outline(rows, outline((1, "Origins"), (2, "Methods")))
+    assert diff.unchanged == [r.id for r in rows]
+    assert not (diff.inserts or diff.updates or diff.renumbers or diff.deletes)
+    assert diff.changed_ids == set()
+
+
+def test_rename_keeps_the_row():
+    origins, methods = stored((1, "Origins"), (2, "Methods"))
+    diff = diff_outline([origins, methods], outline((1, "Beginnings"), (2, "Methods")))
+    assert list(diff.updates) == [origins.id]
+    assert diff.updates[origins.id].title == "Beginnings"
+    assert diff.unchanged == [methods.id]
+    assert not (diff.inserts or diff.deletes or diff.renumbers)
+
+
+def test_field_change_is_an_update():
+    (origins,) = stored((1, "Origins"), summary="old")
+    diff = diff_outline([origins], outline((1, "Origins"), summary="new"))
+    assert list(diff.updates) == [origins.id]
+
+
+def test_swap_only_renumbers():
+    origins, methods = stored((1, "Origins"), (2, "Methods"))
+    diff = diff_outline([origins, methods], outline((1, "Methods"), (2, "Origins")))
+    assert diff.renumbers == {origins.id: 2, methods.id: 1}
+    assert not (diff.inserts or diff.updates or diff.deletes or diff.unchanged)
+
+
+def test_insert_in_the_middle_shifts_the_rows_after_it():
+    origins, methods = stored((1, "Origins"), (2, "Methods"))
+    diff = diff_outline([origins, methods], outline((1, "Origins"), (2, "Interlude"), (3, "Methods")))
+    assert [entry.title for entry in diff.inserts] == ["Interlude"]
+    assert diff.renumbers == {methods.id: 3}
+    assert diff.unchanged == [origins.id]
+    assert not (diff.updates or diff.deletes)
+
+
+def test_delete_shifts_the_rows_after_it():
+    origins, methods, results = stored((1, "Origins"), (2, "Methods"), (3, "Results"))
+    diff = diff_outline([origins, methods, results], outline((1, "Origins"), (2, "Results")))
+    assert diff.deletes == [methods.id]
+    assert diff.renumbers == {results.id: 2}
+    assert diff.unchanged == [origins.id]
+    assert diff.changed_ids == {methods.id, results.id}
+
+
+def test_duplicate_titles_match_one_row_each():
+    first, second = stored((1, "Notes"), (2, "Notes"))
+    diff = diff_outline([first, second], outline((1, "Notes"), (2, "Notes"), (3, "Notes")))
+    assert diff.unchanged == [first.id, second.id]
+    assert [entry.number for entry in diff.inserts] == [3]
+    assert not (diff.updates or diff.renumbers or diff.deletes)
+
+
+def test_title_change_with_renumber():
+    # Matched by title regardless of case and spacing, then both updated and renumbered
+    origins, methods = stored((1, "Origins"), (2, "the  methods"))
+    diff = diff_outline([origins, methods], outline((1, "The Methods"), (2, "Origins")))
+    assert diff.updates[methods.id].title == "The Methods"
+    assert diff.renumbers == {methods.id: 1, origins.id: 2}
+    assert list(diff.updates) == [methods.id]
+
+
+def test_renamed_and_moved_entry_is_replaced():
+    # Neither its title nor its number matches a stored row any more
+    origins, methods = stored((1, "Origins"), (2, "Methods"))
+    diff = diff_outline([origins, methods], outline((1, "Methods"), (2, "Early history")))
+    assert diff.renumbers == {methods.id: 1}
+    assert diff.deletes == [origins.id]
+    assert [entry.title for entry in diff.inserts] == ["Early history"]
+
+
+BRIEF = {
+    "thesis_statement": "A thesis.",
+    "narrative_arc": "An arc.",
+    "required_inclusions": ["a concept"],
+    "key_questions_to_answer": ["a question?"],
+}
+
+
+def chapter_outline(*titles: str) -> ChapterListOutline:
+    return ChapterListOutline(chapters=[
+        {"chapter_number": number, "title": title, "brief": BRIEF, "suggested_agent": "Theorist AI"}
+        for number, title in enumerate(titles, start=1)
+    ])
+
+
+@pytest.mark.asyncio
+async def test_finalize_chapter_structure_keeps_unchanged_chapters(db_session):
+    project = Project(raw_blueprint="A book.")
+    part = Part(project=project, part_number=1, title="Part 1", status="CHAPTERS_PENDING_VALIDATION")
+    chapters = [
+        Chapter(part=part, chapter_number=number, title=title, brief=BRIEF,
+                suggested_agent="Theorist AI", content=f"{title} text", status="COMPLETE")
+        for number, title in enumerate(["Origins", "Methods", "Results"], start=1)
+    ]
+    db_session.add_all([project, part, *chapters])
+    await db_session.flush()
+    db_session.add_all(ChapterVersion(chapter_id=c.id, content=c.content) for c in chapters)
+    await db_session.commit()
+    part_id = part.id
+    origins, methods, results = (c.id for c in chapters)
+
+    # Methods is dropped, Results moves up, a new chapter is added at the end
+    await finalize_chapter_structure(db_session, part_id, chapter_outline("Origins", "Results", "Outlook"))
+
+    db_session.expire_all()
+    rows = (await db_session.execute(
+        select(Chapter.id, Chapter.chapter_number, Chapter.title, Chapter.content)
+        .where(Chapter.part_id == part_id)
+        .order_by(Chapter.chapter_number)
+    )).all()
+    assert [(r.id, r.chapter_number, r.title, r.content) for r in rows[:2]] == [
+        (origins, 1, "Origins", "Origins text"),
+        (results, 2, "Results", "Results text"),
+    ]
+    assert rows[2].title == "Outlook" and rows[2].content is None
+    assert rows[2].id not in {origins, methods, results}
+
+    versions = dict((await db_session.execute(
+        select(ChapterVersion.chapter_id, func.count()).group_by(ChapterVersion.chapter_id)
+    )).all())
+    assert versions == {origins: 1, results: 1}
+    assert (await db_session.get(Part, part_id)).status == "CHAPTERS_VALIDATED"
@@ -0,0 +1,92 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from src.project.models import Chapter, Part, Project
+from src.project.retrieval import (
+    PASSAGE_TARGET_CHARS, bm25_scores, retrieve_passages, split_passages, tokenize,
+)
+
+
+def test_tokenize_drops_stopwords_and_single_letters():
+    assert tokenize("The Printing-Press of 1450, and a Gutenberg Bible!") == [
+        "printing", "press", "1450", "gutenberg", "bible",
+    ]
+
+
+def test_split_passages_merges_short_paragraphs():
+    paragraphs = ["a" * 500, "b" * 500, "c" * 500]
+    passages = split_passages("\n\n".join(paragraphs))
+    # The first two fit in PASSAGE_TARGET_CHARS with their separator; the third does not
+    assert passages == [f"{'a' * 500}\n\n{'b' * 500}", "c" * 500]
+    assert all(len(p) <= PASSAGE_TARGET_CHARS for p in passages)
+
+
+def test_split_passages_keeps_long_paragraphs_whole():
+    long = "x" * (PASSAGE_TARGET_CHARS + 100)
+    assert split_passages(f"short\n\n{long}\n\nend") == ["short", long, "end"]
+
+
+def test_split_passages_skips_blank_paragraphs():
+    assert split_passages("\n\n  first  \n\n\n\n   \n\nsecond\n\n") == ["first\n\nsecond"]
+    assert split_passages("", target_chars=10) == []
+
+
+def scores(passages: list[str], query: str) -> np.ndarray:
+    term_counts = [dict(Counter(tokenize(p))) for p in passages]
+    lengths = np.array([len(tokenize(p)) for p in passages], dtype=np.float64)
+    return bm25_scores(term_counts, lengths, sorted(set(tokenize(query))))
+
+
+def test_bm25_ranks_passages_by_relevance():
+    passages = [
+        "printing press movable type printing press",
+        "printing press history",
+        "monastery scribes copied manuscripts",
+    ]
+    result = scores(passages, "printing press")
+    assert list(np.argsort(-result)) == [0, 1, 2]
+    assert result[2] == 0
+
+
+def test_bm25_favours_rare_terms_and_short_passages():
+    passages = [
+        "gutenberg printing workshop",
+        "printing workshop mainz",
+        "printing workshop mainz guild charter ledger",
+    ]
+    # "gutenberg" occurs in one passage, "printing" in all of them
+    result = scores(passages, "gutenberg printing")
+    assert result[0] > result[1] > 0
+    # Same term frequency: the shorter passage wins
+    result = scores(passages, "mainz")
+    assert result[1] > result[2] > 0
+
+
+@pytest.mark.asyncio
+async def test_retrieve_passages_before_a_chapter(db_session):
+    project = Project(raw_blueprint="A book.")
+    chapters = {}
+    for part_number in (1, 2):
+        part = Part(project=project, part_number=part_number, title=f"Part {part_number}")
+        for chapter_number in (1, 2):
+            chapters[part_number, chapter_number] = Chapter(
+                part=part, chapter_number=chapter_number, title=f"Chapter {part_number}.{chapter_number}",
+                # Later chapters mention the press more often, so they would rank first
+                content=f"Intro.\n\n{' '.join(['press'] * (part_number * 2 + chapter_number))} in Mainz.",
+            )
+    db_session.add_all([project, *chapters.values()])
+    await db_session.commit()
+
+    everything = await retrieve_passages(db_session, project.id, "the press", top_k=10)
+    assert [(p.part_number, p.chapter_number) for p in everything] == [(2, 2), (2, 1), (1, 2), (1, 1)]
+    assert everything[0].chapter_title == "Chapter 2.2" and "Mainz" in everything[0].text
+
+    earlier = await retrieve_passages(db_session, project.id, "press", top_k=10, before=(2, 2))
+    assert [(p.part_number, p.chapter_number) for p in earlier] == [(2, 1), (1, 2), (1, 1)]
+    top = await retrieve_passages(db_session, project.id, "press", top_k=1, before=(2, 1))
+    assert [(p.part_number, p.chapter_number) for p in top] == [(1, 2)]
+
+    assert await retrieve_passages(db_session, project.id, "the and of", top_k=10) == []
+    assert await retrieve_passages(db_session, project.id, "scribes", top_k=10) == []